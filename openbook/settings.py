@@ -134,6 +134,7 @@ INSTALLED_APPS = [
     'openbook_devices',
     'openbook_moderation',
     'openbook_translation',
+    'openbook_search',
 ]
 
 MODELTRANSLATION_FALLBACK_LANGUAGES = ('en',)
@@ -444,6 +445,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 # Video encoding
 
+VIDEO_ENCODING_MAX_WORKERS = int(os.environ.get('VIDEO_ENCODING_MAX_WORKERS', os.cpu_count() or 1))
+VIDEO_ENCODING_PROGRESS_UPDATE = int(os.environ.get('VIDEO_ENCODING_PROGRESS_UPDATE', '5'))
+VIDEO_ENCODING_LOCAL_COPIES_DIR = os.environ.get('VIDEO_ENCODING_LOCAL_COPIES_DIR')
+
 VIDEO_ENCODING_FORMATS = {
     'FFmpeg': [
         {
@@ -529,6 +534,46 @@ MIN_UNIQUE_TOP_POST_REACTIONS_COUNT = int(os.environ.get('MIN_UNIQUE_TOP_POST_RE
 MIN_UNIQUE_TOP_POST_COMMENTS_COUNT = int(os.environ.get('MIN_UNIQUE_TOP_POST_COMMENTS_COUNT', '5'))
 MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT = int(os.environ.get('MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT', '5'))
 
+TIMELINE_MATERIALIZED_ENABLED = os.environ.get('TIMELINE_MATERIALIZED_ENABLED', 'False') == 'True'
+TIMELINE_MAX_LENGTH = int(os.environ.get('TIMELINE_MAX_LENGTH', '800'))
+TIMELINE_MERGED_QUERIES_ENABLED = os.environ.get('TIMELINE_MERGED_QUERIES_ENABLED', 'False') == 'True'
+
+TOP_POSTS_INCREMENTAL_CURATION_ENABLED = os.environ.get('TOP_POSTS_INCREMENTAL_CURATION_ENABLED',
+                                                        'False') == 'True'
+
+TRENDING_POSTS_SCORES_ENABLED = os.environ.get('TRENDING_POSTS_SCORES_ENABLED', 'False') == 'True'
+TRENDING_POSTS_SCORE_HALF_LIFE_HOURS = int(os.environ.get('TRENDING_POSTS_SCORE_HALF_LIFE_HOURS', '6'))
+
+USER_EXCLUSIONS_CACHE_ENABLED = os.environ.get('USER_EXCLUSIONS_CACHE_ENABLED', 'False') == 'True'
+USER_EXCLUSIONS_CACHE_MAX_IDS = int(os.environ.get('USER_EXCLUSIONS_CACHE_MAX_IDS', '500'))
+USER_EXCLUSIONS_CACHE_TIMEOUT = int(os.environ.get('USER_EXCLUSIONS_CACHE_TIMEOUT', '86400'))
+
+USER_RELATIONSHIPS_CACHE_ENABLED = os.environ.get('USER_RELATIONSHIPS_CACHE_ENABLED', 'False') == 'True'
+USER_RELATIONSHIPS_CACHE_MAX_IDS = int(os.environ.get('USER_RELATIONSHIPS_CACHE_MAX_IDS', '20000'))
+USER_RELATIONSHIPS_CACHE_TIMEOUT = int(os.environ.get('USER_RELATIONSHIPS_CACHE_TIMEOUT', '86400'))
+
+COMMUNITIES_MEMBERSHIPS_CACHE_ENABLED = os.environ.get('COMMUNITIES_MEMBERSHIPS_CACHE_ENABLED', 'False') == 'True'
+COMMUNITIES_MEMBERSHIPS_CACHE_TIMEOUT = int(os.environ.get('COMMUNITIES_MEMBERSHIPS_CACHE_TIMEOUT', '86400'))
+
+POSTS_VISIBILITY_CACHE_ENABLED = os.environ.get('POSTS_VISIBILITY_CACHE_ENABLED', 'False') == 'True'
+POSTS_VISIBILITY_CACHE_TIMEOUT = int(os.environ.get('POSTS_VISIBILITY_CACHE_TIMEOUT', '60'))
+
+REFERENCE_ROWS_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_ROWS_CACHE_TIMEOUT', '3600'))
+
+UNREAD_NOTIFICATIONS_COUNTS_TIMEOUT = int(os.environ.get('UNREAD_NOTIFICATIONS_COUNTS_TIMEOUT', '86400'))
+NOTIFICATIONS_PURGE_BATCH_SIZE = int(os.environ.get('NOTIFICATIONS_PURGE_BATCH_SIZE', '1000'))
+
+INLINE_MENTIONS_MAX_COUNT = int(os.environ.get('INLINE_MENTIONS_MAX_COUNT', '10'))
+
+HASHTAGS_STATS_BATCH_SIZE = int(os.environ.get('HASHTAGS_STATS_BATCH_SIZE', '500'))
+
+SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'icontains')
+SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', 'False') == 'True'
+SEARCH_INDEX_MAX_CANDIDATES = int(os.environ.get('SEARCH_INDEX_MAX_CANDIDATES', '1000'))
+
+POST_MEDIA_ASYNC_PROCESSING_ENABLED = os.environ.get('POST_MEDIA_ASYNC_PROCESSING_ENABLED', 'False') == 'True'
+MEDIA_DEDUPLICATION_ENABLED = os.environ.get('MEDIA_DEDUPLICATION_ENABLED', 'False') == 'True'
+
 # Email Config
 
 EMAIL_BACKEND = 'django_amazon_ses.EmailBackend'
@@ -579,3 +624,7 @@ if IS_PRODUCTION:
 # ONE SIGNAL
 ONE_SIGNAL_APP_ID = os.environ.get('ONE_SIGNAL_APP_ID')
 ONE_SIGNAL_API_KEY = os.environ.get('ONE_SIGNAL_API_KEY')
+ONE_SIGNAL_API_ROOT = os.environ.get('ONE_SIGNAL_API_ROOT', 'https://onesignal.com/api/v1')
+ONE_SIGNAL_TIMEOUT = int(os.environ.get('ONE_SIGNAL_TIMEOUT', '10'))
+ONE_SIGNAL_MAX_RETRIES = int(os.environ.get('ONE_SIGNAL_MAX_RETRIES', '3'))
+ONE_SIGNAL_RETRY_BACKOFF_SECONDS = float(os.environ.get('ONE_SIGNAL_RETRY_BACKOFF_SECONDS', '0.5'))
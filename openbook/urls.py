@@ -55,7 +55,7 @@ from openbook_communities.views.community.views import CommunityItem, CommunityA
 from openbook_connections.views import ConnectWithUser, Connections, DisconnectFromUser, UpdateConnection, \
     ConfirmConnection
 from openbook_hashtags.views.hashtag.views import HashtagItem, HashtagPosts
-from openbook_hashtags.views.hashtags.views import SearchHashtags
+from openbook_hashtags.views.hashtags.views import SearchHashtags, TrendingHashtags
 from openbook_invitations.views import UserInvite, UserInvites, SearchUserInvites, SendUserInviteEmail
 from openbook_devices.views import Devices, DeviceItem
 from openbook_follows.views import FollowUser, UnfollowUser, UpdateFollowUser, RequestToFollowUser, \
@@ -425,6 +425,7 @@ hashtag_patterns = [
 
 hashtags_patterns = [
     path('search/', SearchHashtags.as_view(), name='search-hashtags'),
+    path('trending/', TrendingHashtags.as_view(), name='trending-hashtags'),
     path('<str:hashtag_name>/', include(hashtag_patterns)),
 ]
 
@@ -1,10 +1,14 @@
+import heapq
 import secrets
+import threading
 from datetime import datetime, timedelta
 import re
 import uuid
 from django.contrib.auth.validators import UnicodeUsernameValidator, ASCIIUsernameValidator
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
+from django.core.cache import cache
+from django.core.signals import request_started, request_finished
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -14,16 +18,25 @@ from django.utils.translation import ugettext_lazy as _
 from imagekit.models import ProcessedImageField
 from pilkit.processors import ResizeToFill, ResizeToFit
 from rest_framework.authtoken.models import Token
-from django.db.models import Q, F, Count
+from django.db.models import Q, F, Count, Exists
+from django.db.models.functions import Length
 from django.core.mail import EmailMultiAlternatives
+from django_redis import get_redis_connection
 
 from openbook.settings import USERNAME_MAX_LENGTH
 from openbook_auth.helpers import upload_to_user_cover_directory, upload_to_user_avatar_directory
 from openbook_hashtags.queries import make_search_hashtag_query_for_user_with_id, \
-    make_get_hashtag_with_name_for_user_with_id_query
+    make_get_hashtag_with_name_for_user_with_id_query, make_get_trending_hashtags_for_user_with_id_query
 from openbook_notifications.helpers import get_notification_language_code_for_target_user
-from openbook_posts.queries import make_get_hashtag_posts_for_user_with_id_query
+from openbook_posts.queries import make_get_hashtag_posts_for_user_with_id_query, \
+    make_exclude_reported_posts_by_user_with_id_query, make_exclude_blocked_posts_for_user_with_id_query, \
+    make_exclude_community_posts_banned_from_for_user_with_id_query, \
+    make_exclude_reported_post_comments_by_user_with_id_query, \
+    make_exclude_blocked_community_posts_for_user_and_community_with_ids, \
+    make_count_post_reactions_query_for_user_with_id
 from openbook_posts.query_collections import get_posts_for_user_collection
+from openbook_search.queries import is_search_index_engine_enabled, make_users_search_index_query, \
+    make_hashtags_search_index_query, make_search_rank_expression
 from openbook_translation import translation_strategy
 from openbook_common.helpers import get_supported_translation_language
 from openbook_common.models import Badge, Language
@@ -37,7 +50,8 @@ from openbook_common.utils.model_loaders import get_connection_model, get_circle
     get_moderation_penalty_model, get_post_comment_mute_model, get_post_comment_reaction_model, \
     get_post_comment_reaction_notification_model, get_top_post_model, get_top_post_community_exclusion_model, \
     get_hashtag_model, get_profile_posts_community_exclusion_model, get_user_new_post_notification_model, \
-    get_follow_request_model, get_follow_request_notification_model, get_follow_request_approved_notification_model
+    get_follow_request_model, get_follow_request_notification_model, get_follow_request_approved_notification_model, \
+    get_timeline_entry_model, get_notification_model, get_community_membership_model
 from openbook_common.validators import name_characters_validator
 from openbook_notifications import helpers
 from openbook_auth.checkers import *
@@ -106,6 +120,46 @@ class User(AbstractUser):
     JWT_TOKEN_TYPE_CHANGE_EMAIL = 'CE'
     JWT_TOKEN_TYPE_PASSWORD_RESET = 'PR'
 
+    EXCLUSIONS_CACHE_KEY = 'user-exclusions-%d'
+
+    RELATIONSHIPS_CACHE_KEY = 'user-relationships-%s-%d'
+    RELATIONSHIP_LINKED_USERS = 'linked'
+    RELATIONSHIP_FOLLOWERS = 'followers'
+    RELATIONSHIP_BLOCKED_USERS = 'blocked'
+    RELATIONSHIPS = (RELATIONSHIP_LINKED_USERS, RELATIONSHIP_FOLLOWERS, RELATIONSHIP_BLOCKED_USERS,)
+
+    COMMUNITIES_MEMBERSHIPS_CACHE_KEY = 'user-communities-memberships-%d'
+    COMMUNITY_ROLE_MEMBER = 'is_member'
+    COMMUNITY_ROLE_MODERATOR = 'is_moderator'
+    COMMUNITY_ROLE_ADMINISTRATOR = 'is_administrator'
+    COMMUNITY_ROLE_BANNED = 'is_banned'
+
+    # Redis hash per user with the posts and post comments visibility decisions, expiring as a whole. The fields
+    # are prefixed with the version of the decisions, see clear_posts_visibilities.
+    POSTS_VISIBILITY_CACHE_KEY = 'user-posts-visibility-%d'
+    POSTS_VISIBILITY_VERSION_KEY = 'posts-visibility-version'
+
+    _GET_CACHED_POSTS_VISIBILITIES_SCRIPT = """
+    local version = redis.call('GET', KEYS[2]) or '0'
+    local fields = {}
+    for i = 1, #ARGV do
+        fields[i] = version .. ':' .. ARGV[i]
+    end
+    local visibilities = redis.call('HMGET', KEYS[1], unpack(fields))
+    table.insert(visibilities, 1, version)
+    return visibilities
+    """
+
+    _CACHE_POSTS_VISIBILITY_SCRIPT = """
+    redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+    if redis.call('TTL', KEYS[1]) < 0 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+    """
+
+    # The registered Redis scripts by source, see _get_redis_script
+    _redis_scripts = {}
+
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
@@ -160,6 +214,325 @@ class User(AbstractUser):
     def user_with_username_exists(cls, username):
         return User.objects.filter(username=username, is_deleted=False).exists()
 
+    @classmethod
+    def get_exclusions_for_user_with_id(cls, user_id):
+        """
+        The ids of the users blocked by or blocking the user, of the communities the user is banned from and of the
+        posts and post comments the user reported. Cached until any of them changes.
+        Returns None if the cache is disabled, an ids list is None if longer than USER_EXCLUSIONS_CACHE_MAX_IDS.
+        """
+        if not settings.USER_EXCLUSIONS_CACHE_ENABLED:
+            return None
+
+        exclusions_cache_key = cls.EXCLUSIONS_CACHE_KEY % user_id
+        exclusions = cache.get(exclusions_cache_key)
+
+        if exclusions is None:
+            exclusions = cls._make_exclusions_for_user_with_id(user_id=user_id)
+            cache.set(exclusions_cache_key, exclusions, settings.USER_EXCLUSIONS_CACHE_TIMEOUT)
+
+        return exclusions
+
+    @classmethod
+    def clear_exclusions_for_users_with_ids(cls, users_ids):
+        exclusions_cache_keys = [cls.EXCLUSIONS_CACHE_KEY % user_id for user_id in users_ids]
+        cache.delete_many(exclusions_cache_keys)
+        # A read racing the change could have cached the old exclusions again
+        transaction.on_commit(lambda: cache.delete_many(exclusions_cache_keys))
+
+    @classmethod
+    def get_relationship_users_ids_for_user_with_id(cls, user_id, relationship):
+        """
+        The ids of the users related to the user, i.e. its followers. Cached until the relationship changes.
+        Returns None if the cache is disabled or there are more than USER_RELATIONSHIPS_CACHE_MAX_IDS of them.
+        """
+        if not settings.USER_RELATIONSHIPS_CACHE_ENABLED:
+            return None
+
+        relationship_cache_key = cls.RELATIONSHIPS_CACHE_KEY % (relationship, user_id)
+        users_ids = cache.get(relationship_cache_key)
+
+        if users_ids is None:
+            max_ids = settings.USER_RELATIONSHIPS_CACHE_MAX_IDS
+            users_ids = set()
+
+            for users_ids_queryset in cls._make_relationship_users_ids_querysets(user_id=user_id,
+                                                                                 relationship=relationship):
+                users_ids.update(users_ids_queryset[:max_ids + 1])
+
+            # Too many ids are not worth caching, False tells them apart from a cache miss
+            users_ids = list(users_ids) if len(users_ids) <= max_ids else False
+            cache.set(relationship_cache_key, users_ids, settings.USER_RELATIONSHIPS_CACHE_TIMEOUT)
+
+        return users_ids if users_ids is not False else None
+
+    @classmethod
+    def clear_relationships_for_users_with_ids(cls, users_ids, relationships):
+        relationships_cache_keys = [cls.RELATIONSHIPS_CACHE_KEY % (relationship, user_id) for user_id in users_ids
+                                    for relationship in relationships]
+        cache.delete_many(relationships_cache_keys)
+        # A read racing the change could have cached the old ids again
+        transaction.on_commit(lambda: cache.delete_many(relationships_cache_keys))
+
+    @classmethod
+    def get_communities_memberships_for_user_with_id(cls, user_id):
+        """
+        The roles of the user in the communities it is a member of or banned from, by community name as the checks
+        are done by name. Cached until any of them changes.
+        Returns None if the cache is disabled.
+        """
+        if not settings.COMMUNITIES_MEMBERSHIPS_CACHE_ENABLED:
+            return None
+
+        communities_memberships_cache_key = cls.COMMUNITIES_MEMBERSHIPS_CACHE_KEY % user_id
+        communities_memberships = cache.get(communities_memberships_cache_key)
+
+        if communities_memberships is None:
+            communities_memberships = cls._make_communities_memberships_for_user_with_id(user_id=user_id)
+            cache.set(communities_memberships_cache_key, communities_memberships,
+                      settings.COMMUNITIES_MEMBERSHIPS_CACHE_TIMEOUT)
+
+        return communities_memberships
+
+    @classmethod
+    def has_community_role_for_user_with_id(cls, user_id, community_name, role):
+        """
+        Whether the user has the role in the community, None if the cache is disabled
+        """
+        communities_memberships = cls.get_communities_memberships_for_user_with_id(user_id=user_id)
+
+        if communities_memberships is None:
+            return None
+
+        community_membership = communities_memberships.get(community_name)
+        return community_membership is not None and community_membership[role]
+
+    @classmethod
+    def clear_communities_memberships_for_users_with_ids(cls, users_ids):
+        communities_memberships_cache_keys = [cls.COMMUNITIES_MEMBERSHIPS_CACHE_KEY % user_id for user_id in
+                                              users_ids]
+        cache.delete_many(communities_memberships_cache_keys)
+        # A read racing the change could have cached the old roles again
+        transaction.on_commit(lambda: cache.delete_many(communities_memberships_cache_keys))
+
+    @classmethod
+    def _make_communities_memberships_for_user_with_id(cls, user_id):
+        CommunityMembership = get_community_membership_model()
+        Community = get_community_model()
+
+        communities_memberships = {}
+
+        for community_name, community_id, is_moderator, is_administrator in CommunityMembership.objects.filter(
+                user_id=user_id).values_list('community__name', 'community_id', 'is_moderator', 'is_administrator'):
+            communities_memberships[community_name] = {
+                'id': community_id,
+                cls.COMMUNITY_ROLE_MEMBER: True,
+                cls.COMMUNITY_ROLE_MODERATOR: is_moderator,
+                cls.COMMUNITY_ROLE_ADMINISTRATOR: is_administrator,
+                cls.COMMUNITY_ROLE_BANNED: False,
+            }
+
+        for community_name, community_id in Community.objects.filter(banned_users__id=user_id).values_list('name',
+                                                                                                           'id'):
+            community_membership = communities_memberships.setdefault(community_name, {
+                'id': community_id,
+                cls.COMMUNITY_ROLE_MEMBER: False,
+                cls.COMMUNITY_ROLE_MODERATOR: False,
+                cls.COMMUNITY_ROLE_ADMINISTRATOR: False,
+            })
+            community_membership[cls.COMMUNITY_ROLE_BANNED] = True
+
+        return communities_memberships
+
+    @classmethod
+    def _make_relationship_users_ids_querysets(cls, user_id, relationship):
+        Follow = get_follow_model()
+        followers_ids = Follow.objects.filter(followed_user_id=user_id).values_list('user_id', flat=True)
+
+        if relationship == cls.RELATIONSHIP_FOLLOWERS:
+            return [followers_ids]
+        elif relationship == cls.RELATIONSHIP_LINKED_USERS:
+            # The users we have accepted by adding them to a circle, and our followers
+            Connection = get_connection_model()
+            return [Connection.objects.filter(user_id=user_id, circles__isnull=False).values_list(
+                'target_user_id', flat=True).distinct(), followers_ids]
+        elif relationship == cls.RELATIONSHIP_BLOCKED_USERS:
+            UserBlock = get_user_block_model()
+            return [UserBlock.objects.filter(blocker_id=user_id).values_list('blocked_user_id', flat=True)]
+
+        raise ValueError('Unknown relationship %s' % relationship)
+
+    @classmethod
+    def get_users_ids_that_can_see_post(cls, users, post):
+        """
+        Returns the ids of the given users that can see the post, with the same decisions as can_see_post and
+        a single visibility query per chunk of users
+        """
+        Post = get_post_model()
+
+        visible_users_ids = set()
+        posts_queries_by_user_id = {}
+
+        post_community = post.community
+        staff_users_ids = cls._get_community_staff_users_ids(
+            community=post_community, users_ids=[user.pk for user in users]) if post_community else set()
+
+        for user in users:
+            if post.creator_id == user.pk:
+                if post_community or not post.is_deleted:
+                    visible_users_ids.add(user.pk)
+                continue
+
+            if post_community:
+                post_query = user._make_get_community_with_id_posts_query(community=post_community,
+                                                                          is_staff=user.pk in staff_users_ids)
+                post_query.add(Q(pk=post.pk), Q.AND)
+            else:
+                post_query = user._make_get_post_with_id_query_for_user(post.creator, post_id=post.pk)
+
+            posts_queries_by_user_id[user.pk] = post_query
+
+        visible_users_ids.update(cls._get_users_ids_with_existing_rows(
+            queryset=Post.objects.filter(pk=post.pk), queries_by_user_id=posts_queries_by_user_id))
+
+        return visible_users_ids
+
+    @classmethod
+    def get_users_ids_that_can_see_post_comment(cls, users, post_comment):
+        """
+        Returns the ids of the given users that can see the post comment, as can_see_post_comment does
+        """
+        PostComment = get_post_comment_model()
+
+        post = post_comment.post
+        post_users = [user for user in users if
+                      user.pk in cls.get_users_ids_that_can_see_post(users=users, post=post)]
+
+        post_community = post.community
+        staff_users_ids = cls._get_community_staff_users_ids(
+            community=post_community, users_ids=[user.pk for user in post_users]) if post_community else set()
+
+        post_comment_queries_by_user_id = {
+            user.pk: user._make_get_post_comment_with_id_query(post_comment_id=post_comment.pk,
+                                                               post_comment_parent_id=post_comment.parent_comment_id,
+                                                               post=post,
+                                                               is_staff=user.pk in staff_users_ids)
+            for user in post_users
+        }
+
+        return cls._get_users_ids_with_existing_rows(queryset=PostComment.objects.filter(pk=post_comment.pk),
+                                                     queries_by_user_id=post_comment_queries_by_user_id)
+
+    @classmethod
+    def _get_community_staff_users_ids(cls, community, users_ids):
+        CommunityMembership = get_community_membership_model()
+
+        return set(CommunityMembership.objects.filter(
+            Q(is_administrator=True) | Q(is_moderator=True),
+            community_id=community.pk, user_id__in=users_ids).values_list('user_id', flat=True))
+
+    @classmethod
+    def _get_users_ids_with_existing_rows(cls, queryset, queries_by_user_id, chunk_size=100):
+        """
+        Returns the ids of the users whose query matches rows of the queryset model, with each chunk of queries
+        evaluated as EXISTS subqueries of a single query on the queryset
+        """
+        model = queryset.model
+        users_ids = list(queries_by_user_id.keys())
+        existing_rows_users_ids = set()
+
+        for i in range(0, len(users_ids), chunk_size):
+            annotations = {'user_%d' % user_id: Exists(model.objects.filter(queries_by_user_id[user_id])) for
+                           user_id in users_ids[i:i + chunk_size]}
+
+            existing_rows = queryset.annotate(**annotations).values(*annotations.keys()).first()
+
+            if existing_rows is None:
+                break
+
+            existing_rows_users_ids.update(int(annotation[len('user_'):]) for annotation, exists in
+                                           existing_rows.items() if exists)
+
+        return existing_rows_users_ids
+
+    @classmethod
+    def clear_posts_visibility_for_users_with_ids(cls, users_ids):
+        if not users_ids:
+            return
+
+        posts_visibility_memo = _get_posts_visibility_memo()
+        for memo_key in [memo_key for memo_key in posts_visibility_memo.keys() if memo_key[0] in users_ids]:
+            del posts_visibility_memo[memo_key]
+
+        posts_visibility_cache_keys = [cls.POSTS_VISIBILITY_CACHE_KEY % user_id for user_id in users_ids]
+        get_redis_connection().delete(*posts_visibility_cache_keys)
+        # A read racing the change could have cached the old decisions again
+        transaction.on_commit(lambda: get_redis_connection().delete(*posts_visibility_cache_keys))
+
+    @classmethod
+    def clear_memoized_posts_visibilities(cls):
+        """
+        Forgets the visibility decisions memoized during the current request for every user
+        """
+        _get_posts_visibility_memo().clear()
+
+    @classmethod
+    def clear_posts_visibilities(cls):
+        """
+        Forgets the visibility decisions of every user, as moderation changes what every user can see
+        """
+        cls.clear_memoized_posts_visibilities()
+
+        if not settings.POSTS_VISIBILITY_CACHE_ENABLED:
+            return
+
+        get_redis_connection().incr(cls.POSTS_VISIBILITY_VERSION_KEY)
+        # A read racing the change could have cached the old decisions with the new version
+        transaction.on_commit(lambda: get_redis_connection().incr(cls.POSTS_VISIBILITY_VERSION_KEY))
+
+    @classmethod
+    def _get_redis_script(cls, script):
+        redis_script = cls._redis_scripts.get(script)
+
+        if redis_script is None:
+            redis_script = cls._redis_scripts[script] = get_redis_connection().register_script(script)
+
+        return redis_script
+
+    @classmethod
+    def _make_exclusions_for_user_with_id(cls, user_id):
+        UserBlock = get_user_block_model()
+        Community = get_community_model()
+        ModerationReport = get_moderation_report_model()
+        ModeratedObject = get_moderated_object_model()
+
+        max_ids = settings.USER_EXCLUSIONS_CACHE_MAX_IDS
+
+        def get_ids(ids_queryset):
+            ids = list(ids_queryset[:max_ids + 1])
+            return None if len(ids) > max_ids else ids
+
+        user_blocks = UserBlock.objects.filter(Q(blocker_id=user_id) | Q(blocked_user_id=user_id))
+        blocked_users_ids = get_ids(user_blocks.values_list('blocker_id', 'blocked_user_id'))
+
+        if blocked_users_ids is not None:
+            blocked_users_ids = list(set(blocker_id if blocker_id != user_id else blocked_user_id for
+                                         blocker_id, blocked_user_id in blocked_users_ids))
+
+        banned_from_communities = Community.objects.filter(banned_users__id=user_id)
+
+        reports = ModerationReport.objects.filter(reporter_id=user_id)
+        post_reports = reports.filter(moderated_object__object_type=ModeratedObject.OBJECT_TYPE_POST)
+        post_comment_reports = reports.filter(moderated_object__object_type=ModeratedObject.OBJECT_TYPE_POST_COMMENT)
+
+        return {
+            'blocked_users_ids': blocked_users_ids,
+            'banned_from_communities_ids': get_ids(banned_from_communities.values_list('id', flat=True)),
+            'reported_posts_ids': get_ids(post_reports.values_list('moderated_object__object_id', flat=True)),
+            'reported_post_comments_ids': get_ids(
+                post_comment_reports.values_list('moderated_object__object_id', flat=True)),
+        }
+
     @classmethod
     def sanitise_username(cls, username):
         chars = '[@#!±$%^&*()=|/><?,:;\~`{}]'
@@ -296,8 +669,9 @@ class User(AbstractUser):
         return self.moderation_penalties.filter(
             moderated_object__category__severity=moderation_severity).count()
 
-    def count_unread_notifications(self):
-        return self.notifications.filter(read=False).count()
+    def count_unread_notifications(self, types=None):
+        Notification = get_notification_model()
+        return Notification.count_unread_for_owner_with_id(owner_id=self.pk, types=types)
 
     def count_public_posts_for_user(self, user):
         """
@@ -361,20 +735,6 @@ class User(AbstractUser):
 
         return results.count()
 
-    def count_posts_for_hashtag_with_name(self, hashtag_name):
-        Hashtag = get_hashtag_model()
-        hashtag = Hashtag.objects.get(name=hashtag_name)
-        return self.count_posts_for_hashtag(hashtag=hashtag)
-
-    def count_posts_for_hashtag(self, hashtag):
-        """
-        Count how many posts are with the given hashtag name relative to the user
-        """
-        Post = get_post_model()
-        hashtag_posts_query = make_get_hashtag_posts_for_user_with_id_query(user_id=self.pk, hashtag=hashtag)
-
-        return Post.objects.filter(hashtag_posts_query).distinct().cache().count()
-
     def count_posts_for_user_with_id(self, user_id):
         """
         Count how many posts has the user created relative to another user
@@ -732,9 +1092,21 @@ class User(AbstractUser):
                                                        community__name=community_name).exists()
 
     def is_administrator_of_community_with_name(self, community_name):
+        is_administrator = User.has_community_role_for_user_with_id(user_id=self.pk, community_name=community_name,
+                                                                    role=User.COMMUNITY_ROLE_ADMINISTRATOR)
+        if is_administrator is not None:
+            return is_administrator
+
         return self.communities_memberships.filter(community__name=community_name, is_administrator=True).exists()
 
     def is_staff_of_community_with_name(self, community_name):
+        communities_memberships = User.get_communities_memberships_for_user_with_id(user_id=self.pk)
+
+        if communities_memberships is not None:
+            community_membership = communities_memberships.get(community_name)
+            return community_membership is not None and (community_membership[User.COMMUNITY_ROLE_ADMINISTRATOR] or
+                                                          community_membership[User.COMMUNITY_ROLE_MODERATOR])
+
         return self.is_administrator_of_community_with_name(
             community_name=community_name) or self.is_moderator_of_community_with_name(community_name=community_name)
 
@@ -742,15 +1114,30 @@ class User(AbstractUser):
         return self.communities_memberships.all().exists()
 
     def is_member_of_community_with_name(self, community_name):
+        is_member = User.has_community_role_for_user_with_id(user_id=self.pk, community_name=community_name,
+                                                             role=User.COMMUNITY_ROLE_MEMBER)
+        if is_member is not None:
+            return is_member
+
         return self.communities_memberships.filter(community__name=community_name).exists()
 
     def is_banned_from_community_with_name(self, community_name):
+        is_banned = User.has_community_role_for_user_with_id(user_id=self.pk, community_name=community_name,
+                                                             role=User.COMMUNITY_ROLE_BANNED)
+        if is_banned is not None:
+            return is_banned
+
         return self.banned_of_communities.filter(name=community_name).exists()
 
     def is_creator_of_community_with_name(self, community_name):
         return self.created_communities.filter(name=community_name).exists()
 
     def is_moderator_of_community_with_name(self, community_name):
+        is_moderator = User.has_community_role_for_user_with_id(user_id=self.pk, community_name=community_name,
+                                                                role=User.COMMUNITY_ROLE_MODERATOR)
+        if is_moderator is not None:
+            return is_moderator
+
         return self.communities_memberships.filter(community__name=community_name, is_moderator=True).exists()
 
     def is_suspended(self):
@@ -927,18 +1314,43 @@ class User(AbstractUser):
         return self.received_follow_requests.filter(creator=user, approved=True).exists()
 
     def can_see_post(self, post):
-        # Check if post is public
-        if post.community:
-            if self._can_see_community_post(community=post.community, post=post):
-                return True
-        elif post.creator_id == self.pk and not post.is_deleted:
-            return True
-        else:
-            # Check if we can retrieve the post
-            if self._can_see_post(post=post):
-                return True
+        post_visibility_field = self._make_post_visibility_field(post=post)
 
-        return False
+        cached_posts_visibilities = self._get_cached_posts_visibilities(fields=[post_visibility_field])
+        if post_visibility_field in cached_posts_visibilities:
+            return cached_posts_visibilities[post_visibility_field]
+
+        can_see_post = self._can_see_post_with_query(post=post)
+        self._cache_posts_visibilities(posts_visibilities={post_visibility_field: can_see_post})
+
+        return can_see_post
+
+    def can_see_posts(self, post_ids):
+        """
+        Returns the ids of the posts with the given ids the user can see, answering the posts missing from the
+        visibility cache with a single visibility query
+        """
+        Post = get_post_model()
+        posts = Post.objects.filter(id__in=post_ids).select_related('community').only(
+            'id', 'creator_id', 'is_deleted', 'modified', 'community__id', 'community__name')
+
+        posts_by_visibility_field = {self._make_post_visibility_field(post=post): post for post in posts}
+
+        posts_visibilities = self._get_cached_posts_visibilities(fields=list(posts_by_visibility_field.keys()))
+
+        uncached_posts = [post for post_visibility_field, post in posts_by_visibility_field.items() if
+                          post_visibility_field not in posts_visibilities]
+
+        if uncached_posts:
+            visible_posts_ids = self._get_visible_posts_ids_with_query(posts=uncached_posts)
+
+            uncached_posts_visibilities = {self._make_post_visibility_field(post=post): post.pk in visible_posts_ids
+                                           for post in uncached_posts}
+            self._cache_posts_visibilities(posts_visibilities=uncached_posts_visibilities)
+            posts_visibilities.update(uncached_posts_visibilities)
+
+        return set(posts_by_visibility_field[post_visibility_field].pk for post_visibility_field, can_see_post in
+                   posts_visibilities.items() if can_see_post)
 
     def can_see_hashtag(self, hashtag):
         query = make_get_hashtag_with_name_for_user_with_id_query(hashtag_name=hashtag.name,
@@ -948,13 +1360,17 @@ class User(AbstractUser):
 
     def can_see_post_comment(self, post_comment):
         post = post_comment.post
-        if not self.can_see_post(post=post):
-            return False
-        post_comment_query = self._make_get_post_comment_with_id_query(post_comment_id=post_comment.pk,
-                                                                       post_comment_parent_id=post_comment.parent_comment_id,
-                                                                       post=post)
-        PostComment = get_post_comment_model()
-        return PostComment.objects.filter(post_comment_query).exists()
+
+        post_comment_visibility_field = self._make_post_comment_visibility_field(post_comment=post_comment, post=post)
+
+        cached_posts_visibilities = self._get_cached_posts_visibilities(fields=[post_comment_visibility_field])
+        if post_comment_visibility_field in cached_posts_visibilities:
+            return cached_posts_visibilities[post_comment_visibility_field]
+
+        can_see_post_comment = self._can_see_post_comment_with_query(post_comment=post_comment, post=post)
+        self._cache_posts_visibilities(posts_visibilities={post_comment_visibility_field: can_see_post_comment})
+
+        return can_see_post_comment
 
     def get_lists_for_follow_for_user_with_id(self, user_id):
         check_is_following_user_with_id(user=self, user_id=user_id)
@@ -997,38 +1413,22 @@ class User(AbstractUser):
     def get_emoji_counts_for_post(self, post, emoji_id=None):
         check_can_get_reactions_for_post(user=self, post=post)
 
-        Emoji = get_emoji_model()
+        PostReaction = get_post_reaction_model()
 
-        emoji_query = Q(post_reactions__post_id=post.pk, )
+        reactions_query = Q(post_id=post.pk, )
 
         if emoji_id:
-            emoji_query.add(Q(post_reactions__emoji_id=emoji_id), Q.AND)
-
-        post_community = post.community
-
-        if post_community:
-            if not self.is_staff_of_community_with_name(community_name=post_community.name):
-                # Exclude blocked users reactions
-                blocked_users_query = ~Q(Q(post_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                    post_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-                blocked_users_query_staff_members = Q(
-                    post_reactions__reactor__communities_memberships__community_id=post_community.pk)
-                blocked_users_query_staff_members.add(
-                    Q(post_reactions__reactor__communities_memberships__is_administrator=True) | Q(
-                        post_reactions__reactor__communities_memberships__is_moderator=True), Q.AND)
+            reactions_query.add(Q(emoji_id=emoji_id), Q.AND)
 
-                blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
-                emoji_query.add(blocked_users_query, Q.AND)
-        else:
-            # Show all, even blocked users reactions
-            blocked_users_query = ~Q(Q(post_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                post_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-            emoji_query.add(blocked_users_query, Q.AND)
+        is_community_staff = post.community_id is not None and self.is_staff_of_community_with_name(
+            community_name=post.community.name)
 
-        emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_reactions')).distinct().order_by(
-            '-post_reactions__count').cache().all()
+        reactions_query.add(make_count_post_reactions_query_for_user_with_id(user_id=self.pk,
+                                                                            community_id=post.community_id,
+                                                                            is_community_staff=is_community_staff),
+                            Q.AND)
 
-        return [{'emoji': emoji, 'count': emoji.post_reactions__count} for emoji in emojis]
+        return PostReaction.get_emoji_counts_for_reactions_by_post_id(reactions_query=reactions_query).get(post.pk, [])
 
     def get_emoji_counts_for_post_comment_with_id(self, post_comment_id, emoji_id=None):
         PostComment = get_post_comment_model()
@@ -1102,8 +1502,7 @@ class User(AbstractUser):
 
         if self.has_reacted_to_post_with_id(post_id):
             post_reaction = self.post_reactions.get(post_id=post_id)
-            post_reaction.emoji_id = emoji_id
-            post_reaction.save()
+            post_reaction.update_emoji(emoji_id=emoji_id)
         else:
             post_reaction = post.react(reactor=self, emoji_id=emoji_id)
             if post_reaction.post.creator_id != self.pk:
@@ -1213,7 +1612,7 @@ class User(AbstractUser):
         check_can_enable_disable_comments_for_post_in_community_with_name(user=self, community_name=post.community.name)
         post.community.create_enable_post_comments_log(source_user=self, target_user=post.creator, post=post)
         post.comments_enabled = True
-        post.save()
+        post.save(update_fields=['comments_enabled', 'modified'])
 
         return post
 
@@ -1226,7 +1625,7 @@ class User(AbstractUser):
         check_can_enable_disable_comments_for_post_in_community_with_name(user=self, community_name=post.community.name)
         post.community.create_disable_post_comments_log(source_user=self, target_user=post.creator, post=post)
         post.comments_enabled = False
-        post.save()
+        post.save(update_fields=['comments_enabled', 'modified'])
 
         return post
 
@@ -1402,7 +1801,11 @@ class User(AbstractUser):
     def delete_circle_with_id(self, circle_id):
         check_can_delete_circle_with_id(user=self, circle_id=circle_id)
         circle = self.circles.get(id=circle_id)
+        circle_users_ids = list(circle.connections.values_list('target_user_id', flat=True))
         circle.delete()
+        User.clear_posts_visibility_for_users_with_ids(users_ids=circle_users_ids)
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
 
     def update_circle(self, circle, **kwargs):
         return self.update_circle_with_id(circle.pk, **kwargs)
@@ -1458,6 +1861,9 @@ class User(AbstractUser):
         check_is_connected_with_user_with_id_in_circle_with_id(user=self, user_id=user_id, circle_id=circle_id)
         connection = self.get_connection_for_user_with_id(user_id)
         connection.circles.remove(circle_id)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
         return connection
 
     def add_circle_with_id_to_connection_with_user_with_id(self, user_id, circle_id):
@@ -1465,6 +1871,9 @@ class User(AbstractUser):
         check_is_not_connected_with_user_with_id_in_circle_with_id(user=self, user_id=user_id, circle_id=circle_id)
         connection = self.get_connection_for_user_with_id(user_id)
         connection.circles.add(circle_id)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
         return connection
 
     def get_circle_with_id(self, circle_id):
@@ -1514,6 +1923,8 @@ class User(AbstractUser):
         Community = get_community_model()
         community = Community.objects.get(name=community_name)
 
+        # The communities memberships of the users are cached by community name, which could be taken again
+        community._clear_communities_memberships_of_users()
         community.delete()
 
     def update_community(self, community, title=None, name=None, description=None, color=None, type=None,
@@ -1549,7 +1960,7 @@ class User(AbstractUser):
         check_community_data(user=self, community=community_to_update_avatar_from, avatar=avatar)
 
         community_to_update_avatar_from.avatar = avatar
-        community_to_update_avatar_from.save()
+        community_to_update_avatar_from.save(update_fields=['avatar'])
 
         return community_to_update_avatar_from
 
@@ -1559,7 +1970,7 @@ class User(AbstractUser):
         community_to_delete_avatar_from = Community.objects.get(name=community_name)
         delete_file_field(community_to_delete_avatar_from.avatar)
         community_to_delete_avatar_from.avatar = None
-        community_to_delete_avatar_from.save()
+        community_to_delete_avatar_from.save(update_fields=['avatar'])
         return community_to_delete_avatar_from
 
     def update_community_with_name_cover(self, community_name, cover):
@@ -1571,7 +1982,7 @@ class User(AbstractUser):
 
         community_to_update_cover_from.cover = cover
 
-        community_to_update_cover_from.save()
+        community_to_update_cover_from.save(update_fields=['cover'])
 
         return community_to_update_cover_from
 
@@ -1583,7 +1994,7 @@ class User(AbstractUser):
 
         delete_file_field(community_to_delete_cover_from.cover)
         community_to_delete_cover_from.cover = None
-        community_to_delete_cover_from.save()
+        community_to_delete_cover_from.save(update_fields=['cover'])
         return community_to_delete_cover_from
 
     def get_community_with_name_members(self, community_name, max_id=None, exclude_keywords=None):
@@ -1611,6 +2022,11 @@ class User(AbstractUser):
         Community = get_community_model()
         community_to_join = Community.objects.get(name=community_name)
         community_to_join.add_member(self)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            # The community posts get backfilled when the timeline gets rebuilt
+            self._clear_timeline()
 
         # Clean up_full any invites
         CommunityInvite = get_community_invite_model()
@@ -1635,6 +2051,12 @@ class User(AbstractUser):
             self.unsubscribe_from_community_notifications(community=community_to_leave)
 
         community_to_leave.remove_member(self)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            TimelineEntry = get_timeline_entry_model()
+            TimelineEntry.remove_community_with_id_posts_from_timeline_for_user_with_id(
+                community_id=community_to_leave.pk, user_id=self.pk)
 
         return community_to_leave
 
@@ -1694,6 +2116,7 @@ class User(AbstractUser):
         user_to_add_as_administrator = User.objects.get(username=username)
 
         community_to_add_administrator_to.add_administrator(user_to_add_as_administrator)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_add_as_administrator.pk])
         community_to_add_administrator_to.create_add_administrator_log(source_user=self,
                                                                        target_user=user_to_add_as_administrator)
 
@@ -1715,6 +2138,7 @@ class User(AbstractUser):
         user_to_remove_as_administrator = User.objects.get(username=username)
 
         community_to_remove_administrator_from.remove_administrator(user_to_remove_as_administrator)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_remove_as_administrator.pk])
         community_to_remove_administrator_from.create_remove_administrator_log(source_user=self,
                                                                                target_user=user_to_remove_as_administrator)
 
@@ -1749,6 +2173,7 @@ class User(AbstractUser):
         user_to_add_as_moderator = User.objects.get(username=username)
 
         community_to_add_moderator_to.add_moderator(user_to_add_as_moderator)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_add_as_moderator.pk])
 
         community_to_add_moderator_to.create_add_moderator_log(source_user=self,
                                                                target_user=user_to_add_as_moderator)
@@ -1767,6 +2192,7 @@ class User(AbstractUser):
         user_to_remove_as_moderator = User.objects.get(username=username)
 
         community_to_remove_moderator_from.remove_moderator(user_to_remove_as_moderator)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_remove_as_moderator.pk])
         community_to_remove_moderator_from.create_remove_moderator_log(source_user=self,
                                                                        target_user=user_to_remove_as_moderator)
 
@@ -1801,6 +2227,9 @@ class User(AbstractUser):
 
         community_to_ban_user_from.banned_users.add(user_to_ban)
         community_to_ban_user_from.create_user_ban_log(source_user=self, target_user=user_to_ban)
+        User.clear_exclusions_for_users_with_ids(users_ids=[user_to_ban.pk])
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user_to_ban.pk])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_ban.pk])
 
         return community_to_ban_user_from
 
@@ -1814,6 +2243,9 @@ class User(AbstractUser):
 
         community_to_unban_user_from.banned_users.remove(user_to_unban)
         community_to_unban_user_from.create_user_unban_log(source_user=self, target_user=user_to_unban)
+        User.clear_exclusions_for_users_with_ids(users_ids=[user_to_unban.pk])
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user_to_unban.pk])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[user_to_unban.pk])
 
         return community_to_unban_user_from
 
@@ -1889,11 +2321,37 @@ class User(AbstractUser):
         hashtags_query = make_search_hashtag_query_for_user_with_id(search_query=query, user_id=self.pk)
         Hashtag = get_hashtag_model()
 
-        return Hashtag.objects.filter(hashtags_query)
+        if is_search_index_engine_enabled():
+            hashtags_query.add(make_hashtags_search_index_query(query=query), Q.AND)
+
+            # The best matching hashtags first, then the most used ones
+            return Hashtag.objects.filter(hashtags_query).select_related('stats').annotate(
+                search_rank=make_search_rank_expression(query=query, fields=('name',))).order_by(
+                '-search_rank', F('stats__posts_count').desc(nulls_last=True), Length('name'), 'name')
+
+        # The most used hashtags first
+        return Hashtag.objects.filter(hashtags_query).select_related('stats').order_by(
+            F('stats__posts_count').desc(nulls_last=True), 'name')
+
+    def get_trending_hashtags(self):
+        trending_hashtags_query = make_get_trending_hashtags_for_user_with_id_query(user_id=self.pk)
+        Hashtag = get_hashtag_model()
+
+        return Hashtag.objects.filter(trending_hashtags_query).select_related('stats').order_by(
+            '-stats__last_day_posts_count', '-stats__last_week_posts_count', '-stats__posts_count', 'name')
 
     def search_users_with_query(self, query):
         users_query = self._make_search_users_query(query=query)
 
+        if is_search_index_engine_enabled():
+            users_query.add(make_users_search_index_query(query=query), Q.AND)
+
+            # The best matching users first, then the most followed ones
+            return User.objects.filter(users_query).annotate(
+                search_rank=make_search_rank_expression(query=query, fields=('username', 'profile__name')),
+                search_popularity=Count('followers', distinct=True)).order_by(
+                '-search_rank', '-search_popularity', Length('username'), 'username')
+
         return User.objects.filter(users_query)
 
     def _make_search_users_query(self, query):
@@ -1914,51 +2372,31 @@ class User(AbstractUser):
     def get_linked_users(self, max_id=None):
         # All users which are connected with us and we have accepted by adding
         # them to a circle
-        connected_users_query = self._make_connections_query()
-        followers_query = self._make_followers_query()
-
-        if max_id:
-            connected_users_query.add(Q(id__lt=max_id), Q.AND)
-            followers_query.add(Q(id__lt=max_id), Q.AND)
+        linked_users_query = self._make_relationship_users_query(relationship=User.RELATIONSHIP_LINKED_USERS,
+                                                                 max_id=max_id)
+        linked_users_query.add(Q(is_deleted=False), Q.AND)
 
-        connected_users = User.objects.filter(connected_users_query)
-        followers = User.objects.filter(followers_query)
+        return User.objects.filter(linked_users_query)
 
-        linked_users = connected_users.union(followers)
+    def search_linked_users_with_query(self, query, max_id=None):
+        linked_users_query = self._make_relationship_users_query(relationship=User.RELATIONSHIP_LINKED_USERS,
+                                                                 max_id=max_id)
+        linked_users_query.add(Q(is_deleted=False), Q.AND)
+        linked_users_query.add(self._make_users_names_query(query=query), Q.AND)
 
-        return linked_users
-
-    def search_linked_users_with_query(self, query):
-        connected_users_query = self._make_connections_query()
-        followers_query = self._make_followers_query()
-
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
-
-        connected_users_query.add(names_query, Q.AND)
-        followers_query.add(names_query, Q.AND)
-
-        connected_users = User.objects.filter(connected_users_query)
-        followers = User.objects.filter(followers_query)
-
-        search_results_users = connected_users.union(followers)
-
-        return search_results_users
+        return User.objects.filter(linked_users_query).order_by('-id')
 
     def get_blocked_users(self, max_id=None):
         blocked_users_query = self._make_blocked_users_query(max_id=max_id)
 
         return User.objects.filter(blocked_users_query)
 
-    def search_blocked_users_with_query(self, query):
-        blocked_users_query = self._make_blocked_users_query()
-
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
-
-        blocked_users_query.add(names_query, Q.AND)
+    def search_blocked_users_with_query(self, query, max_id=None):
+        blocked_users_query = self._make_relationship_users_query(relationship=User.RELATIONSHIP_BLOCKED_USERS,
+                                                                  max_id=max_id)
+        blocked_users_query.add(self._make_users_names_query(query=query), Q.AND)
 
-        return User.objects.filter(blocked_users_query)
+        return User.objects.filter(blocked_users_query).order_by('-id')
 
     def search_top_posts_excluded_communities_with_query(self, query):
 
@@ -2019,15 +2457,13 @@ class User(AbstractUser):
 
         return User.objects.filter(followings_query)
 
-    def search_followers_with_query(self, query):
-        followers_query = Q(follows__followed_user_id=self.pk, is_deleted=False)
-
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
-
-        followers_query.add(names_query, Q.AND)
+    def search_followers_with_query(self, query, max_id=None):
+        followers_query = self._make_relationship_users_query(relationship=User.RELATIONSHIP_FOLLOWERS,
+                                                              max_id=max_id)
+        followers_query.add(Q(is_deleted=False), Q.AND)
+        followers_query.add(self._make_users_names_query(query=query), Q.AND)
 
-        return User.objects.filter(followers_query)
+        return User.objects.filter(followers_query).order_by('-id')
 
     def get_user_subscriptions(self, max_id=None):
         user_subscriptions_query = Q(notifications_subscribers__subscriber=self, is_deleted=False)
@@ -2238,7 +2674,8 @@ class User(AbstractUser):
         post = Post.objects.select_related('community').get(id=post_id)
         post.community.create_open_post_log(source_user=self, target_user=post.creator, post=post)
         post.is_closed = False
-        post.save()
+        post.save(update_fields=['is_closed', 'modified'])
+        User.clear_memoized_posts_visibilities()
 
         return post
 
@@ -2253,7 +2690,8 @@ class User(AbstractUser):
         post.is_closed = True
         excluded_users = self._get_excluded_users_for_deleting_community_notifications_on_close_post(post)
         post.delete_notifications_except_for_users(excluded_users)
-        post.save()
+        post.save(update_fields=['is_closed', 'modified'])
+        User.clear_memoized_posts_visibilities()
 
         return post
 
@@ -2493,17 +2931,21 @@ class User(AbstractUser):
                       'post__community__avatar',
                       'post__community__color', 'post__community__title')
 
-        reported_posts_exclusion_query = ~Q(post__moderated_object__reports__reporter_id=self.pk)
+        reported_posts_exclusion_query = make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk,
+                                                                                           post_prefix='post__')
         excluded_top_posts_communities_query = ~Q(post__community__top_posts_community_exclusions__user=self.pk)
 
         top_community_posts_query = Q(post__is_closed=False,
                                       post__is_deleted=False,
                                       post__status=Post.STATUS_PUBLISHED)
 
-        top_community_posts_query.add(~Q(Q(post__creator__blocked_by_users__blocker_id=self.pk) | Q(
-            post__creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        top_community_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=self.pk,
+                                                                                        user_field='post__creator'),
+                                      Q.AND)
         top_community_posts_query.add(Q(post__community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
-        top_community_posts_query.add(~Q(post__community__banned_users__id=self.pk), Q.AND)
+        top_community_posts_query.add(
+            make_exclude_community_posts_banned_from_for_user_with_id_query(user_id=self.pk, post_prefix='post__'),
+            Q.AND)
 
         if max_id:
             top_community_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -2532,10 +2974,51 @@ class User(AbstractUser):
         """
 
         if not circles_ids and not lists_ids:
+            if settings.TIMELINE_MATERIALIZED_ENABLED:
+                return self._get_materialized_timeline_posts(max_id=max_id, min_id=min_id)
+            if settings.TIMELINE_MERGED_QUERIES_ENABLED and count:
+                return self._get_timeline_posts_with_no_filters_merged(max_id=max_id, count=count)
             return self._get_timeline_posts_with_no_filters(max_id=max_id)
 
         return self._get_timeline_posts_with_filters(max_id=max_id, circles_ids=circles_ids, lists_ids=lists_ids)
 
+    def _get_materialized_timeline_posts(self, max_id=None, min_id=None):
+        """
+        Reads the timeline posts from the materialized timeline entries, rebuilding them if the timeline is cold.
+        """
+        Post = get_post_model()
+        TimelineEntry = get_timeline_entry_model()
+        ModeratedObject = get_moderated_object_model()
+
+        if not TimelineEntry.timeline_exists_for_user_with_id(user_id=self.pk):
+            TimelineEntry.rebuild_timeline_for_user(user=self)
+
+        posts_select_related = ('creator', 'creator__profile', 'community', 'image')
+
+        posts_prefetch_related = ('circles', 'creator__profile__badges')
+
+        timeline_posts_query = Q(timeline_entries__owner_id=self.pk, is_deleted=False, status=Post.STATUS_PUBLISHED)
+
+        if max_id:
+            timeline_posts_query.add(Q(id__lt=max_id), Q.AND)
+        elif min_id:
+            timeline_posts_query.add(Q(id__gt=min_id), Q.AND)
+
+        # Entries are removed eagerly, these keep the page correct for changes made since the fan out
+        timeline_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk), Q.AND)
+
+        community_posts_query = Q(is_closed=False)
+        community_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
+
+        timeline_posts_query.add(Q(community__isnull=True) | community_posts_query, Q.AND)
+
+        return Post.objects.select_related(*posts_select_related).prefetch_related(
+            *posts_prefetch_related).filter(timeline_posts_query)
+
+    def _clear_timeline(self):
+        TimelineEntry = get_timeline_entry_model()
+        TimelineEntry.clear_timeline_for_user_with_id(user_id=self.pk)
+
     def _get_timeline_posts_with_filters(self, max_id=None, min_id=None, circles_ids=None, lists_ids=None):
         Post = get_post_model()
 
@@ -2579,7 +3062,7 @@ class User(AbstractUser):
 
         timeline_posts_query.add(Q(is_deleted=False, status=Post.STATUS_PUBLISHED), Q.AND)
 
-        timeline_posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        timeline_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk), Q.AND)
 
         return Post.objects.filter(timeline_posts_query).distinct()
 
@@ -2587,6 +3070,48 @@ class User(AbstractUser):
         """
         Being the main action of the network, an optimised call of the get timeline posts call with no filtering.
         """
+        own_posts_queryset, community_posts_queryset, followed_users_queryset = \
+            self._make_timeline_posts_with_no_filters_querysets(max_id=max_id)
+
+        final_queryset = own_posts_queryset.union(community_posts_queryset, followed_users_queryset)
+
+        return final_queryset
+
+    def _get_timeline_posts_with_no_filters_merged(self, count, max_id=None):
+        """
+        Same posts as _get_timeline_posts_with_no_filters, but instead of ordering and limiting the union of the
+        own, community and followed users posts queries, fetches at most count posts ids from each of them
+        and merges them, stopping once count posts ids were merged.
+        """
+        Post = get_post_model()
+
+        posts_querysets = self._make_timeline_posts_with_no_filters_querysets(max_id=max_id)
+
+        posts_ids_streams = [
+            posts_queryset.prefetch_related(None).order_by('-id').values_list('id', flat=True).distinct()[:count]
+            for posts_queryset in posts_querysets
+        ]
+
+        posts_ids = []
+
+        for post_id in heapq.merge(*posts_ids_streams, reverse=True):
+            # The same post can be in more than one of the queries
+            if posts_ids and posts_ids[-1] == post_id:
+                continue
+
+            posts_ids.append(post_id)
+
+            if len(posts_ids) == count:
+                break
+
+        posts_select_related = ('creator', 'creator__profile', 'community', 'image')
+
+        posts_prefetch_related = ('circles', 'creator__profile__badges')
+
+        return Post.objects.select_related(*posts_select_related).prefetch_related(*posts_prefetch_related).filter(
+            id__in=posts_ids)
+
+    def _make_timeline_posts_with_no_filters_querysets(self, max_id=None):
         world_circle_id = self._get_world_circle_id()
 
         Post = get_post_model()
@@ -2603,7 +3128,7 @@ class User(AbstractUser):
                       'community__title')
 
         ModeratedObject = get_moderated_object_model()
-        reported_posts_exclusion_query = ~Q(moderated_object__reports__reporter_id=self.pk)
+        reported_posts_exclusion_query = make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk)
 
         own_posts_query = Q(creator=self.pk, community__isnull=True, is_deleted=False, status=Post.STATUS_PUBLISHED)
 
@@ -2618,8 +3143,7 @@ class User(AbstractUser):
         community_posts_query = Q(community__memberships__user__id=self.pk, is_closed=False, is_deleted=False,
                                   status=Post.STATUS_PUBLISHED)
 
-        community_posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-            creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        community_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=self.pk), Q.AND)
 
         if max_id:
             community_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -2649,9 +3173,7 @@ class User(AbstractUser):
         followed_users_queryset = Post.objects.select_related(*posts_select_related).prefetch_related(
             *posts_prefetch_related).only(*posts_only).filter(followed_users_query)
 
-        final_queryset = own_posts_queryset.union(community_posts_queryset, followed_users_queryset)
-
-        return final_queryset
+        return own_posts_queryset, community_posts_queryset, followed_users_queryset
 
     def get_global_moderated_objects(self, types=None, max_id=None, verified=None, statuses=None):
         check_can_get_global_moderated_objects(user=self)
@@ -2829,8 +3351,14 @@ class User(AbstractUser):
 
         Follow = get_follow_model()
         follow = Follow.create_follow(user_id=self.pk, followed_user_id=user.pk, lists_ids=lists_ids)
+        User.clear_relationships_for_users_with_ids(
+            users_ids=[user.pk], relationships=[User.RELATIONSHIP_LINKED_USERS, User.RELATIONSHIP_FOLLOWERS])
         self._create_follow_notification(followed_user_id=user.pk)
 
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            # The followed user posts get backfilled when the timeline gets rebuilt
+            self._clear_timeline()
+
         if not is_pre_approved:
             # When its preapproved by the user to be followed, do not send the person a push notification
             self._send_follow_push_notification(followed_user_id=user.pk)
@@ -2849,6 +3377,13 @@ class User(AbstractUser):
         follow = self.follows.get(followed_user_id=user_id)
         self._delete_follow_notification(followed_user_id=user_id)
         follow.delete()
+        User.clear_relationships_for_users_with_ids(
+            users_ids=[user_id], relationships=[User.RELATIONSHIP_LINKED_USERS, User.RELATIONSHIP_FOLLOWERS])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            TimelineEntry = get_timeline_entry_model()
+            TimelineEntry.remove_posts_by_creator_with_id_from_timeline_for_user_with_id(
+                creator_id=user_id, user_id=self.pk, include_community_posts=False)
 
     def update_follow_for_user(self, user, lists_ids=None):
         return self.update_follow_for_user_with_id(user.pk, lists_ids=lists_ids)
@@ -2911,6 +3446,9 @@ class User(AbstractUser):
 
         Connection = get_connection_model()
         connection = Connection.create_connection(user_id=self.pk, target_user_id=user.pk, circles_ids=circles_ids)
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk, user.pk])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
 
         # Automatically follow user
         if not self.is_following_user_with_id(user.pk):
@@ -2938,6 +3476,9 @@ class User(AbstractUser):
 
         self._create_connection_confirmed_notification(user_connected_with_id=user_id)
 
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            self._clear_timeline()
+
         return connection
 
     def update_connection_with_user_with_id(self, user_id, circles_ids=None):
@@ -2956,6 +3497,14 @@ class User(AbstractUser):
         connection.circles.clear()
         connection.circles.add(*circles_ids)
         connection.save()
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk, user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            # The encircled posts the user can see changed
+            TimelineEntry = get_timeline_entry_model()
+            TimelineEntry.clear_timeline_for_user_with_id(user_id=user_id)
 
         return connection
 
@@ -2973,6 +3522,14 @@ class User(AbstractUser):
 
         connection = self.connections.get(target_connection__user_id=user_id)
         connection.delete()
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk, user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk, user_id],
+                                                    relationships=[User.RELATIONSHIP_LINKED_USERS])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            TimelineEntry = get_timeline_entry_model()
+            self._clear_timeline()
+            TimelineEntry.clear_timeline_for_user_with_id(user_id=user_id)
 
         return connection
 
@@ -3002,7 +3559,22 @@ class User(AbstractUser):
         if max_id:
             notifications_query.add(Q(id__lte=max_id), Q.AND)
 
-        self.notifications.filter(notifications_query).update(read=True)
+        Notification = get_notification_model()
+
+        read_notifications = self.notifications.filter(notifications_query)
+
+        read_notifications_types = list(read_notifications.values_list('notification_type', flat=True).distinct())
+
+        type_deltas = {}
+        for notification_type in read_notifications_types:
+            # Only the notifications this call marks as read are uncounted, not the ones a concurrent read did
+            read_notifications_count = read_notifications.filter(notification_type=notification_type).update(
+                read=True)
+            if read_notifications_count:
+                type_deltas[notification_type] = -read_notifications_count
+
+        if type_deltas:
+            Notification.update_unread_counts_for_owners_with_ids(unread_counts_deltas={self.pk: type_deltas})
 
     def get_unread_notifications(self, max_id=None, types=None):
         notifications_query = Q(read=False)
@@ -3017,8 +3589,16 @@ class User(AbstractUser):
     def read_notification_with_id(self, notification_id):
         check_can_read_notification_with_id(user=self, notification_id=notification_id)
         notification = self.notifications.get(id=notification_id)
+
+        # Only uncounted by the call actually marking it as read
+        if self.notifications.filter(id=notification_id, read=False).update(read=True):
+            Notification = get_notification_model()
+            Notification.update_unread_counts_for_owners_with_ids(unread_counts_deltas={
+                self.pk: {notification.notification_type: -1}
+            })
+
         notification.read = True
-        notification.save()
+
         return notification
 
     def delete_notification_with_id(self, notification_id):
@@ -3027,28 +3607,29 @@ class User(AbstractUser):
         notification.delete()
 
     def delete_own_notifications(self):
-        self.notifications.all().delete()
+        Notification = get_notification_model()
+
+        with Notification.batch_unread_counts_updates():
+            self.notifications.all().delete()
 
     def delete_outgoing_notifications(self):
         """
         Deletes notifications sent to other users about this user
         Eg. UserNewPostNotification
         """
-        # Remove all user new post notifications
+        Notification = get_notification_model()
         UserNewPostNotification = get_user_new_post_notification_model()
-        UserNewPostNotification.objects.filter(user_notifications_subscription__user=self).delete()
-
-        # Removes all user connection requests
         ConnectionRequestNotification = get_connection_request_notification_model()
-        ConnectionRequestNotification.objects.filter(connection_requester=self).delete()
-
-        # Removes all follow notifications
         FollowNotification = get_follow_notification_model()
-        FollowNotification.objects.filter(follower=self).delete()
-
-        # Removes all connection confirmed notifications
         ConnectionConfirmedNotification = get_connection_confirmed_notification_model()
-        ConnectionConfirmedNotification.objects.filter(connection_confirmator=self).delete()
+
+        Notification.purge_notifications(
+            notifications_query=Notification.make_notifications_query_for_content_objects(content_objects_querysets=[
+                UserNewPostNotification.objects.filter(user_notifications_subscription__user=self),
+                ConnectionRequestNotification.objects.filter(connection_requester=self),
+                FollowNotification.objects.filter(follower=self),
+                ConnectionConfirmedNotification.objects.filter(connection_confirmator=self),
+            ]))
 
     def delete_all_notifications(self):
         self.delete_own_notifications()
@@ -3199,6 +3780,17 @@ class User(AbstractUser):
 
         UserBlock = get_user_block_model()
         UserBlock.create_user_block(blocker_id=self.pk, blocked_user_id=user_id)
+        User.clear_exclusions_for_users_with_ids(users_ids=[self.pk, user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_BLOCKED_USERS])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk, user_id])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            TimelineEntry = get_timeline_entry_model()
+            TimelineEntry.remove_posts_by_creator_with_id_from_timeline_for_user_with_id(creator_id=user_id,
+                                                                                       user_id=self.pk)
+            TimelineEntry.remove_posts_by_creator_with_id_from_timeline_for_user_with_id(creator_id=self.pk,
+                                                                                       user_id=user_id)
 
         return user_to_block
 
@@ -3209,6 +3801,17 @@ class User(AbstractUser):
     def unblock_user_with_id(self, user_id):
         check_can_unblock_user_with_id(user=self, user_id=user_id)
         self.user_blocks.filter(blocked_user_id=user_id).delete()
+        User.clear_exclusions_for_users_with_ids(users_ids=[self.pk, user_id])
+        User.clear_relationships_for_users_with_ids(users_ids=[self.pk],
+                                                    relationships=[User.RELATIONSHIP_BLOCKED_USERS])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk, user_id])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            # Shared community posts become visible again
+            TimelineEntry = get_timeline_entry_model()
+            self._clear_timeline()
+            TimelineEntry.clear_timeline_for_user_with_id(user_id=user_id)
+
         return User.objects.get(pk=user_id)
 
     def report_comment_with_id_for_post_with_uuid(self, post_comment_id, post_uuid, category_id, description=None):
@@ -3228,6 +3831,8 @@ class User(AbstractUser):
                                                                category_id=category_id,
                                                                reporter_id=self.pk,
                                                                description=description)
+        User.clear_exclusions_for_users_with_ids(users_ids=[self.pk])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk])
         post_comment.delete_notifications_for_user(user=self)
 
     def report_post_with_uuid(self, post_uuid, category_id, description=None):
@@ -3242,6 +3847,8 @@ class User(AbstractUser):
                                                        category_id=category_id,
                                                        reporter_id=self.pk,
                                                        description=description)
+        User.clear_exclusions_for_users_with_ids(users_ids=[self.pk])
+        User.clear_posts_visibility_for_users_with_ids(users_ids=[self.pk])
         post.delete_notifications_for_user(user=self)
 
     def report_user_with_username(self, username, category_id, description=None):
@@ -3544,19 +4151,37 @@ class User(AbstractUser):
         self.auth_token.delete()
         bootstrap_user_auth_token(user=self)
 
-    def _make_connections_query(self):
-        connected_users_query = Q(targeted_connections__target_user_id=self.pk,
-                                  targeted_connections__target_connection__circles__isnull=False,
-                                  is_deleted=False)
-
-        return connected_users_query
-
     def _make_followers_query(self):
         return Q(follows__followed_user_id=self.pk, is_deleted=False)
 
     def _make_followings_query(self):
         return Q(followers__user_id=self.pk, is_deleted=False)
 
+    def _make_relationship_users_query(self, relationship, max_id=None):
+        """
+        Narrows the users to the ids of the relationship, cached or as subqueries, rather than joining the
+        relationships of every user
+        """
+        users_ids = User.get_relationship_users_ids_for_user_with_id(user_id=self.pk, relationship=relationship)
+
+        if users_ids is not None:
+            relationship_users_query = Q(id__in=users_ids)
+        else:
+            relationship_users_query = Q()
+            for users_ids_queryset in User._make_relationship_users_ids_querysets(user_id=self.pk,
+                                                                                  relationship=relationship):
+                relationship_users_query.add(Q(id__in=users_ids_queryset), Q.OR)
+
+        if max_id:
+            relationship_users_query.add(Q(id__lt=max_id), Q.AND)
+
+        return relationship_users_query
+
+    def _make_users_names_query(self, query):
+        names_query = Q(username__icontains=query)
+        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        return names_query
+
     def _make_blocked_users_query(self, max_id=None):
         blocked_users_query = Q(blocked_by_users__blocker_id=self.pk, )
 
@@ -3571,10 +4196,17 @@ class User(AbstractUser):
         return posts_query
 
     def _make_get_posts_query_for_user(self, user, max_id=None):
+        posts_query = Q(creator_id=user.pk)
+        posts_query.add(self._make_get_visible_profile_posts_query(max_id=max_id), Q.AND)
+        return posts_query
 
+    def _make_get_visible_profile_posts_query(self, max_id=None):
+        """
+        The posts shared with circles the user can see, whoever their creator
+        """
         Post = get_post_model()
 
-        posts_query = Q(creator_id=user.pk, is_deleted=False, status=Post.STATUS_PUBLISHED)
+        posts_query = Q(is_deleted=False, status=Post.STATUS_PUBLISHED)
 
         world_circle_id = self._get_world_circle_id()
 
@@ -3584,13 +4216,12 @@ class User(AbstractUser):
                                   circles__connections__target_connection__circles__isnull=False), Q.OR)
 
         posts_query.add(posts_circles_query, Q.AND)
-        posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-            creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=self.pk), Q.AND)
 
         if max_id:
             posts_query.add(Q(id__lt=max_id), Q.AND)
 
-        posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk), Q.AND)
 
         return posts_query
 
@@ -3630,6 +4261,130 @@ class User(AbstractUser):
                           settings.SECRET_KEY,
                           algorithm=settings.JWT_ALGORITHM).decode('utf-8')
 
+    def _can_see_post_with_query(self, post):
+        # Check if post is public
+        if post.community:
+            if self._can_see_community_post(community=post.community, post=post):
+                return True
+        elif post.creator_id == self.pk and not post.is_deleted:
+            return True
+        else:
+            # Check if we can retrieve the post
+            if self._can_see_post(post=post):
+                return True
+
+        return False
+
+    def _can_see_post_comment_with_query(self, post_comment, post):
+        if not self.can_see_post(post=post):
+            return False
+        post_comment_query = self._make_get_post_comment_with_id_query(post_comment_id=post_comment.pk,
+                                                                       post_comment_parent_id=post_comment.parent_comment_id,
+                                                                       post=post)
+        PostComment = get_post_comment_model()
+        return PostComment.objects.filter(post_comment_query).exists()
+
+    def _get_visible_posts_ids_with_query(self, posts):
+        """
+        The same decisions as _can_see_post_with_query, for many posts at once
+        """
+        Post = get_post_model()
+
+        visible_posts_ids = set()
+        posts_ids_by_community = {}
+        profile_posts_ids = []
+
+        for post in posts:
+            if post.creator_id == self.pk and (post.community or not post.is_deleted):
+                visible_posts_ids.add(post.pk)
+            elif post.community:
+                posts_ids_by_community.setdefault(post.community, []).append(post.pk)
+            else:
+                profile_posts_ids.append(post.pk)
+
+        posts_query = Q()
+
+        if profile_posts_ids:
+            profile_posts_query = self._make_get_visible_profile_posts_query()
+            profile_posts_query.add(Q(id__in=profile_posts_ids), Q.AND)
+            posts_query.add(profile_posts_query, Q.OR)
+
+        if posts_ids_by_community:
+            staff_communities_ids = set(self.communities_memberships.filter(
+                Q(is_administrator=True) | Q(is_moderator=True),
+                community_id__in=[community.pk for community in posts_ids_by_community.keys()]).values_list(
+                'community_id', flat=True))
+
+            for community, community_posts_ids in posts_ids_by_community.items():
+                community_posts_query = self._make_get_community_with_id_posts_query(
+                    community=community, is_staff=community.pk in staff_communities_ids)
+                community_posts_query.add(Q(id__in=community_posts_ids), Q.AND)
+                posts_query.add(community_posts_query, Q.OR)
+
+        if posts_query:
+            visible_posts_ids.update(Post.objects.filter(posts_query).values_list('id', flat=True).distinct())
+
+        return visible_posts_ids
+
+    def _make_post_visibility_field(self, post):
+        # Edits to the post update its modified time, which leaves the decisions about its previous version behind
+        return 'post-%d-%d' % (post.pk, post.modified.timestamp() * 1000000)
+
+    def _make_post_comment_visibility_field(self, post_comment, post):
+        return 'post-comment-%d-%d-%s' % (
+            post_comment.pk, post_comment.modified.timestamp() * 1000000, self._make_post_visibility_field(post=post))
+
+    def _get_cached_posts_visibilities(self, fields):
+        """
+        The cached visibility decisions among the given fields, from the memo of the request and then from Redis
+        """
+        if not settings.POSTS_VISIBILITY_CACHE_ENABLED:
+            return {}
+
+        posts_visibility_memo = _get_posts_visibility_memo()
+
+        posts_visibilities = {}
+        unmemoized_fields = []
+
+        for field in fields:
+            memo_key = (self.pk, field)
+            if memo_key in posts_visibility_memo:
+                posts_visibilities[field] = posts_visibility_memo[memo_key]
+            else:
+                unmemoized_fields.append(field)
+
+        if unmemoized_fields:
+            get_cached_posts_visibilities_script = self._get_redis_script(self._GET_CACHED_POSTS_VISIBILITIES_SCRIPT)
+            version, *cached_visibilities = get_cached_posts_visibilities_script(
+                keys=[self.POSTS_VISIBILITY_CACHE_KEY % self.pk, self.POSTS_VISIBILITY_VERSION_KEY],
+                args=unmemoized_fields)
+            # The decisions missing from the cache are cached with the version they were missing from
+            self._posts_visibility_version = int(version)
+
+            for field, cached_visibility in zip(unmemoized_fields, cached_visibilities):
+                if cached_visibility is not None:
+                    posts_visibilities[field] = posts_visibility_memo[(self.pk, field)] = cached_visibility == b'1'
+
+        return posts_visibilities
+
+    def _cache_posts_visibilities(self, posts_visibilities):
+        if not settings.POSTS_VISIBILITY_CACHE_ENABLED or not posts_visibilities:
+            return
+
+        posts_visibility_memo = _get_posts_visibility_memo()
+        version = getattr(self, '_posts_visibility_version', None)
+
+        if version is None:
+            version = int(get_redis_connection().get(self.POSTS_VISIBILITY_VERSION_KEY) or 0)
+
+        args = [settings.POSTS_VISIBILITY_CACHE_TIMEOUT]
+        for field, can_see in posts_visibilities.items():
+            posts_visibility_memo[(self.pk, field)] = can_see
+            args.extend(['%d:%s' % (version, field), 1 if can_see else 0])
+
+        cache_posts_visibilities_script = self._get_redis_script(self._CACHE_POSTS_VISIBILITY_SCRIPT)
+        cache_posts_visibilities_script(keys=[self.POSTS_VISIBILITY_CACHE_KEY % self.pk], args=args)
+
     def _can_see_post(self, post):
         post_query = self._make_get_post_with_id_query_for_user(post.creator, post_id=post.pk)
 
@@ -3711,10 +4466,11 @@ class User(AbstractUser):
 
         return reactions_query
 
-    def _make_get_post_comment_with_id_query(self, post_comment_id, post, post_comment_parent_id=None):
+    def _make_get_post_comment_with_id_query(self, post_comment_id, post, post_comment_parent_id=None, is_staff=None):
 
         post_comments_query = self._make_get_comments_for_post_query(post=post,
-                                                                     post_comment_parent_id=post_comment_parent_id)
+                                                                     post_comment_parent_id=post_comment_parent_id,
+                                                                     is_staff=is_staff)
 
         post_comment_query = Q(pk=post_comment_id)
 
@@ -3722,7 +4478,8 @@ class User(AbstractUser):
 
         return post_comments_query
 
-    def _make_get_comments_for_post_query(self, post, post_comment_parent_id=None, max_id=None, min_id=None):
+    def _make_get_comments_for_post_query(self, post, post_comment_parent_id=None, max_id=None, min_id=None,
+                                          is_staff=None):
 
         # Comments from the post
         comments_query = Q(post_id=post.pk)
@@ -3736,16 +4493,13 @@ class User(AbstractUser):
         post_community = post.community
 
         if post_community:
-            if not self.is_staff_of_community_with_name(community_name=post_community.name):
-                # Dont retrieve posts of blocked users, except from staff members
-                blocked_users_query = ~Q(Q(commenter__blocked_by_users__blocker_id=self.pk) | Q(
-                    commenter__user_blocks__blocked_user_id=self.pk))
-                blocked_users_query_staff_members = Q(
-                    commenter__communities_memberships__community_id=post_community.pk)
-                blocked_users_query_staff_members.add(Q(commenter__communities_memberships__is_administrator=True) | Q(
-                    commenter__communities_memberships__is_moderator=True), Q.AND)
+            if is_staff is None:
+                is_staff = self.is_staff_of_community_with_name(community_name=post_community.name)
 
-                blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
+            if not is_staff:
+                # Dont retrieve posts of blocked users, except from staff members
+                blocked_users_query = make_exclude_blocked_community_posts_for_user_and_community_with_ids(
+                    user_id=self.pk, community_id=post_community.pk, user_field='commenter')
                 comments_query.add(blocked_users_query, Q.AND)
 
                 # Don't retrieve items that have been reported and approved
@@ -3753,8 +4507,8 @@ class User(AbstractUser):
                 comments_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
         else:
             #  Dont retrieve posts of blocked users
-            blocked_users_query = ~Q(Q(commenter__blocked_by_users__blocker_id=self.pk) | Q(
-                commenter__user_blocks__blocked_user_id=self.pk))
+            blocked_users_query = make_exclude_blocked_posts_for_user_with_id_query(user_id=self.pk,
+                                                                                    user_field='commenter')
             comments_query.add(blocked_users_query, Q.AND)
 
         # Cursor based scrolling queries
@@ -3764,17 +4518,19 @@ class User(AbstractUser):
             comments_query.add(Q(id__gte=min_id), Q.AND)
 
         # Dont retrieve items we have reported
-        comments_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        comments_query.add(make_exclude_reported_post_comments_by_user_with_id_query(user_id=self.pk), Q.AND)
 
         # Dont retrieve soft deleted post comments
         comments_query.add(Q(is_deleted=False), Q.AND)
 
         return comments_query
 
-    def _make_get_community_with_id_posts_query(self, community, include_closed_posts_for_staff=True):
+    def _make_get_community_with_id_posts_query(self, community, include_closed_posts_for_staff=True, is_staff=None):
         """
         This query returns duplicates
         """
+        if is_staff is None:
+            is_staff = self.is_staff_of_community_with_name(community_name=community.name)
 
         Post = get_post_model()
 
@@ -3786,10 +4542,11 @@ class User(AbstractUser):
         community_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
         # Dont retrieve items we have reported
-        community_posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        community_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=self.pk), Q.AND)
 
         # Only retrieve posts if we're not banned
-        community_posts_query.add(~Q(community__banned_users__id=self.pk), Q.AND)
+        community_posts_query.add(make_exclude_community_posts_banned_from_for_user_with_id_query(user_id=self.pk),
+                                  Q.AND)
 
         # Ensure public/private visibility is respected
         community_posts_visibility_query = Q(community__memberships__user__id=self.pk)
@@ -3798,19 +4555,13 @@ class User(AbstractUser):
 
         community_posts_query.add(community_posts_visibility_query, Q.AND)
 
-        if not self.is_staff_of_community_with_name(community_name=community.name):
+        if not is_staff:
             # Dont retrieve closed posts
             community_posts_query.add(Q(is_closed=False) | Q(creator_id=self.pk), Q.AND)
 
             # Don't retrieve posts of blocked users, except if they're staff members
-            blocked_users_query = ~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-                creator__user_blocks__blocked_user_id=self.pk))
-
-            blocked_users_query_staff_members = Q(creator__communities_memberships__community_id=community)
-            blocked_users_query_staff_members.add(Q(creator__communities_memberships__is_administrator=True) | Q(
-                creator__communities_memberships__is_moderator=True), Q.AND)
-
-            blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
+            blocked_users_query = make_exclude_blocked_community_posts_for_user_and_community_with_ids(
+                user_id=self.pk, community_id=community.pk)
 
             community_posts_query.add(blocked_users_query, Q.AND)
         else:
@@ -3826,6 +4577,32 @@ class User(AbstractUser):
         return excluded_users.union(creator)
 
 
+_posts_visibility_memo = threading.local()
+
+
+def _get_posts_visibility_memo():
+    """
+    The posts visibility decisions taken during the current request, by (user id, visibility field)
+    """
+    posts_visibility_memo = getattr(_posts_visibility_memo, 'visibilities', None)
+
+    if posts_visibility_memo is None:
+        # Outside of a request, like in the jobs, nothing is memoized
+        return {}
+
+    return posts_visibility_memo
+
+
+@receiver(request_started, dispatch_uid='clear_posts_visibility_memo')
+def clear_posts_visibility_memo(sender, **kwargs):
+    _posts_visibility_memo.visibilities = {}
+
+
+@receiver(request_finished, dispatch_uid='drop_posts_visibility_memo')
+def drop_posts_visibility_memo(sender, **kwargs):
+    _posts_visibility_memo.visibilities = None
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='bootstrap_auth_token')
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     """"
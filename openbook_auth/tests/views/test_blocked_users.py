@@ -1,7 +1,9 @@
 import random
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
+from openbook_auth.models import User
 from openbook_common.tests.models import OpenbookAPITestCase
 
 import logging
@@ -130,6 +132,31 @@ class SearchBlockedUsersAPITests(OpenbookAPITestCase):
             self.assertEqual(retrieved_blocked_member['id'], blocked_user.id)
             user.unblock_user_with_id(blocked_user.pk)
 
+    @override_settings(USER_RELATIONSHIPS_CACHE_ENABLED=True)
+    def test_search_reflects_blocked_users_changes_with_cache(self):
+        """
+        should find newly blocked users and stop finding unblocked ones when the blocked users ids are cached
+        """
+        user = make_user()
+        # Users of previous tests could have had the same id
+        User.clear_relationships_for_users_with_ids(users_ids=[user.pk], relationships=User.RELATIONSHIPS)
+        headers = make_authentication_headers_for_user(user)
+        url = self._get_url()
+
+        blocked_user = make_user(name='Lovelace')
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)], [blocked_user.pk])
+
+        new_blocked_user = make_user(name='Lovelace')
+        user.block_user_with_id(user_id=new_blocked_user.pk)
+        user.unblock_user_with_id(user_id=blocked_user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)],
+                         [new_blocked_user.pk])
+
     def _get_url(self):
         return reverse('search-blocked-users')
 
@@ -1,7 +1,9 @@
 import random
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
+from openbook_auth.models import User
 from openbook_common.tests.models import OpenbookAPITestCase
 
 import logging
@@ -189,5 +191,29 @@ class SearchFollowersAPITests(OpenbookAPITestCase):
             self.assertEqual(0, response_members_count)
 
 
+    @override_settings(USER_RELATIONSHIPS_CACHE_ENABLED=True)
+    def test_search_reflects_followers_changes_with_cache(self):
+        """
+        should find new followers and stop finding former ones when the followers ids are cached
+        """
+        user = make_user()
+        # Users of previous tests could have had the same id
+        User.clear_relationships_for_users_with_ids(users_ids=[user.pk], relationships=User.RELATIONSHIPS)
+        headers = make_authentication_headers_for_user(user)
+        url = self._get_url()
+
+        follower = make_user(name='Lovelace')
+        follower.follow_user_with_id(user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)], [follower.pk])
+
+        new_follower = make_user(name='Lovelace')
+        new_follower.follow_user_with_id(user.pk)
+        follower.unfollow_user_with_id(user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)], [new_follower.pk])
+
     def _get_url(self):
         return reverse('search-followers')
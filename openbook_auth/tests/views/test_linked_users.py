@@ -1,7 +1,9 @@
 import random
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
+from openbook_auth.models import User
 from openbook_common.tests.models import OpenbookAPITestCase
 
 import logging
@@ -139,6 +141,60 @@ class SearchLinkedUsersAPITests(OpenbookAPITestCase):
             self.assertEqual(retrieved_linked_member['id'], linked_user.id)
             linked_user.unfollow_user_with_id(user.pk)
 
+    def test_can_paginate_search_results_with_max_id(self):
+        """
+        should return the matching linked users from the newest and the older ones with max_id
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        linked_users = []
+        for i in range(0, 3):
+            linked_user = make_user(name='Lovelace %d' % i)
+            linked_user.follow_user_with_id(user.pk)
+            linked_users.append(linked_user)
+
+        make_user(name='Lovelace').follow_user_with_id(make_user().pk)
+
+        url = self._get_url()
+
+        response = self.client.get(url, {'query': 'lovelace', 'count': 2}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_users_ids = [response_user['id'] for response_user in json.loads(response.content)]
+        self.assertEqual(response_users_ids, [linked_users[2].pk, linked_users[1].pk])
+
+        response = self.client.get(url, {'query': 'lovelace', 'count': 2, 'max_id': response_users_ids[-1]},
+                                   **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_users_ids = [response_user['id'] for response_user in json.loads(response.content)]
+        self.assertEqual(response_users_ids, [linked_users[0].pk])
+
+    @override_settings(USER_RELATIONSHIPS_CACHE_ENABLED=True)
+    def test_search_reflects_linked_users_changes_with_cache(self):
+        """
+        should find new followers and stop finding former ones when the linked users ids are cached
+        """
+        user = make_user()
+        # Users of previous tests could have had the same id
+        User.clear_relationships_for_users_with_ids(users_ids=[user.pk], relationships=User.RELATIONSHIPS)
+        headers = make_authentication_headers_for_user(user)
+        url = self._get_url()
+
+        follower = make_user(name='Lovelace')
+        follower.follow_user_with_id(user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)], [follower.pk])
+
+        new_follower = make_user(name='Lovelace')
+        new_follower.follow_user_with_id(user.pk)
+        follower.unfollow_user_with_id(user.pk)
+
+        response = self.client.get(url, {'query': 'lovelace'}, **headers)
+        self.assertEqual([response_user['id'] for response_user in json.loads(response.content)], [new_follower.pk])
+
     def _get_url(self):
         return reverse('search-linked-users')
 
@@ -17,6 +17,9 @@ class GetBlockedUsersSerializer(serializers.Serializer):
 
 class SearchBlockedUsersSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=settings.SEARCH_QUERIES_MAX_LENGTH, required=True)
+    max_id = serializers.IntegerField(
+        required=False,
+    )
     count = serializers.IntegerField(
         required=False,
         max_value=10
@@ -19,6 +19,9 @@ class GetFollowersSerializer(serializers.Serializer):
 
 class SearchFollowersSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=settings.SEARCH_QUERIES_MAX_LENGTH, required=True)
+    max_id = serializers.IntegerField(
+        required=False,
+    )
     count = serializers.IntegerField(
         required=False,
         max_value=20
@@ -41,9 +41,10 @@ class SearchFollowers(APIView):
 
         count = data.get('count', 10)
         query = data.get('query')
+        max_id = data.get('max_id')
 
         user = request.user
-        users = user.search_followers_with_query(query=query)[:count]
+        users = user.search_followers_with_query(query=query, max_id=max_id)[:count]
 
         users_serializer = FollowersUserSerializer(users, many=True, context={'request': request, })
 
@@ -26,6 +26,9 @@ class GetLinkedUsersSerializer(serializers.Serializer):
 
 class SearchLinkedUsersSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=settings.SEARCH_QUERIES_MAX_LENGTH, required=True)
+    max_id = serializers.IntegerField(
+        required=False,
+    )
     count = serializers.IntegerField(
         required=False,
         max_value=10
@@ -44,10 +44,11 @@ class SearchLinkedUsers(APIView):
 
         count = data.get('count', 10)
         query = data.get('query')
+        max_id = data.get('max_id')
         with_community = data.get('with_community')
 
         user = request.user
-        users = user.search_linked_users_with_query(query=query)[:count]
+        users = user.search_linked_users_with_query(query=query, max_id=max_id)[:count]
 
         users_serializer = LinkedUsersUserSerializer(users, many=True, context={'request': request,
                                                                                 'communities_names': [
@@ -7,6 +7,7 @@ from django.utils import timezone
 from openbook.settings import CIRCLE_MAX_LENGTH, COLOR_ATTR_MAX_LENGTH
 from openbook_auth.models import User
 from openbook_common.utils.model_loaders import get_connection_model
+from openbook_common.utils.reference_rows import register_reference_row, get_reference_row
 from openbook_connections.models import Connection
 from openbook_posts.models import Post
 from openbook_common.validators import hex_color_validator
@@ -60,6 +61,10 @@ class Circle(models.Model):
 
     @classmethod
     def get_world_circle(cls):
+        return get_reference_row('world_circle')
+
+    @classmethod
+    def _load_world_circle(cls):
         return Circle.objects.get(pk=cls.get_world_circle_id())
 
     @classmethod
@@ -91,3 +96,6 @@ class Circle(models.Model):
 
     def __str__(self):
         return self.name
+
+
+register_reference_row('world_circle', Circle._load_world_circle, invalidated_by=(Circle,))
@@ -27,17 +27,21 @@ def get_detected_language_code(text):
 def get_language_for_text(text):
     language_code = get_detected_language_code(text)
     Language = get_language_model()
-    if language_code is not None and Language.objects.filter(code=language_code).exists():
-        return Language.objects.get(code=language_code)
 
-    return None
+    if language_code is None:
+        return None
+
+    try:
+        return Language.get_language_with_code(code=language_code)
+    except Language.DoesNotExist:
+        return None
 
 
 def get_supported_translation_language(language_code):
     Language = get_language_model()
     supported_translation_code = translation_strategy.get_supported_translation_language_code(language_code)
 
-    return Language.objects.get(code=supported_translation_code)
+    return Language.get_language_with_code(code=supported_translation_code)
 
 
 def extract_urls_from_string(text):
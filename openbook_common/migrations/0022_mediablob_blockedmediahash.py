@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_common', '0021_auto_20190917_1806'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockedMediaHash',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, unique=True, verbose_name='hash')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=64, verbose_name='hash')),
+                ('role', models.CharField(max_length=128, verbose_name='role')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('width', models.PositiveIntegerField(null=True)),
+                ('height', models.PositiveIntegerField(null=True)),
+                ('duration', models.FloatField(null=True)),
+                ('references_count', models.PositiveIntegerField(default=1)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mediablob',
+            index=models.Index(fields=['name'], name='openbook_co_name_9fe54c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mediablob',
+            unique_together={('hash', 'role')},
+        ),
+    ]
@@ -3,13 +3,14 @@
 from urllib.parse import urlparse
 
 from django.conf import settings
-from django.db import models
-from django.db.models import QuerySet, Q, Count
+from django.db import models, transaction
+from django.db.models import QuerySet, Q, Count, F
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 # Create your views here.
 from openbook.settings import COLOR_ATTR_MAX_LENGTH
+from openbook_common.utils.reference_rows import register_reference_row, get_reference_row
 from openbook_common.validators import hex_color_validator
 import tldextract
 
@@ -22,6 +23,18 @@ class EmojiGroup(models.Model):
     created = models.DateTimeField(editable=False)
     is_reaction_group = models.BooleanField(_('is reaction group'), default=False)
 
+    @classmethod
+    def get_emoji_groups(cls, is_reaction_group):
+        """
+        The emoji groups ordered by order, with their emojis prefetched ordered by order
+        """
+        return get_reference_row('emoji_groups', is_reaction_group)
+
+    @classmethod
+    def _load_emoji_groups(cls, is_reaction_group):
+        return list(cls.objects.filter(is_reaction_group=is_reaction_group).order_by('order').prefetch_related(
+            models.Prefetch('emojis', queryset=Emoji.objects.order_by('order'))))
+
     def __str__(self):
         return 'EmojiGroup: ' + self.keyword
 
@@ -101,6 +114,14 @@ class Language(models.Model):
     name = models.CharField(_('name'), max_length=64, blank=False, null=False)
     created = models.DateTimeField(editable=False)
 
+    @classmethod
+    def get_language_with_code(cls, code):
+        return get_reference_row('language_with_code', code)
+
+    @classmethod
+    def _load_language_with_code(cls, code):
+        return cls.objects.get(code=code)
+
     def __str__(self):
         return 'Language: ' + self.code
 
@@ -110,6 +131,10 @@ class Language(models.Model):
         return super(Language, self).save(*args, **kwargs)
 
 
+register_reference_row('emoji_groups', EmojiGroup._load_emoji_groups, invalidated_by=(EmojiGroup, Emoji))
+register_reference_row('language_with_code', Language._load_language_with_code, invalidated_by=(Language,))
+
+
 class ProxyBlacklistedDomain(models.Model):
     domain = models.CharField(max_length=settings.PROXY_BLACKLIST_DOMAIN_MAX_LENGTH, unique=True)
 
@@ -132,3 +157,126 @@ class ProxyBlacklistedDomain(models.Model):
         url_full_domain = '.'.join([tld_extract_result.subdomain, tld_extract_result.domain, tld_extract_result.suffix])
 
         return cls.objects.filter(Q(domain=url_root_domain) | Q(domain=url_full_domain)).exists()
+
+
+class MediaBlob(models.Model):
+    """
+    A processed media file stored once per content hash and role, and referenced by every field storing that
+    content in that role while MEDIA_DEDUPLICATION_ENABLED, see delete_file_field
+    """
+    # The sha256 of the uploaded content the file was processed from
+    hash = models.CharField(_('hash'), max_length=64)
+    # What the file is made for, see make_role_for_field
+    role = models.CharField(_('role'), max_length=128)
+    name = models.CharField(_('name'), max_length=255)
+    width = models.PositiveIntegerField(null=True)
+    height = models.PositiveIntegerField(null=True)
+    duration = models.FloatField(null=True)
+    references_count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = (('hash', 'role'),)
+        indexes = [
+            models.Index(fields=['name']),
+        ]
+
+    @classmethod
+    def make_role_for_field(cls, field, variant=None):
+        role = '%s.%s' % (field.model._meta.label_lower, field.name)
+
+        if variant:
+            role = '%s:%s' % (role, variant)
+
+        return role
+
+    @classmethod
+    def get_blobs_for_hash(cls, hash, roles=None, roles_prefix=None):
+        """
+        The blobs of the content with the given hash by role
+        """
+        blobs_query = Q(hash=hash)
+
+        if roles is not None:
+            blobs_query.add(Q(role__in=roles), Q.AND)
+
+        if roles_prefix is not None:
+            blobs_query.add(Q(role__startswith=roles_prefix), Q.AND)
+
+        return {blob.role: blob for blob in cls.objects.filter(blobs_query)}
+
+    @classmethod
+    def reference_blobs(cls, blobs):
+        """
+        Adds a reference to each of the blobs. Returns whether they all still existed, as they are deleted
+        once released by their last reference.
+        """
+        blobs_ids = [blob.pk for blob in blobs]
+
+        with transaction.atomic():
+            referenced_blobs_count = cls.objects.filter(pk__in=blobs_ids).update(
+                references_count=F('references_count') + 1)
+
+            if referenced_blobs_count == len(blobs_ids):
+                return True
+
+            transaction.set_rollback(True)
+
+        return False
+
+    @classmethod
+    def reference_blobs_for_hash(cls, hash, roles):
+        """
+        Adds a reference to the blob of the content with the given hash for each of the roles. Returns the blobs in
+        the order of the roles, or None if any of them is missing.
+        """
+        blobs = cls.get_blobs_for_hash(hash=hash, roles=roles)
+
+        if len(blobs) != len(roles) or not cls.reference_blobs(blobs=blobs.values()):
+            return None
+
+        return [blobs[role] for role in roles]
+
+    @classmethod
+    def register_blob(cls, hash, role, name, width=None, height=None, duration=None):
+        """
+        Makes the stored file the blob of the content with the given hash and role. If another one was registered
+        meanwhile, the file stays unregistered and is deleted as usual.
+        """
+        cls.objects.bulk_create([cls(hash=hash, role=role, name=name, width=width, height=height,
+                                     duration=duration)], ignore_conflicts=True)
+
+    @classmethod
+    def release_blob_with_name(cls, name):
+        """
+        Drops a reference to the blob stored with the given name. Returns whether the file is no longer referenced
+        and should be deleted, which unregistered files never are.
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(name=name).first()
+
+            if not blob:
+                return True
+
+            if blob.references_count > 1:
+                cls.objects.filter(pk=blob.pk).update(references_count=F('references_count') - 1)
+                return False
+
+            blob.delete()
+
+        return True
+
+
+class BlockedMediaHash(models.Model):
+    """
+    The sha256 of media content which can no longer be uploaded, i.e. found with critical severity by moderators
+    """
+    hash = models.CharField(_('hash'), max_length=64, unique=True)
+    created = models.DateTimeField(editable=False, default=timezone.now)
+
+    @classmethod
+    def is_hash_blocked(cls, hash):
+        return cls.objects.filter(hash=hash).exists()
+
+    @classmethod
+    def block_hashes(cls, hashes):
+        cls.objects.bulk_create([cls(hash=hash) for hash in set(hashes) if hash], ignore_conflicts=True)
@@ -1,10 +1,45 @@
+from django.db import models
 from rest_framework.fields import Field
+from rest_framework.serializers import ListSerializer
 
 from openbook_common.utils.model_loaders import get_post_model
 from openbook_communities.models import CommunityMembership
+from openbook_posts.batch_loaders import PostsBatchLoader
 from openbook_posts.models import PostReaction, PostCommentReaction
 
 
+class PostsBatchLoaderListSerializer(ListSerializer):
+    """
+    Serializes a list of posts providing the post fields a PostsBatchLoader for them.
+    Subclasses can set post_source when the items are related to posts, e.g. top posts
+    """
+    post_source = None
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+
+        request = self.context.get('request')
+
+        if request and not request.user.is_anonymous:
+            posts = [getattr(item, self.post_source) if self.post_source else item for item in items]
+            self.context['posts_batch_loader'] = PostsBatchLoader(posts=posts, user=request.user)
+
+        return super(PostsBatchLoaderListSerializer, self).to_representation(items)
+
+
+class RelatedPostsBatchLoaderListSerializer(PostsBatchLoaderListSerializer):
+    post_source = 'post'
+
+
+def get_posts_batch_loader_for_post(field, post):
+    posts_batch_loader = field.context.get('posts_batch_loader')
+
+    if posts_batch_loader and posts_batch_loader.has_post(post):
+        return posts_batch_loader
+
+    return None
+
+
 class ReactionField(Field):
     def __init__(self, reaction_serializer=None, **kwargs):
         kwargs['source'] = '*'
@@ -19,11 +54,18 @@ class ReactionField(Field):
         serialized_reaction = None
 
         if not request_user.is_anonymous:
-            try:
-                reaction = request_user.get_reaction_for_post_with_id(post.pk)
-                serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
-            except PostReaction.DoesNotExist:
-                pass
+            posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+
+            if posts_batch_loader:
+                reaction = posts_batch_loader.get_reaction_for_post(post)
+                if reaction:
+                    serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
+            else:
+                try:
+                    reaction = request_user.get_reaction_for_post_with_id(post.pk)
+                    serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
+                except PostReaction.DoesNotExist:
+                    pass
 
         return serialized_reaction
 
@@ -40,8 +82,12 @@ class CommentsCountField(Field):
 
         comments_count = None
 
+        posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+
         if request_user.is_anonymous:
             comments_count = post.count_comments()
+        elif posts_batch_loader:
+            comments_count = posts_batch_loader.get_comments_count_for_post(post)
         else:
             comments_count = request_user.get_comments_count_for_post(post=post)
 
@@ -60,10 +106,14 @@ class PostReactionsEmojiCountField(Field):
 
         reaction_emoji_count = []
 
+        posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+
         if request_user.is_anonymous:
             if post.public_reactions:
                 Post = get_post_model()
                 reaction_emoji_count = Post.get_emoji_counts_for_post_with_id(post.pk)
+        elif posts_batch_loader:
+            reaction_emoji_count = posts_batch_loader.get_emoji_counts_for_post(post)
         else:
             reaction_emoji_count = request_user.get_emoji_counts_for_post_with_id(post.pk)
 
@@ -86,6 +136,9 @@ class CirclesField(Field):
         circles = []
 
         if post.creator_id == request_user.pk:
+            posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+            if posts_batch_loader:
+                posts_batch_loader.load_circles()
             circles = post.circles
 
         return self.circle_serializer(circles, many=True, context={"request": request, 'post': post}).data
@@ -108,8 +161,17 @@ class PostCreatorField(Field):
         post_creator_serializer = self.post_creator_serializer(post_creator, context={"request": request}).data
 
         if post_community:
-            try:
-                post_creator_membership = post_community.memberships.get(user_id=post_creator.pk)
+            posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+
+            if posts_batch_loader:
+                post_creator_membership = posts_batch_loader.get_creator_membership_for_post(post)
+            else:
+                try:
+                    post_creator_membership = post_community.memberships.get(user_id=post_creator.pk)
+                except CommunityMembership.DoesNotExist:
+                    post_creator_membership = None
+
+            if post_creator_membership:
                 post_creator_serializer['communities_memberships'] = [
                     self.community_membership_serializer(
                         post_creator_membership,
@@ -117,8 +179,6 @@ class PostCreatorField(Field):
                         context={
                             "request": request}).data
                 ]
-            except CommunityMembership.DoesNotExist:
-                pass
 
         return post_creator_serializer
 
@@ -136,7 +196,11 @@ class PostIsMutedField(Field):
         is_muted = False
 
         if not request_user.is_anonymous:
-            is_muted = request_user.has_muted_post_with_id(post_id=post.pk)
+            posts_batch_loader = get_posts_batch_loader_for_post(self, post)
+            if posts_batch_loader:
+                is_muted = posts_batch_loader.has_muted_post(post)
+            else:
+                is_muted = request_user.has_muted_post_with_id(post_id=post.pk)
 
         return is_muted
 
@@ -2,11 +2,21 @@ from unittest.mock import patch
 
 from rest_framework.test import APITestCase
 
+from openbook_common.utils.model_loaders import get_notification_model
+from openbook_common.utils.reference_rows import clear_reference_rows
+
 
 class OpenbookAPITestCase(APITestCase):
     def setUp(self):
         self.patcher = patch('openbook_notifications.helpers._send_notification_to_user')
         self.mock_foo = self.patcher.start()
+        self.users_patcher = patch('openbook_notifications.helpers._send_notification_to_users')
+        self.mock_send_notification_to_users = self.users_patcher.start()
+        # Reference rows loaded by a previous test could have been rolled back
+        clear_reference_rows()
+        # As the unread notifications counters of users with the same ids in previous tests
+        get_notification_model().clear_unread_counts()
 
     def tearDown(self):
         self.patcher.stop()
+        self.users_patcher.stop()
@@ -4,15 +4,21 @@ import random
 import re
 import secrets
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 import magic
 import spectra
+from PIL import Image
+from django.core.files.base import ContentFile
 from django.http import QueryDict
 from imagekit.utils import get_cache
 from imagekit.models import ProcessedImageField
+from pilkit.processors import ResizeToFit
+from pilkit.utils import save_image
 import hashlib
 
-from openbook_common.utils.model_loaders import get_post_model
+from openbook_common.utils.model_loaders import get_post_model, get_media_blob_model
 from openbook_common.validators import is_valid_hex_color
 
 r = lambda: secrets.randbelow(255)
@@ -65,6 +71,12 @@ def delete_file_field(filefield):
     if not filefield:
         return
 
+    MediaBlob = get_media_blob_model()
+
+    if not MediaBlob.release_blob_with_name(name=filefield.name):
+        # Other fields store the same content, see MediaBlob
+        return
+
     try:
         file = filefield.file
 
@@ -92,6 +104,23 @@ def sha256sum(filename=None, file=None):
         raise Exception('file or filename are required')
 
 
+def write_file_to_disk_with_sha256sum(file):
+    """
+    Streams the file to a temp file keeping its extension, computing its sha256sum on the way. Returns the path of
+    the temp file and the sha256sum.
+    """
+    h = hashlib.sha256()
+    tmp_file_descriptor, tmp_file_path = tempfile.mkstemp(suffix=os.path.splitext(file.name)[1])
+
+    with open(tmp_file_descriptor, 'wb') as tmp_file:
+        for chunk in file.chunks():
+            h.update(chunk)
+            tmp_file.write(chunk)
+
+    file.seek(0)
+    return tmp_file_path, h.hexdigest()
+
+
 def _sha256sum(file):
     h = hashlib.sha256()
     b = bytearray(128 * 1024)
@@ -102,6 +131,49 @@ def _sha256sum(file):
     return h.hexdigest()
 
 
+def make_image_derivatives(file, derivatives):
+    """
+    Decodes the image file once and makes a JPEG of it for each (max_width, quality) derivative, resized like the
+    ResizeToFit processor without upscaling. Returns a (content_file, width, height) tuple per derivative.
+    """
+    image = Image.open(file)
+    max_width = max(width for width, quality in derivatives)
+
+    if image.format == 'JPEG' and image.width > max_width:
+        # Let the decoder scale large images down, it never goes below the requested size
+        image.draft('RGB', (max_width, max(1, image.height * max_width // image.width)))
+
+    image.load()
+
+    resized_images = {}
+    # Resize from the closest bigger derivative rather than from the full image
+    resized_image = image
+
+    for width in sorted(set(width for width, quality in derivatives), reverse=True):
+        resized_image = ResizeToFit(width=width, upscale=False).process(resized_image)
+        resized_images[width] = resized_image
+
+    file.seek(0)
+
+    image_derivatives = []
+
+    for width, quality in derivatives:
+        resized_image = resized_images[width]
+        output = BytesIO()
+        save_image(resized_image, output, 'JPEG', options={'quality': quality})
+        image_derivatives.append((ContentFile(output.getvalue()), resized_image.width, resized_image.height))
+
+    return image_derivatives
+
+
+def save_files_concurrently(files):
+    """
+    Saves each (storage, name, content) file in its own thread. Returns the names they were saved with.
+    """
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        return list(executor.map(lambda file: file[0].save(file[1], file[2]), files))
+
+
 def get_post_id_for_post_uuid(post_uuid):
     Post = get_post_model()
     return Post.get_post_id_for_post_with_uuid(post_uuid=post_uuid)
@@ -37,10 +37,22 @@ def get_profile_posts_community_exclusion_model():
     return apps.get_model('openbook_posts.ProfilePostsCommunityExclusion')
 
 
+def get_timeline_entry_model():
+    return apps.get_model('openbook_posts.TimelineEntry')
+
+
 def get_post_media_model():
     return apps.get_model('openbook_posts.PostMedia')
 
 
+def get_post_media_upload_model():
+    return apps.get_model('openbook_posts.PostMediaUpload')
+
+
+def get_post_image_model():
+    return apps.get_model('openbook_posts.PostImage')
+
+
 def get_proxy_blacklist_domain_model():
     return apps.get_model('openbook_common.ProxyBlacklistedDomain')
 
@@ -101,6 +113,14 @@ def get_emoji_model():
     return apps.get_model('openbook_common.Emoji')
 
 
+def get_media_blob_model():
+    return apps.get_model('openbook_common.MediaBlob')
+
+
+def get_blocked_media_hash_model():
+    return apps.get_model('openbook_common.BlockedMediaHash')
+
+
 def get_emoji_group_model():
     return apps.get_model('openbook_common.EmojiGroup')
 
@@ -121,6 +141,10 @@ def get_hashtag_model():
     return apps.get_model('openbook_hashtags.Hashtag')
 
 
+def get_hashtag_stats_model():
+    return apps.get_model('openbook_hashtags.HashtagStats')
+
+
 def get_category_model():
     return apps.get_model('openbook_categories.Category')
 
@@ -215,3 +239,7 @@ def get_moderation_category_model():
 
 def get_moderation_penalty_model():
     return apps.get_model('openbook_moderation.ModerationPenalty')
+
+
+def get_search_token_model():
+    return apps.get_model('openbook_search.SearchToken')
@@ -0,0 +1,57 @@
+"""
+A process wide cache of reference rows, rows read on most requests which (almost) never change, like the world
+circle or the reaction emoji groups.
+
+Reference rows are registered with a loader and loaded lazily on their first use. They are reloaded once
+REFERENCE_ROWS_CACHE_TIMEOUT seconds old and, within the process, whenever a model instance that invalidates
+them is saved or deleted. If the loader raises, nothing is cached and the exception propagates, so a missing
+row is looked up again on the next use.
+"""
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+
+_loaders = {}
+_rows = {}
+
+
+def register_reference_row(name, loader, invalidated_by=()):
+    """
+    Registers the reference row with the given name. The loader is called with the arguments given to
+    get_reference_row, so a name can stand for a family of rows, e.g. languages by code.
+    """
+    _loaders[name] = loader
+
+    def invalidate_reference_row(sender, **kwargs):
+        clear_reference_rows(name=name)
+
+    for model in invalidated_by:
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_reference_row, sender=model, weak=False,
+                           dispatch_uid='reference-row-%s-%s' % (name, model.__name__))
+
+
+def get_reference_row(name, *args):
+    row_key = (name,) + args
+
+    cached_row = _rows.get(row_key)
+
+    if cached_row is not None:
+        row, loaded_at = cached_row
+        if time.monotonic() - loaded_at < settings.REFERENCE_ROWS_CACHE_TIMEOUT:
+            return row
+
+    row = _loaders[name](*args)
+    _rows[row_key] = (row, time.monotonic())
+
+    return row
+
+
+def clear_reference_rows(name=None):
+    if name is None:
+        _rows.clear()
+        return
+
+    for row_key in [row_key for row_key in list(_rows.keys()) if row_key[0] == name]:
+        _rows.pop(row_key, None)
@@ -43,7 +43,7 @@ class EmojiGroups(APIView):
 
     def get(self, request):
         EmojiGroup = get_emoji_group_model()
-        emoji_groups = EmojiGroup.objects.filter(is_reaction_group=False).all().order_by('order')
+        emoji_groups = EmojiGroup.get_emoji_groups(is_reaction_group=False)
         serializer = CommonEmojiGroupSerializer(emoji_groups, many=True, context={'request': request})
 
         return Response(serializer.data, status=status.HTTP_200_OK)
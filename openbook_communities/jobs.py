@@ -0,0 +1,18 @@
+from django_rq import job
+
+from openbook_common.utils.model_loaders import get_community_model
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@job('low')
+def curate_trending_communities():
+    """
+    This job should be scheduled to refresh the trending scores of the communities as they get members and posts
+    """
+    Community = get_community_model()
+
+    total_rescored_communities = Community.refresh_trending_scores()
+
+    return 'Rescored: %d' % total_rescored_communities
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_common.utils.model_loaders import get_community_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the members counts of the communities'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='The amount of communities to repair at once')
+
+    def handle(self, *args, **options):
+        Community = get_community_model()
+
+        batch_size = options['batch_size']
+        total_repaired_communities = 0
+        last_id = 0
+
+        while True:
+            communities_ids = list(
+                Community.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+
+            if not communities_ids:
+                break
+
+            total_repaired_communities += Community.repair_members_counts_for_communities_with_ids(
+                communities_ids=communities_ids)
+            last_id = communities_ids[-1]
+
+        logger.info('Repaired members counts of %d communities' % total_repaired_communities)
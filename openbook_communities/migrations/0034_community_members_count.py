@@ -0,0 +1,50 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, F
+from django.db.models.functions import Coalesce
+
+
+def forwards_func(apps, schema_editor):
+    # We get the model from the versioned app registry;
+    # if we directly import it, it'll be the wrong version
+    Community = apps.get_model('openbook_communities', 'Community')
+    CommunityMembership = apps.get_model('openbook_communities', 'CommunityMembership')
+    db_alias = schema_editor.connection.alias
+
+    members_count = CommunityMembership.objects.using(db_alias).filter(community_id=OuterRef('pk')).values(
+        'community_id').annotate(count=Count('id')).order_by().values('count')
+
+    Community.objects.using(db_alias).update(members_count=Coalesce(Subquery(members_count), 0))
+    # Rank the trending communities by their members until the curate_trending_communities job runs
+    Community.objects.using(db_alias).update(trending_score=F('members_count'))
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_communities', '0033_auto_20191209_1337'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='members_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='members count'),
+        ),
+        migrations.AddField(
+            model_name='community',
+            name='trending_score',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='trending score'),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['type', 'is_deleted', 'members_count'], name='openbook_co_type_fe62be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['type', 'is_deleted', 'trending_score'], name='openbook_co_type_19b0ce_idx'),
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,12 @@
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
+from django.db import models, transaction
 
 # Create your models here.
 from django.utils import timezone
 from django.db.models import Q
-from django.db.models import Count
+from django.db.models import Count, F
+from django.db.models.functions import Length
 from pilkit.processors import ResizeToFill, ResizeToFit
 
 from openbook.settings import COLOR_ATTR_MAX_LENGTH
@@ -15,13 +16,15 @@ from django.utils.translation import ugettext_lazy as _
 from openbook_common.utils.model_loaders import get_community_invite_model, \
     get_community_log_model, get_category_model, get_user_model, get_moderated_object_model, \
     get_community_notifications_subscription_model, get_community_new_post_notification_model, \
-    get_community_invite_notification_model
+    get_community_invite_notification_model, get_notification_model
 from openbook_common.validators import hex_color_validator
 from openbook_communities.helpers import upload_to_community_avatar_directory, upload_to_community_cover_directory
 from openbook_communities.queries import make_search_communities_query_for_user, \
     make_search_joined_communities_query_for_user, make_get_joined_communities_query_for_user
 from openbook_communities.validators import community_name_characters_validator
 from openbook_moderation.models import ModeratedObject, ModerationCategory
+from openbook_search.queries import is_search_index_engine_enabled, make_communities_search_index_query, \
+    make_search_rank_expression
 from openbook_posts.models import Post
 from imagekit.models import ProcessedImageField
 
@@ -66,9 +69,20 @@ class Community(models.Model):
         _('is deleted'),
         default=False,
     )
+    # Maintained counter, see update_members_count_for_community_with_id
+    members_count = models.PositiveIntegerField(_('members count'), default=0, editable=False)
+    # Refreshed by the curate_trending_communities job, see refresh_trending_scores
+    trending_score = models.PositiveIntegerField(_('trending score'), default=0, editable=False)
+
+    TRENDING_MEMBER_SCORE = 1
+    TRENDING_RECENT_POST_SCORE = 5
 
     class Meta:
         verbose_name_plural = 'communities'
+        indexes = [
+            models.Index(fields=['type', 'is_deleted', 'members_count']),
+            models.Index(fields=['type', 'is_deleted', 'trending_score']),
+        ]
 
     @classmethod
     def is_user_with_username_invited_to_community_with_name(cls, username, community_name):
@@ -85,22 +99,59 @@ class Community(models.Model):
 
     @classmethod
     def is_user_with_username_member_of_community_with_name(cls, username, community_name):
+        is_member = cls._has_user_with_username_community_role(username=username, community_name=community_name,
+                                                               role=User.COMMUNITY_ROLE_MEMBER)
+        if is_member is not None:
+            return is_member
+
         return cls.objects.filter(name=community_name, memberships__user__username=username).exists()
 
     @classmethod
     def is_user_with_username_administrator_of_community_with_name(cls, username, community_name):
+        is_administrator = cls._has_user_with_username_community_role(username=username,
+                                                                      community_name=community_name,
+                                                                      role=User.COMMUNITY_ROLE_ADMINISTRATOR)
+        if is_administrator is not None:
+            return is_administrator
+
         return cls.objects.filter(name=community_name, memberships__user__username=username,
                                   memberships__is_administrator=True).exists()
 
     @classmethod
     def is_user_with_username_moderator_of_community_with_name(cls, username, community_name):
+        is_moderator = cls._has_user_with_username_community_role(username=username, community_name=community_name,
+                                                                  role=User.COMMUNITY_ROLE_MODERATOR)
+        if is_moderator is not None:
+            return is_moderator
+
         return cls.objects.filter(name=community_name, memberships__user__username=username,
                                   memberships__is_moderator=True).exists()
 
     @classmethod
     def is_user_with_username_banned_from_community_with_name(cls, username, community_name):
+        is_banned = cls._has_user_with_username_community_role(username=username, community_name=community_name,
+                                                               role=User.COMMUNITY_ROLE_BANNED)
+        if is_banned is not None:
+            return is_banned
+
         return cls.objects.filter(name=community_name, banned_users__username=username).exists()
 
+    @classmethod
+    def _has_user_with_username_community_role(cls, username, community_name, role):
+        """
+        Whether the user has the role in the community according to its cached communities memberships,
+        None if the cache is disabled
+        """
+        if not settings.COMMUNITIES_MEMBERSHIPS_CACHE_ENABLED:
+            return None
+
+        user_id = User.objects.filter(username=username).values_list('pk', flat=True).first()
+
+        if user_id is None:
+            return False
+
+        return User.has_community_role_for_user_with_id(user_id=user_id, community_name=community_name, role=role)
+
     @classmethod
     def is_community_with_name_invites_enabled(cls, community_name):
         return cls.objects.filter(name=community_name, invites_enabled=True).exists()
@@ -122,9 +173,18 @@ class Community(models.Model):
 
     @classmethod
     def search_communities_with_query_for_user(cls, query, user, excluded_from_profile_posts=True):
-        query = make_search_communities_query_for_user(query=query, user=user,
-                                                       excluded_from_profile_posts=excluded_from_profile_posts)
-        return cls.objects.filter(query)
+        search_query = make_search_communities_query_for_user(query=query, user=user,
+                                                              excluded_from_profile_posts=excluded_from_profile_posts)
+
+        if is_search_index_engine_enabled():
+            search_query.add(make_communities_search_index_query(query=query), Q.AND)
+
+            # The best matching communities first, then the ones with the most members
+            return cls.objects.filter(search_query).annotate(
+                search_rank=make_search_rank_expression(query=query, fields=('name', 'title'))).order_by(
+                '-search_rank', '-members_count', Length('name'), 'name')
+
+        return cls.objects.filter(search_query)
 
     @classmethod
     def search_joined_communities_with_query_for_user(cls, query, user, excluded_from_profile_posts=True):
@@ -156,8 +216,82 @@ class Community(models.Model):
 
     @classmethod
     def _get_trending_communities_with_query(cls, query):
-        return cls.objects.annotate(Count('memberships')).filter(query).order_by(
-            '-memberships__count', '-created')
+        return cls.objects.filter(query).order_by('-trending_score', '-members_count', '-created')
+
+    @classmethod
+    def refresh_trending_scores(cls):
+        """
+        Scores the public communities by their members and the posts published in them in the trending window.
+        Returns the amount of communities which score changed.
+        """
+        trending_communities_query = cls._make_trending_communities_query()
+
+        recent_posts_query = Q(community__type=cls.COMMUNITY_TYPE_PUBLIC, community__is_deleted=False,
+                               status=Post.STATUS_PUBLISHED, is_deleted=False)
+        recent_posts_query.add(Q(created__gte=timezone.now() - cls.get_trending_recent_posts_window()), Q.AND)
+
+        recent_posts_counts = dict(
+            Post.objects.filter(recent_posts_query).values('community_id').annotate(count=Count('id')).order_by(
+            ).values_list('community_id', 'count'))
+
+        changed_communities = []
+
+        for community in cls.objects.filter(trending_communities_query).only('id', 'members_count',
+                                                                            'trending_score').iterator():
+            trending_score = community.members_count * cls.TRENDING_MEMBER_SCORE + \
+                             recent_posts_counts.get(community.pk, 0) * cls.TRENDING_RECENT_POST_SCORE
+
+            if trending_score != community.trending_score:
+                community.trending_score = trending_score
+                changed_communities.append(community)
+
+        cls.objects.bulk_update(changed_communities, ['trending_score'], batch_size=1000)
+
+        # Communities which became private or were deleted are no longer trending
+        untrended_communities_count = cls.objects.filter(trending_score__gt=0).exclude(
+            trending_communities_query).update(trending_score=0)
+
+        return len(changed_communities) + untrended_communities_count
+
+    @classmethod
+    def get_trending_recent_posts_window(cls):
+        return timezone.timedelta(days=7)
+
+    @classmethod
+    def update_members_count_for_community_with_id(cls, community_id, delta):
+        members_count_query = Q(pk=community_id)
+
+        if delta < 0:
+            # Never go below zero, drift is fixed by the repair_communities_members_counts command
+            members_count_query.add(Q(members_count__gte=-delta), Q.AND)
+
+        cls.objects.filter(members_count_query).update(members_count=F('members_count') + delta)
+
+    @classmethod
+    def repair_members_counts_for_communities_with_ids(cls, communities_ids):
+        """
+        Recomputes the members counts of the given communities.
+        Returns the amount of communities which members count had drifted.
+        """
+        total_repaired_communities = 0
+
+        with transaction.atomic():
+            # Lock the communities first so no counter update happens between counting and writing
+            communities = list(cls.objects.select_for_update().only('id', 'members_count').filter(
+                pk__in=communities_ids))
+
+            members_counts = dict(
+                CommunityMembership.objects.filter(community_id__in=communities_ids).values(
+                    'community_id').annotate(count=Count('id')).order_by().values_list('community_id', 'count'))
+
+            for community in communities:
+                members_count = members_counts.get(community.pk, 0)
+
+                if community.members_count != members_count:
+                    cls.objects.filter(pk=community.pk).update(members_count=members_count)
+                    total_repaired_communities += 1
+
+        return total_repaired_communities
 
     @classmethod
     def _make_trending_communities_query(cls, category_name=None):
@@ -303,10 +437,6 @@ class Community(models.Model):
         community_banned_users_query.add(Q(profile__name__icontains=query), Q.OR)
         return community.banned_users.filter(community_banned_users_query)
 
-    @property
-    def members_count(self):
-        return self.memberships.all().count()
-
     def get_staff_members(self):
         User = get_user_model()
         staff_members_query = Q(communities_memberships__community_id=self.pk)
@@ -321,8 +451,10 @@ class Community(models.Model):
                user_adjective=None,
                users_adjective=None, rules=None, categories_names=None, invites_enabled=None):
 
-        if name:
+        if name and name.lower() != self.name:
             self.name = name.lower()
+            # The communities memberships of the users are cached by community name
+            self._clear_communities_memberships_of_users()
 
         if title:
             self.title = title
@@ -351,30 +483,36 @@ class Community(models.Model):
         if categories_names is not None:
             self.set_categories_with_names(categories_names=categories_names)
 
-        self.save()
+        # The counters are updated atomically elsewhere, dont overwrite them with the instance values
+        self.save(update_fields=['name', 'title', 'type', 'color', 'description', 'rules', 'user_adjective',
+                                 'users_adjective', 'invites_enabled'])
 
     def add_moderator(self, user):
         user_membership = self.memberships.get(user=user)
         user_membership.is_moderator = True
         user_membership.save()
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
         return user_membership
 
     def remove_moderator(self, user):
         user_membership = self.memberships.get(user=user)
         user_membership.is_moderator = False
         user_membership.save()
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
         return user_membership
 
     def add_administrator(self, user):
         user_membership = self.memberships.get(user=user)
         user_membership.is_administrator = True
         user_membership.save()
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
         return user_membership
 
     def remove_administrator(self, user):
         user_membership = self.memberships.get(user=user)
         user_membership.is_administrator = False
         user_membership.save()
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
         return user_membership
 
     def add_member(self, user):
@@ -383,7 +521,20 @@ class Community(models.Model):
 
     def remove_member(self, user):
         user_membership = self.memberships.get(user=user)
-        user_membership.delete()
+
+        with transaction.atomic():
+            user_membership.delete()
+            self.update_members_count_for_community_with_id(community_id=self.pk, delta=-1)
+
+        if self.members_count > 0:
+            self.members_count -= 1
+
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
+
+    def _clear_communities_memberships_of_users(self):
+        users_ids = set(self.memberships.values_list('user_id', flat=True))
+        users_ids.update(self.banned_users.values_list('id', flat=True))
+        User.clear_communities_memberships_for_users_with_ids(users_ids=users_ids)
 
     def set_categories_with_names(self, categories_names):
         self.clear_categories()
@@ -491,25 +642,28 @@ class Community(models.Model):
         return super(Community, self).save(*args, **kwargs)
 
     def delete_notifications(self):
-        # Remove all community new post notifications
+        Notification = get_notification_model()
         CommunityNewPostNotification = get_community_new_post_notification_model()
-        CommunityNewPostNotification.objects.filter(community_notifications_subscription__community_id=self.pk).delete()
-
-        # Remove all community invite notifications
         CommunityInviteNotification = get_community_invite_notification_model()
-        CommunityInviteNotification.objects.filter(community_invite__community_id=self.pk).delete()
+
+        Notification.purge_notifications(
+            notifications_query=Notification.make_notifications_query_for_content_objects(content_objects_querysets=[
+                CommunityNewPostNotification.objects.filter(
+                    community_notifications_subscription__community_id=self.pk),
+                CommunityInviteNotification.objects.filter(community_invite__community_id=self.pk),
+            ]))
 
     def soft_delete(self):
         self.is_deleted = True
         for post in self.posts.all().iterator():
             post.soft_delete()
-        self.save()
+        self.save(update_fields=['is_deleted'])
 
     def unsoft_delete(self):
         self.is_deleted = False
         for post in self.posts:
             post.unsoft_delete()
-        self.save()
+        self.save(update_fields=['is_deleted'])
 
     def count_pending_moderated_objects(self):
         ModeratedObject = get_moderated_object_model()
@@ -541,8 +695,13 @@ class CommunityMembership(models.Model):
 
     @classmethod
     def create_membership(cls, user, community, is_administrator=False, is_moderator=False):
-        membership = cls.objects.create(user=user, community=community, is_administrator=is_administrator,
-                                        is_moderator=is_moderator)
+        with transaction.atomic():
+            membership = cls.objects.create(user=user, community=community, is_administrator=is_administrator,
+                                            is_moderator=is_moderator)
+            Community.update_members_count_for_community_with_id(community_id=community.pk, delta=1)
+
+        community.members_count += 1
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
 
         return membership
 
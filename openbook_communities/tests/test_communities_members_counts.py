@@ -0,0 +1,136 @@
+from django.utils import timezone
+
+from openbook_common.tests.helpers import make_user, make_community, make_category, make_fake_post_text
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_communities.jobs import curate_trending_communities
+from openbook_communities.models import Community
+from openbook_posts.models import Post
+
+
+class CommunitiesMembersCountsTests(OpenbookAPITestCase):
+    """
+    Maintained members counts of the communities
+    """
+
+    def test_counts_creator_and_members(self):
+        """
+        should count the creator and the members joining and leaving
+        """
+        community = make_community()
+        self._assert_members_count(community=community, members_count=1)
+
+        user = make_user()
+        user.join_community_with_name(community_name=community.name)
+        make_user().join_community_with_name(community_name=community.name)
+        self._assert_members_count(community=community, members_count=3)
+
+        user.leave_community_with_name(community_name=community.name)
+        self._assert_members_count(community=community, members_count=2)
+
+    def test_uncounts_banned_members(self):
+        """
+        should stop counting the members once banned
+        """
+        creator = make_user()
+        user = make_user()
+        community = make_community(creator=creator)
+        user.join_community_with_name(community_name=community.name)
+
+        creator.ban_user_with_username_from_community_with_name(username=user.username,
+                                                                community_name=community.name)
+
+        self._assert_members_count(community=community, members_count=1)
+
+    def test_saving_community_does_not_overwrite_count(self):
+        """
+        should not overwrite the members count with the one of a stale instance
+        """
+        creator = make_user()
+        community = make_community(creator=creator)
+        stale_community = Community.objects.get(pk=community.pk)
+
+        make_user().join_community_with_name(community_name=community.name)
+        creator.update_community_with_name(community_name=stale_community.name, title='New title')
+
+        self._assert_members_count(community=community, members_count=2)
+
+        make_user().join_community_with_name(community_name=community.name)
+        stale_community.update(title='Newer title')
+
+        self._assert_members_count(community=community, members_count=3)
+        self.assertEqual(Community.objects.get(pk=community.pk).title, 'Newer title')
+
+    def test_repair_fixes_drifted_counts(self):
+        """
+        should recompute the drifted members counts of the communities
+        """
+        community = make_community()
+        other_community = make_community()
+
+        Community.objects.filter(pk=community.pk).update(members_count=7)
+
+        repaired_communities_count = Community.repair_members_counts_for_communities_with_ids(
+            communities_ids=[community.pk, other_community.pk])
+
+        self.assertEqual(repaired_communities_count, 1)
+        self._assert_members_count(community=community, members_count=1)
+        self._assert_members_count(community=other_community, members_count=1)
+
+    def _assert_members_count(self, community, members_count):
+        self.assertEqual(Community.objects.get(pk=community.pk).members_count, members_count)
+
+
+class TrendingCommunitiesScoresTests(OpenbookAPITestCase):
+    """
+    Trending scores of the communities, refreshed by the curate_trending_communities job
+    """
+
+    def test_ranks_by_members_and_recent_posts(self):
+        """
+        should rank the communities with recent posts above the ones with slightly more members
+        """
+        members_community = make_community()
+        posts_community = make_community()
+        old_posts_community = make_community()
+
+        for i in range(0, 2):
+            make_user().join_community_with_name(community_name=members_community.name)
+
+        creator = posts_community.creator
+        creator.create_community_post(community_name=posts_community.name, text=make_fake_post_text())
+
+        old_post = old_posts_community.creator.create_community_post(community_name=old_posts_community.name,
+                                                                     text=make_fake_post_text())
+        Post.objects.filter(pk=old_post.pk).update(created=timezone.now() - timezone.timedelta(days=10))
+
+        curate_trending_communities()
+
+        self.assertEqual(list(Community.get_trending_communities()),
+                         [posts_community, members_community, old_posts_community])
+
+    def test_keeps_filtering_by_category(self):
+        """
+        should only rank the communities of the given category
+        """
+        category = make_category()
+        community = make_community()
+        community.set_categories_with_names(categories_names=[category.name])
+        popular_community = make_community()
+
+        make_user().join_community_with_name(community_name=popular_community.name)
+
+        curate_trending_communities()
+
+        self.assertEqual(list(Community.get_trending_communities(category_name=category.name)), [community])
+
+    def test_unscores_private_communities(self):
+        """
+        should reset the score of the communities which are no longer public
+        """
+        community = make_community()
+
+        curate_trending_communities()
+        Community.objects.filter(pk=community.pk).update(type=Community.COMMUNITY_TYPE_PRIVATE)
+        curate_trending_communities()
+
+        self.assertEqual(Community.objects.get(pk=community.pk).trending_score, 0)
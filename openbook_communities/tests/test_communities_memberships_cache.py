@@ -0,0 +1,128 @@
+from django.test import override_settings
+
+from openbook_auth.models import User
+from openbook_common.tests.helpers import make_user, make_community
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_communities.models import Community
+
+
+@override_settings(COMMUNITIES_MEMBERSHIPS_CACHE_ENABLED=True)
+class CommunitiesMembershipsCacheTests(OpenbookAPITestCase):
+    """
+    Cached communities memberships of the users
+    """
+
+    def test_reflects_joining_and_leaving(self):
+        """
+        should tell the user is a member once joined and not once left
+        """
+        creator = self._make_user()
+        user = self._make_user()
+        community = make_community(creator=creator)
+
+        self.assertFalse(user.is_member_of_community_with_name(community_name=community.name))
+
+        user.join_community_with_name(community_name=community.name)
+        self.assertTrue(user.is_member_of_community_with_name(community_name=community.name))
+        self.assertTrue(Community.is_user_with_username_member_of_community_with_name(username=user.username,
+                                                                                      community_name=community.name))
+
+        user.leave_community_with_name(community_name=community.name)
+        self.assertFalse(user.is_member_of_community_with_name(community_name=community.name))
+
+    def test_reflects_staff_changes(self):
+        """
+        should tell the user is staff once made moderator or administrator and not once removed
+        """
+        creator = self._make_user()
+        user = self._make_user()
+        community = make_community(creator=creator)
+        user.join_community_with_name(community_name=community.name)
+
+        self.assertTrue(creator.is_staff_of_community_with_name(community_name=community.name))
+        self.assertFalse(user.is_staff_of_community_with_name(community_name=community.name))
+
+        creator.add_moderator_with_username_to_community_with_name(username=user.username,
+                                                                   community_name=community.name)
+        self.assertTrue(user.is_staff_of_community_with_name(community_name=community.name))
+        self.assertTrue(user.is_moderator_of_community_with_name(community_name=community.name))
+
+        creator.remove_moderator_with_username_from_community_with_name(username=user.username,
+                                                                        community_name=community.name)
+        self.assertFalse(user.is_staff_of_community_with_name(community_name=community.name))
+
+        creator.add_administrator_with_username_to_community_with_name(username=user.username,
+                                                                       community_name=community.name)
+        self.assertTrue(user.is_administrator_of_community_with_name(community_name=community.name))
+        self.assertTrue(Community.is_user_with_username_administrator_of_community_with_name(
+            username=user.username, community_name=community.name))
+
+    def test_reflects_bans(self):
+        """
+        should tell the user is banned once banned and not once unbanned
+        """
+        creator = self._make_user()
+        user = self._make_user()
+        community = make_community(creator=creator)
+        user.join_community_with_name(community_name=community.name)
+
+        creator.ban_user_with_username_from_community_with_name(username=user.username,
+                                                                community_name=community.name)
+        self.assertTrue(user.is_banned_from_community_with_name(community_name=community.name))
+        self.assertFalse(user.is_member_of_community_with_name(community_name=community.name))
+
+        creator.unban_user_with_username_from_community_with_name(username=user.username,
+                                                                  community_name=community.name)
+        self.assertFalse(Community.is_user_with_username_banned_from_community_with_name(
+            username=user.username, community_name=community.name))
+
+    def test_reflects_community_renames(self):
+        """
+        should tell the user is a member of the community by its new name only
+        """
+        creator = self._make_user()
+        user = self._make_user()
+        community = make_community(creator=creator)
+        old_name = community.name
+        user.join_community_with_name(community_name=old_name)
+
+        self.assertTrue(user.is_member_of_community_with_name(community_name=old_name))
+
+        creator.update_community_with_name(community_name=old_name, name='renamed%d' % community.pk)
+
+        self.assertFalse(user.is_member_of_community_with_name(community_name=old_name))
+        self.assertTrue(user.is_member_of_community_with_name(community_name='renamed%d' % community.pk))
+
+    def test_reflects_community_deletions(self):
+        """
+        should not carry the roles of a deleted community over to a new community with the same name
+        """
+        creator = self._make_user()
+        administrator = self._make_user()
+        banned_user = self._make_user()
+        new_creator = self._make_user()
+        community = make_community(creator=creator)
+        community_name = community.name
+
+        administrator.join_community_with_name(community_name=community_name)
+        creator.add_administrator_with_username_to_community_with_name(username=administrator.username,
+                                                                       community_name=community_name)
+        creator.ban_user_with_username_from_community_with_name(username=banned_user.username,
+                                                                community_name=community_name)
+
+        self.assertTrue(administrator.is_administrator_of_community_with_name(community_name=community_name))
+        self.assertTrue(banned_user.is_banned_from_community_with_name(community_name=community_name))
+
+        creator.delete_community_with_name(community_name=community_name)
+        make_community(creator=new_creator, name=community_name)
+
+        self.assertFalse(creator.is_administrator_of_community_with_name(community_name=community_name))
+        self.assertFalse(administrator.is_administrator_of_community_with_name(community_name=community_name))
+        self.assertFalse(administrator.is_member_of_community_with_name(community_name=community_name))
+        self.assertFalse(banned_user.is_banned_from_community_with_name(community_name=community_name))
+
+    def _make_user(self):
+        user = make_user()
+        # Users of previous tests could have had the same id
+        User.clear_communities_memberships_for_users_with_ids(users_ids=[user.pk])
+        return user
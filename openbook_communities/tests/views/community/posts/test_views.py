@@ -12,6 +12,7 @@ from openbook_communities.models import Community, CommunityNotificationsSubscri
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import CommunityNewPostNotification
 from openbook_posts.models import Post, PostUserMention
+from openbook_posts.jobs import notify_post_subscribers
 from openbook_notifications.models import Notification
 
 logger = logging.getLogger(__name__)
@@ -727,6 +728,7 @@ class CommunityPostsAPITest(OpenbookAPITestCase):
             'text': make_fake_post_text()
         }
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         community_notifications_subscription = CommunityNotificationsSubscription.objects.get(subscriber=user,
                                                                                               community=community)
@@ -763,6 +765,7 @@ class CommunityPostsAPITest(OpenbookAPITestCase):
             'text': make_fake_post_text()
         }
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         community_notifications_subscription = CommunityNotificationsSubscription.objects.get(subscriber=blocking_user,
                                                                                               community=community)
@@ -795,6 +798,7 @@ class CommunityPostsAPITest(OpenbookAPITestCase):
             'text': make_fake_post_text()
         }
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         community_notifications_subscription = CommunityNotificationsSubscription.objects.get(
             subscriber=community_admin,
@@ -834,6 +838,7 @@ class CommunityPostsAPITest(OpenbookAPITestCase):
             'text': make_fake_post_text()
         }
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         # notification should only be for community susbcribed to
         self.assertEqual(CommunityNewPostNotification.objects.filter(
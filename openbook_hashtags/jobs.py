@@ -0,0 +1,18 @@
+from django_rq import job
+
+from openbook_common.utils.model_loaders import get_hashtag_stats_model
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@job('low')
+def update_hashtags_stats():
+    """
+    This job should be scheduled to refresh the last day and last week posts counts of the hashtags
+    """
+    HashtagStats = get_hashtag_stats_model()
+
+    total_refreshed_hashtags = HashtagStats.refresh_recent_stats()
+
+    return 'Refreshed: %d' % total_refreshed_hashtags
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_common.utils.model_loaders import get_hashtag_model, get_hashtag_stats_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the posts counts of every hashtag'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.HASHTAGS_STATS_BATCH_SIZE,
+                            help='The amount of hashtags to rebuild at once')
+
+    def handle(self, *args, **options):
+        Hashtag = get_hashtag_model()
+        HashtagStats = get_hashtag_stats_model()
+
+        batch_size = options['batch_size']
+
+        total_rebuilt_hashtags = 0
+        last_id = 0
+
+        while True:
+            hashtags_ids = list(
+                Hashtag.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+
+            if not hashtags_ids:
+                break
+
+            total_rebuilt_hashtags += HashtagStats.rebuild_stats_for_hashtags_with_ids(hashtags_ids=hashtags_ids)
+            last_id = hashtags_ids[-1]
+
+        logger.info('Rebuilt stats of %d hashtags' % total_rebuilt_hashtags)
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_hashtags', '0002_hashtag_text_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashtagStats',
+            fields=[
+                ('hashtag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='openbook_hashtags.Hashtag')),
+                ('posts_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='posts count')),
+                ('last_day_posts_count', models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='last day posts count')),
+                ('last_week_posts_count', models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='last week posts count')),
+                ('modified', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -2,7 +2,8 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, F, Count
 from django.utils import timezone
 
 # Create your models here.
@@ -13,12 +14,13 @@ from pilkit.processors import ResizeToFit
 from openbook.storage_backends import S3PrivateMediaStorage
 from openbook_common.models import Emoji
 from openbook_common.utils.helpers import delete_file_field, get_random_pastel_color
+from openbook_common.utils.model_loaders import get_search_token_model
 from openbook_common.validators import hex_color_validator
 from openbook_communities.models import Community
 from openbook_hashtags.helpers import upload_to_hashtags_directory
 from openbook_hashtags.validators import hashtag_name_validator
 from openbook_posts.models import Post, PostComment
-from openbook_posts.queries import make_only_public_posts_query
+from openbook_posts.queries import make_only_hashtags_stats_counted_posts_query
 
 hashtag_image_storage = S3PrivateMediaStorage() if settings.IS_PRODUCTION else default_storage
 
@@ -59,16 +61,61 @@ class Hashtag(models.Model):
         return tag
 
     @classmethod
-    def get_or_create_hashtag(cls, name, post=None):
-        try:
-            hashtag = cls.objects.get(name=name)
-        except cls.DoesNotExist:
-            hashtag = cls.create_hashtag(name=name)
+    def get_or_create_hashtags(cls, names):
+        names = set(name.lower() for name in names)
+
+        hashtags = list(cls.objects.filter(name__in=names))
+        missing_names = names.difference(hashtag.name for hashtag in hashtags)
+
+        if missing_names:
+            created = timezone.now()
+            new_hashtags = []
+
+            for name in missing_names:
+                hashtag = cls(name=name, color=get_random_pastel_color(), created=created)
+                hashtag.full_clean(validate_unique=False)
+                new_hashtags.append(hashtag)
+
+            # Another post might create the same hashtags meanwhile, fetch them back rather than trusting the result
+            cls.objects.bulk_create(new_hashtags, ignore_conflicts=True)
+            created_hashtags = list(cls.objects.filter(name__in=missing_names))
+            hashtags.extend(created_hashtags)
+
+            # bulk_create sends no post_save signals
+            SearchToken = get_search_token_model()
+            if SearchToken.is_search_index_enabled():
+                SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG,
+                                                   objects_ids=[hashtag.pk for hashtag in created_hashtags])
+
+        return hashtags
+
+    @classmethod
+    def update_media_of_hashtags_with_post(cls, post):
+        """
+        Copies the first image of the post to its hashtags without an image, reading it only once
+        """
+        if not post.is_publicly_visible():
+            return 0
+
+        hashtags = list(post.hashtags.filter(Q(image__isnull=True) | Q(image='')))
+
+        if not hashtags:
+            return 0
+
+        post_first_media_image = post.get_first_media_image()
+
+        if not post_first_media_image:
+            return 0
 
-        if post:
-            hashtag.attempt_update_media_with_post(post=post)
+        image = post_first_media_image.content_object.image
+        image_contents = image.read()
 
-        return hashtag
+        for hashtag in hashtags:
+            image_copy = ContentFile(image_contents)
+            image_copy.name = image.name
+            hashtag.image.save(image_copy.name, image_copy)
+
+        return len(hashtags)
 
     @classmethod
     def hashtag_with_name_exists(cls, hashtag_name):
@@ -89,18 +136,12 @@ class Hashtag(models.Model):
         self.delete_media()
         super(Hashtag, self).delete(*args, **kwargs)
 
-    def attempt_update_media_with_post(self, post):
-        if not self.has_image() and post and post.is_publicly_visible():
-            post_first_media_image = post.get_first_media_image()
-            if post_first_media_image:
-                image_copy = ContentFile(post_first_media_image.content_object.image.read())
-                image_copy.name = post_first_media_image.content_object.image.name
-                self.image.save(image_copy.name, image_copy)
-                self.save()
-
     def count_posts(self):
-        public_posts_query = make_only_public_posts_query()
-        return self.posts.filter(public_posts_query).count()
+        try:
+            return self.stats.posts_count
+        except HashtagStats.DoesNotExist:
+            # Not counted yet, see the rebuild_hashtags_stats command
+            return self.posts.filter(make_only_hashtags_stats_counted_posts_query()).distinct().count()
 
     def delete_media(self):
         if self.has_image():
@@ -113,3 +154,127 @@ class Hashtag(models.Model):
                 return True
 
         return False
+
+
+class HashtagStats(models.Model):
+    """
+    The amount of posts counted in the hashtags stats (see make_only_hashtags_stats_counted_posts_query) with each
+    hashtag, overall and created in the last day and week. Updated as the posts change and refreshed by the
+    update_hashtags_stats job as the days and weeks go by.
+    """
+    hashtag = models.OneToOneField(Hashtag, on_delete=models.CASCADE, related_name='stats', primary_key=True)
+    posts_count = models.PositiveIntegerField(_('posts count'), default=0, editable=False)
+    last_day_posts_count = models.PositiveIntegerField(_('last day posts count'), default=0, editable=False,
+                                                       db_index=True)
+    last_week_posts_count = models.PositiveIntegerField(_('last week posts count'), default=0, editable=False,
+                                                        db_index=True)
+    modified = models.DateTimeField(db_index=True, default=timezone.now)
+
+    COUNTERS_FIELDS = ('posts_count', 'last_day_posts_count', 'last_week_posts_count',)
+
+    @classmethod
+    def update_stats_for_hashtags_with_ids(cls, hashtags_ids, delta, posts_created):
+        """
+        Adds delta to the counters of the given hashtags for a post created at posts_created
+        """
+        if not hashtags_ids:
+            return
+
+        now = timezone.now()
+
+        cls.objects.bulk_create([cls(hashtag_id=hashtag_id, modified=now) for hashtag_id in hashtags_ids],
+                                ignore_conflicts=True)
+
+        counters_fields = ['posts_count']
+
+        if posts_created >= now - cls.get_last_week_window():
+            counters_fields.append('last_week_posts_count')
+
+            if posts_created >= now - cls.get_last_day_window():
+                counters_fields.append('last_day_posts_count')
+
+        if delta >= 0:
+            cls.objects.filter(hashtag_id__in=hashtags_ids).update(
+                modified=now, **{counter_field: F(counter_field) + delta for counter_field in counters_fields})
+            return
+
+        # Never go below zero, drift is fixed by the rebuild_hashtags_stats command. Each counter is guarded on its
+        # own so a drifted counter does not keep the others from decreasing.
+        for counter_field in counters_fields:
+            cls.objects.filter(hashtag_id__in=hashtags_ids, **{counter_field + '__gte': -delta}).update(
+                modified=now, **{counter_field: F(counter_field) + delta})
+
+    @classmethod
+    def rebuild_stats_for_hashtags_with_ids(cls, hashtags_ids):
+        """
+        Recomputes every counter of the given hashtags. Returns the amount of hashtags which stats had drifted.
+        """
+        return cls._rebuild_counters_for_hashtags_with_ids(hashtags_ids=hashtags_ids,
+                                                           counters_fields=cls.COUNTERS_FIELDS)
+
+    @classmethod
+    def refresh_recent_stats(cls):
+        """
+        Recomputes the last day and last week counters, which decrease as time goes by, only looking at the posts of
+        the last week. Returns the amount of refreshed hashtags.
+        """
+        last_week = timezone.now() - cls.get_last_week_window()
+
+        recent_hashtags_ids = set(cls.objects.filter(last_week_posts_count__gt=0).values_list('hashtag_id', flat=True))
+        recent_hashtags_ids.update(Post.hashtags.through.objects.filter(post__created__gte=last_week).values_list(
+            'hashtag_id', flat=True).distinct())
+
+        recent_hashtags_ids = sorted(recent_hashtags_ids)
+        batch_size = settings.HASHTAGS_STATS_BATCH_SIZE
+        total_refreshed_hashtags = 0
+
+        for i in range(0, len(recent_hashtags_ids), batch_size):
+            total_refreshed_hashtags += cls._rebuild_counters_for_hashtags_with_ids(
+                hashtags_ids=recent_hashtags_ids[i:i + batch_size],
+                counters_fields=('last_day_posts_count', 'last_week_posts_count',))
+
+        return total_refreshed_hashtags
+
+    @classmethod
+    def get_last_day_window(cls):
+        return timezone.timedelta(hours=24)
+
+    @classmethod
+    def get_last_week_window(cls):
+        return timezone.timedelta(days=7)
+
+    @classmethod
+    def _rebuild_counters_for_hashtags_with_ids(cls, hashtags_ids, counters_fields):
+        total_rebuilt_hashtags = 0
+        now = timezone.now()
+
+        counted_posts_query = make_only_hashtags_stats_counted_posts_query()
+
+        if 'posts_count' not in counters_fields:
+            counted_posts_query.add(Q(created__gte=now - cls.get_last_week_window()), Q.AND)
+
+        counts_queryset = Post.objects.filter(counted_posts_query, hashtags__id__in=hashtags_ids).values(
+            'hashtags__id').annotate(
+            posts_count=Count('id', distinct=True),
+            last_day_posts_count=Count('id', distinct=True, filter=Q(created__gte=now - cls.get_last_day_window())),
+            last_week_posts_count=Count('id', distinct=True, filter=Q(created__gte=now - cls.get_last_week_window()))
+        ).order_by().values_list('hashtags__id', *counters_fields)
+
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(hashtag_id=hashtag_id, modified=now) for hashtag_id in hashtags_ids],
+                                    ignore_conflicts=True)
+
+            # Lock the stats first so no update happens between counting and writing
+            hashtags_stats = list(cls.objects.select_for_update().filter(hashtag_id__in=hashtags_ids))
+
+            counts = {hashtag_counts[0]: hashtag_counts[1:] for hashtag_counts in counts_queryset}
+
+            for hashtag_stats in hashtags_stats:
+                counters = counts.get(hashtag_stats.hashtag_id, (0,) * len(counters_fields))
+
+                if counters != tuple(getattr(hashtag_stats, field_name) for field_name in counters_fields):
+                    cls.objects.filter(pk=hashtag_stats.pk).update(modified=now,
+                                                                   **dict(zip(counters_fields, counters)))
+                    total_rebuilt_hashtags += 1
+
+        return total_rebuilt_hashtags
@@ -28,3 +28,11 @@ def make_get_hashtag_with_name_for_user_with_id_query(hashtag_name, user_id):
     query.add(make_exclude_reported_and_approved_hashtags_query(), Q.AND)
     query.add(make_exclude_reported_hashtags_by_user_with_id_query(user_id=user_id), Q.AND)
     return query
+
+
+def make_get_trending_hashtags_for_user_with_id_query(user_id):
+    # Only retrieve hashtags used in the last week
+    query = Q(stats__last_week_posts_count__gt=0)
+    query.add(make_exclude_reported_and_approved_hashtags_query(), Q.AND)
+    query.add(make_exclude_reported_hashtags_by_user_with_id_query(user_id=user_id), Q.AND)
+    return query
@@ -0,0 +1,189 @@
+from django.utils import timezone
+
+from openbook_common.tests.helpers import make_user, make_hashtag, make_fake_post_text, make_circle, \
+    make_moderation_category, make_global_moderator
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_hashtags.jobs import update_hashtags_stats
+from openbook_hashtags.models import HashtagStats
+from openbook_moderation.models import ModeratedObject
+from openbook_posts.models import Post
+
+
+class HashtagStatsTests(OpenbookAPITestCase):
+    """
+    Maintained posts counts of the hashtags
+    """
+
+    def test_counts_public_posts(self):
+        """
+        should count the published public posts with the hashtag
+        """
+        hashtag = make_hashtag()
+
+        for i in range(0, 2):
+            user = make_user()
+            user.create_public_post(text='#%s' % hashtag.name)
+
+        user = make_user()
+        circle = make_circle(creator=user)
+        user.create_encircled_post(text='#%s' % hashtag.name, circles_ids=[circle.pk])
+        user.create_public_post(text='#%s' % hashtag.name, is_draft=True)
+
+        self._assert_stats(hashtag=hashtag, posts_count=2, last_day_posts_count=2, last_week_posts_count=2)
+        self.assertEqual(hashtag.count_posts(), 2)
+
+    def test_counts_published_draft(self):
+        """
+        should count a draft post once published
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name, is_draft=True)
+        user.publish_post(post=post)
+
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_updates_counts_on_edit(self):
+        """
+        should move the post count to the new hashtags when editing the post
+        """
+        hashtag = make_hashtag()
+        new_hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+        user.update_post(post=post, text='#%s' % new_hashtag.name)
+
+        self._assert_stats(hashtag=hashtag, posts_count=0, last_day_posts_count=0, last_week_posts_count=0)
+        self._assert_stats(hashtag=new_hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_updates_counts_on_soft_delete(self):
+        """
+        should stop counting soft deleted posts and count them again once restored
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+
+        post.soft_delete()
+        self._assert_stats(hashtag=hashtag, posts_count=0, last_day_posts_count=0, last_week_posts_count=0)
+
+        post.unsoft_delete()
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_updates_counts_on_delete(self):
+        """
+        should stop counting deleted posts
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+        user.create_public_post(text='#%s' % hashtag.name)
+
+        user.delete_post(post=post)
+
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_updates_counts_on_moderation(self):
+        """
+        should stop counting reported and approved posts and count them again once rejected
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+
+        report_category = make_moderation_category()
+        reporter = make_user()
+        reporter.report_post(post=post, category_id=report_category.pk)
+
+        moderated_object = ModeratedObject.get_or_create_moderated_object_for_post(post=post,
+                                                                                   category_id=report_category.pk)
+        global_moderator = make_global_moderator()
+        global_moderator.approve_moderated_object(moderated_object=moderated_object)
+
+        self._assert_stats(hashtag=hashtag, posts_count=0, last_day_posts_count=0, last_week_posts_count=0)
+
+        moderated_object.refresh_from_db()
+        moderated_object.reject_with_actor_with_id(actor_id=global_moderator.pk)
+
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_only_updates_recent_counts_for_recent_posts(self):
+        """
+        should leave the last day and week counts alone when uncounting a post older than them
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        old_post = user.create_public_post(text='#%s' % hashtag.name)
+        user.create_public_post(text='#%s' % hashtag.name)
+
+        Post.objects.filter(pk=old_post.pk).update(created=timezone.now() - timezone.timedelta(days=10))
+        HashtagStats.rebuild_stats_for_hashtags_with_ids(hashtags_ids=[hashtag.pk])
+        self._assert_stats(hashtag=hashtag, posts_count=2, last_day_posts_count=1, last_week_posts_count=1)
+
+        old_post = Post.objects.get(pk=old_post.pk)
+        old_post.soft_delete()
+
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def test_uncounting_never_goes_below_zero(self):
+        """
+        should keep a drifted count at zero while still decreasing the other counts when uncounting a post
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+
+        HashtagStats.objects.filter(hashtag_id=hashtag.pk).update(last_day_posts_count=0)
+
+        post.soft_delete()
+
+        self._assert_stats(hashtag=hashtag, posts_count=0, last_day_posts_count=0, last_week_posts_count=0)
+
+    def test_update_hashtags_stats_refreshes_recent_counts(self):
+        """
+        should recount the recent posts of the hashtags as time goes by
+        """
+        hashtag = make_hashtag()
+        user = make_user()
+
+        post = user.create_public_post(text='#%s' % hashtag.name)
+
+        HashtagStats.objects.filter(hashtag_id=hashtag.pk).update(last_day_posts_count=5, last_week_posts_count=5)
+        Post.objects.filter(pk=post.pk).update(created=timezone.now() - timezone.timedelta(days=2))
+
+        update_hashtags_stats()
+
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=0, last_week_posts_count=1)
+
+    def test_rebuild_stats_fixes_drifted_counts(self):
+        """
+        should recompute the drifted counts of the hashtags
+        """
+        hashtag = make_hashtag()
+        other_hashtag = make_hashtag()
+        user = make_user()
+
+        user.create_public_post(text='#%s #%s' % (hashtag.name, other_hashtag.name))
+        user.create_public_post(text=make_fake_post_text())
+
+        HashtagStats.objects.filter(hashtag_id=hashtag.pk).update(posts_count=7, last_day_posts_count=0)
+
+        rebuilt_hashtags_count = HashtagStats.rebuild_stats_for_hashtags_with_ids(
+            hashtags_ids=[hashtag.pk, other_hashtag.pk])
+
+        self.assertEqual(rebuilt_hashtags_count, 1)
+        self._assert_stats(hashtag=hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+        self._assert_stats(hashtag=other_hashtag, posts_count=1, last_day_posts_count=1, last_week_posts_count=1)
+
+    def _assert_stats(self, hashtag, posts_count, last_day_posts_count, last_week_posts_count):
+        hashtag_stats = HashtagStats.objects.get(hashtag_id=hashtag.pk)
+        self.assertEqual(
+            (hashtag_stats.posts_count, hashtag_stats.last_day_posts_count, hashtag_stats.last_week_posts_count),
+            (posts_count, last_day_posts_count, last_week_posts_count))
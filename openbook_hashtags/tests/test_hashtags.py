@@ -2,6 +2,7 @@
 import random
 
 from django.urls import reverse
+from django.utils import timezone
 from faker import Faker
 from rest_framework import status
 
@@ -12,7 +13,9 @@ from openbook_common.tests.models import OpenbookAPITestCase
 import logging
 import json
 
+from openbook_hashtags.jobs import update_hashtags_stats
 from openbook_moderation.models import ModeratedObject
+from openbook_posts.models import Post
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -130,3 +133,110 @@ class SearchHashtagsAPITests(OpenbookAPITestCase):
 
     def _get_url(self):
         return reverse('search-hashtags')
+
+    def test_search_returns_most_used_hashtags_first(self):
+        """
+        should return the hashtags with more posts first when searching and return 200
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        query = make_hashtag_name()
+
+        less_used_hashtag = make_hashtag(name=query + 'a')
+        most_used_hashtag = make_hashtag(name=query + 'b')
+
+        user.create_public_post(text='#%s' % less_used_hashtag.name)
+        for i in range(0, 2):
+            user.create_public_post(text='#%s' % most_used_hashtag.name)
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'query': query
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parsed_response = json.loads(response.content)
+        self.assertEqual([hashtag['name'] for hashtag in parsed_response],
+                         [most_used_hashtag.name, less_used_hashtag.name])
+
+
+class TrendingHashtagsAPITests(OpenbookAPITestCase):
+    """
+    TrendingHashtagsAPITests
+    """
+
+    def test_retrieves_recently_used_hashtags_by_usage(self):
+        """
+        should retrieve the hashtags used in the last week, the most used in the last day first, and return 200
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        creator = make_user()
+
+        trending_hashtag = make_hashtag()
+        for i in range(0, 2):
+            creator.create_public_post(text='#%s' % trending_hashtag.name)
+
+        less_trending_hashtag = make_hashtag()
+        creator.create_public_post(text='#%s' % less_trending_hashtag.name)
+
+        make_hashtag()
+
+        old_hashtag = make_hashtag()
+        old_post = creator.create_public_post(text='#%s' % old_hashtag.name)
+        Post.objects.filter(pk=old_post.pk).update(created=timezone.now() - timezone.timedelta(days=8))
+        update_hashtags_stats()
+
+        url = self._get_url()
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parsed_response = json.loads(response.content)
+        self.assertEqual([hashtag['name'] for hashtag in parsed_response],
+                         [trending_hashtag.name, less_trending_hashtag.name])
+        self.assertEqual(parsed_response[0]['posts_count'], 2)
+
+    def test_does_not_retrieve_reported_hashtags(self):
+        """
+        should not retrieve the hashtags reported by the user and return 200
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        hashtag = make_hashtag()
+        make_user().create_public_post(text='#%s' % hashtag.name)
+
+        report_category = make_moderation_category()
+        user.report_hashtag_with_name(hashtag_name=hashtag.name, category_id=report_category.pk)
+
+        url = self._get_url()
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parsed_response = json.loads(response.content)
+        self.assertEqual(len(parsed_response), 0)
+
+    def test_retrieves_count_hashtags(self):
+        """
+        should retrieve at most count hashtags and return 200
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        for i in range(0, 3):
+            hashtag = make_hashtag()
+            user.create_public_post(text='#%s' % hashtag.name)
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'count': 2
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parsed_response = json.loads(response.content)
+        self.assertEqual(len(parsed_response), 2)
+
+    def _get_url(self):
+        return reverse('trending-hashtags')
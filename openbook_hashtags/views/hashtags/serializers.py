@@ -8,3 +8,11 @@ class SearchHashtagsSerializer(serializers.Serializer):
         required=False,
         max_value=10
     )
+
+
+class GetTrendingHashtagsSerializer(serializers.Serializer):
+    count = serializers.IntegerField(
+        required=False,
+        max_value=20,
+        default=10
+    )
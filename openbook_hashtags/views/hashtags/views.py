@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from openbook_hashtags.views.hashtag.serializers import GetHashtagHashtagSerializer
-from openbook_hashtags.views.hashtags.serializers import SearchHashtagsSerializer
+from openbook_hashtags.views.hashtags.serializers import SearchHashtagsSerializer, GetTrendingHashtagsSerializer
 from openbook_moderation.permissions import IsNotSuspended
 
 
@@ -29,3 +29,24 @@ class SearchHashtags(APIView):
         hashtags_serializer = GetHashtagHashtagSerializer(hashtags[:count], many=True, context={'request': request})
 
         return Response(hashtags_serializer.data, status=status.HTTP_200_OK)
+
+
+class TrendingHashtags(APIView):
+    permission_classes = (IsAuthenticated, IsNotSuspended)
+
+    def get(self, request):
+        query_params = request.query_params.dict()
+        serializer = GetTrendingHashtagsSerializer(data=query_params)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+
+        count = data.get('count')
+
+        user = request.user
+
+        hashtags = user.get_trending_hashtags()
+
+        hashtags_serializer = GetHashtagHashtagSerializer(hashtags[:count], many=True, context={'request': request})
+
+        return Response(hashtags_serializer.data, status=status.HTTP_200_OK)
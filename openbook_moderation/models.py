@@ -234,9 +234,10 @@ class ModeratedObject(models.Model):
 
                 if moderation_severity == ModerationCategory.SEVERITY_CRITICAL and isinstance(content_object, Post):
                     # We have hashes
+                    content_object.block_media_hashes()
                     content_object.delete_media()
 
-        content_object.save()
+        # The content objects save their own (un)soft deletion, saving them again would write back stale counters
         self.save()
 
     def unverify_with_actor_with_id(self, actor_id):
@@ -258,7 +259,6 @@ class ModeratedObject(models.Model):
                 isinstance(content_object, User) and moderation_severity == ModerationCategory.SEVERITY_CRITICAL):
             content_object.unsoft_delete()
         self.save()
-        content_object.save()
 
     def approve_with_actor_with_id(self, actor_id):
         Post = get_post_model()
@@ -282,6 +282,10 @@ class ModeratedObject(models.Model):
             content_object.delete_outgoing_notifications()
 
         self.save()
+        User.clear_posts_visibilities()
+
+        if isinstance(content_object, Post) and current_status != ModeratedObject.STATUS_APPROVED:
+            content_object.update_hashtags_stats_for_moderation(is_approved=True)
 
     def reject_with_actor_with_id(self, actor_id):
         current_status = self.status
@@ -289,6 +293,10 @@ class ModeratedObject(models.Model):
         ModeratedObjectStatusChangedLog.create_moderated_object_status_changed_log(
             changed_from=current_status, changed_to=self.status, moderated_object_id=self.pk, actor_id=actor_id)
         self.save()
+        User.clear_posts_visibilities()
+
+        if self.object_type == ModeratedObject.OBJECT_TYPE_POST and current_status == ModeratedObject.STATUS_APPROVED:
+            self.content_object.update_hashtags_stats_for_moderation(is_approved=False)
 
     def get_reporters(self):
         return User.objects.filter(moderation_reports__moderated_object_id=self.pk).all()
@@ -46,7 +46,7 @@ class ModeratedObjectCommunitySerializer(serializers.ModelSerializer):
 
 class ModeratedObjectHashtagSerializer(serializers.ModelSerializer):
     emoji = CommonEmojiSerializer()
-    posts_count = HashtagPostsCountField(show_all=True)
+    posts_count = HashtagPostsCountField()
 
     class Meta:
         model = Hashtag
@@ -26,6 +26,7 @@ from openbook_moderation.models import ModeratedObject, ModeratedObjectDescripti
     ModeratedObjectCategoryChangedLog, ModerationPenalty, ModerationCategory, ModeratedObjectStatusChangedLog, \
     ModeratedObjectVerifiedChangedLog
 from openbook_posts.models import Post, PostComment
+from openbook_posts.jobs import notify_post_subscribers
 
 fake = Faker()
 
@@ -1005,6 +1006,7 @@ class ApproveModeratedObjectApiTests(OpenbookAPITestCase):
         # subscribe to notifications
         reporter_user.enable_new_post_notifications_for_user_with_username(username=user.username)
         post = user.create_public_post(text=make_fake_post_text())
+        notify_post_subscribers(post_id=post.pk)
 
         report_category = make_moderation_category(severity=ModerationCategory.SEVERITY_CRITICAL)
         reporter_user.report_user_with_username(username=user.username, category_id=report_category.pk)
@@ -1204,6 +1206,7 @@ class ApproveModeratedObjectApiTests(OpenbookAPITestCase):
         reporter_community.enable_new_post_notifications_for_community_with_name(community_name=community.name)
 
         post = community_admin.create_community_post(text=make_fake_post_text(), community_name=community.name)
+        notify_post_subscribers(post_id=post.pk)
 
         report_category = make_moderation_category()
         reporter_community.report_community(community=community,
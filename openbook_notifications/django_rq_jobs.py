@@ -1,32 +1,29 @@
-from hashlib import sha256
-import onesignal as onesignal_sdk
-from django.conf import settings
 from django_rq import job
 
-from openbook_common.utils.model_loaders import get_user_model
-
-onesignal_client = onesignal_sdk.Client(
-    app_id=settings.ONE_SIGNAL_APP_ID,
-    app_auth_key=settings.ONE_SIGNAL_API_KEY
-)
+from openbook_common.utils.model_loaders import get_user_model, get_notification_model
+from openbook_notifications.push_notifications import send_notification_to_users
 
 
 @job('default')
 def send_notification_to_user_with_id(user_id, notification):
     User = get_user_model()
-    user = User.objects.only('username', 'uuid', 'id').get(pk=user_id)
+    user = User.objects.only('username', 'uuid', 'id').prefetch_related('devices').get(pk=user_id)
+
+    send_notification_to_users(users=[user], notification=notification)
 
-    for device in user.devices.all():
-        notification.set_parameter('ios_badgeType', 'Increase')
-        notification.set_parameter('ios_badgeCount', '1')
 
-        user_id_contents = (str(user.uuid) + str(user.id)).encode('utf-8')
+@job('default')
+def send_notification_to_users_with_ids(users_ids, notification):
+    """
+    Sends the same notification to every user, in a single job
+    """
+    User = get_user_model()
+    users = User.objects.only('username', 'uuid', 'id').prefetch_related('devices').filter(pk__in=users_ids)
 
-        user_id = sha256(user_id_contents).hexdigest()
+    send_notification_to_users(users=users, notification=notification)
 
-        notification.set_filters([
-            {"field": "tag", "key": "user_id", "relation": "=", "value": user_id},
-            {"field": "tag", "key": "device_uuid", "relation": "=", "value": device.uuid},
-        ])
 
-        onesignal_client.send_notification(notification)
+@job('low')
+def purge_notifications_with_ids(notifications_ids):
+    Notification = get_notification_model()
+    Notification.delete_notifications_with_ids(notifications_ids=notifications_ids)
@@ -4,7 +4,8 @@ from django.utils.translation import ugettext_lazy as _
 import onesignal as onesignal_sdk
 
 from openbook_common.utils.model_loaders import get_notification_model
-from openbook_notifications.django_rq_jobs import send_notification_to_user_with_id
+from openbook_notifications.django_rq_jobs import send_notification_to_user_with_id, \
+    send_notification_to_users_with_ids
 from openbook_translation import translation_strategy
 
 import logging
@@ -264,6 +265,80 @@ def send_post_user_mention_push_notification(post_user_mention):
     _send_notification_to_user(notification=one_signal_notification, user=mentioned_user)
 
 
+def send_post_comment_user_mention_push_notifications(post_comment, post_comment_user_mentions):
+    """
+    Batched send_post_comment_user_mention_push_notification for mentions in the same post comment, with one
+    notification per language of the mentioned users.
+    """
+    Notification = get_notification_model()
+
+    mentioner = post_comment.commenter
+
+    mentioned_users = [post_comment_user_mention.user for post_comment_user_mention in post_comment_user_mentions if
+                       post_comment_user_mention.user.has_post_comment_mention_notifications_enabled()]
+
+    for mentioned_users_language_code, language_mentioned_users in _group_users_by_notification_language_code(
+            mentioned_users).items():
+        with translation.override(mentioned_users_language_code):
+            one_signal_notification = onesignal_sdk.Notification(post_body={
+                "contents": {
+                    "en": _(
+                        '%(mentioner_name)s · @%(mentioner_username)s mentioned you in a comment.') % {
+                              'mentioner_name': mentioner.profile.name,
+                              'mentioner_username': mentioner.username,
+                          }}
+            })
+
+        notification_data = {
+            'type': Notification.POST_COMMENT_USER_MENTION,
+        }
+
+        notification_group = NOTIFICATION_GROUP_MEDIUM_PRIORITY
+
+        one_signal_notification.set_parameter('data', notification_data)
+        one_signal_notification.set_parameter('!thread_id', notification_group)
+        one_signal_notification.set_parameter('android_group', notification_group)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_mentioned_users)
+
+
+def send_post_user_mention_push_notifications(post, post_user_mentions):
+    """
+    Batched send_post_user_mention_push_notification for mentions in the same post, with one notification per
+    language of the mentioned users.
+    """
+    Notification = get_notification_model()
+
+    mentioner = post.creator
+
+    mentioned_users = [post_user_mention.user for post_user_mention in post_user_mentions if
+                       post_user_mention.user.has_post_mention_notifications_enabled()]
+
+    for mentioned_users_language_code, language_mentioned_users in _group_users_by_notification_language_code(
+            mentioned_users).items():
+        with translation.override(mentioned_users_language_code):
+            one_signal_notification = onesignal_sdk.Notification(post_body={
+                "contents": {
+                    "en": _(
+                        '%(mentioner_name)s · @%(mentioner_username)s mentioned you in a post.') % {
+                              'mentioner_name': mentioner.profile.name,
+                              'mentioner_username': mentioner.username,
+                          }}
+            })
+
+        notification_data = {
+            'type': Notification.POST_USER_MENTION,
+        }
+
+        notification_group = NOTIFICATION_GROUP_MEDIUM_PRIORITY
+
+        one_signal_notification.set_parameter('data', notification_data)
+        one_signal_notification.set_parameter('!thread_id', notification_group)
+        one_signal_notification.set_parameter('android_group', notification_group)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_mentioned_users)
+
+
 def send_community_invite_push_notification(community_invite):
     invited_user = community_invite.invited_user
 
@@ -347,6 +422,78 @@ def send_user_new_post_push_notification(user_notifications_subscription, post):
         _send_notification_to_user(notification=one_signal_notification, user=target_user)
 
 
+def send_community_new_post_push_notifications(community, community_notifications_subscriptions):
+    """
+    Batched send_community_new_post_push_notification for subscriptions of the community, with one notification
+    per language of the subscribers.
+    """
+    Notification = get_notification_model()
+
+    target_users = [subscription.subscriber for subscription in community_notifications_subscriptions if
+                    subscription.subscriber.has_community_new_post_notifications_enabled()]
+
+    for target_users_language_code, language_target_users in _group_users_by_notification_language_code(
+            target_users).items():
+        with translation.override(target_users_language_code):
+            one_signal_notification = onesignal_sdk.Notification(
+                post_body={"contents": {"en": _('A new post was posted in c/%(community_name)s.') % {
+                    'community_name': community.name,
+                }}})
+
+        notification_data = {
+            'type': Notification.COMMUNITY_NEW_POST,
+        }
+
+        notification_group = NOTIFICATION_GROUP_HIGH_PRIORITY
+
+        one_signal_notification.set_parameter('data', notification_data)
+        one_signal_notification.set_parameter('!thread_id', notification_group)
+        one_signal_notification.set_parameter('android_group', notification_group)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_target_users)
+
+
+def send_user_new_post_push_notifications(post, user_notifications_subscriptions):
+    """
+    Batched send_user_new_post_push_notification for subscriptions to the post creator, with one notification
+    per language of the subscribers.
+    """
+    Notification = get_notification_model()
+
+    post_creator_name = post.creator.profile.name
+    post_creator_username = post.creator.username
+
+    target_users = [subscription.subscriber for subscription in user_notifications_subscriptions if
+                    subscription.subscriber.has_user_new_post_notifications_enabled()]
+
+    for target_users_language_code, language_target_users in _group_users_by_notification_language_code(
+            target_users).items():
+        with translation.override(target_users_language_code):
+            one_signal_notification = onesignal_sdk.Notification(
+                post_body={
+                    "contents": {"en": _('%(post_creator_name)s · @%(post_creator_username)s posted something.') % {
+                        'post_creator_username': post_creator_username,
+                        'post_creator_name': post_creator_name,
+                    }}})
+
+        notification_data = {
+            'type': Notification.USER_NEW_POST,
+        }
+        one_signal_notification.set_parameter('data', notification_data)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_target_users)
+
+
+def _group_users_by_notification_language_code(users):
+    users_by_language_code = {}
+
+    for user in users:
+        language_code = get_notification_language_code_for_target_user(user)
+        users_by_language_code.setdefault(language_code, []).append(user)
+
+    return users_by_language_code
+
+
 def get_notification_language_code_for_target_user(target_user):
     if target_user.language and translation.check_for_language(target_user.language.code):
         return target_user.language.code
@@ -356,3 +503,7 @@ def get_notification_language_code_for_target_user(target_user):
 
 def _send_notification_to_user(user, notification):
     send_notification_to_user_with_id.delay(user_id=user.pk, notification=notification)
+
+
+def _send_notification_to_users(users, notification):
+    send_notification_to_users_with_ids.delay(users_ids=[user.pk for user in users], notification=notification)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+import logging
+
+from openbook_common.utils.model_loaders import get_notification_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Counts again the unread notifications of the users with maintained unread notifications counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='The amount of users to reconcile at once')
+
+    def handle(self, *args, **options):
+        Notification = get_notification_model()
+
+        batch_size = options['batch_size']
+        unread_counts_keys_prefix = Notification.UNREAD_COUNTS_KEY.replace('%d', '')
+
+        owners_ids = []
+        total_reconciled = 0
+
+        for unread_counts_key in get_redis_connection().scan_iter(match=unread_counts_keys_prefix + '*',
+                                                                  count=batch_size):
+            owners_ids.append(int(unread_counts_key.decode()[len(unread_counts_keys_prefix):]))
+
+            if len(owners_ids) == batch_size:
+                total_reconciled += len(Notification.reconcile_unread_counts_for_owners_with_ids(owners_ids=owners_ids))
+                owners_ids = []
+
+        if owners_ids:
+            total_reconciled += len(Notification.reconcile_unread_counts_for_owners_with_ids(owners_ids=owners_ids))
+
+        logger.info('Reconciled unread notifications counters of %d users' % total_reconciled)
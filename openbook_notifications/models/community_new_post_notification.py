@@ -1,5 +1,5 @@
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
+from django.db import models, transaction
 from openbook_communities.models import CommunityNotificationsSubscription
 from openbook_notifications.models.notification import Notification
 from openbook_posts.models import Post
@@ -20,6 +20,38 @@ class CommunityNewPostNotification(models.Model):
                                          owner_id=owner_id)
         return community_new_post_notification
 
+    @classmethod
+    def create_community_new_post_notifications(cls, post_id, subscriptions):
+        """
+        Bulk creates the notifications of the post for the subscriptions not notified of it yet.
+        Returns these subscriptions.
+        """
+        # The notifications and their content objects are created together or not at all
+        with transaction.atomic():
+            notified_subscriptions_ids = set(cls.objects.filter(
+                post_id=post_id,
+                community_notifications_subscription__in=subscriptions
+            ).values_list('community_notifications_subscription_id', flat=True))
+
+            subscriptions = [subscription for subscription in subscriptions if
+                             subscription.pk not in notified_subscriptions_ids]
+
+            cls.objects.bulk_create([
+                cls(post_id=post_id, community_notifications_subscription_id=subscription.pk)
+                for subscription in subscriptions
+            ])
+
+            # Not every database returns the ids of bulk created rows
+            notifications = cls.objects.filter(post_id=post_id, community_notifications_subscription__in=subscriptions)
+            subscribers_ids = {subscription.pk: subscription.subscriber_id for subscription in subscriptions}
+
+            Notification.create_notifications(type=Notification.COMMUNITY_NEW_POST, owners_ids_and_content_objects=[
+                (subscribers_ids[notification.community_notifications_subscription_id], notification)
+                for notification in notifications
+            ])
+
+        return subscriptions
+
     @classmethod
     def delete_community_new_post_notification(cls, community_notifications_subscription_id, post_id, owner_id):
         cls.objects.filter(community_notifications_subscription_id=community_notifications_subscription_id,
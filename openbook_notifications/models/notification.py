@@ -1,9 +1,18 @@
+import threading
+from contextlib import contextmanager
+
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
+from django_redis import get_redis_connection
 
 from openbook_auth.models import User
+from openbook_notifications.django_rq_jobs import purge_notifications_with_ids
 
 
 class Notification(models.Model):
@@ -54,6 +63,205 @@ class Notification(models.Model):
     def create_notification(cls, owner_id, type, content_object):
         return cls.objects.create(notification_type=type, content_object=content_object, owner_id=owner_id)
 
+    @classmethod
+    def create_notifications(cls, type, owners_ids_and_content_objects):
+        """
+        Bulk creates a notification for each (owner_id, content_object) pair, the content objects being of
+        the same model
+        """
+        if not owners_ids_and_content_objects:
+            return []
+
+        created = timezone.now()
+        content_type = ContentType.objects.get_for_model(owners_ids_and_content_objects[0][1])
+
+        notifications = cls.objects.bulk_create([
+            cls(notification_type=type, content_type=content_type, object_id=content_object.pk, owner_id=owner_id,
+                created=created) for owner_id, content_object in owners_ids_and_content_objects
+        ])
+
+        # Bulk created notifications send no post_save signals
+        unread_counts_deltas = {}
+        for owner_id, content_object in owners_ids_and_content_objects:
+            unread_counts_deltas.setdefault(owner_id, {type: 0})[type] += 1
+
+        cls.update_unread_counts_for_owners_with_ids(unread_counts_deltas=unread_counts_deltas)
+
+        return notifications
+
+    @classmethod
+    def make_notifications_query_for_content_objects(cls, content_objects_querysets):
+        """
+        Matches the notifications of the content objects of the querysets, e.g. the post reaction notifications
+        of a post, through their generic relation
+        """
+        notifications_query = Q()
+
+        for content_objects_queryset in content_objects_querysets:
+            content_type = ContentType.objects.get_for_model(content_objects_queryset.model)
+            notifications_query.add(Q(content_type=content_type,
+                                      object_id__in=content_objects_queryset.values('pk')), Q.OR)
+
+        return notifications_query
+
+    @classmethod
+    def purge_notifications(cls, notifications_query):
+        """
+        Deletes the notifications matching the query along with their content objects. More notifications
+        than fit in a batch are deleted by a low priority job once the transaction commits.
+        """
+        notifications_ids = list(cls.objects.filter(notifications_query).values_list('id', flat=True))
+
+        if len(notifications_ids) <= settings.NOTIFICATIONS_PURGE_BATCH_SIZE:
+            cls.delete_notifications_with_ids(notifications_ids=notifications_ids)
+        else:
+            transaction.on_commit(lambda: purge_notifications_with_ids.delay(notifications_ids=notifications_ids))
+
+    @classmethod
+    def delete_notifications_with_ids(cls, notifications_ids):
+        batch_size = settings.NOTIFICATIONS_PURGE_BATCH_SIZE
+
+        for i in range(0, len(notifications_ids), batch_size):
+            batch_notifications_ids = notifications_ids[i:i + batch_size]
+
+            with transaction.atomic(), cls.batch_unread_counts_updates():
+                notifications = cls.objects.filter(id__in=batch_notifications_ids)
+
+                content_objects_ids_by_content_type = {}
+                for content_type_id, object_id in notifications.values_list('content_type_id', 'object_id'):
+                    content_objects_ids_by_content_type.setdefault(content_type_id, []).append(object_id)
+
+                # Sends the post_delete signals which keep the unread counters
+                notifications.delete()
+
+                for content_type_id, content_objects_ids in content_objects_ids_by_content_type.items():
+                    content_type = ContentType.objects.get_for_id(content_type_id)
+                    content_type.model_class().objects.filter(pk__in=content_objects_ids).delete()
+
+    # Redis hash per owner with the count of unread notifications of each type and in total
+    UNREAD_COUNTS_KEY = 'ob-api-unread-notifications-counts-%d'
+    UNREAD_COUNTS_TOTAL_FIELD = 'total'
+
+    _UPDATE_UNREAD_COUNTS_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    for i = 1, #ARGV, 2 do
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+    return 1
+    """
+
+    @classmethod
+    def count_unread_for_owner_with_id(cls, owner_id, types=None):
+        unread_counts = cls.get_unread_counts_for_owner_with_id(owner_id=owner_id)
+
+        if types:
+            return sum(unread_counts.get(type, 0) for type in types)
+
+        return unread_counts[cls.UNREAD_COUNTS_TOTAL_FIELD]
+
+    @classmethod
+    def get_unread_counts_for_owner_with_id(cls, owner_id):
+        """
+        The unread notifications counts of the owner, by type and in total. Read from the maintained counters,
+        which are counted again when missing or broken.
+        """
+        redis = get_redis_connection()
+        unread_counts_key = cls.UNREAD_COUNTS_KEY % owner_id
+
+        unread_counts = {field.decode(): int(count) for field, count in redis.hgetall(unread_counts_key).items()}
+
+        if cls.UNREAD_COUNTS_TOTAL_FIELD in unread_counts and min(unread_counts.values()) >= 0:
+            return unread_counts
+
+        return cls.reconcile_unread_counts_for_owners_with_ids(owners_ids=[owner_id])[owner_id]
+
+    @classmethod
+    def reconcile_unread_counts_for_owners_with_ids(cls, owners_ids):
+        """
+        Counts the unread notifications of the owners and stores the counts as their counters
+        """
+        unread_counts_by_owner = {}
+
+        for owner_id in owners_ids:
+            unread_counts = {notification_type: 0 for notification_type in cls.get_notification_types_values()}
+            unread_counts[cls.UNREAD_COUNTS_TOTAL_FIELD] = 0
+            unread_counts_by_owner[owner_id] = unread_counts
+
+        unread_notifications_counts = cls.objects.filter(owner_id__in=owners_ids, read=False).values(
+            'owner_id', 'notification_type').annotate(count=Count('id')).order_by()
+
+        for unread_notifications_count in unread_notifications_counts:
+            unread_counts = unread_counts_by_owner[unread_notifications_count['owner_id']]
+            unread_counts[unread_notifications_count['notification_type']] = unread_notifications_count['count']
+            unread_counts[cls.UNREAD_COUNTS_TOTAL_FIELD] += unread_notifications_count['count']
+
+        pipeline = get_redis_connection().pipeline()
+
+        for owner_id, unread_counts in unread_counts_by_owner.items():
+            unread_counts_key = cls.UNREAD_COUNTS_KEY % owner_id
+            pipeline.hset(unread_counts_key, mapping=unread_counts)
+            pipeline.expire(unread_counts_key, settings.UNREAD_NOTIFICATIONS_COUNTS_TIMEOUT)
+
+        pipeline.execute()
+
+        return unread_counts_by_owner
+
+    @classmethod
+    def update_unread_counts_for_owners_with_ids(cls, unread_counts_deltas):
+        """
+        Adds the deltas, given by owner id and then notification type, to the existing counters once the
+        transaction commits, so rolled back changes are never counted. Missing counters are left to be counted on
+        their next read.
+        """
+        transaction.on_commit(lambda: cls._apply_unread_counts_deltas(unread_counts_deltas=unread_counts_deltas))
+
+    @classmethod
+    def _apply_unread_counts_deltas(cls, unread_counts_deltas):
+        redis = get_redis_connection()
+        update_unread_counts_script = redis.register_script(cls._UPDATE_UNREAD_COUNTS_SCRIPT)
+        pipeline = redis.pipeline()
+
+        for owner_id, type_deltas in unread_counts_deltas.items():
+            args = []
+            for notification_type, delta in type_deltas.items():
+                args.extend([notification_type, delta])
+            args.extend([cls.UNREAD_COUNTS_TOTAL_FIELD, sum(type_deltas.values())])
+
+            update_unread_counts_script(keys=[cls.UNREAD_COUNTS_KEY % owner_id], args=args, client=pipeline)
+
+        pipeline.execute()
+
+    @classmethod
+    @contextmanager
+    def batch_unread_counts_updates(cls):
+        """
+        Adds up the unread counts deltas of the notifications deleted within, like the ones of a mass delete, and
+        applies them at once when leaving it instead of one by one
+        """
+        if _get_batched_unread_counts_deltas() is not None:
+            # Applied by the outer batch
+            yield
+            return
+
+        unread_counts_deltas = _batched_unread_counts_deltas.deltas = {}
+
+        try:
+            yield
+        finally:
+            _batched_unread_counts_deltas.deltas = None
+
+        if unread_counts_deltas:
+            cls.update_unread_counts_for_owners_with_ids(unread_counts_deltas=unread_counts_deltas)
+
+    @classmethod
+    def clear_unread_counts(cls):
+        redis = get_redis_connection()
+
+        for unread_counts_key in redis.scan_iter(match=cls.UNREAD_COUNTS_KEY.replace('%d', '*')):
+            redis.delete(unread_counts_key)
+
     @classmethod
     def get_notification_types_values(cls):
         return [a for (a, b) in Notification.NOTIFICATION_TYPES]
@@ -64,3 +272,36 @@ class Notification(models.Model):
             self.created = timezone.now()
 
         return super(Notification, self).save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='notification_update_unread_counts_on_save')
+def notification_post_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.read:
+        Notification.update_unread_counts_for_owners_with_ids(unread_counts_deltas={
+            instance.owner_id: {instance.notification_type: 1}
+        })
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid='notification_update_unread_counts_on_delete')
+def notification_post_delete(sender, instance, **kwargs):
+    if instance.read:
+        return
+
+    # Also sent for each notification of the mass deletes, see Notification.batch_unread_counts_updates
+    unread_counts_deltas = _get_batched_unread_counts_deltas()
+
+    if unread_counts_deltas is None:
+        Notification.update_unread_counts_for_owners_with_ids(unread_counts_deltas={
+            instance.owner_id: {instance.notification_type: -1}
+        })
+        return
+
+    type_deltas = unread_counts_deltas.setdefault(instance.owner_id, {})
+    type_deltas[instance.notification_type] = type_deltas.get(instance.notification_type, 0) - 1
+
+
+_batched_unread_counts_deltas = threading.local()
+
+
+def _get_batched_unread_counts_deltas():
+    return getattr(_batched_unread_counts_deltas, 'deltas', None)
@@ -18,6 +18,25 @@ class PostCommentUserMentionNotification(models.Model):
                                          owner_id=owner_id)
         return post_comment_user_mention_notification
 
+    @classmethod
+    def create_post_comment_user_mention_notifications(cls, post_comment_user_mentions):
+        """
+        Bulk creates the notifications of the post comment user mentions
+        """
+        cls.objects.bulk_create([cls(post_comment_user_mention_id=post_comment_user_mention.pk) for
+                                 post_comment_user_mention in post_comment_user_mentions])
+
+        # Not every database returns the ids of bulk created rows
+        notifications = cls.objects.filter(post_comment_user_mention__in=post_comment_user_mentions)
+        owners_ids = {post_comment_user_mention.pk: post_comment_user_mention.user_id for
+                      post_comment_user_mention in post_comment_user_mentions}
+
+        Notification.create_notifications(type=Notification.POST_COMMENT_USER_MENTION,
+                                          owners_ids_and_content_objects=[
+                                              (owners_ids[notification.post_comment_user_mention_id], notification)
+                                              for notification in notifications
+                                          ])
+
     @classmethod
     def delete_post_comment_user_mention_notification(cls, post_comment_user_mention_id, owner_id):
         cls.objects.filter(post_comment_user_mention_id=post_comment_user_mention_id,
@@ -17,6 +17,22 @@ class PostUserMentionNotification(models.Model):
                                          owner_id=owner_id)
         return post_user_mention_notification
 
+    @classmethod
+    def create_post_user_mention_notifications(cls, post_user_mentions):
+        """
+        Bulk creates the notifications of the post user mentions
+        """
+        cls.objects.bulk_create([cls(post_user_mention_id=post_user_mention.pk) for
+                                 post_user_mention in post_user_mentions])
+
+        # Not every database returns the ids of bulk created rows
+        notifications = cls.objects.filter(post_user_mention__in=post_user_mentions)
+        owners_ids = {post_user_mention.pk: post_user_mention.user_id for post_user_mention in post_user_mentions}
+
+        Notification.create_notifications(type=Notification.POST_USER_MENTION, owners_ids_and_content_objects=[
+            (owners_ids[notification.post_user_mention_id], notification) for notification in notifications
+        ])
+
     @classmethod
     def delete_post_user_mention_notification(cls, post_user_mention_id, owner_id):
         cls.objects.filter(post_user_mention_id=post_user_mention_id,
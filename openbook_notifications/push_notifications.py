@@ -0,0 +1,108 @@
+"""
+Delivery of the push notifications through the OneSignal API
+"""
+import time
+import uuid
+from hashlib import sha256
+
+import requests
+from django.conf import settings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ONE_SIGNAL_NOTIFICATIONS_PATH = '/notifications'
+
+# OneSignal accepts up to 200 filters per notification, a device takes two of them plus an OR operator
+MAX_DEVICES_PER_NOTIFICATION = 66
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session = None
+
+
+def send_notification_to_users(users, notification):
+    """
+    Sends the OneSignal notification to every device of the users, addressing as many devices as allowed in each
+    request. The notification itself is left untouched.
+    """
+    devices_filters = []
+
+    for user in users:
+        user_tag = make_push_tag_for_user(user=user)
+
+        for device in user.devices.all():
+            devices_filters.append([
+                {"field": "tag", "key": "user_id", "relation": "=", "value": user_tag},
+                {"field": "tag", "key": "device_uuid", "relation": "=", "value": device.uuid},
+            ])
+
+    for i in range(0, len(devices_filters), MAX_DEVICES_PER_NOTIFICATION):
+        filters = []
+
+        for device_filters in devices_filters[i:i + MAX_DEVICES_PER_NOTIFICATION]:
+            if filters:
+                filters.append({"operator": "OR"})
+            filters.extend(device_filters)
+
+        post_body = dict(notification.post_body)
+        post_body['ios_badgeType'] = 'Increase'
+        post_body['ios_badgeCount'] = '1'
+        post_body['filters'] = filters
+
+        send_notification_post_body(post_body=post_body)
+
+    return len(devices_filters)
+
+
+def send_notification_post_body(post_body):
+    """
+    Posts the notification to OneSignal, retrying with an exponential backoff on connection errors and
+    rate limited or server error responses.
+    """
+    post_body = dict(post_body)
+    post_body['app_id'] = settings.ONE_SIGNAL_APP_ID
+    # Lets OneSignal drop the duplicates of a retried request
+    post_body['external_id'] = str(uuid.uuid4())
+
+    url = settings.ONE_SIGNAL_API_ROOT + ONE_SIGNAL_NOTIFICATIONS_PATH
+    headers = {'Authorization': 'Basic %s' % settings.ONE_SIGNAL_API_KEY}
+
+    session = _get_session()
+    max_retries = settings.ONE_SIGNAL_MAX_RETRIES
+
+    for attempt in range(0, max_retries + 1):
+        try:
+            response = session.post(url, json=post_body, headers=headers, timeout=settings.ONE_SIGNAL_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                if not response.ok:
+                    logger.warning('OneSignal rejected notification with status %d: %s' % (
+                        response.status_code, response.text))
+                return response
+
+            if attempt == max_retries:
+                response.raise_for_status()
+
+        time.sleep(settings.ONE_SIGNAL_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+
+def make_push_tag_for_user(user):
+    user_id_contents = (str(user.uuid) + str(user.id)).encode('utf-8')
+    return sha256(user_id_contents).hexdigest()
+
+
+def _get_session():
+    """
+    A session per process, so the connections to OneSignal are pooled across notifications
+    """
+    global _session
+
+    if _session is None:
+        _session = requests.Session()
+
+    return _session
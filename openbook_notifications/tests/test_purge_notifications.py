@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.test import override_settings
+
+from openbook_common.tests.helpers import make_user, make_fake_post_text, make_fake_post_comment_text, \
+    make_reactions_emoji_group, make_emoji
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_notifications.django_rq_jobs import purge_notifications_with_ids
+from openbook_notifications.models import Notification, PostReactionNotification, PostCommentNotification
+
+
+class PurgeNotificationsTests(OpenbookAPITestCase):
+    """
+    Purge of the notifications of posts, comments, communities and users
+    """
+
+    def test_purges_post_notifications_with_their_content_objects(self):
+        """
+        should delete the notifications of the post and their content objects, leaving other posts notifications
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+        other_post = user.create_public_post(text=make_fake_post_text())
+
+        self._react_and_comment_post(post=post)
+        self._react_and_comment_post(post=other_post)
+
+        other_post_notifications_ids = list(
+            Notification.objects.filter(owner=user).exclude(
+                id__in=self._get_post_notifications(post=post).values('id')).values_list('id', flat=True))
+
+        post.delete_notifications()
+
+        self.assertFalse(self._get_post_notifications(post=post).exists())
+        self.assertFalse(PostReactionNotification.objects.filter(post_reaction__post=post).exists())
+        self.assertFalse(PostCommentNotification.objects.filter(post_comment__post=post).exists())
+
+        self.assertEqual(len(other_post_notifications_ids), 2)
+        self.assertEqual(Notification.objects.filter(id__in=other_post_notifications_ids).count(), 2)
+
+    def test_purges_post_notifications_of_user(self):
+        """
+        should only delete the notifications of the post owned by the given user
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        commenter = make_user()
+        commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+
+        self._react_and_comment_post(post=post)
+
+        post.delete_notifications_for_user(user=commenter)
+
+        self.assertFalse(Notification.objects.filter(owner=commenter).exists())
+        self.assertEqual(Notification.objects.filter(owner=user).count(), 3)
+
+    @mock.patch('openbook_notifications.models.notification.transaction.on_commit', side_effect=lambda func: func())
+    def test_purge_keeps_unread_notifications_count(self, on_commit):
+        """
+        should keep the unread notifications count of the owners of the purged notifications
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        self._react_and_comment_post(post=post)
+
+        self.assertEqual(user.count_unread_notifications(), 2)
+
+        post.delete_notifications()
+
+        self.assertEqual(user.count_unread_notifications(), 0)
+
+    @mock.patch('openbook_notifications.models.notification.transaction.on_commit', side_effect=lambda func: func())
+    def test_purge_updates_unread_notifications_counts_at_once(self, on_commit):
+        """
+        should update the unread notifications counts of the purged notifications at once, not one by one
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        for i in range(0, 3):
+            self._react_and_comment_post(post=post)
+
+        self.assertEqual(user.count_unread_notifications(), 6)
+
+        with mock.patch.object(Notification, 'update_unread_counts_for_owners_with_ids',
+                               wraps=Notification.update_unread_counts_for_owners_with_ids) as update_mock:
+            post.delete_notifications()
+
+        update_mock.assert_called_once()
+        self.assertEqual(user.count_unread_notifications(), 0)
+
+    def test_deletes_notifications_in_batches(self):
+        """
+        should delete all the notifications when they don't fit in a single batch
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        for i in range(0, 3):
+            self._react_and_comment_post(post=post)
+
+        notifications_ids = list(self._get_post_notifications(post=post).values_list('id', flat=True))
+
+        with override_settings(NOTIFICATIONS_PURGE_BATCH_SIZE=4):
+            Notification.delete_notifications_with_ids(notifications_ids=notifications_ids)
+
+        self.assertFalse(Notification.objects.filter(id__in=notifications_ids).exists())
+        self.assertFalse(PostReactionNotification.objects.filter(post_reaction__post=post).exists())
+        self.assertFalse(PostCommentNotification.objects.filter(post_comment__post=post).exists())
+
+    def test_defers_purge_of_notifications_over_a_batch(self):
+        """
+        should leave the purge of more notifications than fit in a batch to the purge job
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        for i in range(0, 3):
+            self._react_and_comment_post(post=post)
+
+        notifications_ids = list(self._get_post_notifications(post=post).values_list('id', flat=True))
+
+        with override_settings(NOTIFICATIONS_PURGE_BATCH_SIZE=4):
+            post.delete_notifications()
+
+            self.assertEqual(Notification.objects.filter(id__in=notifications_ids).count(), len(notifications_ids))
+
+            purge_notifications_with_ids(notifications_ids=notifications_ids)
+
+        self.assertFalse(Notification.objects.filter(id__in=notifications_ids).exists())
+
+    def _react_and_comment_post(self, post):
+        emoji = make_emoji(group=make_reactions_emoji_group())
+
+        reactor = make_user()
+        reactor.react_to_post_with_id(post.pk, emoji_id=emoji.pk)
+
+        commenter = make_user()
+        commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+
+    def _get_post_notifications(self, post):
+        return Notification.objects.filter(
+            Notification.make_notifications_query_for_content_objects(content_objects_querysets=[
+                PostReactionNotification.objects.filter(post_reaction__post=post),
+                PostCommentNotification.objects.filter(post_comment__post=post),
+            ]))
@@ -0,0 +1,177 @@
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import onesignal as onesignal_sdk
+import requests
+from django.test import override_settings
+
+from openbook_common.tests.helpers import make_user, make_device
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_notifications.django_rq_jobs import send_notification_to_users_with_ids, \
+    send_notification_to_user_with_id
+from openbook_notifications.push_notifications import make_push_tag_for_user, MAX_DEVICES_PER_NOTIFICATION
+
+
+class FakeOneSignalRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        content_length = int(self.headers['Content-Length'])
+        self.server.received_requests.append({
+            'path': self.path,
+            'authorization': self.headers['Authorization'],
+            'body': json.loads(self.rfile.read(content_length).decode('utf-8'))
+        })
+
+        status_code = self.server.responses_status_codes.pop(0) if self.server.responses_status_codes else 200
+
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"id": "fake", "recipients": 1}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PushNotificationsTests(OpenbookAPITestCase):
+    """
+    Push notifications delivery, against a fake OneSignal API
+    """
+
+    def setUp(self):
+        super(PushNotificationsTests, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), FakeOneSignalRequestHandler)
+        self.server.received_requests = []
+        self.server.responses_status_codes = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.settings_override = override_settings(
+            ONE_SIGNAL_API_ROOT='http://127.0.0.1:%d/api/v1' % self.server.server_port,
+            ONE_SIGNAL_APP_ID='fake-app-id',
+            ONE_SIGNAL_API_KEY='fake-api-key',
+            ONE_SIGNAL_MAX_RETRIES=2,
+            ONE_SIGNAL_RETRY_BACKOFF_SECONDS=0)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+        super(PushNotificationsTests, self).tearDown()
+
+    def test_sends_one_request_for_all_devices_of_users(self):
+        """
+        should address the devices of every user in a single request
+        """
+        users = [make_user() for i in range(0, 3)]
+        devices = [make_device(owner=user) for user in users for i in range(0, 2)]
+
+        notification = self._make_notification()
+
+        send_notification_to_users_with_ids(users_ids=[user.pk for user in users], notification=notification)
+
+        self.assertEqual(len(self.server.received_requests), 1)
+
+        request = self.server.received_requests[0]
+        self.assertEqual(request['path'], '/api/v1/notifications')
+        self.assertEqual(request['authorization'], 'Basic fake-api-key')
+        self.assertEqual(request['body']['app_id'], 'fake-app-id')
+        self.assertEqual(request['body']['contents'], {'en': 'Hello'})
+
+        filters = request['body']['filters']
+        self.assertEqual(len([filter for filter in filters if filter.get('operator') == 'OR']), len(devices) - 1)
+
+        addressed_devices = set(zip(
+            [filter['value'] for filter in filters if filter.get('key') == 'user_id'],
+            [filter['value'] for filter in filters if filter.get('key') == 'device_uuid']))
+        expected_devices = set((make_push_tag_for_user(user=device.owner), device.uuid) for device in devices)
+        self.assertEqual(addressed_devices, expected_devices)
+
+    def test_splits_devices_over_the_filters_limit(self):
+        """
+        should split the devices in requests of at most 200 filters
+        """
+        user = make_user()
+        devices_count = MAX_DEVICES_PER_NOTIFICATION + 4
+
+        for i in range(0, devices_count):
+            make_device(owner=user)
+
+        send_notification_to_user_with_id(user_id=user.pk, notification=self._make_notification())
+
+        self.assertEqual(len(self.server.received_requests), 2)
+
+        for request in self.server.received_requests:
+            self.assertTrue(len(request['body']['filters']) <= 200)
+
+        addressed_devices_count = sum(
+            len([filter for filter in request['body']['filters'] if filter.get('key') == 'device_uuid']) for
+            request in self.server.received_requests)
+        self.assertEqual(addressed_devices_count, devices_count)
+
+    def test_does_not_mutate_notification(self):
+        """
+        should leave the given notification untouched
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        notification = self._make_notification()
+
+        send_notification_to_user_with_id(user_id=user.pk, notification=notification)
+
+        self.assertEqual(notification.post_body, {'contents': {'en': 'Hello'}})
+
+    def test_does_not_send_requests_without_devices(self):
+        """
+        should not send any request if the users have no devices
+        """
+        user = make_user()
+
+        send_notification_to_user_with_id(user_id=user.pk, notification=self._make_notification())
+
+        self.assertEqual(len(self.server.received_requests), 0)
+
+    def test_retries_server_errors_with_same_external_id(self):
+        """
+        should retry a request failing with a server error with the same external id
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_status_codes = [503, 429]
+
+        send_notification_to_user_with_id(user_id=user.pk, notification=self._make_notification())
+
+        self.assertEqual(len(self.server.received_requests), 3)
+        self.assertEqual(len(set(request['body']['external_id'] for request in self.server.received_requests)), 1)
+
+    def test_raises_once_retries_are_exhausted(self):
+        """
+        should raise once the retries of a failing request are exhausted
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_status_codes = [500, 500, 500]
+
+        with self.assertRaises(requests.HTTPError):
+            send_notification_to_user_with_id(user_id=user.pk, notification=self._make_notification())
+
+        self.assertEqual(len(self.server.received_requests), 3)
+
+    def test_does_not_retry_client_errors(self):
+        """
+        should not retry a request rejected with a client error
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_status_codes = [400]
+
+        send_notification_to_user_with_id(user_id=user.pk, notification=self._make_notification())
+
+        self.assertEqual(len(self.server.received_requests), 1)
+
+    def _make_notification(self):
+        return onesignal_sdk.Notification(post_body={'contents': {'en': 'Hello'}})
@@ -1,5 +1,8 @@
 import json
+from unittest import mock
 
+from django.core.management import call_command
+from django.db import transaction, DatabaseError
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
@@ -438,5 +441,131 @@ class UnreadNotificationsCountAPITests(OpenbookAPITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @mock.patch('openbook_notifications.models.notification.transaction.on_commit', side_effect=lambda func: func())
+    def test_unread_notifications_count_is_kept_when_reading_notifications(self, on_commit):
+        """
+        should keep the unread notifications count when reading notifications one by one, by type and all at once
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        notification_types = Notification.get_notification_types_values()
+
+        notifications = [make_notification(owner=user, notification_type=notification_types[i % 2]) for i in
+                         range(0, 6)]
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 6)
+
+        self.client.post(reverse('read-notification', kwargs={
+            'notification_id': notifications[0].pk
+        }), **headers)
+        # Reading it again should not count it twice
+        self.client.post(reverse('read-notification', kwargs={
+            'notification_id': notifications[0].pk
+        }), **headers)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 5)
+
+        self.client.post(reverse('read-notifications'), {
+            'types': notification_types[0]
+        }, **headers)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 3)
+        self.assertEqual(self._get_unread_notifications_count(headers=headers, types=[notification_types[0]]), 0)
+        self.assertEqual(self._get_unread_notifications_count(headers=headers, types=[notification_types[1]]), 3)
+
+        make_notification(owner=user, notification_type=notification_types[0])
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 4)
+
+        self.client.post(reverse('read-notifications'), {}, **headers)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 0)
+
+    @mock.patch('openbook_notifications.models.notification.transaction.on_commit', side_effect=lambda func: func())
+    def test_unread_notifications_count_is_kept_when_deleting_notifications(self, on_commit):
+        """
+        should keep the unread notifications count when deleting notifications one by one and in bulk
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        notifications = [make_notification(owner=user) for i in range(0, 5)]
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 5)
+
+        self.client.delete(reverse('notification', kwargs={
+            'notification_id': notifications[0].pk
+        }), **headers)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 4)
+
+        Notification.objects.filter(pk__in=[notification.pk for notification in notifications[1:3]]).delete()
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 2)
+
+    def test_unread_notifications_count_ignores_rolled_back_notifications(self):
+        """
+        should not count the notifications created in a rolled back transaction
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 0)
+
+        try:
+            with transaction.atomic():
+                make_notification(owner=user)
+                raise DatabaseError()
+        except DatabaseError:
+            pass
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 0)
+
+    def test_unread_notifications_count_is_counted_when_counter_is_missing(self):
+        """
+        should count the unread notifications when their counter is missing
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        for i in range(0, 3):
+            make_notification(owner=user)
+
+        Notification.clear_unread_counts()
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 3)
+
+    def test_reconcile_unread_notifications_counts_command_fixes_counters(self):
+        """
+        should fix the unread notifications counters that drifted from the notifications
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        for i in range(0, 3):
+            make_notification(owner=user)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 3)
+
+        # Bypasses the counters
+        Notification.objects.filter(owner=user).update(read=True)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 3)
+
+        call_command('reconcile_unread_notifications_counts', batch_size=1)
+
+        self.assertEqual(self._get_unread_notifications_count(headers=headers), 0)
+
+    def _get_unread_notifications_count(self, headers, types=None):
+        data = {}
+
+        if types:
+            data['types'] = ','.join(types)
+
+        response = self.client.get(self._get_url(), data, **headers)
+
+        return json.loads(response.content)['count']
+
     def _get_url(self):
             return reverse('unread-notifications-count')
@@ -87,9 +87,13 @@ class UnreadNotificationsCount(APIView):
         max_id = data.get('max_id')
         types = data.get('types')
 
-        notifications = user.get_unread_notifications(max_id=max_id, types=types)
+        if max_id:
+            # The unread counters can't be bounded
+            count = user.get_unread_notifications(max_id=max_id, types=types).count()
+        else:
+            count = user.count_unread_notifications(types=types)
 
-        return Response({'count': notifications.count()}, status=status.HTTP_200_OK)
+        return Response({'count': count}, status=status.HTTP_200_OK)
 
 
 class NotificationItem(APIView):
@@ -0,0 +1,133 @@
+from django.db.models import Q, Count, prefetch_related_objects
+
+from openbook_common.utils.model_loaders import get_post_reaction_model, get_post_mute_model, \
+    get_post_comment_model, get_community_membership_model
+from openbook_posts.queries import make_count_post_comments_query_for_user_with_id, \
+    make_count_post_reactions_query_for_user_with_id
+
+
+class PostsBatchLoader:
+    """
+    Loads the viewer dependent data of a list of posts with one query per kind of data, so the post serializer
+    fields don't have to query per post. Each kind of data is loaded on first access.
+    """
+
+    def __init__(self, posts, user):
+        self.posts = [post for post in posts if post is not None]
+        self.posts_ids = set(post.pk for post in self.posts)
+        self.user = user
+        self._reactions = None
+        self._muted_posts_ids = None
+        self._comments_counts = None
+        self._emoji_counts = None
+        self._creators_memberships = None
+        self._staff_communities_ids = None
+        self._circles_loaded = False
+
+    def has_post(self, post):
+        return post.pk in self.posts_ids
+
+    def get_reaction_for_post(self, post):
+        if self._reactions is None:
+            PostReaction = get_post_reaction_model()
+            reactions = PostReaction.objects.select_related('emoji').filter(reactor_id=self.user.pk,
+                                                                           post_id__in=self.posts_ids)
+            self._reactions = {reaction.post_id: reaction for reaction in reactions}
+
+        return self._reactions.get(post.pk)
+
+    def has_muted_post(self, post):
+        if self._muted_posts_ids is None:
+            PostMute = get_post_mute_model()
+            self._muted_posts_ids = set(
+                PostMute.objects.filter(muter_id=self.user.pk, post_id__in=self.posts_ids).values_list('post_id',
+                                                                                                       flat=True))
+
+        return post.pk in self._muted_posts_ids
+
+    def get_comments_count_for_post(self, post):
+        """
+        The comments count of every post as seen by the user, see Post.count_comments_with_user
+        """
+        if self._comments_counts is None:
+            PostComment = get_post_comment_model()
+
+            comments_query = self._make_posts_query(make_count_query=make_count_post_comments_query_for_user_with_id)
+
+            comments_counts = PostComment.objects.filter(comments_query).values('post_id').annotate(
+                comments_count=Count('id')).order_by()
+
+            self._comments_counts = {comments_count['post_id']: comments_count['comments_count'] for comments_count
+                                     in comments_counts}
+
+        return self._comments_counts.get(post.pk, 0)
+
+    def get_emoji_counts_for_post(self, post):
+        """
+        The reactions emoji counts of every post as seen by the user, see User.get_emoji_counts_for_post
+        """
+        if self._emoji_counts is None:
+            PostReaction = get_post_reaction_model()
+
+            reactions_query = self._make_posts_query(
+                make_count_query=make_count_post_reactions_query_for_user_with_id)
+
+            self._emoji_counts = PostReaction.get_emoji_counts_for_reactions_by_post_id(
+                reactions_query=reactions_query)
+
+        return self._emoji_counts.get(post.pk, [])
+
+    def get_creator_membership_for_post(self, post):
+        if self._creators_memberships is None:
+            CommunityMembership = get_community_membership_model()
+            community_posts = [post for post in self.posts if post.community_id]
+            self._creators_memberships = {}
+
+            if community_posts:
+                memberships = CommunityMembership.objects.filter(
+                    user_id__in=set(post.creator_id for post in community_posts),
+                    community_id__in=set(post.community_id for post in community_posts))
+                self._creators_memberships = {(membership.user_id, membership.community_id): membership for
+                                              membership in memberships}
+
+        return self._creators_memberships.get((post.creator_id, post.community_id))
+
+    def load_circles(self):
+        if not self._circles_loaded:
+            own_posts = [post for post in self.posts if post.creator_id == self.user.pk]
+            prefetch_related_objects(own_posts, 'circles')
+            self._circles_loaded = True
+
+    def _get_staff_communities_ids(self):
+        if self._staff_communities_ids is None:
+            communities_ids = set(post.community_id for post in self.posts if post.community_id)
+            self._staff_communities_ids = set()
+
+            if communities_ids:
+                self._staff_communities_ids = set(self.user.communities_memberships.filter(
+                    Q(community_id__in=communities_ids) & Q(Q(is_administrator=True) | Q(is_moderator=True))
+                ).values_list('community_id', flat=True))
+
+        return self._staff_communities_ids
+
+    def _make_posts_query(self, make_count_query):
+        """
+        Matches the comments or reactions of the posts counted for the user, with the count query made by
+        make_count_query for the posts of each community, like it is for a single post
+        """
+        posts_ids_by_community_id = {}
+
+        for post in self.posts:
+            posts_ids_by_community_id.setdefault(post.community_id, []).append(post.pk)
+
+        staff_communities_ids = self._get_staff_communities_ids()
+        posts_query = Q()
+
+        for community_id, posts_ids in posts_ids_by_community_id.items():
+            community_posts_query = Q(post_id__in=posts_ids)
+            community_posts_query.add(make_count_query(user_id=self.user.pk, community_id=community_id,
+                                                       is_community_staff=community_id in staff_communities_ids),
+                                      Q.AND)
+            posts_query.add(community_posts_query, Q.OR)
+
+        return posts_query
@@ -2,7 +2,7 @@ from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
-from openbook_common.utils.model_loaders import get_post_model
+from openbook_common.utils.model_loaders import get_post_model, get_blocked_media_hash_model
 
 
 def check_can_be_updated(post, text=None):
@@ -21,7 +21,7 @@ def check_is_draft(post):
 
 def check_can_add_media(post):
     check_is_draft(post=post)
-    existing_media_count = post.count_media()
+    existing_media_count = post.count_media() + post.count_pending_media()
 
     if existing_media_count >= settings.POST_MEDIA_MAX_ITEMS:
         raise ValidationError(
@@ -51,6 +51,15 @@ def check_can_be_published(post):
     check_is_not_empty(post=post)
 
 
+def check_media_hash_is_not_blocked(hash):
+    BlockedMediaHash = get_blocked_media_hash_model()
+
+    if BlockedMediaHash.is_hash_blocked(hash=hash):
+        raise ValidationError(
+            _('This media is not allowed')
+        )
+
+
 def check_mimetype_is_supported_media_mimetypes(mimetype):
     if not mimetype in settings.SUPPORTED_MEDIA_MIMETYPES:
         raise ValidationError(_('%s is not a supported mimetype') % mimetype, )
@@ -16,6 +16,11 @@ def upload_to_post_video_directory(post_video, filename):
     return _upload_to_post_directory_directory(post=post, filename=filename)
 
 
+def upload_to_post_media_upload_directory(post_media_upload, filename):
+    post = post_media_upload.post
+    return _upload_to_post_directory_directory(post=post, filename=filename)
+
+
 def _upload_to_post_directory_directory(post, filename):
     extension = splitext(filename)[1].lower()
     new_filename = str(uuid.uuid4()) + extension
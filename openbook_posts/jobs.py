@@ -1,13 +1,20 @@
 from django.utils import timezone
 from django_rq import job
 from video_encoding import tasks
+from video_encoding.utils import delete_fieldfile_local_copy
 from datetime import timedelta
 from django.db.models import Q, Count
 from django.conf import settings
 from cursor_pagination import CursorPaginator
 
 from openbook_common.utils.model_loaders import get_post_model, get_post_media_model, get_community_model, \
-    get_top_post_model, get_post_comment_model, get_moderated_object_model, get_trending_post_model
+    get_top_post_model, get_post_comment_model, get_moderated_object_model, get_trending_post_model, \
+    get_timeline_entry_model, get_post_reaction_model, get_community_notifications_subscription_model, \
+    get_user_notifications_subscription_model, get_community_new_post_notification_model, \
+    get_user_new_post_notification_model, get_post_user_mention_model, get_post_comment_user_mention_model, \
+    get_hashtag_model, get_post_media_upload_model
+from openbook_notifications.helpers import send_community_new_post_push_notifications, \
+    send_user_new_post_push_notifications
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,51 +47,292 @@ def process_post_media(post_id):
     Post = get_post_model()
     PostMedia = get_post_media_model()
     post = Post.objects.get(pk=post_id)
+
+    if post.has_pending_media():
+        # The last process_post_media_upload job of the post will call this job again
+        logger.info('Waiting on the media uploads of post with id: %d' % post_id)
+        return
+
     logger.info('Processing media of post with id: %d' % post_id)
 
-    post_media_videos = post.media.filter(type=PostMedia.MEDIA_TYPE_VIDEO)
+    try:
+        post_media_videos = post.media.filter(type=PostMedia.MEDIA_TYPE_VIDEO)
+        post_videos = [post_media_video.content_object for post_media_video in post_media_videos.iterator()]
+
+        # Encodes the formats of all the videos at once, up to VIDEO_ENCODING_MAX_WORKERS at a time
+        tasks.convert_videos([post_video.file for post_video in post_videos])
+    finally:
+        # The local copies of the videos are only kept for this encoding, even if it failed before starting
+        for post_video in post.videos.all():
+            if post_video.file:
+                delete_fieldfile_local_copy(fieldfile=post_video.file)
 
-    for post_media_video in post_media_videos.iterator():
-        post_video = post_media_video.content_object
-        tasks.convert_video(post_video.file)
+    for post_video in post_videos:
+        post_video.register_formats_blobs()
 
     # This updates the status and created attributes
     post._publish()
     logger.info('Processed media of post with id: %d' % post_id)
 
 
+@job('high')
+def process_post_media_upload(post_media_upload_id):
+    """
+    This job is called to validate, convert and resize a media file added to a post, see PostMediaUpload.process
+    """
+    PostMediaUpload = get_post_media_upload_model()
+    post_media_upload = PostMediaUpload.objects.filter(pk=post_media_upload_id).first()
+
+    if not post_media_upload:
+        # The post was deleted meanwhile, along with the uploaded file, see Post.delete_media
+        return
+
+    logger.info('Processing media upload with id: %d' % post_media_upload_id)
+    post_media_upload.process()
+    logger.info('Processed media upload with id: %d' % post_media_upload_id)
+
+
+@job('high')
+def fan_out_post_to_timelines(post_id):
+    """
+    This job is called to add a published post to the materialized timelines of the users who can see it
+    """
+    Post = get_post_model()
+    TimelineEntry = get_timeline_entry_model()
+
+    post = Post.objects.filter(pk=post_id, is_deleted=False, status=Post.STATUS_PUBLISHED).first()
+
+    if post is None:
+        return 'Skipped post with id: %d' % post_id
+
+    users_ids = list(TimelineEntry.get_timeline_target_users_ids_for_post(post=post))
+
+    total_fanned_out = 0
+    chunk_size = 1000
+
+    for i in range(0, len(users_ids), chunk_size):
+        total_fanned_out += TimelineEntry.add_post_with_id_to_timelines_for_users_with_ids(
+            post_id=post_id, users_ids=users_ids[i:i + chunk_size])
+
+    return 'Checked: %d. Fanned out: %d' % (len(users_ids), total_fanned_out)
+
+
+@job('high')
+def notify_post_subscribers(post_id):
+    """
+    This job is called to notify the community or user notifications subscribers of a published post
+    """
+    Post = get_post_model()
+
+    post = Post.objects.select_related('creator__profile', 'community').filter(
+        pk=post_id, is_deleted=False, status=Post.STATUS_PUBLISHED).first()
+
+    if post is None:
+        return 'Skipped post with id: %d' % post_id
+
+    if post.community_id:
+        target_subscriptions = Post.get_community_notification_target_subscriptions(post=post)
+        notify_subscriptions = _notify_community_post_subscriptions
+    else:
+        target_subscriptions = Post.get_user_notification_target_subscriptions(post=post)
+        notify_subscriptions = _notify_user_post_subscriptions
+
+    subscriptions_ids = list(target_subscriptions.values_list('id', flat=True))
+
+    total_notified = 0
+    chunk_size = 1000
+
+    for i in range(0, len(subscriptions_ids), chunk_size):
+        total_notified += notify_subscriptions(post=post, subscriptions_ids=subscriptions_ids[i:i + chunk_size])
+
+    return 'Checked: %d. Notified: %d' % (len(subscriptions_ids), total_notified)
+
+
+@job('high')
+def create_post_user_mentions(post_id, usernames):
+    """
+    This job is called to mention the users of a post mentioning too many usernames to do it while saving it
+    """
+    Post = get_post_model()
+    PostUserMention = get_post_user_mention_model()
+
+    post = Post.objects.select_related('creator__profile', 'community').filter(pk=post_id).first()
+
+    if post is None:
+        return 'Skipped post with id: %d' % post_id
+
+    post_user_mentions = PostUserMention.create_post_user_mentions(post=post, usernames=usernames)
+
+    return 'Checked: %d. Mentioned: %d' % (len(usernames), len(post_user_mentions))
+
+
+@job('high')
+def create_post_comment_user_mentions(post_comment_id, usernames):
+    """
+    This job is called to mention the users of a post comment mentioning too many usernames to do it while
+    saving it
+    """
+    PostComment = get_post_comment_model()
+    PostCommentUserMention = get_post_comment_user_mention_model()
+
+    post_comment = PostComment.objects.select_related('commenter__profile', 'post__community',
+                                                      'parent_comment').filter(pk=post_comment_id).first()
+
+    if post_comment is None:
+        return 'Skipped post comment with id: %d' % post_comment_id
+
+    post_comment_user_mentions = PostCommentUserMention.create_post_comment_user_mentions(post_comment=post_comment,
+                                                                                          usernames=usernames)
+
+    return 'Checked: %d. Mentioned: %d' % (len(usernames), len(post_comment_user_mentions))
+
+
+@job('low')
+def update_hashtags_media_with_post(post_id):
+    """
+    This job is called to give the hashtags of a published post without an image the first image of the post
+    """
+    Post = get_post_model()
+    Hashtag = get_hashtag_model()
+
+    post = Post.objects.select_related('community').filter(pk=post_id, status=Post.STATUS_PUBLISHED).first()
+
+    if post is None:
+        return 'Skipped post with id: %d' % post_id
+
+    updated_hashtags_count = Hashtag.update_media_of_hashtags_with_post(post=post)
+
+    return 'Updated hashtags: %d' % updated_hashtags_count
+
+
+def _notify_community_post_subscriptions(post, subscriptions_ids):
+    CommunityNotificationsSubscription = get_community_notifications_subscription_model()
+    CommunityNewPostNotification = get_community_new_post_notification_model()
+
+    subscriptions = CommunityNotificationsSubscription.objects.select_related(
+        'subscriber__notifications_settings', 'subscriber__language').filter(pk__in=subscriptions_ids)
+
+    notified_subscriptions = CommunityNewPostNotification.create_community_new_post_notifications(
+        post_id=post.pk, subscriptions=list(subscriptions))
+
+    send_community_new_post_push_notifications(community=post.community,
+                                               community_notifications_subscriptions=notified_subscriptions)
+
+    return len(notified_subscriptions)
+
+
+def _notify_user_post_subscriptions(post, subscriptions_ids):
+    UserNotificationsSubscription = get_user_notifications_subscription_model()
+    UserNewPostNotification = get_user_new_post_notification_model()
+
+    subscriptions = UserNotificationsSubscription.objects.select_related(
+        'subscriber__notifications_settings', 'subscriber__language').filter(pk__in=subscriptions_ids)
+
+    notified_subscriptions = UserNewPostNotification.create_user_new_post_notifications(
+        post_id=post.pk, subscriptions=list(subscriptions))
+
+    send_user_new_post_push_notifications(post=post, user_notifications_subscriptions=notified_subscriptions)
+
+    return len(notified_subscriptions)
+
+
+@job('low')
+def trim_timelines():
+    """
+    Trims the materialized timelines to settings.TIMELINE_MAX_LENGTH entries.
+    This job should be scheduled to be run every n hours.
+    """
+    TimelineEntry = get_timeline_entry_model()
+
+    oversized_timelines = TimelineEntry.objects.values('owner_id'). \
+        annotate(entries_count=Count('id')). \
+        filter(entries_count__gt=settings.TIMELINE_MAX_LENGTH)
+
+    total_trimmed_timelines = 0
+    total_removed_entries = 0
+
+    for oversized_timeline in oversized_timelines.iterator():
+        total_trimmed_timelines += 1
+        total_removed_entries += TimelineEntry.trim_timeline_for_user_with_id(user_id=oversized_timeline['owner_id'])
+
+    return 'Trimmed: %d. Removed: %d' % (total_trimmed_timelines, total_removed_entries)
+
+
 @job('low')
 def curate_top_posts():
     """
     Curates the top posts.
     This job should be scheduled to be run every n hours.
+    If TOP_POSTS_INCREMENTAL_CURATION_ENABLED, only the posts with new reactions or comments are checked and
+    reconcile_top_posts should be scheduled to check all of them once in a while.
     """
+    TopPost = get_top_post_model()
+    logger.info('Processing top posts at %s...' % timezone.now())
+    started = timezone.now()
+
+    if not settings.TOP_POSTS_INCREMENTAL_CURATION_ENABLED:
+        total_checked_posts, total_curated_posts = _curate_top_posts()
+    else:
+        total_checked_posts = 0
+        total_curated_posts = 0
+
+        while True:
+            dirty_posts_ids = TopPost.pop_dirty_posts_ids(1000)
+
+            if not dirty_posts_ids:
+                break
+
+            checked_posts, curated_posts = _curate_top_posts(posts_query=Q(id__in=dirty_posts_ids))
+            total_checked_posts += checked_posts
+            total_curated_posts += curated_posts
+
+    return 'Checked: %d. Curated: %d. Duration: %s' % (
+        total_checked_posts, total_curated_posts, timezone.now() - started)
+
+
+@job('low')
+def reconcile_top_posts():
+    """
+    Curates the top posts checking every post, catching up on what the incremental curation could have missed.
+    Only needed if TOP_POSTS_INCREMENTAL_CURATION_ENABLED, should be scheduled to be run every day or so.
+    """
+    TopPost = get_top_post_model()
+    logger.info('Reconciling top posts at %s...' % timezone.now())
+    started = timezone.now()
+
+    # Every post is checked, the engagement recorded from now on will be checked in the next incremental run
+    TopPost.clear_dirty_posts()
+    total_checked_posts, total_curated_posts = _curate_top_posts()
+
+    return 'Checked: %d. Curated: %d. Duration: %s' % (
+        total_checked_posts, total_curated_posts, timezone.now() - started)
+
+
+def _curate_top_posts(posts_query=None):
     Post = get_post_model()
     Community = get_community_model()
     PostComment = get_post_comment_model()
     ModeratedObject = get_moderated_object_model()
     TopPost = get_top_post_model()
-    logger.info('Processing top posts at %s...' % timezone.now())
 
     top_posts_community_query = Q(top_post__isnull=True)
     top_posts_community_query.add(Q(community__isnull=False, community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
     top_posts_community_query.add(Q(is_closed=False, is_deleted=False, status=Post.STATUS_PUBLISHED), Q.AND)
     top_posts_community_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
-    top_posts_criteria_query = Q(total_comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
+    if posts_query:
+        top_posts_community_query.add(posts_query, Q.AND)
+
+    top_posts_criteria_query = Q(comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
                                Q(reactions_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
 
     posts_select_related = 'community'
-    posts_prefetch_related = ('comments__commenter', 'reactions__reactor')
-    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type')
+    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type', 'comments_count', 'reactions_count')
 
     posts = Post.objects. \
         select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
         only(*posts_only). \
         filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('comments__commenter_id'),
-                 reactions_count=Count('reactions__reactor_id')). \
         filter(top_posts_criteria_query)
 
     top_posts_objects = []
@@ -116,7 +364,7 @@ def curate_top_posts():
         total_curated_posts += len(top_posts_objects)
         TopPost.objects.bulk_create(top_posts_objects)
 
-    return 'Checked: %d. Curated: %d' % (total_checked_posts, total_curated_posts)
+    return total_checked_posts, total_curated_posts
 
 
 @job('low')
@@ -139,19 +387,16 @@ def clean_top_posts():
     top_posts_community_query.add(Q(post__moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.OR)
 
     # counts less than minimum
-    top_posts_criteria_query = Q(total_comments_count__lt=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) & \
-                               Q(reactions_count__lt=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
+    top_posts_criteria_query = Q(post__comments_count__lt=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) & \
+                               Q(post__reactions_count__lt=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
 
     posts_select_related = 'post__community'
-    posts_prefetch_related = ('post__comments__commenter', 'post__reactions__reactor')
-    posts_only = ('post__id', 'post__status', 'post__is_deleted', 'post__is_closed', 'post__community__type')
+    posts_only = ('post__id', 'post__status', 'post__is_deleted', 'post__is_closed', 'post__community__type',
+                  'post__comments_count', 'post__reactions_count')
 
     direct_removable_top_posts = TopPost.objects.select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
         only(*posts_only). \
         filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('post__comments__commenter_id'),
-                 reactions_count=Count('post__reactions__reactor_id')). \
         filter(top_posts_criteria_query)
 
     # bulk delete all that definitely dont meet the criteria anymore
@@ -165,21 +410,18 @@ def clean_top_posts():
                                   Q.AND)
     top_posts_community_query.add(~Q(post__moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
-    top_posts_criteria_query = Q(total_comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
-                               Q(reactions_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
+    top_posts_criteria_query = Q(post__comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
+                               Q(post__reactions_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
 
     top_posts = TopPost.objects.select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
         only(*posts_only). \
         filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('post__comments__commenter_id'),
-                 reactions_count=Count('post__reactions__reactor_id')). \
         filter(top_posts_criteria_query)
 
     delete_ids = []
 
     for top_post in _chunked_queryset_iterator(top_posts, 1000):
-        if not top_post.reactions_count >= settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT:
+        if not top_post.post.reactions_count >= settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT:
             unique_comments_count = PostComment.objects.filter(post=top_post.post). \
                 values('commenter_id'). \
                 annotate(user_comments_count=Count('commenter_id')).count()
@@ -210,6 +452,9 @@ def curate_trending_posts():
     TrendingPost = get_trending_post_model()
     logger.info('Processing trending posts at %s...' % timezone.now())
 
+    if settings.TRENDING_POSTS_SCORES_ENABLED:
+        return 'Curated: %d posts' % _curate_trending_posts_from_scores()
+
     trending_posts_query = Q(created__gte=timezone.now() - timedelta(
         hours=12))
 
@@ -221,17 +466,14 @@ def curate_trending_posts():
     trending_posts_query.add(trending_posts_community_query, Q.AND)
 
     posts_select_related = 'community'
-    posts_prefetch_related = 'reactions__reactor'
-    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type')
+    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type', 'reactions_count')
 
     trending_posts_criteria_query = Q(reactions_count__gte=settings.MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT)
 
     posts = Post.objects. \
         select_related(posts_select_related). \
-        prefetch_related(posts_prefetch_related). \
         only(*posts_only). \
         filter(trending_posts_query). \
-        annotate(reactions_count=Count('reactions__reactor_id')).\
         filter(trending_posts_criteria_query).\
         order_by('-reactions_count', '-created')[:30]
 
@@ -261,6 +503,10 @@ def bootstrap_trending_posts():
     TrendingPost = get_trending_post_model()
     logger.info('Processing trending posts at %s...' % timezone.now())
 
+    if settings.TRENDING_POSTS_SCORES_ENABLED:
+        total_recorded_engagements = _bootstrap_trending_posts_scores()
+        return 'Recorded: %d. Curated: %d' % (total_recorded_engagements, _curate_trending_posts_from_scores())
+
     trending_posts_community_query = Q(community__isnull=False, community__type=Community.COMMUNITY_TYPE_PUBLIC,
                                        status=Post.STATUS_PUBLISHED,
                                        is_closed=False, is_deleted=False)
@@ -268,17 +514,14 @@ def bootstrap_trending_posts():
     trending_posts_community_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
     posts_select_related = 'community'
-    posts_prefetch_related = 'reactions__reactor'
-    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type')
+    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type', 'reactions_count')
 
     trending_posts_criteria_query = Q(reactions_count__gte=settings.MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT)
 
     posts = Post.objects. \
         select_related(posts_select_related). \
-        prefetch_related(posts_prefetch_related). \
         only(*posts_only). \
         filter(trending_posts_community_query). \
-        annotate(reactions_count=Count('reactions__reactor_id')). \
         filter(trending_posts_criteria_query). \
         order_by('-created')
 
@@ -322,29 +565,82 @@ def clean_trending_posts():
     trending_posts_community_query.add(Q(post__status=Post.STATUS_PROCESSING), Q.OR)
     trending_posts_community_query.add(Q(post__moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.OR)
 
-    posts_select_related = 'post__community'
-    posts_only = ('post__id', 'post__status', 'post__is_deleted', 'post__is_closed', 'post__community__type')
+    # delete posts
+    TrendingPost.objects.filter(trending_posts_community_query).delete()
 
-    removable_trending_posts = TrendingPost.objects.select_related(posts_select_related). \
-        only(*posts_only). \
-        filter(trending_posts_community_query)
+    # Now we delete trending posts that do not meet criteria anymore
+    TrendingPost.objects.filter(post__reactions_count__lt=settings.MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT).delete()
 
-    direct_removable_delete_ids = [trending_post.pk for trending_post in removable_trending_posts]
+    if settings.TRENDING_POSTS_SCORES_ENABLED:
+        # And the ones which engagement has decayed
+        TrendingPost.evict_decayed_posts_scores()
+        posts_ids = TrendingPost.objects.values_list('post_id', flat=True)
+        TrendingPost.objects.filter(post_id__in=TrendingPost.get_decayed_posts_ids(posts_ids)).delete()
 
-    # delete posts
-    TrendingPost.objects.filter(id__in=direct_removable_delete_ids).delete()
 
-    # Now we filter trending posts that do not meet criteria anymore
-    trending_posts_criteria_query = Q(reactions_count__lt=settings.MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT)
+def _curate_trending_posts_from_scores():
+    """
+    Replaces the trending posts with the best scored eligible posts, returns how many there are
+    """
+    Post = get_post_model()
+    Community = get_community_model()
+    ModeratedObject = get_moderated_object_model()
+    TrendingPost = get_trending_post_model()
+
+    TrendingPost.evict_decayed_posts_scores()
+
+    # Some of the best scored posts might not be eligible, fetch more than needed
+    scored_posts_ids = TrendingPost.get_top_scored_posts_ids(count=90)
+
+    trending_posts_query = Q(id__in=scored_posts_ids, community__type=Community.COMMUNITY_TYPE_PUBLIC,
+                             status=Post.STATUS_PUBLISHED, is_closed=False, is_deleted=False,
+                             reactions_count__gte=settings.MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT)
+    trending_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
+
+    eligible_posts_ids = set(Post.objects.filter(trending_posts_query).values_list('id', flat=True))
+    trending_posts_ids = [post_id for post_id in scored_posts_ids if post_id in eligible_posts_ids][:30]
+
+    TrendingPost.objects.filter(post_id__in=trending_posts_ids).delete()
+
+    # The best scored post is created last so it is listed first
+    TrendingPost.objects.bulk_create(
+        [TrendingPost(post_id=post_id, created=timezone.now()) for post_id in reversed(trending_posts_ids)])
+
+    return len(trending_posts_ids)
+
+
+def _bootstrap_trending_posts_scores():
+    """
+    Records the engagement within the scores window again, returns how many engagements were recorded
+    """
+    PostReaction = get_post_reaction_model()
+    PostComment = get_post_comment_model()
+    TrendingPost = get_trending_post_model()
+
+    TrendingPost.clear_posts_scores()
+
+    scores_window_start = timezone.now() - TrendingPost.get_scores_window()
+    total_recorded_engagements = 0
+
+    post_reactions = PostReaction.objects.select_related('post'). \
+        only('reactor_id', 'created', 'post__id', 'post__community_id'). \
+        filter(created__gte=scores_window_start, post__community__isnull=False)
+
+    for post_reaction in post_reactions.iterator():
+        TrendingPost.record_post_engagement(post=post_reaction.post, participant_id=post_reaction.reactor_id,
+                                            score=TrendingPost.REACTION_SCORE, at=post_reaction.created)
+        total_recorded_engagements += 1
+
+    post_comments = PostComment.objects.select_related('post'). \
+        only('commenter_id', 'created', 'post__id', 'post__community_id'). \
+        filter(created__gte=scores_window_start, post__community__isnull=False)
 
-    less_than_min_reactions_trending_posts = TrendingPost.objects.\
-        prefetch_related('post__reactions__reactor'). \
-        only('id'). \
-        annotate(reactions_count=Count('post__reactions__reactor_id')). \
-        filter(trending_posts_criteria_query)
+    for post_comment in post_comments.iterator():
+        TrendingPost.record_post_engagement(post=post_comment.post, participant_id=post_comment.commenter_id,
+                                            score=TrendingPost.COMMENT_SCORE, at=post_comment.created)
+        total_recorded_engagements += 1
 
-    delete_ids = [trending_post.pk for trending_post in less_than_min_reactions_trending_posts]
-    TrendingPost.objects.filter(id__in=delete_ids).delete()
+    return total_recorded_engagements
 
 
 def _chunked_queryset_iterator(queryset, size, *, ordering=('id',)):
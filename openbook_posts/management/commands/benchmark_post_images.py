@@ -0,0 +1,64 @@
+import os
+import statistics
+import time
+from io import BytesIO
+
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+from pilkit.processors import ResizeToFit
+from pilkit.utils import save_image
+
+from openbook_common.utils.helpers import make_image_derivatives
+from openbook_common.utils.model_loaders import get_post_model, get_post_image_model
+
+
+class Command(BaseCommand):
+    help = 'Compares the CPU time per upload of making the post media image derivatives by processing the image ' \
+           'for each of them and in a single pass, over a folder of sample images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', type=str, help='The folder with the sample images')
+        parser.add_argument('--repeat', type=int, default=5, help='The amount of times each image is processed')
+
+    def handle(self, *args, **options):
+        folder = options['folder']
+
+        if not os.path.isdir(folder):
+            raise CommandError('%s is not a folder' % folder)
+
+        images_paths = [os.path.join(folder, file_name) for file_name in sorted(os.listdir(folder)) if
+                        os.path.splitext(file_name)[1].lower() in ('.jpg', '.jpeg', '.png')]
+
+        if not images_paths:
+            raise CommandError('No jpg or png images found in %s' % folder)
+
+        Post = get_post_model()
+        PostImage = get_post_image_model()
+
+        derivatives = [PostImage.IMAGE_DERIVATIVE, PostImage.THUMBNAIL_DERIVATIVE, Post.MEDIA_THUMBNAIL_DERIVATIVE]
+
+        makers = (
+            ('per derivative', self._make_derivatives_separately),
+            ('single pass', make_image_derivatives),
+        )
+
+        for maker_name, make_derivatives in makers:
+            durations = []
+
+            for image_path in images_paths:
+                with open(image_path, 'rb') as file:
+                    for i in range(0, options['repeat']):
+                        start = time.process_time()
+                        make_derivatives(file=file, derivatives=derivatives)
+                        durations.append((time.process_time() - start) * 1000)
+                        file.seek(0)
+
+            self.stdout.write('%s: median %.2fms, mean %.2fms CPU time per upload of %d images' % (
+                maker_name, statistics.median(durations), statistics.mean(durations), len(images_paths)))
+
+    def _make_derivatives_separately(self, file, derivatives):
+        # What the ProcessedImageField of each derivative does on save
+        for width, quality in derivatives:
+            image = ResizeToFit(width=width, upscale=False).process(Image.open(file))
+            save_image(image, BytesIO(), 'JPEG', options={'quality': quality})
+            file.seek(0)
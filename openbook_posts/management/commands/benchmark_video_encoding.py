@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from video_encoding.backends import get_backend
+from video_encoding.tasks import Encoding, run_encodings
+
+
+class Command(BaseCommand):
+    help = 'Compares the wall time of encoding all the formats of a folder of sample videos one at a time and ' \
+           'concurrently, as done for the videos of a post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', type=str, help='The folder with the sample videos')
+        parser.add_argument('--workers', type=int, default=settings.VIDEO_ENCODING_MAX_WORKERS,
+                            help='The maximum amount of encodings running at once when encoding concurrently')
+
+    def handle(self, *args, **options):
+        folder = options['folder']
+
+        if not os.path.isdir(folder):
+            raise CommandError('%s is not a folder' % folder)
+
+        videos_paths = [os.path.join(folder, file_name) for file_name in sorted(os.listdir(folder)) if
+                        os.path.splitext(file_name)[1].lower() in ('.mp4', '.mov', '.webm', '.mkv', '.avi')]
+
+        if not videos_paths:
+            raise CommandError('No mp4, mov, webm, mkv or avi videos found in %s' % folder)
+
+        encoding_backend = get_backend()
+        formats_options = settings.VIDEO_ENCODING_FORMATS[encoding_backend.name]
+
+        for runner_name, max_workers in (('sequential', 1), ('concurrent', options['workers'])):
+            encodings = []
+
+            for video_path in videos_paths:
+                for format_options in formats_options:
+                    _, target_path = tempfile.mkstemp(suffix='_{name}.{extension}'.format(**format_options))
+                    encodings.append(Encoding(source_path=video_path, target_path=target_path,
+                                              params=format_options['params']))
+
+            try:
+                start = time.perf_counter()
+                run_encodings(encodings, encoding_backend=encoding_backend, max_workers=max_workers)
+                duration = time.perf_counter() - start
+            finally:
+                for encoding in encodings:
+                    os.remove(encoding.target_path)
+
+            failed_encodings_count = len([encoding for encoding in encodings if encoding.error])
+
+            self.stdout.write('%s with %d workers: %.2fs wall time for %d encodings of %d videos, %d failed' % (
+                runner_name, max_workers, duration, len(encodings), len(videos_paths), failed_encodings_count))
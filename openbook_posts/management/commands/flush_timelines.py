@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_common.utils.model_loaders import get_timeline_entry_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Flushes all of the materialized timelines, they will be rebuilt on their next read'
+
+    def handle(self, *args, **options):
+        TimelineEntry = get_timeline_entry_model()
+        flushed_entries, _ = TimelineEntry.objects.all().delete()
+        logger.info('Flushed %d timeline entries' % flushed_entries)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_common.utils.model_loaders import get_post_model, get_post_comment_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the reactions and comments counters of the posts and the replies counters of the comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='The amount of items to repair at once')
+
+    def handle(self, *args, **options):
+        Post = get_post_model()
+        PostComment = get_post_comment_model()
+
+        batch_size = options['batch_size']
+
+        total_repaired_posts = self._repair_in_batches(queryset=Post.objects.all(),
+                                                       repair=Post.repair_counters_for_posts_with_ids,
+                                                       batch_size=batch_size)
+        logger.info('Repaired counters of %d posts' % total_repaired_posts)
+
+        total_repaired_post_comments = self._repair_in_batches(
+            queryset=PostComment.objects.filter(parent_comment__isnull=True),
+            repair=PostComment.repair_counters_for_post_comments_with_ids,
+            batch_size=batch_size)
+        logger.info('Repaired counters of %d post comments' % total_repaired_post_comments)
+
+    def _repair_in_batches(self, queryset, repair, batch_size):
+        total_repaired = 0
+        last_id = 0
+
+        while True:
+            ids = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+
+            if not ids:
+                break
+
+            total_repaired += repair(ids)
+            last_id = ids[-1]
+
+        return total_repaired
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_common', '0021_auto_20190917_1806'),
+        ('openbook_posts', '0069_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='comments count'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reactions_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='reactions count'),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='replies count'),
+        ),
+        migrations.CreateModel(
+            name='PostReactionEmojiCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('emoji', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_reactions_emoji_counts', to='openbook_common.Emoji')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions_emoji_counts', to='openbook_posts.Post')),
+            ],
+            options={
+                'unique_together': {('post', 'emoji')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 04:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import openbook_posts.helpers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_posts', '0070_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostMediaUpload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(null=True, upload_to=openbook_posts.helpers.upload_to_post_media_upload_directory)),
+                ('order', models.PositiveIntegerField(null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('status', models.CharField(choices=[('PG', 'Processing'), ('P', 'Processed'), ('F', 'Failed')], default='PG', max_length=2)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to='openbook_posts.Post')),
+            ],
+        ),
+    ]
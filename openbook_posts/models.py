@@ -1,5 +1,7 @@
 # Create your models here.
+import math
 import os
+import shutil
 import tempfile
 import uuid
 from datetime import timedelta
@@ -9,11 +11,13 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile, SimpleUploadedFile
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Q, F, DEFERRED
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.db.models import Count
+from django_redis import get_redis_connection
 import ffmpy
 
 # Create your views here.
@@ -27,13 +31,15 @@ from openbook_posts.validators import post_text_validators, post_comment_text_va
 from video_encoding.backends import get_backend
 from video_encoding.fields import VideoField
 from video_encoding.models import Format
+from video_encoding.utils import keep_fieldfile_local_copy, delete_fieldfile_local_copy
 
 from openbook.storage_backends import S3PrivateMediaStorage
 from openbook_auth.models import User
 
 from openbook_common.models import Emoji, Language
 from openbook_common.utils.helpers import delete_file_field, sha256sum, extract_usernames_from_string, get_magic, \
-    write_in_memory_file_to_disk, extract_hashtags_from_string
+    write_in_memory_file_to_disk, extract_hashtags_from_string, make_image_derivatives, save_files_concurrently, \
+    write_file_to_disk_with_sha256sum
 from openbook_common.utils.model_loaders import get_emoji_model, \
     get_circle_model, get_community_model, get_post_comment_notification_model, \
     get_post_comment_reply_notification_model, get_post_reaction_notification_model, get_moderated_object_model, \
@@ -41,18 +47,26 @@ from openbook_common.utils.model_loaders import get_emoji_model, \
     get_post_user_mention_model, get_post_comment_user_mention_model, get_community_notifications_subscription_model, \
     get_community_new_post_notification_model, get_user_new_post_notification_model, \
     get_hashtag_model, get_user_notifications_subscription_model, get_trending_post_model, \
-    get_post_comment_reaction_notification_model
+    get_post_comment_reaction_notification_model, get_community_membership_model, get_follow_model, \
+    get_connection_model, get_notification_model, get_hashtag_stats_model, get_media_blob_model, \
+    get_blocked_media_hash_model
 from imagekit.models import ProcessedImageField
 
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.helpers import send_post_comment_user_mention_push_notification, \
-    send_post_user_mention_push_notification, send_community_new_post_push_notification, \
-    send_user_new_post_push_notification
+    send_post_user_mention_push_notification, send_post_comment_user_mention_push_notifications, \
+    send_post_user_mention_push_notifications
 from openbook_posts.checkers import check_can_be_updated, check_can_add_media, check_can_be_published, \
-    check_mimetype_is_supported_media_mimetypes
+    check_mimetype_is_supported_media_mimetypes, check_media_hash_is_not_blocked
 from openbook_posts.helpers import upload_to_post_image_directory, upload_to_post_video_directory, \
-    upload_to_post_directory
-from openbook_posts.jobs import process_post_media
+    upload_to_post_directory, upload_to_post_media_upload_directory
+from openbook_posts.jobs import process_post_media, fan_out_post_to_timelines, notify_post_subscribers, \
+    create_post_user_mentions, create_post_comment_user_mentions, update_hashtags_media_with_post, \
+    process_post_media_upload
+from openbook_posts.queries import make_exclude_reported_posts_by_user_with_id_query, \
+    make_exclude_blocked_posts_for_user_with_id_query, make_exclude_community_posts_banned_from_for_user_with_id_query, \
+    make_only_public_posts_query, make_exclude_reported_and_approved_posts_query, \
+    make_count_post_comments_query_for_user_with_id
 
 magic = get_magic()
 from openbook_common.helpers import get_language_for_text
@@ -92,6 +106,17 @@ class Post(models.Model):
                                           upload_to=upload_to_post_directory,
                                           blank=False, null=True, format='JPEG', options={'quality': 30},
                                           processors=[ResizeToFit(width=512, upscale=False)])
+    # Maintained counters, see update_comments_count_for_post_with_id and update_reactions_count_for_post_with_id
+    comments_count = models.PositiveIntegerField(_('comments count'), default=0, editable=False)
+    reactions_count = models.PositiveIntegerField(_('reactions count'), default=0, editable=False)
+
+    COUNTERS_FIELDS = ('comments_count', 'reactions_count',)
+    # The max width and JPEG quality of a media_thumbnail made from an image, see PostImage.create_post_media_image
+    MEDIA_THUMBNAIL_DERIVATIVE = (512, 30)
+    # The fields set from the first media of the post, see _add_media_with_file
+    MEDIA_FIELDS = ('media_width', 'media_height', 'media_thumbnail',)
+    # The fields which changes are processed on save, see _process_content_changes
+    CONTENT_STATE_FIELDS = ('text', 'status', 'is_deleted', 'is_closed',)
 
     class Meta:
         index_together = [
@@ -152,9 +177,73 @@ class Post(models.Model):
 
     @classmethod
     def get_emoji_counts_for_post_with_id(cls, post_id, emoji_id=None, reactor_id=None):
+        if not emoji_id and not reactor_id:
+            return PostReactionEmojiCount.get_emoji_counts_for_post_with_id(post_id=post_id)
+
         Emoji = get_emoji_model()
         return Emoji.get_emoji_counts_for_post_with_id(post_id=post_id, emoji_id=emoji_id, reactor_id=reactor_id)
 
+    @classmethod
+    def update_comments_count_for_post_with_id(cls, post_id, delta):
+        cls._update_counter_for_post_with_id(post_id=post_id, counter_name='comments_count', delta=delta)
+
+    @classmethod
+    def update_reactions_count_for_post_with_id(cls, post_id, emoji_id, delta):
+        cls._update_counter_for_post_with_id(post_id=post_id, counter_name='reactions_count', delta=delta)
+        PostReactionEmojiCount.update_count_for_post_with_id_and_emoji_with_id(post_id=post_id, emoji_id=emoji_id,
+                                                                               delta=delta)
+
+    @classmethod
+    def _update_counter_for_post_with_id(cls, post_id, counter_name, delta):
+        counter_query = Q(pk=post_id)
+
+        if delta < 0:
+            # Never go below zero, drift is fixed by the repair_post_counters command
+            counter_query.add(Q(**{'%s__gte' % counter_name: -delta}), Q.AND)
+
+        cls.objects.filter(counter_query).update(**{counter_name: F(counter_name) + delta})
+
+    @classmethod
+    def repair_counters_for_posts_with_ids(cls, posts_ids):
+        """
+        Recomputes the counters of the given posts and their reactions emoji counts.
+        Returns the amount of posts which counters had drifted.
+        """
+        total_repaired_posts = 0
+
+        with transaction.atomic():
+            # Lock the posts first so no counter update happens between counting and writing
+            posts = list(cls.objects.select_for_update().only('id', *cls.COUNTERS_FIELDS).filter(pk__in=posts_ids))
+
+            comments_counts = dict(
+                PostComment.objects.filter(post_id__in=posts_ids, parent_comment__isnull=True, is_deleted=False).values(
+                    'post_id').annotate(count=Count('id')).order_by().values_list('post_id', 'count'))
+
+            emoji_counts = list(
+                PostReaction.objects.filter(post_id__in=posts_ids).values('post_id', 'emoji_id').annotate(
+                    count=Count('id')).order_by())
+
+            reactions_counts = {}
+            for emoji_count in emoji_counts:
+                reactions_counts[emoji_count['post_id']] = reactions_counts.get(emoji_count['post_id'], 0) + \
+                                                           emoji_count['count']
+
+            for post in posts:
+                comments_count = comments_counts.get(post.pk, 0)
+                reactions_count = reactions_counts.get(post.pk, 0)
+
+                if post.comments_count != comments_count or post.reactions_count != reactions_count:
+                    cls.objects.filter(pk=post.pk).update(comments_count=comments_count,
+                                                          reactions_count=reactions_count)
+                    total_repaired_posts += 1
+
+            PostReactionEmojiCount.objects.filter(post_id__in=posts_ids).delete()
+            PostReactionEmojiCount.objects.bulk_create(
+                [PostReactionEmojiCount(post_id=emoji_count['post_id'], emoji_id=emoji_count['emoji_id'],
+                                        count=emoji_count['count']) for emoji_count in emoji_counts])
+
+        return total_repaired_posts
+
     @classmethod
     def get_trending_posts_for_user_with_id(cls, user_id, max_id=None, min_id=None):
         """
@@ -177,16 +266,18 @@ class Post(models.Model):
                       'post__community__avatar',
                       'post__community__color', 'post__community__title')
 
-        reported_posts_exclusion_query = ~Q(post__moderated_object__reports__reporter_id=user_id)
+        reported_posts_exclusion_query = make_exclude_reported_posts_by_user_with_id_query(user_id=user_id,
+                                                                                           post_prefix='post__')
 
         trending_community_posts_query = Q(post__is_closed=False,
                                            post__is_deleted=False,
                                            post__status=Post.STATUS_PUBLISHED)
 
-        trending_community_posts_query.add(~Q(Q(post__creator__blocked_by_users__blocker_id=user_id) | Q(
-            post__creator__user_blocks__blocked_user_id=user_id)), Q.AND)
+        trending_community_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(
+            user_id=user_id, user_field='post__creator'), Q.AND)
         trending_community_posts_query.add(Q(post__community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
-        trending_community_posts_query.add(~Q(post__community__banned_users__id=user_id), Q.AND)
+        trending_community_posts_query.add(make_exclude_community_posts_banned_from_for_user_with_id_query(
+            user_id=user_id, post_prefix='post__'), Q.AND)
 
         if max_id:
             trending_community_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -212,12 +303,12 @@ class Post(models.Model):
         For backwards compatibility reasons
         """
         trending_posts_query = cls._get_trending_posts_old_query()
-        trending_posts_query.add(~Q(community__banned_users__id=user_id), Q.AND)
+        trending_posts_query.add(make_exclude_community_posts_banned_from_for_user_with_id_query(user_id=user_id),
+                                 Q.AND)
 
-        trending_posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-            creator__user_blocks__blocked_user_id=user_id)), Q.AND)
+        trending_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id), Q.AND)
 
-        trending_posts_query.add(~Q(moderated_object__reports__reporter_id=user_id), Q.AND)
+        trending_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=user_id), Q.AND)
 
         trending_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
@@ -343,36 +434,22 @@ class Post(models.Model):
         return target_subscriptions
 
     def count_comments(self):
-        return PostComment.count_comments_for_post_with_id(self.pk)
+        return self.comments_count
 
     def count_comments_with_user(self, user):
-        # Count comments excluding users blocked by authenticated user
-        count_query = ~Q(Q(commenter__blocked_by_users__blocker_id=user.pk) | Q(
-            commenter__user_blocks__blocked_user_id=user.pk))
+        is_community_staff = self.community_id is not None and user.is_staff_of_community_with_name(
+            community_name=self.community.name)
 
-        if self.community:
-            if not user.is_staff_of_community_with_name(community_name=self.community.name):
-                # Dont retrieve comments except from staff members
-                blocked_users_query_staff_members = Q(
-                    commenter__communities_memberships__community_id=self.community.pk)
-                blocked_users_query_staff_members.add(Q(commenter__communities_memberships__is_administrator=True) | Q(
-                    commenter__communities_memberships__is_moderator=True), Q.AND)
-
-                count_query.add(~blocked_users_query_staff_members, Q.AND)
-
-            # Don't count items that have been reported and approved by community moderators
-            ModeratedObject = get_moderated_object_model()
-            count_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
-
-        # Dont count soft deleted items
-        count_query.add(Q(is_deleted=False), Q.AND)
-
-        # Dont count items we have reported
-        count_query.add(~Q(moderated_object__reports__reporter_id=user.pk), Q.AND)
+        count_query = make_count_post_comments_query_for_user_with_id(user_id=user.pk,
+                                                                       community_id=self.community_id,
+                                                                       is_community_staff=is_community_staff)
 
         return self.comments.filter(count_query).count()
 
     def count_reactions(self, reactor_id=None):
+        if not reactor_id:
+            return self.reactions_count
+
         return PostReaction.count_reactions_for_post_with_id(self.pk, reactor_id=reactor_id)
 
     def is_text_only_post(self):
@@ -430,7 +507,8 @@ class Post(models.Model):
         self.text = text
         self.is_edited = True
         self.language = get_language_for_text(text)
-        self.save()
+        # The counters are updated atomically elsewhere, dont overwrite them with the instance values
+        self.save(update_fields=['text', 'is_edited', 'language', 'modified'])
 
     def get_media(self):
         return self.media
@@ -438,6 +516,14 @@ class Post(models.Model):
     def add_media(self, file, order=None):
         check_can_add_media(post=self)
 
+        if settings.POST_MEDIA_ASYNC_PROCESSING_ENABLED:
+            # The process_post_media_upload job adds the media once processed
+            return PostMediaUpload.create_post_media_upload(file=file, post_id=self.pk, order=order)
+
+        self._add_media_with_file(file=file, order=order)
+        self.save()
+
+    def _add_media_with_file(self, file, order):
         is_in_memory_file = isinstance(file, InMemoryUploadedFile) or isinstance(file, SimpleUploadedFile)
 
         if is_in_memory_file:
@@ -477,11 +563,11 @@ class Post(models.Model):
         has_other_media = self.media.exists()
 
         if file_mime_type == 'image':
-            post_image = self._add_media_image(image=file, order=order)
+            # Sets the media thumbnail too
+            post_image = self._add_media_image(image=file, order=order, with_media_thumbnail=not has_other_media)
             if not has_other_media:
                 self.media_width = post_image.width
                 self.media_height = post_image.height
-                self.media_thumbnail = file
         elif file_mime_type == 'video':
             post_video = self._add_media_video(video=file, order=order)
             if not has_other_media:
@@ -496,16 +582,15 @@ class Post(models.Model):
         for file_to_close in temp_files_to_close:
             file_to_close.close()
 
-        self.save()
-
     def get_first_media(self):
         return self.media.first()
 
     def get_first_media_image(self):
         return self.media.filter(type=PostMedia.MEDIA_TYPE_IMAGE).first()
 
-    def _add_media_image(self, image, order):
-        return PostImage.create_post_media_image(image=image, post_id=self.pk, order=order)
+    def _add_media_image(self, image, order, with_media_thumbnail=False):
+        return PostImage.create_post_media_image(image=image, post_id=self.pk, order=order,
+                                                 media_thumbnail_post=self if with_media_thumbnail else None)
 
     def _add_media_video(self, video, order):
         return PostVideo.create_post_media_video(file=video, post_id=self.pk, order=order)
@@ -513,28 +598,53 @@ class Post(models.Model):
     def count_media(self):
         return self.media.count()
 
+    def get_pending_media(self):
+        return self.media_uploads.filter(status=PostMediaUpload.STATUS_PROCESSING)
+
+    def count_pending_media(self):
+        return self.get_pending_media().count()
+
+    def has_pending_media(self):
+        return self.get_pending_media().exists()
+
     def publish(self):
         check_can_be_published(post=self)
 
-        if self.has_media():
-            # After finishing, this will call _publish()
-            self.status = Post.STATUS_PROCESSING
-            self.save()
-            process_post_media.delay(post_id=self.pk)
+        if self.has_media() or self.has_pending_media():
+            with transaction.atomic():
+                # Lock the post so the process_post_media_upload jobs see the processing status, see
+                # PostMediaUpload.process
+                Post.objects.select_for_update().only('id').get(pk=self.pk)
+                # The process_post_media_upload jobs could have set them meanwhile
+                self.refresh_from_db(fields=self.MEDIA_FIELDS)
+                # After finishing, this will call _publish()
+                self.status = Post.STATUS_PROCESSING
+                self.save()
+
+                if not self.has_pending_media():
+                    process_post_media.delay(post_id=self.pk)
+                # Otherwise the last process_post_media_upload job of the post will do it
         else:
             self._publish()
 
     def _publish(self):
         self.status = Post.STATUS_PUBLISHED
         self.created = timezone.now()
-        self._process_post_subscribers()
         self.save()
+        # Without an enclosing transaction the jobs are enqueued right away, so only after saving
+        self._process_post_subscribers()
+        self._fan_out_to_timelines()
+
+    def _fan_out_to_timelines(self):
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            transaction.on_commit(lambda: fan_out_post_to_timelines.delay(post_id=self.pk))
 
     def is_draft(self):
         return self.status == Post.STATUS_DRAFT
 
     def is_empty(self):
-        return not self.text and not hasattr(self, 'image') and not hasattr(self, 'video') and not self.has_media()
+        return not self.text and not hasattr(self, 'image') and not hasattr(self, 'video') and \
+               not self.has_media() and not self.has_pending_media()
 
     def has_media(self):
         return self.media.exists()
@@ -546,155 +656,152 @@ class Post(models.Model):
 
         self.modified = timezone.now()
 
+        content_state = self._get_content_state()
+        processed_content_state = None if self._state.adding else getattr(self, '_content_processed_state', None)
+
         post = super(Post, self).save(*args, **kwargs)
 
-        self._process_post_mentions()
-        self._process_post_hashtags()
+        if content_state != processed_content_state:
+            self._process_content_changes(content_state=content_state,
+                                          processed_content_state=processed_content_state)
+            self._content_processed_state = content_state
 
         return post
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super(Post, cls).from_db(db, field_names, values)
+        post._content_processed_state = post._get_content_state()
+        return post
+
+    def _get_content_state(self):
+        # Deferred fields stay DEFERRED until assigned or loaded
+        return tuple(self.__dict__.get(field_name, DEFERRED) for field_name in self.CONTENT_STATE_FIELDS)
+
+    def _process_content_changes(self, content_state, processed_content_state):
+        if processed_content_state is None:
+            changed_fields = set(self.CONTENT_STATE_FIELDS)
+        else:
+            changed_fields = set(field_name for field_name, value, processed_value in
+                                 zip(self.CONTENT_STATE_FIELDS, content_state, processed_content_state) if
+                                 value != processed_value)
+
+        # The mentions depend on the text and on who can see the post, which changes once published
+        if 'text' in changed_fields or 'status' in changed_fields:
+            self._process_post_mentions()
+
+        if 'text' in changed_fields:
+            hashtags_ids, removed_hashtags_ids, added_hashtags_ids = self._process_post_hashtags()
+        else:
+            hashtags_ids = removed_hashtags_ids = added_hashtags_ids = None
+
+        self._update_hashtags_stats(processed_content_state=processed_content_state, hashtags_ids=hashtags_ids,
+                                    removed_hashtags_ids=removed_hashtags_ids, added_hashtags_ids=added_hashtags_ids)
+
+        if ('text' in changed_fields or 'status' in changed_fields) and self.status == Post.STATUS_PUBLISHED:
+            self._update_hashtags_media()
+
     def delete(self, *args, **kwargs):
         self.delete_media()
+
+        hashtags_ids = None
+        if self._is_counted_in_hashtags_stats_with_state(content_state=self._get_content_state()) and \
+                self._is_public_for_hashtags_stats():
+            hashtags_ids = list(self.hashtags.values_list('id', flat=True))
+
         super(Post, self).delete(*args, **kwargs)
 
+        if hashtags_ids:
+            HashtagStats = get_hashtag_stats_model()
+            HashtagStats.update_stats_for_hashtags_with_ids(hashtags_ids=hashtags_ids, delta=-1,
+                                                            posts_created=self.created)
+
     def delete_media(self):
         if self.has_image():
-            delete_file_field(self.image.image)
+            self.image.delete_media()
+
+        for post_video in self.videos.all():
+            post_video.delete_media()
+
+        # The process_post_media_upload jobs of the uploads won't find them once deleted
+        for post_media_upload in self.media_uploads.exclude(file=None):
+            post_media_upload.delete_media()
+
+        if self.media_thumbnail:
+            delete_file_field(self.media_thumbnail)
+            # Dont release the same file twice
+            Post.objects.filter(pk=self.pk).update(media_thumbnail=None)
+            self.media_thumbnail = None
+
+    def block_media_hashes(self):
+        BlockedMediaHash = get_blocked_media_hash_model()
+
+        hashes = list(PostImage.objects.filter(post_id=self.pk).values_list('hash', flat=True))
+        hashes.extend(self.videos.values_list('hash', flat=True))
+
+        BlockedMediaHash.block_hashes(hashes=hashes)
 
     def soft_delete(self):
         self.delete_notifications()
         for comment in self.comments.all().iterator():
             comment.soft_delete()
         self.is_deleted = True
-        self.save()
+        # The comments soft deletion updated the counters of this instance
+        self.save(update_fields=['is_deleted', 'modified'])
+
+        if settings.TIMELINE_MATERIALIZED_ENABLED:
+            TimelineEntry.remove_post_with_id_from_timelines(post_id=self.pk)
 
     def unsoft_delete(self):
         self.is_deleted = False
         for comment in self.comments.all().iterator():
             comment.unsoft_delete()
-        self.save()
+        # The comments unsoft deletion updated the counters of this instance
+        self.save(update_fields=['is_deleted', 'modified'])
 
-    def delete_notifications(self):
-        # Remove all post reaction notifications
-        PostReactionNotification = get_post_reaction_notification_model()
-        PostReactionNotification.objects.filter(post_reaction__post_id=self.pk).delete()
+        if self.status == Post.STATUS_PUBLISHED:
+            self._fan_out_to_timelines()
 
-        # Remove all post user mention notifications
-        PostUserMentionNotification = get_post_user_mention_notification_model()
-        PostUserMentionNotification.objects.filter(post_user_mention__post_id=self.pk).delete()
-
-        # Remove all post comment notifications
-        PostCommentNotification = get_post_comment_notification_model()
-        PostCommentNotification.objects.filter(post_comment__post_id=self.pk).delete()
-
-        # Remove all post comment reply notifications
-        PostCommentReplyNotification = get_post_comment_reply_notification_model()
-        PostCommentReplyNotification.objects.filter(post_comment__post_id=self.pk).delete()
-
-        # Remove all post comment reaction notifications
-        PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(
-            post_comment_reaction__post_comment__post_id=self.pk).delete()
-
-        # Remove all post comment user mention notifications
-        PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
-        PostCommentUserMentionNotification.objects.filter(
-            post_comment_user_mention__post_comment__post_id=self.pk).delete()
-
-        # Remove all community new post notifications
-        CommunityNewPostNotification = get_community_new_post_notification_model()
-        CommunityNewPostNotification.objects.filter(post_id=self.pk).delete()
-
-        # Remove all user new post notifications
-        UserNewPostNotification = get_user_new_post_notification_model()
-        UserNewPostNotification.objects.filter(post_id=self.pk).delete()
+    def delete_notifications(self):
+        Notification = get_notification_model()
+        Notification.purge_notifications(notifications_query=self._make_notifications_query())
 
     def delete_notifications_for_user(self, user):
-        # Remove all post reaction notifications
-        PostReactionNotification = get_post_reaction_notification_model()
-        PostReactionNotification.objects.filter(
-            notification__owner_id=user.pk,
-            post_reaction__post_id=self.pk).delete()
-
-        # Remove all post user mention notifications
-        PostUserMentionNotification = get_post_user_mention_notification_model()
-        PostUserMentionNotification.objects.filter(
-            notification__owner_id=user.pk,
-            post_user_mention__post_id=self.pk).delete()
-
-        # Remove all post comment notifications
-        PostCommentNotification = get_post_comment_notification_model()
-        PostCommentNotification.objects.filter(post_comment__post_id=self.pk,
-                                               notification__owner_id=user.pk).delete()
-
-        # Remove all post comment reply notifications
-        PostCommentReplyNotification = get_post_comment_reply_notification_model()
-        PostCommentReplyNotification.objects.filter(post_comment__post_id=self.pk,
-                                                    notification__owner_id=user.pk).delete()
-
-        # Remove all post comment user mention notifications
-        PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
-        PostCommentUserMentionNotification.objects.filter(
-            notification__owner_id=user.pk,
-            post_comment_user_mention__post_comment__post_id=self.pk).delete()
-
-        # Remove all post comment reaction notifications
-        PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(
-            notification__owner_id=user.pk,
-            post_comment_reaction__post_comment__post_id=self.pk).delete()
-
-        # Remove all community new post notifications
-        CommunityNewPostNotification = get_community_new_post_notification_model()
-        CommunityNewPostNotification.objects.filter(notification__owner_id=user.pk,
-                                                    post_id=self.pk).delete()
-
-        # Remove all user new post notifications
-        UserNewPostNotification = get_user_new_post_notification_model()
-        UserNewPostNotification.objects.filter(notification__owner_id=user.pk,
-                                               post_id=self.pk).delete()
+        Notification = get_notification_model()
+        notifications_query = self._make_notifications_query()
+        notifications_query.add(Q(owner_id=user.pk), Q.AND)
+        Notification.purge_notifications(notifications_query=notifications_query)
 
     def delete_notifications_except_for_users(self, excluded_users):
         excluded_ids = [user.pk for user in excluded_users]
 
-        # Remove all post user mention notifications
-        PostUserMentionNotification = get_post_user_mention_notification_model()
-        PostUserMentionNotification.objects.filter(post_user_mention__post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
+        Notification = get_notification_model()
+        notifications_query = self._make_notifications_query()
+        notifications_query.add(~Q(owner_id__in=excluded_ids), Q.AND)
+        Notification.purge_notifications(notifications_query=notifications_query)
 
-        # Remove all post comment notifications
-        PostCommentNotification = get_post_comment_notification_model()
-        PostCommentNotification.objects.filter(post_comment__post_id=self.pk).\
-            exclude(notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all post reaction notifications
+    def _make_notifications_query(self):
+        Notification = get_notification_model()
         PostReactionNotification = get_post_reaction_notification_model()
-        PostReactionNotification.objects.filter(post_reaction__post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all post comment reply notifications
+        PostUserMentionNotification = get_post_user_mention_notification_model()
+        PostCommentNotification = get_post_comment_notification_model()
         PostCommentReplyNotification = get_post_comment_reply_notification_model()
-        PostCommentReplyNotification.objects.filter(post_comment__post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all post comment reaction notifications
         PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(post_comment_reaction__post_comment__post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all post comment user mention notifications
         PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
-        PostCommentUserMentionNotification.objects.filter(post_comment_user_mention__post_comment__post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all community new post notifications
         CommunityNewPostNotification = get_community_new_post_notification_model()
-        CommunityNewPostNotification.objects.filter(post_id=self.pk).exclude(
-            notification__owner_id__in=excluded_ids).delete()
-
-        # Remove all user new post notifications
         UserNewPostNotification = get_user_new_post_notification_model()
-        UserNewPostNotification.objects.filter(post_id=self.pk).exclude(notification__owner_id__in=excluded_ids).delete()
+
+        return Notification.make_notifications_query_for_content_objects(content_objects_querysets=[
+            PostReactionNotification.objects.filter(post_reaction__post_id=self.pk),
+            PostUserMentionNotification.objects.filter(post_user_mention__post_id=self.pk),
+            PostCommentNotification.objects.filter(post_comment__post_id=self.pk),
+            PostCommentReplyNotification.objects.filter(post_comment__post_id=self.pk),
+            PostCommentReactionNotification.objects.filter(post_comment_reaction__post_comment__post_id=self.pk),
+            PostCommentUserMentionNotification.objects.filter(
+                post_comment_user_mention__post_comment__post_id=self.pk),
+            CommunityNewPostNotification.objects.filter(post_id=self.pk),
+            UserNewPostNotification.objects.filter(post_id=self.pk),
+        ])
 
     def get_participants(self):
         User = get_user_model()
@@ -716,84 +823,165 @@ class Post(models.Model):
         return result
 
     def _process_post_mentions(self):
-        if not self.text:
-            self.user_mentions.all().delete()
-        else:
-            usernames = extract_usernames_from_string(string=self.text)
-            if not usernames:
-                self.user_mentions.all().delete()
+        usernames = set(username.lower() for username in extract_usernames_from_string(string=self.text)) if \
+            self.text else set()
+
+        removed_mentions_ids = []
+
+        for mention_id, mention_username in self.user_mentions.values_list('id', 'user__username'):
+            mention_username = mention_username.lower()
+            if mention_username in usernames:
+                usernames.remove(mention_username)
             else:
-                existing_mention_usernames = []
-                for existing_mention in self.user_mentions.only('id', 'user__username').all().iterator():
-                    existing_mention_username = existing_mention.user.username.lower()
-                    if existing_mention_username not in usernames:
-                        existing_mention.delete()
-                    else:
-                        existing_mention_usernames.append(existing_mention_username)
-
-                PostUserMention = get_post_user_mention_model()
-                User = get_user_model()
-
-                for username in usernames:
-                    username = username.lower()
-                    if username not in existing_mention_usernames:
-                        try:
-                            user = User.objects.only('id', 'username').get(username__iexact=username)
-                            user_is_post_creator = user.pk == self.creator_id
-                            if user.can_see_post(post=self) and not user_is_post_creator:
-                                PostUserMention.create_post_user_mention(user=user, post=self)
-                                existing_mention_usernames.append(username)
-                        except User.DoesNotExist:
-                            pass
+                removed_mentions_ids.append(mention_id)
 
-    def _process_post_hashtags(self):
-        if not self.text:
-            self.hashtags.all().delete()
+        if removed_mentions_ids:
+            PostUserMention = get_post_user_mention_model()
+            PostUserMention.objects.filter(id__in=removed_mentions_ids).delete()
+
+        if not usernames:
+            return
+
+        if len(usernames) > settings.INLINE_MENTIONS_MAX_COUNT:
+            usernames = list(usernames)
+            transaction.on_commit(lambda: create_post_user_mentions.delay(post_id=self.pk, usernames=usernames))
         else:
-            hashtags = extract_hashtags_from_string(string=self.text)
-            if not hashtags:
-                self.hashtags.all().delete()
-            else:
-                existing_hashtags = []
-                for existing_hashtag in self.hashtags.only('id', 'name').all().iterator():
-                    if existing_hashtag.name not in hashtags:
-                        self.hashtags.remove(existing_hashtag)
-                    else:
-                        existing_hashtags.append(existing_hashtag.name)
+            PostUserMention = get_post_user_mention_model()
+            PostUserMention.create_post_user_mentions(post=self, usernames=usernames)
 
-                Hashtag = get_hashtag_model()
+    def _process_post_hashtags(self):
+        """
+        Links the post to the hashtags of its text.
+        Returns the ids of the hashtags of the post, and of the removed and added ones.
+        """
+        hashtags_names = extract_hashtags_from_string(string=self.text) if self.text else []
 
-                for hashtag in hashtags:
-                    hashtag = hashtag.lower()
-                    hashtag_obj = Hashtag.get_or_create_hashtag(name=hashtag, post=self)
-                    if hashtag not in existing_hashtags:
-                        self.hashtags.add(hashtag_obj)
+        Hashtag = get_hashtag_model()
+        hashtags = Hashtag.get_or_create_hashtags(names=hashtags_names) if hashtags_names else []
 
-    def _process_post_subscribers(self):
-        if self.community:
-            CommunityNewPostNotification = get_community_new_post_notification_model()
-            community_subscriptions = Post.get_community_notification_target_subscriptions(post=self)
-
-            for subscription in community_subscriptions:
-                CommunityNewPostNotification.create_community_new_post_notification(
-                    post_id=self.pk,
-                    owner_id=subscription.subscriber.pk, community_notifications_subscription_id=subscription.pk)
-                send_community_new_post_push_notification(community_notifications_subscription=subscription)
+        PostHashtag = self.hashtags.through
+        hashtags_ids = set(hashtag.pk for hashtag in hashtags)
+        existing_hashtags_ids = set(PostHashtag.objects.filter(post_id=self.pk).values_list('hashtag_id', flat=True))
+
+        removed_hashtags_ids = existing_hashtags_ids - hashtags_ids
+        added_hashtags_ids = hashtags_ids - existing_hashtags_ids
+
+        if removed_hashtags_ids:
+            PostHashtag.objects.filter(post_id=self.pk, hashtag_id__in=removed_hashtags_ids).delete()
+
+        if added_hashtags_ids:
+            PostHashtag.objects.bulk_create([PostHashtag(post_id=self.pk, hashtag_id=hashtag_id) for hashtag_id in
+                                             added_hashtags_ids], ignore_conflicts=True)
+
+        return hashtags_ids, removed_hashtags_ids, added_hashtags_ids
+
+    def _update_hashtags_stats(self, processed_content_state, hashtags_ids=None, removed_hashtags_ids=None,
+                               added_hashtags_ids=None):
+        """
+        Counts the post in the stats of its hashtags, or stops counting it, when its hashtags or its status,
+        soft deletion or closing change
+        """
+        is_counted = self._is_counted_in_hashtags_stats_with_state(content_state=self._get_content_state())
+
+        if processed_content_state is None:
+            was_counted = False
+        else:
+            # A field never loaded before saving was not changed
+            was_counted = self._is_counted_in_hashtags_stats_with_state(content_state=tuple(
+                getattr(self, field_name) if processed_value is DEFERRED else processed_value for
+                field_name, processed_value in zip(self.CONTENT_STATE_FIELDS, processed_content_state)))
+
+        if not was_counted and not is_counted:
+            return
+
+        if hashtags_ids is None:
+            hashtags_ids = set(self.hashtags.values_list('id', flat=True))
+            removed_hashtags_ids = added_hashtags_ids = set()
+
+        if was_counted and is_counted:
+            uncounted_hashtags_ids, counted_hashtags_ids = removed_hashtags_ids, added_hashtags_ids
+        elif was_counted:
+            previous_hashtags_ids = (hashtags_ids - added_hashtags_ids) | removed_hashtags_ids
+            uncounted_hashtags_ids, counted_hashtags_ids = previous_hashtags_ids, set()
         else:
-            UserNewPostNotification = get_user_new_post_notification_model()
-            user_subscriptions = Post.get_user_notification_target_subscriptions(post=self)
+            uncounted_hashtags_ids, counted_hashtags_ids = set(), hashtags_ids
+
+        if not uncounted_hashtags_ids and not counted_hashtags_ids:
+            return
+
+        if not self._is_public_for_hashtags_stats():
+            return
+
+        HashtagStats = get_hashtag_stats_model()
+        HashtagStats.update_stats_for_hashtags_with_ids(hashtags_ids=uncounted_hashtags_ids, delta=-1,
+                                                        posts_created=self.created)
+        HashtagStats.update_stats_for_hashtags_with_ids(hashtags_ids=counted_hashtags_ids, delta=1,
+                                                        posts_created=self.created)
+
+    def update_hashtags_stats_for_moderation(self, is_approved):
+        """
+        Stops counting the post in the stats of its hashtags once approved by the moderators, or counts it again
+        """
+        if not self._is_counted_in_hashtags_stats_with_state(content_state=self._get_content_state()) or \
+                not self._is_public_for_hashtags_stats(ignore_moderation=True):
+            return
+
+        HashtagStats = get_hashtag_stats_model()
+        HashtagStats.update_stats_for_hashtags_with_ids(hashtags_ids=list(self.hashtags.values_list('id', flat=True)),
+                                                        delta=-1 if is_approved else 1, posts_created=self.created)
+
+    def _is_counted_in_hashtags_stats_with_state(self, content_state):
+        # Same as make_only_hashtags_stats_counted_posts_query, for the fields of the post itself
+        content_state = dict(zip(self.CONTENT_STATE_FIELDS, content_state))
+
+        if DEFERRED in content_state.values():
+            content_state.update(
+                {field_name: getattr(self, field_name) for field_name, value in content_state.items() if
+                 value is DEFERRED})
+
+        return content_state['status'] == Post.STATUS_PUBLISHED and not content_state['is_deleted'] and \
+               not content_state['is_closed']
+
+    def _is_public_for_hashtags_stats(self, ignore_moderation=False):
+        public_query = make_only_public_posts_query()
 
-            for subscription in user_subscriptions:
-                UserNewPostNotification.create_user_new_post_notification(
-                    post_id=self.pk, owner_id=subscription.subscriber.pk,
-                    user_notifications_subscription_id=subscription.pk)
-                send_user_new_post_push_notification(user_notifications_subscription=subscription, post=self)
+        if not ignore_moderation:
+            public_query.add(make_exclude_reported_and_approved_posts_query(), Q.AND)
+
+        return Post.objects.filter(public_query, pk=self.pk).exists()
+
+    def _update_hashtags_media(self):
+        if self.text and extract_hashtags_from_string(string=self.text) and self.is_publicly_visible() and \
+                self.has_media():
+            transaction.on_commit(lambda: update_hashtags_media_with_post.delay(post_id=self.pk))
+
+    def _process_post_subscribers(self):
+        transaction.on_commit(lambda: notify_post_subscribers.delay(post_id=self.pk))
 
 
 class TopPost(models.Model):
     post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='top_post')
     created = models.DateTimeField(editable=False, db_index=True)
 
+    # Redis set with the ids of the posts with new engagement since they were last curated
+    DIRTY_POSTS_KEY = 'ob-api-top-posts-dirty-posts'
+
+    @classmethod
+    def mark_post_as_dirty(cls, post):
+        if not settings.TOP_POSTS_INCREMENTAL_CURATION_ENABLED or not post.community_id:
+            return
+
+        # A rolled back engagement leaves a harmless extra check
+        get_redis_connection().sadd(cls.DIRTY_POSTS_KEY, post.pk)
+
+    @classmethod
+    def pop_dirty_posts_ids(cls, count):
+        return [int(post_id) for post_id in get_redis_connection().spop(cls.DIRTY_POSTS_KEY, count)]
+
+    @classmethod
+    def clear_dirty_posts(cls):
+        get_redis_connection().delete(cls.DIRTY_POSTS_KEY)
+
     def save(self, *args, **kwargs):
         ''' On save, update timestamps '''
         if not self.id:
@@ -807,6 +995,100 @@ class TrendingPost(models.Model):
     post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='trending_post')
     created = models.DateTimeField(editable=False, db_index=True)
 
+    # Redis sorted set with the decayed engagement score of the posts, see record_post_engagement
+    POSTS_SCORES_KEY = 'ob-api-trending-posts-scores'
+    # Redis set per post with the users who engaged with it
+    POST_PARTICIPANTS_KEY = 'ob-api-trending-posts-participants-%d'
+
+    REACTION_SCORE = 1
+    COMMENT_SCORE = 2
+    PARTICIPANT_SCORE = 2
+    # Posts which decayed below this score are evicted
+    MIN_SCORE = 1
+
+    # The scores are stored as log2(score) + time in half lives, so the order of the set is the order of the scores
+    # decayed to any point in time without ever rewriting them
+    _RECORD_POST_ENGAGEMENT_SCRIPT = """
+    local score = tonumber(ARGV[3])
+    if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+        score = score + tonumber(ARGV[4])
+    end
+    redis.call('EXPIRE', KEYS[2], ARGV[6])
+    local now = tonumber(ARGV[5])
+    local stored_score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+    if stored_score then
+        score = score + math.pow(2, tonumber(stored_score) - now)
+    end
+    redis.call('ZADD', KEYS[1], now + math.log(score) / math.log(2), ARGV[1])
+    return 1
+    """
+
+    @classmethod
+    def record_post_engagement(cls, post, participant_id, score, at=None):
+        if not settings.TRENDING_POSTS_SCORES_ENABLED or not post.community_id:
+            return
+
+        redis = get_redis_connection()
+        record_post_engagement_script = redis.register_script(cls._RECORD_POST_ENGAGEMENT_SCRIPT)
+
+        participants_ttl = int(cls.get_scores_window().total_seconds())
+
+        record_post_engagement_script(keys=[cls.POSTS_SCORES_KEY, cls.POST_PARTICIPANTS_KEY % post.pk],
+                                      args=[post.pk, participant_id, score, cls.PARTICIPANT_SCORE,
+                                            cls._get_time_in_half_lives(at=at), participants_ttl])
+
+    @classmethod
+    def get_scores_window(cls):
+        """
+        The time after which an engagement has lost almost all of its score
+        """
+        return cls._get_score_half_life() * 4
+
+    @classmethod
+    def get_top_scored_posts_ids(cls, count):
+        return [int(post_id) for post_id in get_redis_connection().zrevrange(cls.POSTS_SCORES_KEY, 0, count - 1)]
+
+    @classmethod
+    def get_decayed_posts_ids(cls, posts_ids):
+        """
+        Returns which of the given posts have no score left
+        """
+        posts_ids = list(posts_ids)
+        min_stored_score = cls._get_min_stored_score()
+
+        pipeline = get_redis_connection().pipeline(transaction=False)
+        for post_id in posts_ids:
+            pipeline.zscore(cls.POSTS_SCORES_KEY, post_id)
+        stored_scores = pipeline.execute()
+
+        return [post_id for post_id, stored_score in zip(posts_ids, stored_scores) if
+                stored_score is None or stored_score < min_stored_score]
+
+    @classmethod
+    def evict_decayed_posts_scores(cls):
+        return get_redis_connection().zremrangebyscore(cls.POSTS_SCORES_KEY, '-inf',
+                                                       '(%r' % cls._get_min_stored_score())
+
+    @classmethod
+    def clear_posts_scores(cls):
+        redis = get_redis_connection()
+        redis.delete(cls.POSTS_SCORES_KEY)
+        for participants_key in redis.scan_iter(match=cls.POST_PARTICIPANTS_KEY.replace('%d', '*')):
+            redis.delete(participants_key)
+
+    @classmethod
+    def _get_min_stored_score(cls):
+        return cls._get_time_in_half_lives() + math.log2(cls.MIN_SCORE)
+
+    @classmethod
+    def _get_time_in_half_lives(cls, at=None):
+        at = at or timezone.now()
+        return at.timestamp() / cls._get_score_half_life().total_seconds()
+
+    @classmethod
+    def _get_score_half_life(cls):
+        return timedelta(hours=settings.TRENDING_POSTS_SCORE_HALF_LIFE_HOURS)
+
     def save(self, *args, **kwargs):
         ''' On save, update timestamps '''
         if not self.id:
@@ -852,6 +1134,100 @@ class ProfilePostsCommunityExclusion(models.Model):
         return super(ProfilePostsCommunityExclusion, self).save(*args, **kwargs)
 
 
+class TimelineEntry(models.Model):
+    """
+    A materialized entry of the timeline of a user.
+    A user without entries has a cold timeline which gets rebuilt on the next read.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+
+    class Meta:
+        unique_together = ('owner', 'post',)
+
+    @classmethod
+    def timeline_exists_for_user_with_id(cls, user_id):
+        return cls.objects.filter(owner_id=user_id).exists()
+
+    @classmethod
+    def rebuild_timeline_for_user(cls, user):
+        posts = user._get_timeline_posts_with_no_filters().order_by('-id')[:settings.TIMELINE_MAX_LENGTH]
+        timeline_entries = [cls(owner_id=user.pk, post_id=post.pk) for post in posts]
+
+        cls.clear_timeline_for_user_with_id(user_id=user.pk)
+        cls.objects.bulk_create(timeline_entries, ignore_conflicts=True)
+
+    @classmethod
+    def clear_timeline_for_user_with_id(cls, user_id):
+        cls.objects.filter(owner_id=user_id).delete()
+
+    @classmethod
+    def add_post_with_id_to_timelines_for_users_with_ids(cls, post_id, users_ids):
+        # Only warm timelines get the entry, cold ones will pick it up when rebuilt
+        warm_users_ids = cls.objects.filter(owner_id__in=users_ids).values_list('owner_id', flat=True).distinct()
+        timeline_entries = [cls(owner_id=user_id, post_id=post_id) for user_id in warm_users_ids]
+        cls.objects.bulk_create(timeline_entries, ignore_conflicts=True)
+        return len(timeline_entries)
+
+    @classmethod
+    def remove_post_with_id_from_timelines(cls, post_id):
+        cls.objects.filter(post_id=post_id).delete()
+
+    @classmethod
+    def remove_posts_by_creator_with_id_from_timeline_for_user_with_id(cls, creator_id, user_id,
+                                                                     include_community_posts=True):
+        timeline_entries_query = Q(owner_id=user_id, post__creator_id=creator_id)
+
+        if not include_community_posts:
+            timeline_entries_query.add(Q(post__community__isnull=True), Q.AND)
+
+        cls.objects.filter(timeline_entries_query).delete()
+
+    @classmethod
+    def remove_community_with_id_posts_from_timeline_for_user_with_id(cls, community_id, user_id):
+        cls.objects.filter(owner_id=user_id, post__community_id=community_id).delete()
+
+    @classmethod
+    def trim_timeline_for_user_with_id(cls, user_id, max_length=None):
+        if max_length is None:
+            max_length = settings.TIMELINE_MAX_LENGTH
+
+        oldest_kept_posts_ids = cls.objects.filter(owner_id=user_id).order_by('-post_id').values_list(
+            'post_id', flat=True)[max_length - 1:max_length]
+
+        if not oldest_kept_posts_ids:
+            return 0
+
+        deleted, _ = cls.objects.filter(owner_id=user_id, post_id__lt=oldest_kept_posts_ids[0]).delete()
+        return deleted
+
+    @classmethod
+    def get_timeline_target_users_ids_for_post(cls, post):
+        """
+        The ids of the users whose timeline (as built by User._get_timeline_posts_with_no_filters) contains the post
+        """
+        if post.community_id:
+            CommunityMembership = get_community_membership_model()
+            blocked_users_query = Q(user__blocked_by_users__blocker_id=post.creator_id) | Q(
+                user__user_blocks__blocked_user_id=post.creator_id)
+            return CommunityMembership.objects.filter(community_id=post.community_id).exclude(
+                blocked_users_query).values_list('user_id', flat=True)
+
+        Follow = get_follow_model()
+        followers_ids = Follow.objects.filter(followed_user_id=post.creator_id).values_list('user_id', flat=True)
+
+        if not post.is_public_post():
+            Connection = get_connection_model()
+            post_circles_ids = post.circles.values_list('id', flat=True)
+            connected_users_ids = Connection.objects.filter(user_id=post.creator_id,
+                                                            circles__id__in=post_circles_ids,
+                                                            target_connection__circles__isnull=False).values_list(
+                'target_user_id', flat=True)
+            followers_ids = followers_ids.filter(user_id__in=connected_users_ids)
+
+        return [post.creator_id] + list(followers_ids)
+
+
 class PostMedia(OrderedModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media')
     order_with_respect_to = 'post'
@@ -894,20 +1270,78 @@ class PostImage(models.Model):
 
     media = GenericRelation(PostMedia)
 
+    # The max width and JPEG quality of the image and thumbnail fields, see create_post_media_image
+    IMAGE_DERIVATIVE = (1024, 80)
+    THUMBNAIL_DERIVATIVE = (1024, 30)
+
     @classmethod
     def create_post_image(cls, image, post_id):
         hash = sha256sum(file=image.file)
+        check_media_hash_is_not_blocked(hash=hash)
         return cls.objects.create(image=image, post_id=post_id, hash=hash)
 
     @classmethod
-    def create_post_media_image(cls, image, post_id, order):
+    def create_post_media_image(cls, image, post_id, order, media_thumbnail_post=None):
+        """
+        Decodes the image once to make the image, the thumbnail and the media thumbnail of media_thumbnail_post if
+        given, and writes them to the storage at once instead of processing the image for each field. With
+        MEDIA_DEDUPLICATION_ENABLED, the ones already made from the same content are referenced instead.
+        """
         hash = sha256sum(file=image.file)
-        post_image = cls.objects.create(image=image, post_id=post_id, hash=hash, thumbnail=image)
+        check_media_hash_is_not_blocked(hash=hash)
+
+        # Only used to name the files
+        unsaved_post_image = cls(post_id=post_id)
+        derivatives = [cls.IMAGE_DERIVATIVE, cls.THUMBNAIL_DERIVATIVE]
+        derivatives_fields = [(cls._meta.get_field('image'), unsaved_post_image),
+                              (cls._meta.get_field('thumbnail'), unsaved_post_image)]
+
+        if media_thumbnail_post:
+            derivatives.append(Post.MEDIA_THUMBNAIL_DERIVATIVE)
+            derivatives_fields.append((Post._meta.get_field('media_thumbnail'), media_thumbnail_post))
+
+        MediaBlob = get_media_blob_model()
+        derivatives_roles = [MediaBlob.make_role_for_field(field=field) for field, instance in derivatives_fields]
+        derivatives_blobs = None
+
+        if settings.MEDIA_DEDUPLICATION_ENABLED:
+            derivatives_blobs = MediaBlob.reference_blobs_for_hash(hash=hash, roles=derivatives_roles)
+
+        if derivatives_blobs:
+            derivatives_names = [blob.name for blob in derivatives_blobs]
+            image_width, image_height = derivatives_blobs[0].width, derivatives_blobs[0].height
+        else:
+            image_derivatives = make_image_derivatives(file=image, derivatives=derivatives)
+
+            derivatives_names = save_files_concurrently(files=[
+                (field.storage, field.generate_filename(instance, '%s.jpg' % field.name), content) for
+                (field, instance), (content, width, height) in zip(derivatives_fields, image_derivatives)])
+
+            if settings.MEDIA_DEDUPLICATION_ENABLED:
+                for role, name, (content, width, height) in zip(derivatives_roles, derivatives_names,
+                                                                image_derivatives):
+                    MediaBlob.register_blob(hash=hash, role=role, name=name, width=width, height=height)
+
+            image_content, image_width, image_height = image_derivatives[0]
+
+        # Assigning the names instead of files skips the processors of the fields
+        post_image = cls.objects.create(image=derivatives_names[0], width=image_width, height=image_height,
+                                        thumbnail=derivatives_names[1], post_id=post_id, hash=hash)
+
+        if media_thumbnail_post:
+            media_thumbnail_post.media_thumbnail = derivatives_names[2]
+
         PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_IMAGE,
                                     content_object=post_image,
                                     post_id=post_id, order=order)
         return post_image
 
+    def delete_media(self):
+        delete_file_field(self.image)
+        delete_file_field(self.thumbnail)
+        # Dont release the same files twice
+        PostImage.objects.filter(pk=self.pk).update(image=None, thumbnail=None)
+
 
 class PostVideo(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='videos', null=True)
@@ -938,23 +1372,238 @@ class PostVideo(models.Model):
 
     @classmethod
     def create_post_media_video(cls, file, post_id, order):
-        hash = sha256sum(file=file.file)
-        video_backend = get_backend()
-
+        """
+        Works on a local file of the video, which an in memory file is streamed to once while computing its hash.
+        That file is kept for the encoding of the video, see keep_fieldfile_local_copy.
+        """
         if isinstance(file, InMemoryUploadedFile):
-            # If its in memory, doing read shouldn't be an issue as the file should be small.
-            in_disk_file = write_in_memory_file_to_disk(file)
-            thumbnail_path = video_backend.get_thumbnail(video_path=in_disk_file.name, at_time=0.0)
+            local_path, hash = write_file_to_disk_with_sha256sum(file=file)
+            is_local_temp_file = True
         else:
-            thumbnail_path = video_backend.get_thumbnail(video_path=file.file.name, at_time=0.0)
+            local_path, hash = file.file.name, sha256sum(file=file.file)
+            is_local_temp_file = False
+
+        try:
+            check_media_hash_is_not_blocked(hash=hash)
+
+            post_video = None
+
+            if settings.MEDIA_DEDUPLICATION_ENABLED:
+                post_video = cls._create_post_video_from_blobs(hash=hash, post_id=post_id)
+
+            if not post_video:
+                post_video = cls._create_post_video_from_file(file=file, local_path=local_path, hash=hash,
+                                                              post_id=post_id)
+                keep_fieldfile_local_copy(fieldfile=post_video.file, local_path=local_path, move=is_local_temp_file)
+        finally:
+            if is_local_temp_file and os.path.exists(local_path):
+                os.remove(local_path)
+
+        try:
+            PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO,
+                                        content_object=post_video,
+                                        post_id=post_id, order=order)
+        except BaseException:
+            # The video won't be encoded
+            delete_fieldfile_local_copy(fieldfile=post_video.file)
+            raise
+
+        return post_video
+
+    @classmethod
+    def _create_post_video_from_blobs(cls, hash, post_id):
+        """
+        References the video, thumbnail and renditions stored for the same content. The missing renditions are
+        encoded by the process_post_media job.
+        """
+        MediaBlob = get_media_blob_model()
+
+        blobs = MediaBlob.reference_blobs_for_hash(hash=hash, roles=[
+            MediaBlob.make_role_for_field(field=cls._meta.get_field('file')),
+            MediaBlob.make_role_for_field(field=cls._meta.get_field('thumbnail'))])
+
+        if not blobs:
+            return None
+
+        file_blob, thumbnail_blob = blobs
+
+        # Assigning the names instead of files skips reading them for their dimensions
+        post_video = cls.objects.create(file=file_blob.name, width=file_blob.width, height=file_blob.height,
+                                        duration=file_blob.duration, thumbnail=thumbnail_blob.name,
+                                        thumbnail_width=thumbnail_blob.width, thumbnail_height=thumbnail_blob.height,
+                                        post_id=post_id, hash=hash)
+
+        formats_blobs = MediaBlob.get_blobs_for_hash(hash=hash, roles_prefix=cls._get_format_role_prefix())
+
+        if formats_blobs and MediaBlob.reference_blobs(blobs=formats_blobs.values()):
+            content_type = ContentType.objects.get_for_model(cls)
+            Format.objects.bulk_create([
+                Format(object_id=post_video.pk, content_type=content_type, field_name='file',
+                       format=role.split(':', 1)[1], file=blob.name, width=blob.width, height=blob.height,
+                       duration=blob.duration, progress=100) for role, blob in formats_blobs.items()])
+
+        return post_video
+
+    @classmethod
+    def _create_post_video_from_file(cls, file, local_path, hash, post_id):
+        video_backend = get_backend()
+
+        # Probe the local file once, filling the dimensions and duration skips probing the stored file
+        media_info = video_backend.get_media_info(local_path)
+        thumbnail_path = video_backend.get_thumbnail(video_path=local_path, at_time=0.0,
+                                                     video_duration=media_info['duration'])
+
+        try:
+            with open(thumbnail_path, 'rb+') as thumbnail_file:
+                post_video = cls.objects.create(file=file, width=media_info['width'], height=media_info['height'],
+                                                duration=media_info['duration'], post_id=post_id, hash=hash,
+                                                thumbnail=File(thumbnail_file), )
+        finally:
+            os.remove(thumbnail_path)
+
+        if settings.MEDIA_DEDUPLICATION_ENABLED:
+            MediaBlob = get_media_blob_model()
+            MediaBlob.register_blob(hash=hash, role=MediaBlob.make_role_for_field(field=cls._meta.get_field('file')),
+                                    name=post_video.file.name, width=post_video.width, height=post_video.height,
+                                    duration=post_video.duration)
+            MediaBlob.register_blob(hash=hash,
+                                    role=MediaBlob.make_role_for_field(field=cls._meta.get_field('thumbnail')),
+                                    name=post_video.thumbnail.name, width=post_video.thumbnail_width,
+                                    height=post_video.thumbnail_height)
 
-        with open(thumbnail_path, 'rb+') as thumbnail_file:
-            post_video = cls.objects.create(file=file, post_id=post_id, hash=hash, thumbnail=File(thumbnail_file), )
-        PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO,
-                                    content_object=post_video,
-                                    post_id=post_id, order=order)
         return post_video
 
+    @classmethod
+    def _get_format_role_prefix(cls):
+        MediaBlob = get_media_blob_model()
+        return '%s:' % MediaBlob.make_role_for_field(field=Format._meta.get_field('file'))
+
+    def register_formats_blobs(self):
+        """
+        Lets the videos with the same content reference the renditions encoded for this one
+        """
+        if not settings.MEDIA_DEDUPLICATION_ENABLED or not self.hash:
+            return
+
+        MediaBlob = get_media_blob_model()
+        format_role_prefix = self._get_format_role_prefix()
+
+        for video_format in self.format_set.exclude(file=''):
+            MediaBlob.register_blob(hash=self.hash, role='%s%s' % (format_role_prefix, video_format.format),
+                                    name=video_format.file.name, width=video_format.width,
+                                    height=video_format.height, duration=video_format.duration)
+
+    def delete_media(self):
+        if self.file:
+            delete_fieldfile_local_copy(fieldfile=self.file)
+
+        delete_file_field(self.file)
+        delete_file_field(self.thumbnail)
+
+        for video_format in self.format_set.all():
+            delete_file_field(video_format.file)
+
+        # Dont release the same files twice
+        self.format_set.all().delete()
+        PostVideo.objects.filter(pk=self.pk).update(file=None, thumbnail=None)
+
+
+class PostMediaUpload(models.Model):
+    """
+    A media file added to a post while POST_MEDIA_ASYNC_PROCESSING_ENABLED, stored as uploaded until the
+    process_post_media_upload job validates and adds it to the post media
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='media_uploads')
+    file = models.FileField(storage=post_image_storage, upload_to=upload_to_post_media_upload_directory, null=True)
+    order = models.PositiveIntegerField(null=True)
+    created = models.DateTimeField(editable=False, default=timezone.now)
+
+    STATUS_PROCESSING = 'PG'
+    STATUS_PROCESSED = 'P'
+    STATUS_FAILED = 'F'
+    STATUSES = (
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_PROCESSED, 'Processed'),
+        (STATUS_FAILED, 'Failed'),
+    )
+    status = models.CharField(blank=False, null=False, choices=STATUSES, default=STATUS_PROCESSING, max_length=2)
+
+    @classmethod
+    def create_post_media_upload(cls, file, post_id, order):
+        post_media_upload = cls.objects.create(file=file, post_id=post_id, order=order)
+        transaction.on_commit(lambda: process_post_media_upload.delay(post_media_upload_id=post_media_upload.pk))
+        return post_media_upload
+
+    def process(self):
+        """
+        Adds the uploaded file to the post media, then resumes the publishing of the post if it was waiting on it
+        """
+        if self.status != self.STATUS_PROCESSING:
+            return
+
+        try:
+            self._add_to_post_media()
+        except Exception:
+            self._finish_processing(status=self.STATUS_FAILED)
+            raise
+
+        self._finish_processing(status=self.STATUS_PROCESSED)
+
+    def _add_to_post_media(self):
+        post = self.post
+        has_other_media = post.has_media()
+        local_file = self._open_local_file()
+
+        try:
+            post._add_media_with_file(file=File(local_file), order=self.order)
+
+            if not has_other_media:
+                # Dont overwrite the status, the post might have been published meanwhile
+                post.save(update_fields=Post.MEDIA_FIELDS)
+        finally:
+            local_file.close()
+
+    def _open_local_file(self):
+        try:
+            return open(self.file.path, 'rb')
+        except NotImplementedError:
+            # Storage doesnt support absolute paths, download the file keeping its extension
+            local_temp_file = tempfile.NamedTemporaryFile(suffix=os.path.splitext(self.file.name)[1])
+
+            with self.file.open('rb') as storage_file:
+                shutil.copyfileobj(storage_file, local_temp_file)
+
+            local_temp_file.seek(0)
+            return local_temp_file
+
+    def delete_media(self):
+        delete_file_field(self.file)
+        # Dont release the same file twice
+        PostMediaUpload.objects.filter(pk=self.pk).update(file=None)
+        self.file = None
+
+    def _finish_processing(self, status):
+        with transaction.atomic():
+            # Lock the post so its publishing does not miss this upload finishing, see Post.publish
+            post = Post.objects.select_for_update().get(pk=self.post_id)
+
+            self.status = status
+            self.save(update_fields=['status'])
+
+            should_process_post_media = post.status == Post.STATUS_PROCESSING and not post.has_pending_media()
+
+            if should_process_post_media and post.is_empty():
+                # None of the media could be processed, give the post back to its creator
+                Post.objects.filter(pk=post.pk).update(status=Post.STATUS_DRAFT)
+                should_process_post_media = False
+
+        delete_file_field(self.file)
+        self.file = None
+        self.save(update_fields=['file'])
+
+        if should_process_post_media:
+            process_post_media.delay(post_id=self.post_id)
+
 
 class PostComment(models.Model):
     moderated_object = GenericRelation(ModeratedObject, related_query_name='post_comments')
@@ -969,16 +1618,63 @@ class PostComment(models.Model):
     is_edited = models.BooleanField(default=False, null=False, blank=False)
     # This only happens if the comment was reported and found with critical severity content
     is_deleted = models.BooleanField(default=False)
+    # Maintained counter, see update_replies_count_for_post_comment_with_id
+    replies_count = models.PositiveIntegerField(_('replies count'), default=0, editable=False)
+
+    COUNTERS_FIELDS = ('replies_count',)
 
     @classmethod
     def create_comment(cls, text, commenter, post, parent_comment=None):
-        post_comment = PostComment.objects.create(text=text, commenter=commenter, post=post,
-                                                  parent_comment=parent_comment)
+        with transaction.atomic():
+            post_comment = PostComment.objects.create(text=text, commenter=commenter, post=post,
+                                                      parent_comment=parent_comment)
+            post_comment._update_counters_for_added_comment(delta=1)
+            TopPost.mark_post_as_dirty(post=post)
+            # The scores can't be rolled back
+            transaction.on_commit(lambda: TrendingPost.record_post_engagement(post=post,
+                                                                              participant_id=commenter.pk,
+                                                                              score=TrendingPost.COMMENT_SCORE))
+
         post_comment.language = get_language_for_text(text)
-        post_comment.save()
+        post_comment.save(update_fields=['language', 'modified'])
 
         return post_comment
 
+    @classmethod
+    def update_replies_count_for_post_comment_with_id(cls, post_comment_id, delta):
+        counter_query = Q(pk=post_comment_id)
+
+        if delta < 0:
+            # Never go below zero, drift is fixed by the repair_post_counters command
+            counter_query.add(Q(replies_count__gte=-delta), Q.AND)
+
+        cls.objects.filter(counter_query).update(replies_count=F('replies_count') + delta)
+
+    @classmethod
+    def repair_counters_for_post_comments_with_ids(cls, post_comments_ids):
+        """
+        Recomputes the replies count of the given post comments.
+        Returns the amount of post comments which counter had drifted.
+        """
+        total_repaired_post_comments = 0
+
+        with transaction.atomic():
+            post_comments = list(
+                cls.objects.select_for_update().only('id', *cls.COUNTERS_FIELDS).filter(pk__in=post_comments_ids))
+
+            replies_counts = dict(
+                cls.objects.filter(parent_comment_id__in=post_comments_ids).values('parent_comment_id').annotate(
+                    count=Count('id')).order_by().values_list('parent_comment_id', 'count'))
+
+            for post_comment in post_comments:
+                replies_count = replies_counts.get(post_comment.pk, 0)
+
+                if post_comment.replies_count != replies_count:
+                    cls.objects.filter(pk=post_comment.pk).update(replies_count=replies_count)
+                    total_repaired_post_comments += 1
+
+        return total_repaired_post_comments
+
     @classmethod
     def count_comments_for_post_with_id(cls, post_id):
         count_query = Q(post_id=post_id, parent_comment__isnull=True, is_deleted=False)
@@ -991,7 +1687,7 @@ class PostComment(models.Model):
                                                                reactor_id=reactor_id)
 
     def count_replies(self):
-        return self.replies.count()
+        return self.replies_count
 
     def count_replies_with_user(self, user):
         # Count replies excluding users blocked by authenticated user
@@ -1023,7 +1719,7 @@ class PostComment(models.Model):
     def reply_to_comment(self, commenter, text):
         post_comment = PostComment.create_comment(text=text, commenter=commenter, post=self.post, parent_comment=self)
         post_comment.language = get_language_for_text(text)
-        post_comment.save()
+        post_comment.save(update_fields=['language', 'modified'])
 
         return post_comment
 
@@ -1039,150 +1735,136 @@ class PostComment(models.Model):
 
         self.full_clean(exclude=['language'])
 
+        content_changed = self._state.adding or self._get_content_state() != getattr(
+            self, '_content_processed_state', None)
+
         post_comment = super(PostComment, self).save(*args, **kwargs)
 
-        self._process_post_comment_mentions()
-        self._process_post_comment_hashtags()
+        if content_changed:
+            self._process_post_comment_mentions()
+            self._process_post_comment_hashtags()
+            self._content_processed_state = self._get_content_state()
+
+        return post_comment
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post_comment = super(PostComment, cls).from_db(db, field_names, values)
+        post_comment._content_processed_state = post_comment._get_content_state()
         return post_comment
 
+    def _get_content_state(self):
+        return self.__dict__.get('text', DEFERRED)
+
     def _process_post_comment_mentions(self):
-        usernames = extract_usernames_from_string(string=self.text)
+        usernames = set(username.lower() for username in extract_usernames_from_string(string=self.text))
+
+        removed_mentions_ids = []
+
+        for mention_id, mention_username in self.user_mentions.values_list('id', 'user__username'):
+            mention_username = mention_username.lower()
+            if mention_username in usernames:
+                usernames.remove(mention_username)
+            else:
+                removed_mentions_ids.append(mention_id)
+
+        if removed_mentions_ids:
+            PostCommentUserMention = get_post_comment_user_mention_model()
+            PostCommentUserMention.objects.filter(id__in=removed_mentions_ids).delete()
 
         if not usernames:
-            self.user_mentions.all().delete()
-        else:
-            existing_mention_usernames = []
-            for existing_mention in self.user_mentions.only('id', 'user__username').all().iterator():
-                existing_mention_username = existing_mention.user.username.lower()
-                if existing_mention_username not in usernames:
-                    existing_mention.delete()
-                else:
-                    existing_mention_usernames.append(existing_mention_username)
+            return
 
+        if len(usernames) > settings.INLINE_MENTIONS_MAX_COUNT:
+            usernames = list(usernames)
+            transaction.on_commit(lambda: create_post_comment_user_mentions.delay(post_comment_id=self.pk,
+                                                                                 usernames=usernames))
+        else:
             PostCommentUserMention = get_post_comment_user_mention_model()
-            User = get_user_model()
-
-            for username in usernames:
-                username = username.lower()
-                if username not in existing_mention_usernames:
-                    try:
-                        user = User.objects.only('id', 'username').get(username__iexact=username)
-                        user_can_see_post_comment = user.can_see_post_comment(post_comment=self)
-                        user_is_commenter = user.pk == self.commenter_id
-
-                        if not user_can_see_post_comment or user_is_commenter:
-                            continue
-
-                        if self.parent_comment:
-                            user_is_parent_comment_creator = self.parent_comment.commenter_id == user.pk
-                            user_has_replied_before = self.parent_comment.replies.filter(commenter_id=user.pk).exists()
-
-                            if user_has_replied_before or user_is_parent_comment_creator:
-                                # Its a reply to a comment, if the user previously replied to the comment
-                                # or if he's the creator of the parent comment he will already be alerted of the reply,
-                                # no need for mention
-                                continue
-                        else:
-                            user_has_commented_before = self.post.comments.filter(commenter_id=user.pk).exists()
-                            if user_has_commented_before:
-                                # Its a comment to a post, if the user previously commented on the post
-                                # he will already be alerted of the comment, no need for mention
-                                continue
-
-                        PostCommentUserMention.create_post_comment_user_mention(user=user, post_comment=self)
-                        existing_mention_usernames.append(username)
-                    except User.DoesNotExist:
-                        pass
+            PostCommentUserMention.create_post_comment_user_mentions(post_comment=self, usernames=usernames)
 
     def _process_post_comment_hashtags(self):
-        if not self.text:
-            self.hashtags.all().delete()
-        else:
-            hashtags = extract_hashtags_from_string(string=self.text)
-            if not hashtags:
-                self.hashtags.all().delete()
-            else:
-                existing_hashtags = []
-                for existing_hashtag in self.hashtags.only('id', 'name').all().iterator():
-                    if existing_hashtag.name not in hashtags:
-                        self.hashtags.remove(existing_hashtag)
-                    else:
-                        existing_hashtags.append(existing_hashtag.name)
+        hashtags_names = extract_hashtags_from_string(string=self.text) if self.text else []
 
-                Hashtag = get_hashtag_model()
+        Hashtag = get_hashtag_model()
+        hashtags = Hashtag.get_or_create_hashtags(names=hashtags_names) if hashtags_names else []
 
-                for hashtag in hashtags:
-                    hashtag = hashtag.lower()
-                    if hashtag not in existing_hashtags:
-                        hashtag_obj = Hashtag.get_or_create_hashtag(name=hashtag)
-                        self.hashtags.add(hashtag_obj)
+        PostCommentHashtag = self.hashtags.through
+        hashtags_ids = [hashtag.pk for hashtag in hashtags]
+
+        PostCommentHashtag.objects.filter(postcomment_id=self.pk).exclude(hashtag_id__in=hashtags_ids).delete()
+
+        if hashtags_ids:
+            PostCommentHashtag.objects.bulk_create(
+                [PostCommentHashtag(postcomment_id=self.pk, hashtag_id=hashtag_id) for hashtag_id in hashtags_ids],
+                ignore_conflicts=True)
 
     def update_comment(self, text):
         self.text = text
         self.is_edited = True
         self.language = get_language_for_text(text)
-        self.save()
+        # The counters are updated atomically elsewhere, dont overwrite them with the instance values
+        self.save(update_fields=['text', 'is_edited', 'language', 'modified'])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            is_deleted = PostComment.objects.filter(pk=self.pk, is_deleted=True).exists()
+            super(PostComment, self).delete(*args, **kwargs)
+            self._update_counters_for_added_comment(delta=-1, update_comments_count=not is_deleted)
 
     def soft_delete(self):
-        self.is_deleted = True
-        self.delete_notifications()
-        self.save()
+        with transaction.atomic():
+            # Only the call that actually flips the flag updates the counters
+            if PostComment.objects.filter(pk=self.pk, is_deleted=False).update(is_deleted=True):
+                self._update_counters_for_visible_comment(delta=-1)
+            self.is_deleted = True
+            self.delete_notifications()
+            self.save(update_fields=['is_deleted', 'modified'])
 
     def unsoft_delete(self):
-        self.is_deleted = False
-        self.save()
+        with transaction.atomic():
+            if PostComment.objects.filter(pk=self.pk, is_deleted=True).update(is_deleted=False):
+                self._update_counters_for_visible_comment(delta=1)
+            self.is_deleted = False
+            self.save(update_fields=['is_deleted', 'modified'])
+
+    def _update_counters_for_added_comment(self, delta, update_comments_count=True):
+        if self.parent_comment_id:
+            PostComment.update_replies_count_for_post_comment_with_id(post_comment_id=self.parent_comment_id,
+                                                                      delta=delta)
+        elif update_comments_count:
+            Post.update_comments_count_for_post_with_id(post_id=self.post_id, delta=delta)
+
+    def _update_counters_for_visible_comment(self, delta):
+        # Replies count includes the soft deleted replies, only the post comments count changes
+        if not self.parent_comment_id:
+            Post.update_comments_count_for_post_with_id(post_id=self.post_id, delta=delta)
 
     def delete_notifications(self):
-        # Delete all post comment notifications
-        PostCommentNotification = get_post_comment_notification_model()
-        PostCommentNotification.objects.filter(post_comment_id=self.pk).delete()
-
-        # Delete all post comments reply notifications
-        PostCommentReplyNotification = get_post_comment_reply_notification_model()
-        PostCommentReplyNotification.objects.filter(post_comment__parent_comment_id=self.pk).delete()
-
-        # Delete all post comment reaction notifications
-        PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(post_comment_reaction__post_comment_id=self.pk).delete()
-
-        # Delete all post comment reply reaction notifications
-        PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(
-            post_comment_reaction__post_comment__parent_comment_id=self.pk).delete()
-
-        # Delete all post comment user mention notifications
-        PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
-        PostCommentUserMentionNotification.objects.filter(
-            post_comment_user_mention__post_comment__post_id=self.pk).delete()
+        Notification = get_notification_model()
+        Notification.purge_notifications(notifications_query=self._make_notifications_query())
 
     def delete_notifications_for_user(self, user):
-        # Delete all post comment notifications
-        PostCommentNotification = get_post_comment_notification_model()
-        PostCommentNotification.objects.filter(post_comment_id=self.pk,
-                                               notification__owner_id=user.pk).delete()
+        Notification = get_notification_model()
+        notifications_query = self._make_notifications_query()
+        notifications_query.add(Q(owner_id=user.pk), Q.AND)
+        Notification.purge_notifications(notifications_query=notifications_query)
 
-        # Delete all post comments reply notifications
+    def _make_notifications_query(self):
+        Notification = get_notification_model()
+        PostCommentNotification = get_post_comment_notification_model()
         PostCommentReplyNotification = get_post_comment_reply_notification_model()
-        PostCommentReplyNotification.objects.filter(post_comment__parent_comment_id=self.pk,
-                                                    notification__owner_id=user.pk).delete()
-
-        # Delete all post comment reaction notifications
         PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(post_comment_reaction__post_comment_id=self.pk,
-                                                       notification__owner_id=user.pk).delete()
-
-        # Delete all post comment reply reaction notifications
-        PostCommentReactionNotification = get_post_comment_reaction_notification_model()
-        PostCommentReactionNotification.objects.filter(
-            notification__owner_id=user.pk,
-            post_comment_reaction__post_comment__parent_comment_id=self.pk).delete()
-
-        # Delete all post comment user mention notifications
         PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
-        PostCommentUserMentionNotification.objects.filter(
-            post_comment_user_mention__post_comment__post_id=self.pk,
-            notification__owner_id=user.pk).delete()
+
+        return Notification.make_notifications_query_for_content_objects(content_objects_querysets=[
+            PostCommentNotification.objects.filter(post_comment_id=self.pk),
+            PostCommentReplyNotification.objects.filter(post_comment__parent_comment_id=self.pk),
+            PostCommentReactionNotification.objects.filter(post_comment_reaction__post_comment_id=self.pk),
+            PostCommentReactionNotification.objects.filter(
+                post_comment_reaction__post_comment__parent_comment_id=self.pk),
+            PostCommentUserMentionNotification.objects.filter(post_comment_user_mention__post_comment_id=self.pk),
+        ])
 
 
 class PostReaction(models.Model):
@@ -1196,7 +1878,38 @@ class PostReaction(models.Model):
 
     @classmethod
     def create_reaction(cls, reactor, emoji_id, post):
-        return PostReaction.objects.create(reactor=reactor, emoji_id=emoji_id, post=post)
+        with transaction.atomic():
+            post_reaction = PostReaction.objects.create(reactor=reactor, emoji_id=emoji_id, post=post)
+            Post.update_reactions_count_for_post_with_id(post_id=post.pk, emoji_id=emoji_id, delta=1)
+            TopPost.mark_post_as_dirty(post=post)
+            # The scores can't be rolled back
+            transaction.on_commit(lambda: TrendingPost.record_post_engagement(post=post,
+                                                                              participant_id=reactor.pk,
+                                                                              score=TrendingPost.REACTION_SCORE))
+
+        return post_reaction
+
+    @classmethod
+    def get_emoji_counts_for_reactions_by_post_id(cls, reactions_query):
+        """
+        The emoji counts of the reactions matching the query by post id, the most used emojis first
+        """
+        Emoji = get_emoji_model()
+
+        reactions_counts = list(cls.objects.filter(reactions_query).values('post_id', 'emoji_id').annotate(
+            reactions_count=Count('id')).order_by('post_id', '-reactions_count', 'emoji_id'))
+
+        emojis = Emoji.objects.in_bulk(set(reactions_count['emoji_id'] for reactions_count in reactions_counts))
+
+        emoji_counts = {}
+
+        for reactions_count in reactions_counts:
+            emoji_counts.setdefault(reactions_count['post_id'], []).append({
+                'emoji': emojis[reactions_count['emoji_id']],
+                'count': reactions_count['reactions_count']
+            })
+
+        return emoji_counts
 
     @classmethod
     def count_reactions_for_post_with_id(cls, post_id, reactor_id=None):
@@ -1213,6 +1926,54 @@ class PostReaction(models.Model):
             self.created = timezone.now()
         return super(PostReaction, self).save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            super(PostReaction, self).delete(*args, **kwargs)
+            Post.update_reactions_count_for_post_with_id(post_id=self.post_id, emoji_id=self.emoji_id, delta=-1)
+
+    def update_emoji(self, emoji_id):
+        with transaction.atomic():
+            previous_emoji_id = self.emoji_id
+            self.emoji_id = emoji_id
+            self.save()
+
+            if previous_emoji_id != emoji_id:
+                PostReactionEmojiCount.update_count_for_post_with_id_and_emoji_with_id(post_id=self.post_id,
+                                                                                       emoji_id=previous_emoji_id,
+                                                                                       delta=-1)
+                PostReactionEmojiCount.update_count_for_post_with_id_and_emoji_with_id(post_id=self.post_id,
+                                                                                       emoji_id=emoji_id,
+                                                                                       delta=1)
+
+
+class PostReactionEmojiCount(models.Model):
+    """
+    The maintained amount of reactions of a post per emoji
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reactions_emoji_counts')
+    emoji = models.ForeignKey(Emoji, on_delete=models.CASCADE, related_name='post_reactions_emoji_counts')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'emoji',)
+
+    @classmethod
+    def get_emoji_counts_for_post_with_id(cls, post_id):
+        emoji_counts = cls.objects.select_related('emoji').filter(post_id=post_id, count__gt=0).order_by('-count')
+
+        return [{'emoji': emoji_count.emoji, 'count': emoji_count.count} for emoji_count in emoji_counts]
+
+    @classmethod
+    def update_count_for_post_with_id_and_emoji_with_id(cls, post_id, emoji_id, delta):
+        if delta > 0:
+            emoji_count, created = cls.objects.get_or_create(post_id=post_id, emoji_id=emoji_id,
+                                                             defaults={'count': delta})
+            if not created:
+                cls.objects.filter(pk=emoji_count.pk).update(count=F('count') + delta)
+        else:
+            cls.objects.filter(post_id=post_id, emoji_id=emoji_id, count__gte=-delta).update(count=F('count') + delta)
+            cls.objects.filter(post_id=post_id, emoji_id=emoji_id, count=0).delete()
+
 
 class PostCommentReaction(models.Model):
     post_comment = models.ForeignKey(PostComment, on_delete=models.CASCADE, related_name='reactions')
@@ -1284,6 +2045,45 @@ class PostUserMention(models.Model):
         return post_user_mention
 
 
+    @classmethod
+    def create_post_user_mentions(cls, post, usernames):
+        """
+        Mentions the users with the given usernames that can see the post, notifying them.
+        The post creator and the users already mentioned are skipped. Returns the created mentions.
+        """
+        User = get_user_model()
+
+        users = [user for user in cls._get_users_with_usernames(usernames=usernames) if
+                 user.pk != post.creator_id]
+
+        mentioned_users_ids = set(cls.objects.filter(post=post, user__in=users).values_list('user_id', flat=True))
+        users = [user for user in users if user.pk not in mentioned_users_ids]
+
+        if not users:
+            return []
+
+        visible_users_ids = User.get_users_ids_that_can_see_post(users=users, post=post)
+        users_ids = [user.pk for user in users if user.pk in visible_users_ids]
+
+        cls.objects.bulk_create([cls(user_id=user_id, post=post) for user_id in users_ids], ignore_conflicts=True)
+
+        # Not every database returns the ids of bulk created rows
+        post_user_mentions = list(cls.objects.select_related('user__notifications_settings', 'user__language').filter(
+            post=post, user_id__in=users_ids))
+
+        PostUserMentionNotification = get_post_user_mention_notification_model()
+        PostUserMentionNotification.create_post_user_mention_notifications(post_user_mentions=post_user_mentions)
+        send_post_user_mention_push_notifications(post=post, post_user_mentions=post_user_mentions)
+
+        return post_user_mentions
+
+    @classmethod
+    def _get_users_with_usernames(cls, usernames):
+        User = get_user_model()
+        return list(User.objects.annotate(username_lower=Lower('username')).filter(
+            username_lower__in=[username.lower() for username in usernames]))
+
+
 class PostCommentUserMention(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_comment_mentions')
     post_comment = models.ForeignKey(PostComment, on_delete=models.CASCADE, related_name='user_mentions')
@@ -1300,3 +2100,60 @@ class PostCommentUserMention(models.Model):
             owner_id=user.pk)
         send_post_comment_user_mention_push_notification(post_comment_user_mention=post_comment_user_mention)
         return post_comment_user_mention
+
+    @classmethod
+    def create_post_comment_user_mentions(cls, post_comment, usernames):
+        """
+        Mentions the users with the given usernames that can see the post comment, notifying them.
+        The commenter, the users already mentioned and the users already notified of the comment as
+        participants of the post or of the parent comment are skipped. Returns the created mentions.
+        """
+        User = get_user_model()
+
+        users = [user for user in PostUserMention._get_users_with_usernames(usernames=usernames) if
+                 user.pk != post_comment.commenter_id]
+
+        mentioned_users_ids = set(cls.objects.filter(post_comment=post_comment, user__in=users).values_list(
+            'user_id', flat=True))
+        users = [user for user in users if user.pk not in mentioned_users_ids]
+
+        if not users:
+            return []
+
+        parent_comment = post_comment.parent_comment
+
+        if parent_comment:
+            # Its a reply to a comment, if the user previously replied to the comment or if he's the creator of
+            # the parent comment he will already be alerted of the reply, no need for mention
+            participants_ids = set(parent_comment.replies.filter(commenter__in=users).values_list(
+                'commenter_id', flat=True))
+            participants_ids.add(parent_comment.commenter_id)
+        else:
+            # Its a comment to a post, if the user previously commented on the post he will already be alerted
+            # of the comment, no need for mention
+            participants_ids = set(post_comment.post.comments.filter(commenter__in=users).values_list(
+                'commenter_id', flat=True))
+
+        users = [user for user in users if user.pk not in participants_ids]
+
+        if not users:
+            return []
+
+        visible_users_ids = User.get_users_ids_that_can_see_post_comment(users=users, post_comment=post_comment)
+        users_ids = [user.pk for user in users if user.pk in visible_users_ids]
+
+        cls.objects.bulk_create([cls(user_id=user_id, post_comment=post_comment) for user_id in users_ids],
+                                ignore_conflicts=True)
+
+        # Not every database returns the ids of bulk created rows
+        post_comment_user_mentions = list(
+            cls.objects.select_related('user__notifications_settings', 'user__language').filter(
+                post_comment=post_comment, user_id__in=users_ids))
+
+        PostCommentUserMentionNotification = get_post_comment_user_mention_notification_model()
+        PostCommentUserMentionNotification.create_post_comment_user_mention_notifications(
+            post_comment_user_mentions=post_comment_user_mentions)
+        send_post_comment_user_mention_push_notifications(post_comment=post_comment,
+                                                          post_comment_user_mentions=post_comment_user_mentions)
+
+        return post_comment_user_mentions
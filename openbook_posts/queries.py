@@ -1,7 +1,7 @@
 from django.db.models import Q
 
 from openbook_common.utils.model_loaders import get_post_model, get_moderated_object_model, get_community_model, \
-    get_circle_model
+    get_circle_model, get_user_model, get_community_membership_model
 
 
 def make_only_posts_with_max_id(max_id):
@@ -40,12 +40,33 @@ def make_exclude_reported_and_approved_posts_query():
     return ~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED)
 
 
-def make_exclude_reported_posts_by_user_with_id_query(user_id):
+def make_exclude_reported_posts_by_user_with_id_query(user_id, post_prefix=''):
+    reported_posts_ids = _get_exclusion_ids_for_user_with_id(user_id=user_id, exclusion='reported_posts_ids')
+
+    if reported_posts_ids is not None:
+        return _make_exclude_ids_query(field='%sid' % post_prefix, ids=reported_posts_ids)
+
+    return ~Q(**{'%smoderated_object__reports__reporter_id' % post_prefix: user_id})
+
+
+def make_exclude_reported_post_comments_by_user_with_id_query(user_id):
+    reported_post_comments_ids = _get_exclusion_ids_for_user_with_id(user_id=user_id,
+                                                                     exclusion='reported_post_comments_ids')
+
+    if reported_post_comments_ids is not None:
+        return _make_exclude_ids_query(field='id', ids=reported_post_comments_ids)
+
     return ~Q(moderated_object__reports__reporter_id=user_id)
 
 
-def make_exclude_community_posts_banned_from_for_user_with_id_query(user_id):
-    return ~Q(community__banned_users__id=user_id)
+def make_exclude_community_posts_banned_from_for_user_with_id_query(user_id, post_prefix=''):
+    banned_from_communities_ids = _get_exclusion_ids_for_user_with_id(user_id=user_id,
+                                                                      exclusion='banned_from_communities_ids')
+
+    if banned_from_communities_ids is not None:
+        return _make_exclude_ids_query(field='%scommunity_id' % post_prefix, ids=banned_from_communities_ids)
+
+    return ~Q(**{'%scommunity__banned_users__id' % post_prefix: user_id})
 
 
 def make_exclude_closed_posts_in_community_for_user_with_id_query(user_id):
@@ -56,14 +77,27 @@ def make_exclude_closed_posts_query():
     return Q(is_closed=False)
 
 
-def make_exclude_blocked_community_posts_for_user_and_community_with_ids(user_id, community_id):
+def make_exclude_blocked_community_posts_for_user_and_community_with_ids(user_id, community_id, user_field='creator'):
     # Don't retrieve posts of blocked users, except if they're staff members
-    blocked_users_query = ~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-        creator__user_blocks__blocked_user_id=user_id))
+    blocked_users_ids = _get_exclusion_ids_for_user_with_id(user_id=user_id, exclusion='blocked_users_ids')
+
+    if blocked_users_ids is not None:
+        if not blocked_users_ids:
+            return Q()
+
+        CommunityMembership = get_community_membership_model()
+        community_staff_members_ids = CommunityMembership.objects.filter(
+            Q(community_id=community_id) & Q(Q(is_administrator=True) | Q(is_moderator=True))).values('user_id')
 
-    blocked_users_query_staff_members = Q(creator__communities_memberships__community_id=community_id)
-    blocked_users_query_staff_members.add(Q(creator__communities_memberships__is_administrator=True) | Q(
-        creator__communities_memberships__is_moderator=True), Q.AND)
+        return _make_exclude_ids_query(field='%s_id' % user_field, ids=blocked_users_ids) | Q(
+            **{'%s_id__in' % user_field: community_staff_members_ids})
+
+    blocked_users_query = ~Q(Q(**{'%s__blocked_by_users__blocker_id' % user_field: user_id}) | Q(
+        **{'%s__user_blocks__blocked_user_id' % user_field: user_id}))
+
+    blocked_users_query_staff_members = Q(**{'%s__communities_memberships__community_id' % user_field: community_id})
+    blocked_users_query_staff_members.add(Q(**{'%s__communities_memberships__is_administrator' % user_field: True}) | Q(
+        **{'%s__communities_memberships__is_moderator' % user_field: True}), Q.AND)
 
     blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
 
@@ -82,9 +116,59 @@ def make_exclude_community_posts_query():
     return Q(community__isnull=True)
 
 
-def make_exclude_blocked_posts_for_user_with_id_query(user_id):
-    return ~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-        creator__user_blocks__blocked_user_id=user_id))
+def make_exclude_blocked_posts_for_user_with_id_query(user_id, user_field='creator'):
+    blocked_users_ids = _get_exclusion_ids_for_user_with_id(user_id=user_id, exclusion='blocked_users_ids')
+
+    if blocked_users_ids is not None:
+        return _make_exclude_ids_query(field='%s_id' % user_field, ids=blocked_users_ids)
+
+    return ~Q(Q(**{'%s__blocked_by_users__blocker_id' % user_field: user_id}) | Q(
+        **{'%s__user_blocks__blocked_user_id' % user_field: user_id}))
+
+
+def make_count_post_comments_query_for_user_with_id(user_id, community_id=None, is_community_staff=False):
+    """
+    The comments counted for the user in a post of the community with community_id if any, see
+    Post.count_comments_with_user
+    """
+    # Dont count soft deleted items
+    count_query = Q(is_deleted=False)
+
+    if community_id and not is_community_staff:
+        # Dont count comments of blocked users, except from staff members
+        count_query.add(make_exclude_blocked_community_posts_for_user_and_community_with_ids(
+            user_id=user_id, community_id=community_id, user_field='commenter'), Q.AND)
+    else:
+        # Count comments excluding users blocked by authenticated user
+        count_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id, user_field='commenter'),
+                        Q.AND)
+
+    if community_id:
+        # Don't count items that have been reported and approved by community moderators
+        count_query.add(make_exclude_reported_and_approved_posts_query(), Q.AND)
+
+    # Dont count items we have reported
+    count_query.add(make_exclude_reported_post_comments_by_user_with_id_query(user_id=user_id), Q.AND)
+
+    return count_query
+
+
+def make_count_post_reactions_query_for_user_with_id(user_id, community_id=None, is_community_staff=False):
+    """
+    The reactions counted for the user in a post of the community with community_id if any, see
+    User.get_emoji_counts_for_post
+    """
+    if not community_id:
+        # Exclude blocked users reactions
+        return make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id, user_field='reactor')
+
+    if is_community_staff:
+        # Show all, even blocked users reactions
+        return Q()
+
+    # Exclude blocked users reactions, except from staff members
+    return make_exclude_blocked_community_posts_for_user_and_community_with_ids(
+        user_id=user_id, community_id=community_id, user_field='reactor')
 
 
 def make_only_public_community_posts_query():
@@ -102,24 +186,37 @@ def make_only_public_posts_query():
     return make_only_public_community_posts_query() | make_only_world_circle_posts_query()
 
 
-def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
-    # Retrieve posts with the given hashtag
-    hashtag_posts_query = make_only_posts_with_hashtag_with_id_query(hashtag_id=hashtag.pk)
-
+def make_only_hashtags_stats_counted_posts_query():
+    """
+    The posts counted in the hashtags stats, the ones anyone can see in the hashtags posts
+    """
     # Only retrieve public posts
-    hashtag_posts_query.add(make_only_public_posts_query(), Q.AND)
+    counted_posts_query = make_only_public_posts_query()
 
     # Dont retrieve soft deleted posts
-    hashtag_posts_query.add(make_exclude_soft_deleted_posts_query(), Q.AND)
-
-    # Dont retrieve posts from blocked people
-    hashtag_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id), Q.AND)
+    counted_posts_query.add(make_exclude_soft_deleted_posts_query(), Q.AND)
 
     # Only retrieve published posts
-    hashtag_posts_query.add(make_only_published_posts_query(), Q.AND)
+    counted_posts_query.add(make_only_published_posts_query(), Q.AND)
 
     # Don't retrieve items that have been reported and approved
-    hashtag_posts_query.add(make_exclude_reported_and_approved_posts_query(), Q.AND)
+    counted_posts_query.add(make_exclude_reported_and_approved_posts_query(), Q.AND)
+
+    # Dont retrieve closed posts
+    counted_posts_query.add(make_exclude_closed_posts_query(), Q.AND)
+
+    return counted_posts_query
+
+
+def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
+    # Retrieve posts with the given hashtag
+    hashtag_posts_query = make_only_posts_with_hashtag_with_id_query(hashtag_id=hashtag.pk)
+
+    # Only retrieve the posts counted in the hashtags stats
+    hashtag_posts_query.add(make_only_hashtags_stats_counted_posts_query(), Q.AND)
+
+    # Dont retrieve posts from blocked people
+    hashtag_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id), Q.AND)
 
     # Dont retrieve items we have reported
     hashtag_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=user_id), Q.AND)
@@ -127,9 +224,6 @@ def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
     # Dont retrieve posts from communities we're  banned from
     hashtag_posts_query.add(make_exclude_community_posts_banned_from_for_user_with_id_query(user_id=user_id), Q.AND)
 
-    # Dont retrieve closed posts
-    hashtag_posts_query.add(make_exclude_closed_posts_query(), Q.AND)
-
     return hashtag_posts_query
 
 
@@ -142,3 +236,23 @@ def make_circles_posts_query_for_user(user):
 
 def make_community_posts_query_for_user(user):
     return make_only_visible_community_posts_for_user_with_id_query(user_id=user.pk)
+
+
+def _get_exclusion_ids_for_user_with_id(user_id, exclusion):
+    """
+    The cached ids to exclude for the user, or None if they're not cached and have to be joined
+    """
+    User = get_user_model()
+    exclusions = User.get_exclusions_for_user_with_id(user_id=user_id)
+
+    if exclusions is None:
+        return None
+
+    return exclusions[exclusion]
+
+
+def _make_exclude_ids_query(field, ids):
+    if not ids:
+        return Q()
+
+    return ~Q(**{'%s__in' % field: ids})
@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from openbook_common.tests.helpers import make_user, make_fake_post_text
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_posts.models import PostMediaUpload
+from video_encoding.exceptions import VideoEncodingError
+from video_encoding.models import Format
+from video_encoding.tasks import Encoding, run_encodings, convert_video, _report_progresses, \
+    _save_encoding_progress
+
+
+class FakeEncodingBackend(object):
+    """
+    Encodes by yielding the progresses after the duration, or fails at once with the error of the source
+    """
+    name = 'FFmpeg'
+
+    def __init__(self, progresses=(0.5, 1), errors=None, duration=0):
+        self.progresses = progresses
+        self.errors = errors or {}
+        self.duration = duration
+        self.encoded_sources_paths = []
+        self.targets_paths = []
+        self.max_running_encodings_count = 0
+        self._running_encodings_count = 0
+        self._lock = threading.Lock()
+
+    def encode(self, source_path, target_path, params):
+        with self._lock:
+            self.encoded_sources_paths.append(source_path)
+            self.targets_paths.append(target_path)
+            self._running_encodings_count += 1
+            self.max_running_encodings_count = max(self.max_running_encodings_count,
+                                                   self._running_encodings_count)
+
+        try:
+            if source_path in self.errors:
+                raise self.errors[source_path]
+
+            time.sleep(self.duration)
+
+            for progress in self.progresses:
+                yield progress
+        finally:
+            with self._lock:
+                self._running_encodings_count -= 1
+
+
+class RunEncodingsTests(OpenbookAPITestCase):
+    """
+    Concurrent encoding of the video formats
+    """
+
+    def test_runs_at_most_max_workers_encodings_at_once(self):
+        """
+        should run every encoding, never more than max_workers at once
+        """
+        encoding_backend = FakeEncodingBackend(duration=0.05)
+        encodings = self._make_encodings(count=5)
+        finished_encodings = []
+
+        run_encodings(encodings, encoding_backend=encoding_backend, max_workers=2,
+                      on_finished=finished_encodings.append)
+
+        self.assertEqual(encoding_backend.max_running_encodings_count, 2)
+        self.assertEqual(set(finished_encodings), set(encodings))
+        self.assertTrue(all(encoding.error is None and encoding.progress == 1 for encoding in encodings))
+
+    @override_settings(VIDEO_ENCODING_MAX_WORKERS=1)
+    def test_runs_at_most_max_workers_setting_encodings_at_once(self):
+        """
+        should default to running at most VIDEO_ENCODING_MAX_WORKERS encodings at once
+        """
+        encoding_backend = FakeEncodingBackend(duration=0.05)
+
+        run_encodings(self._make_encodings(count=3), encoding_backend=encoding_backend)
+
+        self.assertEqual(encoding_backend.max_running_encodings_count, 1)
+        self.assertEqual(len(encoding_backend.encoded_sources_paths), 3)
+
+    def test_keeps_running_other_encodings_when_one_fails(self):
+        """
+        should finish the failed encoding with its error and still run the others
+        """
+        error = VideoEncodingError()
+        encoding_backend = FakeEncodingBackend(errors={'source0': error})
+        encodings = self._make_encodings(count=3)
+        finished_encodings = []
+
+        run_encodings(encodings, encoding_backend=encoding_backend, max_workers=1,
+                      on_finished=finished_encodings.append)
+
+        self.assertEqual(set(finished_encodings), set(encodings))
+        self.assertIs(encodings[0].error, error)
+        self.assertIsNone(encodings[1].error)
+        self.assertIsNone(encodings[2].error)
+
+    def test_cancels_queued_encodings_on_exception(self):
+        """
+        should not start the queued encodings once an unexpected exception is raised
+        """
+        encoding_backend = FakeEncodingBackend(errors={'source0': RuntimeError()}, duration=0.2)
+
+        with self.assertRaises(RuntimeError):
+            run_encodings(self._make_encodings(count=3), encoding_backend=encoding_backend, max_workers=1)
+
+        self.assertNotIn('source2', encoding_backend.encoded_sources_paths)
+
+    def test_reports_changed_progresses_once_per_progress_update(self):
+        """
+        should only report a changed progress of an encoding once progress_update seconds went by since the last one
+        """
+        encoding = self._make_encodings(count=1)[0]
+        on_progress = mock.Mock()
+        progress_updated = {encoding: 100}
+        saved_progresses = {encoding: 0}
+
+        encoding.progress = 0.5
+
+        for now, reported_count in ((103, 0), (106, 1), (112, 1)):
+            with mock.patch('video_encoding.tasks.time.monotonic', return_value=now):
+                _report_progresses(encodings=[encoding], on_progress=on_progress, progress_updated=progress_updated,
+                                   saved_progresses=saved_progresses, progress_update=5)
+
+            self.assertEqual(on_progress.call_count, reported_count)
+
+        encoding.progress = 0.7
+
+        with mock.patch('video_encoding.tasks.time.monotonic', return_value=112):
+            _report_progresses(encodings=[encoding], on_progress=on_progress, progress_updated=progress_updated,
+                               saved_progresses=saved_progresses, progress_update=5)
+
+        self.assertEqual(on_progress.call_count, 2)
+        on_progress.assert_called_with(encoding)
+
+    def _make_encodings(self, count):
+        return [Encoding(source_path='source%d' % i, target_path='target%d' % i, params=[]) for i in range(0, count)]
+
+
+class ConvertVideosTests(OpenbookAPITestCase):
+    """
+    Conversion of the videos into their formats
+    """
+
+    def test_saves_progress_as_percent_below_hundred(self):
+        """
+        should save the progress fraction of an encoding as a percent, keeping 100 for the saved format file
+        """
+        post_media_upload = self._make_post_media_upload()
+        video_format = Format.objects.create(object_id=post_media_upload.pk,
+                                             content_type=ContentType.objects.get_for_model(post_media_upload),
+                                             field_name='file', format='mp4_sd')
+
+        encoding = Encoding(source_path='source', target_path='target', params=[])
+        encoding.video_format = video_format
+
+        for progress, percent in ((0.5, 50), (0.999, 99), (1, 99)):
+            encoding.progress = progress
+            _save_encoding_progress(encoding)
+
+            self.assertEqual(Format.objects.get(pk=video_format.pk).progress, percent)
+
+        post_media_upload.delete_media()
+
+    def test_failed_encoding_deletes_format_and_temp_target(self):
+        """
+        should delete the format and the temporary target file of a failed encoding
+        """
+        post_media_upload = self._make_post_media_upload()
+        fieldfile = post_media_upload.file
+        source_path = fieldfile.storage.path(fieldfile.path)
+        encoding_backend = FakeEncodingBackend(errors={source_path: VideoEncodingError()})
+
+        with mock.patch('video_encoding.tasks.get_backend', return_value=encoding_backend):
+            convert_video(fieldfile)
+
+        self.assertEqual(encoding_backend.encoded_sources_paths, [source_path])
+        self.assertFalse(Format.objects.filter(
+            object_id=post_media_upload.pk,
+            content_type=ContentType.objects.get_for_model(post_media_upload)).exists())
+
+        for target_path in encoding_backend.targets_paths:
+            self.assertFalse(os.path.exists(target_path))
+
+        post_media_upload.delete_media()
+
+    def _make_post_media_upload(self):
+        post = make_user().create_public_post(text=make_fake_post_text())
+        return PostMediaUpload.create_post_media_upload(file=SimpleUploadedFile('video.mp4', b'video'),
+                                                        post_id=post.pk, order=0)
@@ -6,6 +6,7 @@ from os import access, F_OK
 from PIL import Image
 from django.urls import reverse
 from django_rq import get_worker
+from django_redis import get_redis_connection
 from django_rq.queues import get_queues
 from faker import Faker
 from rest_framework import status
@@ -14,6 +15,7 @@ from django.core.files.images import ImageFile
 from django.core.files import File
 from django.core.cache import cache
 from django.conf import settings
+from django.test import override_settings
 from unittest import mock
 
 import logging
@@ -23,15 +25,18 @@ from rq import SimpleWorker, Worker
 from openbook_common.tests.helpers import make_authentication_headers_for_user, make_fake_post_text, \
     make_fake_post_comment_text, make_user, make_circle, make_community, make_moderation_category, \
     get_test_videos, get_test_image, make_proxy_blacklisted_domain, make_hashtag, make_hashtag_name, \
-    make_reactions_emoji_group, make_emoji
+    make_reactions_emoji_group, make_emoji, make_global_moderator
 from openbook_common.utils.model_loaders import get_language_model, get_community_new_post_notification_model, \
     get_post_comment_notification_model, get_post_comment_user_mention_notification_model, \
     get_post_user_mention_notification_model, get_post_comment_reaction_notification_model, \
     get_post_comment_reply_notification_model
+from openbook_auth.models import User, clear_posts_visibility_memo
 from openbook_communities.models import Community
 from openbook_hashtags.models import Hashtag
 from openbook_notifications.models import PostUserMentionNotification, Notification
 from openbook_posts.models import Post, PostUserMention, PostMedia
+from openbook_moderation.models import ModeratedObject
+from openbook_posts.jobs import notify_post_subscribers, update_hashtags_media_with_post
 from openbook_common.models import ProxyBlacklistedDomain
 
 logger = logging.getLogger(__name__)
@@ -1041,6 +1046,51 @@ class PostItemAPITests(OpenbookAPITestCase):
         self.assertEqual(post.hashtags.filter(name=hashtag.name).count(), 1)
         self.assertEqual(post.hashtags.all().count(), 1)
 
+    def test_editing_own_post_removing_hashtag_keeps_hashtag(self):
+        """
+        when editing a post removing a hashtag, should unlink the hashtag from the post without deleting it
+        """
+        user = make_user()
+
+        headers = make_authentication_headers_for_user(user=user)
+
+        hashtag = make_hashtag()
+        other_post = user.create_public_post(text='One hashtag #' + hashtag.name)
+        post = user.create_public_post(text='One hashtag #' + hashtag.name)
+
+        data = {
+            'text': make_fake_post_text()
+        }
+
+        url = self._get_url(post)
+
+        response = self.client.patch(url, data, **headers, format='multipart')
+
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+        self.assertFalse(post.hashtags.exists())
+        self.assertTrue(other_post.hashtags.filter(pk=hashtag.pk).exists())
+
+    def test_saving_post_without_text_changes_does_not_process_hashtags(self):
+        """
+        should only process the hashtags of a post when its text changes
+        """
+        user = make_user()
+
+        hashtag_name = make_hashtag_name()
+        post = user.create_public_post(text='One hashtag #' + hashtag_name)
+        post.hashtags.clear()
+
+        post = Post.objects.get(pk=post.pk)
+        post.save()
+
+        self.assertFalse(post.hashtags.exists())
+
+        post.text = 'Same hashtag #' + hashtag_name
+        post.save()
+
+        self.assertTrue(post.hashtags.filter(name=hashtag_name).exists())
+
     def test_edit_text_post_with_more_hashtags_than_allowed_should_not_edit_it(self):
         """
         when editing a post with more than allowed hashtags, should not create it
@@ -1727,6 +1777,26 @@ class PostCloseAPITests(OpenbookAPITestCase):
         self.assertTrue(post.is_closed)
         self.assertTrue(parsed_response['is_closed'])
 
+    def test_close_post_keeps_concurrently_updated_comments_count(self):
+        """
+        should keep the comments made after loading the post counted when closing it
+        """
+        user = make_user()
+        admin = make_user()
+        community = make_community(admin)
+
+        user.join_community_with_name(community_name=community.name)
+        post = user.create_community_post(community.name, text=make_fake_post_text())
+
+        post = Post.objects.select_related('community').get(pk=post.pk)
+        user.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+
+        admin.close_post(post=post)
+
+        post = Post.objects.get(pk=post.pk)
+        self.assertTrue(post.is_closed)
+        self.assertEqual(post.comments_count, 1)
+
     def test_can_close_post_if_moderator_of_community(self):
         """
          should be able to close post if moderator of a community
@@ -1806,6 +1876,7 @@ class PostCloseAPITests(OpenbookAPITestCase):
         community_member.enable_new_post_notifications_for_community_with_name(community_name=community.name)
 
         post = community_post_creator.create_community_post(community.name, text=make_fake_post_text())
+        notify_post_subscribers(post_id=post.pk)
 
         url = self._get_url(post)
         headers = make_authentication_headers_for_user(admin)
@@ -1972,6 +2043,7 @@ class PostCloseAPITests(OpenbookAPITestCase):
         community_member.enable_new_post_notifications_for_community_with_name(community_name=community.name)
 
         post = community_post_creator.create_community_post(community.name, text=make_fake_post_text())
+        notify_post_subscribers(post_id=post.pk)
 
         url = self._get_url(post)
         headers = make_authentication_headers_for_user(admin)
@@ -2960,9 +3032,43 @@ class PublishPostAPITests(OpenbookAPITestCase):
 
         self.assertEqual(post.status, Post.STATUS_PUBLISHED)
 
+        # The image is copied by a job enqueued once the publishing is committed
         hashtag = Hashtag.objects.get(name=hashtag_name)
+        self.assertFalse(hashtag.has_image())
+
+        update_hashtags_media_with_post(post_id=post.pk)
+
+        hashtag.refresh_from_db()
         self.assertTrue(hashtag.has_image())
 
+    def test_publishing_encircled_image_post_with_new_hashtag_should_not_use_image(self):
+        """
+        when publishing an encircled post with a new hashtag, the hashtag should not use the image
+        """
+        user = make_user()
+        circle = make_circle(creator=user)
+
+        image = Image.new('RGB', (100, 100))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+        tmp_file.seek(0)
+
+        hashtag_name = make_hashtag_name()
+
+        post = user.create_encircled_post(text='#%s' % hashtag_name, image=ImageFile(tmp_file),
+                                          circles_ids=[circle.pk])
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.STATUS_PUBLISHED)
+
+        update_hashtags_media_with_post(post_id=post.pk)
+
+        hashtag = Hashtag.objects.get(name=hashtag_name)
+        self.assertFalse(hashtag.has_image())
+
     def _get_url(self, post):
         return reverse('publish-post', kwargs={
             'post_uuid': post.uuid
@@ -3023,3 +3129,191 @@ class PostStatusAPITests(OpenbookAPITestCase):
         return reverse('post-status', kwargs={
             'post_uuid': post.uuid
         })
+
+
+@override_settings(POSTS_VISIBILITY_CACHE_ENABLED=True)
+class PostsVisibilityCachePostItemAPITests(OpenbookAPITestCase):
+    """
+    PostItemAPI with the posts visibility cache enabled
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json'
+    ]
+
+    def setUp(self):
+        super(PostsVisibilityCachePostItemAPITests, self).setUp()
+        clear_posts_visibility_memo(sender=None)
+
+    def test_caches_can_see_post_decision(self):
+        """
+        should answer whether the user can see a post again without querying
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        post = make_user().create_public_post(text=make_fake_post_text())
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # As a new request would
+        clear_posts_visibility_memo(sender=None)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(user.can_see_post(post=post))
+
+    def test_cant_retrieve_encircled_post_after_disconnecting(self):
+        """
+        should not retrieve an encircled post once disconnected from its creator after caching its visibility
+        """
+        user = make_user()
+        foreign_user = make_user()
+
+        headers = make_authentication_headers_for_user(user)
+
+        circle = make_circle(creator=foreign_user)
+        post = foreign_user.create_encircled_post(text=make_fake_post_text(), circles_ids=[circle.pk])
+
+        user.connect_with_user_with_id(foreign_user.pk)
+        foreign_user.confirm_connection_with_user_with_id(user.pk, circles_ids=[circle.pk])
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        foreign_user.disconnect_from_user_with_id(user.pk)
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cant_retrieve_community_post_after_being_banned(self):
+        """
+        should not retrieve a community post once banned from the community after caching its visibility
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community_owner = make_user()
+        community = make_community(creator=community_owner, type=Community.COMMUNITY_TYPE_PRIVATE)
+
+        community_owner.invite_user_with_username_to_community_with_name(username=user.username,
+                                                                         community_name=community.name)
+        user.join_community_with_name(community_name=community.name)
+
+        post = community_owner.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        community_owner.ban_user_with_username_from_community_with_name(username=user.username,
+                                                                        community_name=community.name)
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forgets_visibility_decisions_on_moderation(self):
+        """
+        should not answer from the decisions cached before a community post was reported and approved
+        """
+        user = make_user()
+        community_owner = make_user()
+        community = make_community(creator=community_owner)
+        user.join_community_with_name(community_name=community.name)
+
+        post = community_owner.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        self.assertTrue(user.can_see_post(post=post))
+
+        report_category = make_moderation_category()
+        make_user().report_post(post=post, category_id=report_category.pk)
+        moderated_object = ModeratedObject.get_or_create_moderated_object_for_post(post=post,
+                                                                                   category_id=report_category.pk)
+        make_global_moderator().approve_moderated_object(moderated_object=moderated_object)
+
+        self.assertFalse(user.can_see_post(post=post))
+        # As a new request would
+        clear_posts_visibility_memo(sender=None)
+        self.assertFalse(user.can_see_post(post=post))
+
+    def test_doesnt_memoize_visibility_outside_of_requests(self):
+        """
+        should only memoize the visibility decisions during a request
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        post = make_user().create_public_post(text=make_fake_post_text())
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        get_redis_connection().delete(User.POSTS_VISIBILITY_CACHE_KEY % user.pk)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user.can_see_post(post=post))
+
+    def test_cant_retrieve_community_post_after_being_closed(self):
+        """
+        should not retrieve a community post once closed after caching its visibility
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community_owner = make_user()
+        community = make_community(creator=community_owner)
+
+        post = community_owner.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        community_owner.close_post(post=post)
+
+        response = self.client.get(self._get_url(post), **headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_can_see_posts_matches_can_see_post(self):
+        """
+        should answer the visibility of many posts at once as for each post
+        """
+        user = make_user()
+        foreign_user = make_user()
+
+        circle = make_circle(creator=foreign_user)
+        private_community = make_community(creator=foreign_user, type=Community.COMMUNITY_TYPE_PRIVATE)
+        public_community = make_community(creator=foreign_user)
+
+        closed_post = foreign_user.create_community_post(community_name=public_community.name,
+                                                         text=make_fake_post_text())
+        foreign_user.close_post(post=closed_post)
+
+        deleted_post = user.create_public_post(text=make_fake_post_text())
+        deleted_post.soft_delete()
+
+        posts = [
+            foreign_user.create_public_post(text=make_fake_post_text()),
+            foreign_user.create_encircled_post(text=make_fake_post_text(), circles_ids=[circle.pk]),
+            foreign_user.create_community_post(community_name=private_community.name, text=make_fake_post_text()),
+            foreign_user.create_community_post(community_name=public_community.name, text=make_fake_post_text()),
+            user.create_encircled_post(text=make_fake_post_text(), circles_ids=[user.connections_circle_id]),
+            closed_post,
+            deleted_post,
+        ]
+
+        with override_settings(POSTS_VISIBILITY_CACHE_ENABLED=False):
+            expected_visible_posts_ids = set(post.pk for post in posts if user.can_see_post(post=post))
+
+        self.assertEqual(expected_visible_posts_ids, {posts[0].pk, posts[3].pk, posts[4].pk})
+
+        visible_posts_ids = user.can_see_posts(post_ids=[post.pk for post in posts])
+        self.assertEqual(visible_posts_ids, expected_visible_posts_ids)
+
+        clear_posts_visibility_memo(sender=None)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.can_see_posts(post_ids=[post.pk for post in posts]), expected_visible_posts_ids)
+
+    def _get_url(self, post):
+        return reverse('post', kwargs={
+            'post_uuid': post.uuid
+        })
@@ -14,7 +14,7 @@ from openbook_communities.models import Community
 from openbook_hashtags.models import Hashtag
 from openbook_notifications.models import PostCommentNotification, Notification, PostCommentReplyNotification, \
     PostCommentUserMentionNotification
-from openbook_posts.models import PostComment, PostCommentUserMention
+from openbook_posts.models import PostComment, PostCommentUserMention, Post
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -1325,6 +1325,86 @@ class PostCommentItemAPITests(OpenbookAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(PostComment.objects.filter(id=post_comment_reply.pk).exists())
 
+    def test_replying_and_deleting_reply_updates_replies_count_only(self):
+        """
+        should update the comment replies count and leave the post comments count untouched on replies
+        """
+        user = make_user()
+
+        commenter = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        post_comment = commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+        post_comment_reply = commenter.reply_to_comment_with_id_for_post_with_uuid(post_comment_id=post_comment.pk,
+                                                                                   post_uuid=post.uuid,
+                                                                                   text=make_fake_post_comment_text())
+
+        self.assertEqual(PostComment.objects.get(pk=post_comment.pk).replies_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+        url = self._get_url(post_comment=post_comment_reply, post=post)
+
+        headers = make_authentication_headers_for_user(user)
+        response = self.client.delete(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(PostComment.objects.get(pk=post_comment.pk).replies_count, 0)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+    def test_deleting_and_soft_deleting_comments_updates_post_comments_count(self):
+        """
+        should decrement the post comments count when a comment is deleted or soft deleted, once per comment
+        """
+        user = make_user()
+
+        commenter = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        post_comment = commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+        soft_deleted_post_comment = commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 2)
+
+        soft_deleted_post_comment.soft_delete()
+        soft_deleted_post_comment.soft_delete()
+
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+        url = self._get_url(post_comment=post_comment, post=post)
+
+        headers = make_authentication_headers_for_user(user)
+        response = self.client.delete(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 0)
+
+        soft_deleted_post_comment.unsoft_delete()
+
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+    def test_soft_deleting_post_keeps_post_comments_count(self):
+        """
+        should keep the post comments count updated by the soft deletion of its comments when soft deleting a post
+        """
+        user = make_user()
+
+        commenter = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        for i in range(0, 2):
+            commenter.comment_post_with_id(post.pk, text=make_fake_post_comment_text())
+
+        post = Post.objects.get(pk=post.pk)
+
+        post.soft_delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 0)
+
+        post.unsoft_delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 2)
+
     def test_can_delete_community_post_comment_reply_if_mod(self):
         """
          should be able to delete a community post comment reply if is moderator and return 200
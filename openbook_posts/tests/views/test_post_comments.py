@@ -5,6 +5,7 @@ from faker import Faker
 from rest_framework import status
 from unittest import mock
 from unittest.mock import ANY
+from django.test import override_settings
 from openbook_common.tests.models import OpenbookAPITestCase
 
 import logging
@@ -17,6 +18,7 @@ from openbook_hashtags.models import Hashtag
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import PostCommentNotification, PostCommentReplyNotification, \
     PostCommentUserMentionNotification, Notification
+from openbook_posts.jobs import create_post_comment_user_mentions
 from openbook_posts.models import PostComment, PostCommentUserMention, Post
 
 logger = logging.getLogger(__name__)
@@ -577,6 +579,24 @@ class PostCommentsAPITests(OpenbookAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(PostComment.objects.filter(post_id=post.pk, text=post_comment_text).count() == 1)
 
+    def test_commenting_increments_post_comments_count(self):
+        """
+        should increment the post comments count when commenting
+        """
+        user = make_user()
+        commenter = make_user()
+
+        headers = make_authentication_headers_for_user(commenter)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        data = self._get_create_post_comment_request_data(make_fake_post_comment_text())
+
+        url = self._get_url(post)
+        response = self.client.put(url, data, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
     def test_commenting_detects_mentions(self):
         """
         should be able to comment with a mention and detect it once
@@ -733,6 +753,36 @@ class PostCommentsAPITests(OpenbookAPITestCase):
 
         self.assertEqual(PostCommentUserMention.objects.filter(post_comment_id=post_comment.pk).count(), 0)
 
+    def test_create_text_post_comment_with_many_mentions_creates_them_in_job(self):
+        """
+        should leave the mentions of a post comment mentioning more users than INLINE_MENTIONS_MAX_COUNT to a job,
+        still ignoring the users that already commented
+        """
+        user = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        mentioned_users = [make_user() for i in range(0, 3)]
+        commenter = make_user()
+        commenter.comment_post(post=post, text=make_fake_post_comment_text())
+
+        usernames = [mentioned_user.username for mentioned_user in mentioned_users] + [commenter.username]
+        post_comment_text = 'Hello ' + ' '.join('@' + username for username in usernames)
+
+        with override_settings(INLINE_MENTIONS_MAX_COUNT=2):
+            post_comment = user.comment_post(post=post, text=post_comment_text)
+
+        self.assertFalse(PostCommentUserMention.objects.filter(post_comment_id=post_comment.pk).exists())
+
+        create_post_comment_user_mentions(post_comment_id=post_comment.pk, usernames=usernames)
+
+        self.assertEqual(
+            set(PostCommentUserMention.objects.filter(post_comment_id=post_comment.pk).values_list('user_id',
+                                                                                                  flat=True)),
+            set(mentioned_user.pk for mentioned_user in mentioned_users))
+        self.assertEqual(PostCommentUserMentionNotification.objects.filter(
+            post_comment_user_mention__post_comment_id=post_comment.pk).count(), len(mentioned_users))
+
     def test_create_text_post_comment_creates_mention_notifications(self):
         """
         should be able to create a text post comment with a mention notification
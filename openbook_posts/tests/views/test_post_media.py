@@ -1,14 +1,18 @@
 # Create your tests here.
 import json
+import os
 import tempfile
+from unittest import mock
 
 from PIL import Image
 from django.conf import settings
 from django.core.files import File
+from django.test import override_settings
 from django.urls import reverse
 from django_rq import get_worker
 from faker import Faker
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rq import SimpleWorker
 
 from openbook_common.tests.models import OpenbookAPITestCase
@@ -18,8 +22,12 @@ import logging
 
 from openbook_common.tests.helpers import make_authentication_headers_for_user, make_fake_post_text, \
     make_user, get_test_videos, get_test_image, get_test_video, make_circle, make_community, get_test_images
+from openbook_common.models import MediaBlob, BlockedMediaHash
 from openbook_communities.models import Community
-from openbook_posts.models import PostMedia, Post
+from openbook_posts.jobs import process_post_media_upload, process_post_media
+from openbook_posts.models import PostMedia, Post, PostMediaUpload, PostImage, PostVideo
+from video_encoding.exceptions import VideoEncodingError
+from video_encoding.utils import get_fieldfile_local_copy_path
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -280,6 +288,39 @@ class PostMediaAPITests(OpenbookAPITestCase):
                 post_image = first_media.content_object
                 self.assertIsNotNone(post_image.thumbnail)
 
+    def test_add_media_image_makes_resized_derivatives(self):
+        """
+        should store the image, its thumbnail and the post media thumbnail resized to their max widths
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user=user)
+
+        post = user.create_public_post(is_draft=True)
+
+        image = Image.new('RGB', (2048, 1024))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+        tmp_file.seek(0)
+
+        response = self.client.put(self._get_url(post=post), {'file': tmp_file}, **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        post.refresh_from_db()
+        post_image = post.get_first_media().content_object
+
+        self.assertEqual((post_image.width, post_image.height), (1024, 512))
+        self.assertEqual((post.media_width, post.media_height), (1024, 512))
+
+        with Image.open(post_image.image) as stored_image:
+            self.assertEqual(stored_image.size, (1024, 512))
+
+        with Image.open(post_image.thumbnail) as stored_thumbnail:
+            self.assertEqual(stored_thumbnail.size, (1024, 512))
+
+        with Image.open(post.media_thumbnail) as stored_media_thumbnail:
+            self.assertEqual(stored_media_thumbnail.size, (512, 256))
+
     def test_can_retrieve_post_empty_media_if_no_media(self):
         """
         should be able to retrieve a posts empty media if the pos has no media
@@ -902,7 +943,261 @@ class PostMediaAPITests(OpenbookAPITestCase):
             else:
                 raise Exception('Unsupported media type')
 
+    def test_processing_media_deletes_videos_local_copies_when_failing(self):
+        """
+        should delete the local copies kept for the encoding of the videos of a post even if the encoding fails
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+
+        post_video = PostVideo.objects.create(post=draft_post, file='videos/%s.mp4' % draft_post.uuid, width=1,
+                                              height=1, duration=1, thumbnail_width=1, thumbnail_height=1)
+        PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO, content_object=post_video,
+                                    post_id=draft_post.pk, order=0)
+
+        with tempfile.TemporaryDirectory() as local_copies_dir, \
+                override_settings(VIDEO_ENCODING_LOCAL_COPIES_DIR=local_copies_dir):
+            local_copy_path = get_fieldfile_local_copy_path(fieldfile=post_video.file)
+
+            with open(local_copy_path, 'wb') as local_copy:
+                local_copy.write(b'Not a video')
+
+            with mock.patch('openbook_posts.jobs.tasks.convert_videos', side_effect=VideoEncodingError()):
+                with self.assertRaises(VideoEncodingError):
+                    process_post_media(post_id=draft_post.pk)
+
+            self.assertFalse(os.path.exists(local_copy_path))
+
+    def test_deleting_draft_deletes_videos_local_copies(self):
+        """
+        should delete the local copies kept for the encoding of the videos of a draft post never published
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+
+        post_video = PostVideo.objects.create(post=draft_post, file='videos/%s.mp4' % draft_post.uuid, width=1,
+                                              height=1, duration=1, thumbnail_width=1, thumbnail_height=1)
+        PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO, content_object=post_video,
+                                    post_id=draft_post.pk, order=0)
+
+        with tempfile.TemporaryDirectory() as local_copies_dir, \
+                override_settings(VIDEO_ENCODING_LOCAL_COPIES_DIR=local_copies_dir):
+            local_copy_path = get_fieldfile_local_copy_path(fieldfile=post_video.file)
+
+            with open(local_copy_path, 'wb') as local_copy:
+                local_copy.write(b'Not a video')
+
+            user.delete_post(post=draft_post)
+
+            self.assertFalse(os.path.exists(local_copy_path))
+
     def _get_url(self, post):
         return reverse('post-media', kwargs={
             'post_uuid': post.uuid
         })
+
+
+@override_settings(POST_MEDIA_ASYNC_PROCESSING_ENABLED=True)
+class PostMediaAsyncProcessingAPITests(OpenbookAPITestCase):
+    """
+    PostMediaAPI with POST_MEDIA_ASYNC_PROCESSING_ENABLED
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+    ]
+
+    def test_adding_media_returns_pending_media(self):
+        """
+        should store the added media as pending and return 202 without processing it
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        draft_post = user.create_public_post(is_draft=True)
+        test_image = get_test_image()
+
+        with open(test_image['path'], 'rb') as file:
+            response = self.client.put(self._get_url(post=draft_post), {'file': file}, **headers,
+                                       format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        post_media_upload = PostMediaUpload.objects.get(post_id=draft_post.pk)
+        self.assertEqual(json.loads(response.content)['pending_media'], [
+            {'id': post_media_upload.pk, 'order': None, 'status': PostMediaUpload.STATUS_PROCESSING}])
+
+        self.assertFalse(draft_post.media.exists())
+
+    def test_processing_upload_adds_media(self):
+        """
+        should add the processed upload to the post media and set the post media thumbnail and dimensions
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+        test_image = get_test_image()
+
+        with open(test_image['path'], 'rb') as file:
+            user.add_media_to_post(post=draft_post, file=File(file))
+
+        post_media_upload = PostMediaUpload.objects.get(post_id=draft_post.pk)
+
+        process_post_media_upload(post_media_upload_id=post_media_upload.pk)
+
+        draft_post.refresh_from_db()
+        post_media_upload.refresh_from_db()
+
+        self.assertEqual(draft_post.status, Post.STATUS_DRAFT)
+        self.assertEqual(draft_post.get_first_media().type, PostMedia.MEDIA_TYPE_IMAGE)
+        self.assertIsNotNone(draft_post.media_width)
+        self.assertTrue(draft_post.media_thumbnail)
+        self.assertEqual(post_media_upload.status, PostMediaUpload.STATUS_PROCESSED)
+        self.assertFalse(post_media_upload.file)
+
+    def test_publishing_waits_on_pending_media(self):
+        """
+        should only publish the post once its pending media is processed
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+        test_image = get_test_image()
+
+        with open(test_image['path'], 'rb') as file:
+            user.add_media_to_post(post=draft_post, file=File(file))
+
+        user.publish_post(post=draft_post)
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        draft_post.refresh_from_db()
+        self.assertEqual(draft_post.status, Post.STATUS_PROCESSING)
+
+        process_post_media_upload(post_media_upload_id=draft_post.media_uploads.get().pk)
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        draft_post.refresh_from_db()
+        self.assertEqual(draft_post.status, Post.STATUS_PUBLISHED)
+        self.assertEqual(draft_post.get_first_media().type, PostMedia.MEDIA_TYPE_IMAGE)
+
+    def test_deleting_post_deletes_pending_upload_file(self):
+        """
+        should delete the stored file of an upload not processed yet when deleting its post
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+        test_image = get_test_image()
+
+        with open(test_image['path'], 'rb') as file:
+            user.add_media_to_post(post=draft_post, file=File(file))
+
+        post_media_upload = draft_post.media_uploads.get()
+        upload_file_name = post_media_upload.file.name
+
+        self.assertTrue(post_media_upload.file.storage.exists(upload_file_name))
+
+        user.delete_post(post=draft_post)
+
+        # The job of the upload finds nothing to process
+        process_post_media_upload(post_media_upload_id=post_media_upload.pk)
+
+        self.assertFalse(post_media_upload.file.storage.exists(upload_file_name))
+
+    def test_failed_upload_gives_back_empty_post(self):
+        """
+        should mark an unsupported upload as failed and give back the post waiting on it as a draft
+        """
+        user = make_user()
+        draft_post = user.create_public_post(is_draft=True)
+
+        with tempfile.NamedTemporaryFile(suffix='.txt') as file:
+            file.write(b'Not an image')
+            file.seek(0)
+            user.add_media_to_post(post=draft_post, file=File(file))
+
+        user.publish_post(post=draft_post)
+
+        post_media_upload = draft_post.media_uploads.get()
+
+        with self.assertRaises(ValidationError):
+            process_post_media_upload(post_media_upload_id=post_media_upload.pk)
+
+        draft_post.refresh_from_db()
+        post_media_upload.refresh_from_db()
+
+        self.assertEqual(post_media_upload.status, PostMediaUpload.STATUS_FAILED)
+        self.assertEqual(draft_post.status, Post.STATUS_DRAFT)
+        self.assertFalse(draft_post.media.exists())
+
+    def _get_url(self, post):
+        return reverse('post-media', kwargs={
+            'post_uuid': post.uuid
+        })
+
+
+@override_settings(MEDIA_DEDUPLICATION_ENABLED=True)
+class PostMediaDeduplicationTests(OpenbookAPITestCase):
+    """
+    Post media stored once per content with MEDIA_DEDUPLICATION_ENABLED
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+    ]
+
+    def test_reuses_files_of_same_content(self):
+        """
+        should store the same image added to several posts once and reference it from each of them
+        """
+        user = make_user()
+        first_post = self._make_post_with_image(user=user)
+        second_post = self._make_post_with_image(user=user)
+
+        first_image = first_post.get_first_media().content_object
+        second_image = second_post.get_first_media().content_object
+
+        self.assertEqual(first_image.image.name, second_image.image.name)
+        self.assertEqual(first_image.thumbnail.name, second_image.thumbnail.name)
+        self.assertEqual(MediaBlob.objects.get(name=first_image.image.name).references_count, 2)
+
+    def test_deletes_files_once_unreferenced(self):
+        """
+        should keep the files of deleted posts while other posts reference them
+        """
+        user = make_user()
+        first_post = self._make_post_with_image(user=user)
+        second_post = self._make_post_with_image(user=user)
+
+        image_name = first_post.get_first_media().content_object.image.name
+        storage = PostImage._meta.get_field('image').storage
+
+        user.delete_post(post=first_post)
+
+        self.assertTrue(storage.exists(image_name))
+        self.assertEqual(MediaBlob.objects.get(name=image_name).references_count, 1)
+
+        user.delete_post(post=second_post)
+
+        self.assertFalse(storage.exists(image_name))
+        self.assertFalse(MediaBlob.objects.filter(name=image_name).exists())
+
+    def test_cannot_add_blocked_media(self):
+        """
+        should not allow adding the media of a post whose media hashes were blocked
+        """
+        user = make_user()
+        post = self._make_post_with_image(user=user)
+
+        post.block_media_hashes()
+
+        self.assertTrue(BlockedMediaHash.is_hash_blocked(hash=post.get_first_media().content_object.hash))
+
+        with self.assertRaises(ValidationError):
+            self._make_post_with_image(user=user)
+
+    def _make_post_with_image(self, user):
+        draft_post = user.create_public_post(is_draft=True)
+        test_image = get_test_image()
+
+        with open(test_image['path'], 'rb') as file:
+            user.add_media_to_post(post=draft_post, file=File(file))
+
+        return draft_post
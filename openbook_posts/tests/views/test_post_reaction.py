@@ -10,7 +10,7 @@ from openbook_common.tests.helpers import make_authentication_headers_for_user,
     make_fake_post_comment_text, make_user, make_circle, make_emoji, make_reactions_emoji_group, \
     make_community
 from openbook_notifications.models import PostReactionNotification, Notification
-from openbook_posts.models import PostReaction
+from openbook_posts.models import PostReaction, Post, PostReactionEmojiCount
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -432,6 +432,31 @@ class PostReactionItemAPITests(OpenbookAPITestCase):
         self.assertFalse(PostReactionNotification.objects.filter(pk=post_reaction_notification.pk).exists())
         self.assertFalse(Notification.objects.filter(pk=notification.pk).exists())
 
+    def test_deleting_reaction_updates_post_reactions_counters(self):
+        """
+        should decrement the post reactions count and remove the emptied reaction emoji count when deleting a reaction
+        """
+        user = make_user()
+
+        foreign_user = make_user()
+
+        post = foreign_user.create_public_post(text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+
+        post_reaction_emoji_id = make_emoji(group=emoji_group).pk
+
+        post_reaction = user.react_to_post_with_id(post.pk, emoji_id=post_reaction_emoji_id)
+
+        url = self._get_url(post_reaction=post_reaction, post=post)
+
+        headers = make_authentication_headers_for_user(user)
+        response = self.client.delete(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(pk=post.pk).reactions_count, 0)
+        self.assertFalse(PostReactionEmojiCount.objects.filter(post_id=post.pk).exists())
+
     def _get_url(self, post, post_reaction):
         return reverse('post-reaction', kwargs={
             'post_uuid': post.uuid,
@@ -10,7 +10,7 @@ from openbook_common.tests.helpers import make_authentication_headers_for_user,
     make_fake_post_comment_text, make_user, make_circle, make_emoji, make_emoji_group, make_reactions_emoji_group, \
     make_community
 from openbook_notifications.models import PostReactionNotification
-from openbook_posts.models import PostReaction
+from openbook_posts.models import PostReaction, Post, PostReactionEmojiCount
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -582,6 +582,85 @@ class PostReactionsAPITests(OpenbookAPITestCase):
         self.assertFalse(PostReactionNotification.objects.filter(post_reaction__emoji__id=post_reaction_emoji_id,
                                                                  notification__owner=user).exists())
 
+    def test_reacting_updates_post_reactions_counters(self):
+        """
+        should increment the post reactions count and the reaction emoji count when reacting
+        """
+        user = make_user()
+        reactor = make_user()
+
+        headers = make_authentication_headers_for_user(reactor)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+
+        post_reaction_emoji_id = make_emoji(group=emoji_group).pk
+
+        data = self._get_create_post_reaction_request_data(post_reaction_emoji_id, emoji_group.pk)
+
+        url = self._get_url(post)
+        response = self.client.put(url, data, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=post.pk).reactions_count, 1)
+        self.assertEqual(PostReactionEmojiCount.objects.get(post_id=post.pk, emoji_id=post_reaction_emoji_id).count,
+                         1)
+
+    def test_reacting_again_with_other_emoji_moves_reaction_emoji_count(self):
+        """
+        should keep the post reactions count and move the reaction emoji count when reacting again with another emoji
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+
+        post_reaction_emoji_id = make_emoji(group=emoji_group).pk
+
+        data = self._get_create_post_reaction_request_data(post_reaction_emoji_id, emoji_group.pk)
+
+        url = self._get_url(post)
+        self.client.put(url, data, **headers)
+
+        new_post_reaction_emoji_id = make_emoji(group=emoji_group).pk
+
+        data = self._get_create_post_reaction_request_data(new_post_reaction_emoji_id, emoji_group.pk)
+        response = self.client.put(url, data, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=post.pk).reactions_count, 1)
+        self.assertFalse(
+            PostReactionEmojiCount.objects.filter(post_id=post.pk, emoji_id=post_reaction_emoji_id).exists())
+        self.assertEqual(
+            PostReactionEmojiCount.objects.get(post_id=post.pk, emoji_id=new_post_reaction_emoji_id).count, 1)
+
+    def test_repairing_post_counters_fixes_drifted_counters(self):
+        """
+        should recompute the post reactions counters from the reactions when repairing them
+        """
+        user = make_user()
+        post = user.create_public_post(text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        amount_of_reactors = 3
+
+        for i in range(0, amount_of_reactors):
+            reactor = make_user()
+            reactor.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        Post.objects.filter(pk=post.pk).update(reactions_count=0)
+        PostReactionEmojiCount.objects.filter(post_id=post.pk).delete()
+
+        total_repaired_posts = Post.repair_counters_for_posts_with_ids([post.pk])
+
+        self.assertEqual(total_repaired_posts, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).reactions_count, amount_of_reactors)
+        self.assertEqual(PostReactionEmojiCount.objects.get(post_id=post.pk, emoji_id=emoji.pk).count,
+                         amount_of_reactors)
+
     def _get_create_post_reaction_request_data(self, emoji_id, emoji_group_id):
         return {
             'emoji_id': emoji_id,
@@ -6,10 +6,15 @@ from PIL import Image
 from django.conf import settings
 from django.core.files import File
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction, DatabaseError
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django_rq import get_worker
 from faker import Faker
 from rest_framework import status
+from rest_framework.test import APIRequestFactory
 from rq import SimpleWorker
 
 from openbook_common.tests.models import OpenbookAPITestCase
@@ -29,13 +34,17 @@ from openbook_common.tests.helpers import make_user, make_users, make_fake_post_
     make_fake_post_comment_text, make_reactions_emoji_group, make_emoji, make_hashtag_name, make_hashtag, \
     get_test_valid_hashtags, get_test_invalid_hashtags
 from openbook_common.utils.helpers import sha256sum
+from openbook_common.utils.reference_rows import clear_reference_rows
 from openbook_communities.models import Community
 from openbook_hashtags.models import Hashtag
 from openbook_lists.models import List
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import PostUserMentionNotification, Notification, UserNewPostNotification
-from openbook_posts.jobs import curate_top_posts, curate_trending_posts
-from openbook_posts.models import Post, PostUserMention, PostMedia, TopPost, TrendingPost
+from openbook_posts.jobs import curate_top_posts, curate_trending_posts, fan_out_post_to_timelines, trim_timelines, \
+    reconcile_top_posts, clean_trending_posts, bootstrap_trending_posts, notify_post_subscribers, \
+    create_post_user_mentions
+from openbook_posts.models import Post, PostUserMention, PostMedia, TopPost, TrendingPost, TimelineEntry
+from openbook_posts.views.posts.serializers import AuthenticatedUserPostSerializer
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -544,6 +553,74 @@ class PostsAPITests(OpenbookAPITestCase):
 
         self.assertFalse(PostUserMention.objects.filter(post_id=post.pk, user_id=user.pk).exists())
 
+    def test_create_text_post_mentions_only_users_that_can_see_it(self):
+        """
+        should mention the users that can see the post among many mentioned users at once
+        """
+        user = make_user()
+
+        circle = make_circle(creator=user)
+
+        connected_users = [make_user() for i in range(0, 3)]
+
+        for connected_user in connected_users:
+            user.connect_with_user_with_id(user_id=connected_user.pk, circles_ids=[circle.pk])
+            connected_user.confirm_connection_with_user_with_id(user_id=user.pk)
+
+        foreign_user = make_user()
+
+        post_text = 'Hello ' + ' '.join('@' + mentioned_user.username.upper() for mentioned_user in
+                                        connected_users + [foreign_user])
+
+        post = user.create_encircled_post(text=post_text, circles_ids=[circle.pk])
+
+        self.assertEqual(set(PostUserMention.objects.filter(post_id=post.pk).values_list('user_id', flat=True)),
+                         set(connected_user.pk for connected_user in connected_users))
+
+        self.assertEqual(Notification.objects.filter(notification_type=Notification.POST_USER_MENTION,
+                                                     owner__in=connected_users).count(), len(connected_users))
+
+    def test_create_text_post_with_many_mentions_creates_them_in_job(self):
+        """
+        should leave the mentions of a post mentioning more users than INLINE_MENTIONS_MAX_COUNT to a job
+        """
+        user = make_user()
+
+        mentioned_users = [make_user() for i in range(0, 3)]
+
+        post_text = 'Hello ' + ' '.join('@' + mentioned_user.username for mentioned_user in mentioned_users)
+
+        with override_settings(INLINE_MENTIONS_MAX_COUNT=2):
+            post = user.create_public_post(text=post_text)
+
+        self.assertFalse(PostUserMention.objects.filter(post_id=post.pk).exists())
+
+        create_post_user_mentions(post_id=post.pk, usernames=[mentioned_user.username for mentioned_user in
+                                                              mentioned_users])
+
+        self.assertEqual(set(PostUserMention.objects.filter(post_id=post.pk).values_list('user_id', flat=True)),
+                         set(mentioned_user.pk for mentioned_user in mentioned_users))
+
+    def test_saving_post_without_text_changes_does_not_process_mentions(self):
+        """
+        should only process the mentions of a post when its text changes
+        """
+        user = make_user()
+        mentioned_user = make_user()
+
+        post = user.create_public_post(text='Hello @' + mentioned_user.username)
+        PostUserMention.objects.filter(post_id=post.pk).delete()
+
+        post = Post.objects.get(pk=post.pk)
+        post.save()
+
+        self.assertFalse(PostUserMention.objects.filter(post_id=post.pk).exists())
+
+        post.text = 'Hello again @' + mentioned_user.username
+        post.save()
+
+        self.assertTrue(PostUserMention.objects.filter(post_id=post.pk, user_id=mentioned_user.pk).exists())
+
     def test_create_post_is_added_to_world_circle(self):
         """
         the created text post should automatically added to world circle
@@ -3802,6 +3879,7 @@ class PostsAPITests(OpenbookAPITestCase):
 
         url = self._get_url()
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         user_notifications_subscription = UserNotificationsSubscription.objects.get(subscriber=subscriber, user=user)
 
@@ -3825,6 +3903,7 @@ class PostsAPITests(OpenbookAPITestCase):
 
         url = self._get_url()
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
         response_post = json.loads(response.content)
         post = Post.objects.get(id=response_post['id'])
 
@@ -3848,6 +3927,7 @@ class PostsAPITests(OpenbookAPITestCase):
 
         url = self._get_url()
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
         response_post = json.loads(response.content)
         post = Post.objects.get(id=response_post['id'])
 
@@ -3881,6 +3961,7 @@ class PostsAPITests(OpenbookAPITestCase):
 
         url = self._get_url()
         response = self.client.put(url, data, **headers, format='multipart')
+        notify_post_subscribers(post_id=json.loads(response.content)['id'])
 
         other_subscriber_notifications_subscription = UserNotificationsSubscription.objects.get(
             subscriber=other_subscriber, user=post_creator)
@@ -3894,6 +3975,293 @@ class PostsAPITests(OpenbookAPITestCase):
         self.assertTrue(UserNewPostNotification.objects.filter(
             user_notifications_subscription=subscriber_notifications_subscription).count() == 1)
 
+    def test_create_post_does_not_notify_subscribers_before_job(self):
+        """
+        should leave notifying the subscribers of a created post to the notify post subscribers job
+        """
+        user = make_user()
+        subscriber = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        subscriber.enable_new_post_notifications_for_user_with_username(user.username)
+
+        response = self.client.put(self._get_url(), {'text': make_fake_post_text()}, **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(UserNewPostNotification.objects.filter(post_id=json.loads(response.content)['id']).exists())
+
+    def test_create_post_without_transaction_notifies_subscribers(self):
+        """
+        should notify the subscribers of a post created outside of a transaction, once the post is published
+        """
+        user = make_user()
+        subscriber = make_user()
+
+        subscriber.enable_new_post_notifications_for_user_with_username(user.username)
+
+        # Outside of a transaction the on commit callbacks run right away
+        with mock.patch('openbook_posts.models.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('openbook_posts.models.notify_post_subscribers') as notify_post_subscribers_mock:
+            notify_post_subscribers_mock.delay.side_effect = notify_post_subscribers
+            post = user.create_public_post(text=make_fake_post_text())
+
+        self.assertTrue(UserNewPostNotification.objects.filter(
+            post=post, user_notifications_subscription__subscriber=subscriber).exists())
+
+    def test_notify_post_subscribers_sends_one_push_notification_for_all_subscribers(self):
+        """
+        should notify every subscriber once and send them a single batched push notification
+        """
+        user = make_user()
+        subscribers = make_users(5)
+
+        for subscriber in subscribers:
+            subscriber.enable_new_post_notifications_for_user_with_username(user.username)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        notify_post_subscribers(post_id=post.pk)
+        notify_post_subscribers(post_id=post.pk)
+
+        for subscriber in subscribers:
+            self.assertEqual(Notification.objects.filter(owner=subscriber,
+                                                         notification_type=Notification.USER_NEW_POST).count(), 1)
+            self.assertEqual(UserNewPostNotification.objects.filter(
+                post=post, user_notifications_subscription__subscriber=subscriber).count(), 1)
+
+        self.mock_send_notification_to_users.assert_called_once()
+        pushed_users = self.mock_send_notification_to_users.call_args[1]['users']
+        self.assertEqual(sorted(pushed_user.pk for pushed_user in pushed_users),
+                         sorted(subscriber.pk for subscriber in subscribers))
+
+    def test_notify_post_subscribers_notifies_subscribers_on_retry_after_failing(self):
+        """
+        should not leave new post notifications without their notification when failing, so a retry notifies them
+        """
+        user = make_user()
+        subscribers = make_users(3)
+
+        for subscriber in subscribers:
+            subscriber.enable_new_post_notifications_for_user_with_username(user.username)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        with mock.patch.object(Notification, 'create_notifications', side_effect=DatabaseError()):
+            with self.assertRaises(DatabaseError):
+                notify_post_subscribers(post_id=post.pk)
+
+        self.assertFalse(UserNewPostNotification.objects.filter(post=post).exists())
+
+        notify_post_subscribers(post_id=post.pk)
+
+        for subscriber in subscribers:
+            self.assertEqual(Notification.objects.filter(owner=subscriber,
+                                                         notification_type=Notification.USER_NEW_POST).count(), 1)
+
+    def test_get_all_posts_reactions_comments_and_mutes_queries_do_not_grow_with_posts(self):
+        """
+        should retrieve the posts reactions, comments counts and mutes with the same queries for any amount of posts
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community = make_community(creator=make_user(), type='P')
+        user.join_community_with_name(community_name=community.name)
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        for i in range(0, 6):
+            community_member = make_user()
+            community_member.join_community_with_name(community_name=community.name)
+            post = community_member.create_community_post(text=make_fake_post_text(),
+                                                          community_name=community.name)
+            community_member.comment_post(post=post, text=make_fake_post_comment_text())
+            user.react_to_post(post=post, emoji_id=emoji.pk)
+            user.mute_post(post=post)
+
+        url = self._get_url()
+
+        with CaptureQueriesContext(connection) as few_posts_queries:
+            response = self.client.get(url, {'count': 2}, **headers)
+            self.assertEqual(len(json.loads(response.content)), 2)
+
+        with CaptureQueriesContext(connection) as many_posts_queries:
+            response = self.client.get(url, {'count': 6}, **headers)
+            self.assertEqual(len(json.loads(response.content)), 6)
+
+        batched_tables = ['openbook_posts_postreaction', 'openbook_posts_postmute', 'openbook_posts_postcomment']
+
+        for batched_table in batched_tables:
+            self.assertEqual(self._count_queries_from_table(few_posts_queries, batched_table),
+                             self._count_queries_from_table(many_posts_queries, batched_table))
+
+    def _count_queries_from_table(self, captured_queries, table):
+        return len([query for query in captured_queries if 'FROM "%s"' % table in query['sql']])
+
+    def test_get_all_posts_serializes_as_single_posts(self):
+        """
+        should serialize the posts list the same as each post on its own
+        """
+        user = make_user()
+
+        community = make_community(creator=make_user(), type='P')
+        user.join_community_with_name(community_name=community.name)
+
+        blocked_user = make_user()
+        blocked_user.join_community_with_name(community_name=community.name)
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+        other_emoji = make_emoji(group=emoji_group)
+
+        posts = [user.create_public_post(text=make_fake_post_text())]
+
+        for i in range(0, 3):
+            community_member = make_user()
+            community_member.join_community_with_name(community_name=community.name)
+            post = community_member.create_community_post(text=make_fake_post_text(),
+                                                          community_name=community.name)
+            community_member.comment_post(post=post, text=make_fake_post_comment_text())
+            community_member.react_to_post(post=post, emoji_id=other_emoji.pk)
+            blocked_user.react_to_post(post=post, emoji_id=emoji.pk)
+            blocked_user.comment_post(post=post, text=make_fake_post_comment_text())
+            posts.append(post)
+
+        user.react_to_post(post=posts[1], emoji_id=emoji.pk)
+        user.mute_post(post=posts[2])
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        request = APIRequestFactory().get(self._get_url())
+        request.user = user
+
+        posts_data = AuthenticatedUserPostSerializer(posts, many=True, context={'request': request}).data
+
+        for post, post_data in zip(posts, posts_data):
+            single_post_data = AuthenticatedUserPostSerializer(post, context={'request': request}).data
+            self.assertEqual(self._normalize_post_data(post_data), self._normalize_post_data(single_post_data))
+
+    def test_get_all_posts_counts_match_post_counts_with_blocked_commenter(self):
+        """
+        should return the same comments and reactions counts in the posts list as in the post detail when a commenter
+        is blocked
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community = make_community(creator=make_user(), type='P')
+        user.join_community_with_name(community_name=community.name)
+
+        blocked_user = make_user()
+        blocked_user.join_community_with_name(community_name=community.name)
+        user.follow_user(blocked_user)
+
+        blocked_moderator = make_user()
+        blocked_moderator.join_community_with_name(community_name=community.name)
+        community.creator.add_moderator_with_username_to_community_with_name(username=blocked_moderator.username,
+                                                                             community_name=community.name)
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        posts = [
+            blocked_user.create_public_post(text=make_fake_post_text()),
+            community.creator.create_community_post(text=make_fake_post_text(), community_name=community.name)
+        ]
+
+        for post in posts:
+            for commenter in (blocked_user, blocked_moderator, make_user()):
+                commenter.comment_post(post=post, text=make_fake_post_comment_text())
+                commenter.react_to_post(post=post, emoji_id=emoji.pk)
+
+        user.block_user_with_id(user_id=blocked_moderator.pk)
+        user.block_user_with_id(user_id=blocked_user.pk)
+        user.follow_user(community.creator)
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        posts_data = {post_data['id']: post_data for post_data in json.loads(response.content)}
+        self.assertIn(posts[1].pk, posts_data)
+
+        for post_data in posts_data.values():
+            post = Post.objects.get(pk=post_data['id'])
+            post_response = self.client.get(reverse('post', kwargs={'post_uuid': post.uuid}), **headers)
+            single_post_data = json.loads(post_response.content)
+
+            self.assertEqual(post_data['comments_count'], single_post_data['comments_count'])
+            self.assertEqual(self._get_emoji_counts(post_data), self._get_emoji_counts(single_post_data))
+
+    def test_get_all_posts_comments_count_matches_post_comments_count_for_staff(self):
+        """
+        should return the same comments count in the posts list as in the post detail to the community staff when a
+        comment was reported and approved
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community = make_community(creator=user, type='P')
+        commenter = make_user()
+        commenter.join_community_with_name(community_name=community.name)
+
+        post = user.create_community_post(text=make_fake_post_text(), community_name=community.name)
+        commenter.comment_post(post=post, text=make_fake_post_comment_text())
+        post_comment = commenter.comment_post(post=post, text=make_fake_post_comment_text())
+
+        report_category = make_moderation_category()
+        make_user().report_comment_for_post(post=post, post_comment=post_comment, category_id=report_category.pk)
+        moderated_object = ModeratedObject.get_or_create_moderated_object_for_post_comment(
+            post_comment=post_comment, category_id=report_category.pk)
+        user.approve_moderated_object(moderated_object=moderated_object)
+
+        response = self.client.get(self._get_url(), **headers)
+        post_data = next(post_data for post_data in json.loads(response.content) if post_data['id'] == post.pk)
+
+        post_response = self.client.get(reverse('post', kwargs={'post_uuid': post.uuid}), **headers)
+
+        self.assertEqual(post_data['comments_count'], json.loads(post_response.content)['comments_count'])
+
+    def _get_emoji_counts(self, post_data):
+        return [(emoji_count['emoji']['id'], emoji_count['count']) for emoji_count in
+                post_data['reactions_emoji_counts']]
+
+    def test_timeline_loads_world_circle_once(self):
+        """
+        should only query the world circle on the first timeline retrieval of the process
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        followed_user.create_public_post(text=make_fake_post_text())
+
+        url = self._get_url()
+        clear_reference_rows()
+
+        with CaptureQueriesContext(connection) as cold_context:
+            self.client.get(url, **headers)
+
+        with CaptureQueriesContext(connection) as warm_context:
+            response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(warm_context.captured_queries), len(cold_context.captured_queries))
+
+        self.assertEqual(len(self._get_world_circle_queries(cold_context.captured_queries)), 1)
+        self.assertEqual(len(self._get_world_circle_queries(warm_context.captured_queries)), 0)
+
+    def _get_world_circle_queries(self, queries):
+        return [query for query in queries if query['sql'].startswith('SELECT') and
+                'FROM "openbook_circles_circle" WHERE "openbook_circles_circle"."id" = ' in query['sql']]
+
+    def _normalize_post_data(self, post_data):
+        post_data = json.loads(json.dumps(post_data))
+        # Emojis with the same count have no defined order
+        post_data['reactions_emoji_counts'].sort(key=lambda emoji_count: (-emoji_count['count'],
+                                                                          emoji_count['emoji']['id']))
+        return post_data
+
     def _get_url(self):
         return reverse('posts')
 
@@ -4377,6 +4745,159 @@ class TrendingPostsAPITests(OpenbookAPITestCase):
         response_post = response_posts[0]
         self.assertEqual(response_post['post']['id'], post_two.pk)
 
+    @override_settings(TRENDING_POSTS_SCORES_ENABLED=True)
+    def test_scored_curation_lists_best_scored_posts_first(self):
+        """
+        should curate the posts by engagement score, listing the best scored first, when scores are enabled
+        """
+        TrendingPost.clear_posts_scores()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+        best_post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        reactors = make_users(2)
+        for reactor in reactors:
+            reactor.join_community_with_name(community_name=community.name)
+
+        # The engagement is scored once committed
+        with mock.patch('openbook_posts.models.transaction.on_commit', side_effect=lambda func: func()):
+            user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+            for reactor in reactors:
+                reactor.react_to_post_with_id(post_id=best_post.pk, emoji_id=emoji.pk)
+
+        curate_trending_posts()
+
+        headers = make_authentication_headers_for_user(user)
+        response = self.client.get(self._get_url(), **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+        response_posts_ids = [response_post['post']['id'] for response_post in response_posts]
+
+        self.assertEqual(response_posts_ids, [best_post.pk, post.pk])
+
+    @override_settings(TRENDING_POSTS_SCORES_ENABLED=True, MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT=2)
+    def test_scored_curation_honours_min_reactions(self):
+        """
+        should not curate well scored posts with less than minimum reactions when scores are enabled
+        """
+        TrendingPost.clear_posts_scores()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        commenters = make_users(3)
+        for commenter in commenters:
+            commenter.join_community_with_name(community_name=community.name)
+
+        # The engagement is scored once committed
+        with mock.patch('openbook_posts.models.transaction.on_commit', side_effect=lambda func: func()):
+            user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+            for commenter in commenters:
+                commenter.comment_post(post, text=make_fake_post_comment_text())
+
+        curate_trending_posts()
+
+        self.assertFalse(TrendingPost.objects.filter(post_id=post.pk).exists())
+
+    @override_settings(TRENDING_POSTS_SCORES_ENABLED=True)
+    def test_rolled_back_engagement_is_not_scored(self):
+        """
+        should not score the engagement of a rolled back transaction when scores are enabled
+        """
+        TrendingPost.clear_posts_scores()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji = make_emoji(group=make_reactions_emoji_group())
+
+        try:
+            with transaction.atomic():
+                user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+                user.comment_post(post, text=make_fake_post_comment_text())
+                raise DatabaseError()
+        except DatabaseError:
+            pass
+
+        self.assertEqual(TrendingPost.get_top_scored_posts_ids(count=30), [])
+
+    @override_settings(TRENDING_POSTS_SCORES_ENABLED=True)
+    def test_cleaning_evicts_posts_with_decayed_scores(self):
+        """
+        should remove the trending posts which engagement decayed when scores are enabled
+        """
+        TrendingPost.clear_posts_scores()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+        decayed_post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        # The engagement is scored once committed
+        with mock.patch('openbook_posts.models.transaction.on_commit', side_effect=lambda func: func()):
+            user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        with override_settings(TRENDING_POSTS_SCORES_ENABLED=False):
+            user.react_to_post_with_id(post_id=decayed_post.pk, emoji_id=emoji.pk)
+
+        TrendingPost.record_post_engagement(post=decayed_post, participant_id=user.pk,
+                                            score=TrendingPost.REACTION_SCORE,
+                                            at=timezone.now() - TrendingPost.get_scores_window())
+
+        TrendingPost.objects.create(post=decayed_post)
+        TrendingPost.objects.create(post=post)
+
+        clean_trending_posts()
+
+        self.assertTrue(TrendingPost.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(TrendingPost.objects.filter(post_id=decayed_post.pk).exists())
+
+    @override_settings(TRENDING_POSTS_SCORES_ENABLED=True)
+    def test_bootstrapping_records_existing_engagement(self):
+        """
+        should score the existing engagement and curate the posts when bootstrapping with scores enabled
+        """
+        TrendingPost.clear_posts_scores()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        with override_settings(TRENDING_POSTS_SCORES_ENABLED=False):
+            user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        self.assertEqual(TrendingPost.get_top_scored_posts_ids(count=30), [])
+
+        bootstrap_trending_posts()
+
+        self.assertEqual(TrendingPost.get_top_scored_posts_ids(count=30), [post.pk])
+        self.assertTrue(TrendingPost.objects.filter(post_id=post.pk).exists())
+
     def _get_url(self):
         return reverse('trending-posts-new')
 
@@ -5001,6 +5522,53 @@ class TopPostsAPITests(OpenbookAPITestCase):
         response_posts = json.loads(response.content)
         self.assertEqual(5, len(response_posts))
 
+    @override_settings(TOP_POSTS_INCREMENTAL_CURATION_ENABLED=True)
+    def test_incremental_curation_only_checks_posts_with_new_engagement(self):
+        """
+        should only curate the posts commented or reacted to since the last curation when incremental
+        """
+        TopPost.clear_dirty_posts()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        engaged_post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+        not_engaged_post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        with override_settings(TOP_POSTS_INCREMENTAL_CURATION_ENABLED=False):
+            user.comment_post(not_engaged_post, text=make_fake_post_comment_text())
+
+        user.comment_post(engaged_post, text=make_fake_post_comment_text())
+
+        curate_top_posts()
+
+        self.assertTrue(TopPost.objects.filter(post_id=engaged_post.pk).exists())
+        self.assertFalse(TopPost.objects.filter(post_id=not_engaged_post.pk).exists())
+        self.assertEqual(TopPost.pop_dirty_posts_ids(1000), [])
+
+    @override_settings(TOP_POSTS_INCREMENTAL_CURATION_ENABLED=True)
+    def test_reconciliation_curates_posts_missed_by_incremental_curation(self):
+        """
+        should curate every qualifying post when reconciling the top posts
+        """
+        TopPost.clear_dirty_posts()
+
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        with override_settings(TOP_POSTS_INCREMENTAL_CURATION_ENABLED=False):
+            user.comment_post(post, text=make_fake_post_comment_text())
+
+        curate_top_posts()
+
+        self.assertFalse(TopPost.objects.filter(post_id=post.pk).exists())
+
+        reconcile_top_posts()
+
+        self.assertTrue(TopPost.objects.filter(post_id=post.pk).exists())
+
     def _get_url(self):
         return reverse('top-posts')
 
@@ -5565,3 +6133,437 @@ class TopPostsExcludedCommunityAPITests(OpenbookAPITestCase):
         return reverse('top-posts-excluded-community', kwargs={
             'community_name': community.name
         })
+
+
+@override_settings(TIMELINE_MATERIALIZED_ENABLED=True)
+class MaterializedTimelinePostsAPITests(OpenbookAPITestCase):
+    """
+    PostsAPI with the materialized timeline enabled
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+        'openbook_common/fixtures/languages.json'
+    ]
+
+    def test_cold_timeline_is_rebuilt_on_read(self):
+        """
+        should rebuild a cold timeline and retrieve the same posts as the dynamic timeline
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        own_post = user.create_public_post(text=make_fake_post_text())
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        followed_user_post = followed_user.create_public_post(text=make_fake_post_text())
+
+        community = make_community(creator=make_user(), type='P')
+        user.join_community_with_name(community_name=community.name)
+        community_post = community.creator.create_community_post(text=make_fake_post_text(),
+                                                                  community_name=community.name)
+
+        foreign_user = make_user()
+        foreign_user.create_public_post(text=make_fake_post_text())
+
+        self.assertFalse(TimelineEntry.timeline_exists_for_user_with_id(user_id=user.pk))
+
+        response = self.client.get(self._get_url(), **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts_ids = [response_post['id'] for response_post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [community_post.pk, followed_user_post.pk, own_post.pk])
+        self.assertEqual(TimelineEntry.objects.filter(owner=user).count(), 3)
+
+    def test_published_post_is_fanned_out_to_warm_timelines(self):
+        """
+        should add a published post to the warm timelines of the followers
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        followed_user.create_public_post(text=make_fake_post_text())
+
+        # Warm up the timeline
+        self.client.get(self._get_url(), **headers)
+
+        post = followed_user.create_public_post(text=make_fake_post_text())
+        fan_out_post_to_timelines(post_id=post.pk)
+
+        self.assertTrue(TimelineEntry.objects.filter(owner=user, post=post).exists())
+
+        response = self.client.get(self._get_url(), **headers)
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(response_posts[0]['id'], post.pk)
+
+    def test_encircled_post_is_not_fanned_out_to_non_connected_followers(self):
+        """
+        should not add an encircled post to the timeline of a follower not connected in the circle
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        followed_user.create_public_post(text=make_fake_post_text())
+
+        self.client.get(self._get_url(), **headers)
+
+        circle = make_circle(creator=followed_user)
+        post = followed_user.create_encircled_post(text=make_fake_post_text(), circles_ids=[circle.pk])
+        fan_out_post_to_timelines(post_id=post.pk)
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=user, post=post).exists())
+
+    def test_post_is_not_fanned_out_to_cold_timelines(self):
+        """
+        should not create a partial timeline for users whose timeline is cold
+        """
+        user = make_user()
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+
+        post = followed_user.create_public_post(text=make_fake_post_text())
+        fan_out_post_to_timelines(post_id=post.pk)
+
+        self.assertFalse(TimelineEntry.timeline_exists_for_user_with_id(user_id=user.pk))
+
+    def test_unfollow_removes_posts_from_timeline(self):
+        """
+        should remove the posts of an unfollowed user from the timeline
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        user.create_public_post(text=make_fake_post_text())
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        followed_user_post = followed_user.create_public_post(text=make_fake_post_text())
+
+        self.client.get(self._get_url(), **headers)
+
+        user.unfollow_user(followed_user)
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=user, post=followed_user_post).exists())
+
+        response = self.client.get(self._get_url(), **headers)
+        response_posts_ids = [response_post['id'] for response_post in json.loads(response.content)]
+
+        self.assertNotIn(followed_user_post.pk, response_posts_ids)
+
+    def test_block_removes_posts_from_both_timelines(self):
+        """
+        should remove the posts of the blocked and blocking users from each others timelines
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community = make_community(creator=make_user(), type='P')
+
+        blocked_user = make_user()
+        blocked_user_headers = make_authentication_headers_for_user(blocked_user)
+
+        for community_member in [user, blocked_user]:
+            community_member.join_community_with_name(community_name=community.name)
+
+        user_post = user.create_community_post(text=make_fake_post_text(), community_name=community.name)
+        blocked_user_post = blocked_user.create_community_post(text=make_fake_post_text(),
+                                                               community_name=community.name)
+
+        self.client.get(self._get_url(), **headers)
+        self.client.get(self._get_url(), **blocked_user_headers)
+
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=user, post=blocked_user_post).exists())
+        self.assertFalse(TimelineEntry.objects.filter(owner=blocked_user, post=user_post).exists())
+
+    def test_leave_community_removes_posts_from_timeline(self):
+        """
+        should remove the posts of a left community from the timeline
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        user.create_public_post(text=make_fake_post_text())
+
+        community = make_community(creator=make_user(), type='P')
+        user.join_community_with_name(community_name=community.name)
+        community_post = community.creator.create_community_post(text=make_fake_post_text(),
+                                                                  community_name=community.name)
+
+        self.client.get(self._get_url(), **headers)
+
+        user.leave_community_with_name(community_name=community.name)
+
+        self.assertFalse(TimelineEntry.objects.filter(owner=user, post=community_post).exists())
+
+    def test_soft_delete_removes_post_from_timelines(self):
+        """
+        should remove a soft deleted post from the timelines
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+        post = followed_user.create_public_post(text=make_fake_post_text())
+
+        self.client.get(self._get_url(), **headers)
+
+        post.soft_delete()
+
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_trim_timelines(self):
+        """
+        should trim the timelines to the max length keeping the newest posts
+        """
+        user = make_user()
+
+        posts_ids = [user.create_public_post(text=make_fake_post_text()).pk for i in range(0, 5)]
+        TimelineEntry.rebuild_timeline_for_user(user=user)
+
+        with self.settings(TIMELINE_MAX_LENGTH=3):
+            trim_timelines()
+
+        timeline_posts_ids = list(TimelineEntry.objects.filter(owner=user).order_by('-post_id').values_list(
+            'post_id', flat=True))
+
+        self.assertEqual(timeline_posts_ids, sorted(posts_ids, reverse=True)[:3])
+
+    def _get_url(self):
+        return reverse('posts')
+
+
+@override_settings(USER_EXCLUSIONS_CACHE_ENABLED=True)
+class UserExclusionsCachePostsAPITests(OpenbookAPITestCase):
+    """
+    PostsAPI with the user exclusions cache enabled
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+        'openbook_common/fixtures/languages.json'
+    ]
+
+    def test_cant_retrieve_posts_of_user_blocked_after_caching(self):
+        """
+        should not retrieve the posts of a user blocked after the exclusions were cached
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community = make_community(creator=make_user(), type='P')
+
+        blocked_user = make_user()
+
+        for community_member in [user, blocked_user]:
+            community_member.join_community_with_name(community_name=community.name)
+
+        User.clear_exclusions_for_users_with_ids(users_ids=[user.pk, blocked_user.pk])
+
+        blocked_user_post = blocked_user.create_community_post(text=make_fake_post_text(),
+                                                               community_name=community.name)
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertIn(blocked_user_post.pk, [post['id'] for post in json.loads(response.content)])
+        self.assertEqual(User.get_exclusions_for_user_with_id(user_id=user.pk)['blocked_users_ids'], [])
+
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertNotIn(blocked_user_post.pk, [post['id'] for post in json.loads(response.content)])
+        self.assertEqual(User.get_exclusions_for_user_with_id(user_id=user.pk)['blocked_users_ids'],
+                         [blocked_user.pk])
+
+        user.unblock_user_with_id(user_id=blocked_user.pk)
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertIn(blocked_user_post.pk, [post['id'] for post in json.loads(response.content)])
+
+    def test_cant_retrieve_posts_reported_after_caching(self):
+        """
+        should not retrieve a post reported after the exclusions were cached
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+
+        User.clear_exclusions_for_users_with_ids(users_ids=[user.pk])
+
+        post = followed_user.create_public_post(text=make_fake_post_text())
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertIn(post.pk, [post['id'] for post in json.loads(response.content)])
+
+        user.report_post(post=post, category_id=make_moderation_category().pk)
+
+        response = self.client.get(self._get_url(), **headers)
+        self.assertNotIn(post.pk, [post['id'] for post in json.loads(response.content)])
+        self.assertEqual(User.get_exclusions_for_user_with_id(user_id=user.pk)['reported_posts_ids'], [post.pk])
+
+    def test_does_not_display_trending_post_from_community_banned_from_after_caching(self):
+        """
+        should not display a trending post of a community the user was banned from after the exclusions were cached
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        community_owner = make_user()
+        community = make_community(creator=community_owner, type='P')
+        user.join_community_with_name(community_name=community.name)
+
+        User.clear_exclusions_for_users_with_ids(users_ids=[user.pk])
+
+        post = community_owner.create_community_post(community_name=community.name, text=make_fake_post_text())
+        TrendingPost.objects.create(post=post)
+
+        response = self.client.get(reverse('trending-posts-new'), **headers)
+        self.assertEqual([post.pk], [trending_post['post']['id'] for trending_post in json.loads(response.content)])
+
+        community_owner.ban_user_with_username_from_community_with_name(username=user.username,
+                                                                        community_name=community.name)
+
+        response = self.client.get(reverse('trending-posts-new'), **headers)
+        self.assertEqual([], json.loads(response.content))
+        self.assertEqual(User.get_exclusions_for_user_with_id(user_id=user.pk)['banned_from_communities_ids'],
+                         [community.pk])
+
+    def test_falls_back_to_joins_when_too_many_ids(self):
+        """
+        should not cache the ids lists longer than the max and still exclude their posts
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        blocked_users = make_users(2)
+        for blocked_user in blocked_users:
+            user.follow_user(blocked_user)
+
+        User.clear_exclusions_for_users_with_ids(users_ids=[user.pk])
+
+        blocked_users_posts_ids = [blocked_user.create_public_post(text=make_fake_post_text()).pk for blocked_user in
+                                   blocked_users]
+
+        for blocked_user in blocked_users:
+            user.block_user_with_id(user_id=blocked_user.pk)
+
+        with self.settings(USER_EXCLUSIONS_CACHE_MAX_IDS=1):
+            response = self.client.get(self._get_url(), **headers)
+            self.assertIsNone(User.get_exclusions_for_user_with_id(user_id=user.pk)['blocked_users_ids'])
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        for blocked_user_post_id in blocked_users_posts_ids:
+            self.assertNotIn(blocked_user_post_id, response_posts_ids)
+
+    def _get_url(self):
+        return reverse('posts')
+
+
+class MergedTimelinePostsAPITests(OpenbookAPITestCase):
+    """
+    PostsAPI with the timeline queries merged
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+        'openbook_common/fixtures/languages.json'
+    ]
+
+    def test_retrieves_same_posts_as_union(self):
+        """
+        should retrieve the same timeline pages as the union of the timeline queries
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        followed_user = make_user()
+        user.follow_user(followed_user)
+
+        connected_user = make_user()
+        connected_user_circle = make_circle(creator=connected_user)
+        user.connect_with_user_with_id(connected_user.pk)
+        connected_user.confirm_connection_with_user_with_id(user.pk, circles_ids=[connected_user_circle.pk])
+
+        community = make_community(creator=make_user(), type='P')
+        blocked_user = make_user()
+
+        for community_member in [user, followed_user, blocked_user]:
+            community_member.join_community_with_name(community_name=community.name)
+
+        foreign_user = make_user()
+        report_category = make_moderation_category()
+
+        for i in range(0, 4):
+            user.create_public_post(text=make_fake_post_text())
+            user.create_community_post(text=make_fake_post_text(), community_name=community.name)
+            followed_user.create_public_post(text=make_fake_post_text())
+            followed_user.create_community_post(text=make_fake_post_text(), community_name=community.name)
+            connected_user.create_encircled_post(text=make_fake_post_text(), circles_ids=[connected_user_circle.pk])
+            reported_post = connected_user.create_public_post(text=make_fake_post_text())
+            user.report_post(post=reported_post, category_id=report_category.pk)
+            blocked_user.create_community_post(text=make_fake_post_text(), community_name=community.name)
+            community.creator.create_community_post(text=make_fake_post_text(), community_name=community.name)
+            foreign_user.create_public_post(text=make_fake_post_text())
+
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        for count in [1, 3, 7, 20]:
+            union_pages = self._get_timeline_pages(headers=headers, count=count)
+
+            with self.settings(TIMELINE_MERGED_QUERIES_ENABLED=True):
+                merged_pages = self._get_timeline_pages(headers=headers, count=count)
+
+            self.assertEqual(union_pages, merged_pages)
+            self.assertTrue(len(union_pages[0]) > 0)
+
+    def test_retrieves_each_branch_bounded_by_count(self):
+        """
+        should limit each of the timeline queries to count posts
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        for i in range(0, 5):
+            user.create_public_post(text=make_fake_post_text())
+
+        with self.settings(TIMELINE_MERGED_QUERIES_ENABLED=True), CaptureQueriesContext(connection) as context:
+            response = self.client.get(self._get_url(), {'count': 2}, **headers)
+
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+        limited_queries = [query['sql'] for query in context.captured_queries if 'LIMIT 2' in query['sql']]
+        self.assertEqual(len(limited_queries), 3)
+
+    def _get_timeline_pages(self, headers, count):
+        pages = []
+        max_id = None
+
+        while True:
+            query_params = {'count': count}
+            if max_id:
+                query_params['max_id'] = max_id
+
+            response = self.client.get(self._get_url(), query_params, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            page_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+            if not page_posts_ids:
+                return pages
+
+            pages.append(page_posts_ids)
+            max_id = page_posts_ids[-1]
+
+    def _get_url(self):
+        return reverse('posts')
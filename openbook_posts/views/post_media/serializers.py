@@ -5,7 +5,7 @@ from rest_framework import serializers
 from video_encoding.models import Format
 
 from openbook_common.serializers_fields.request import RestrictedImageFileSizeField, RestrictedFileSizeField
-from openbook_posts.models import PostMedia, PostImage, PostVideo
+from openbook_posts.models import PostMedia, PostImage, PostVideo, PostMediaUpload
 from openbook_posts.validators import post_uuid_exists, post_reaction_id_exists
 
 
@@ -26,6 +26,16 @@ class GetPostMediaSerializer(serializers.Serializer):
     )
 
 
+class PostMediaUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PostMediaUpload
+        fields = (
+            'id',
+            'order',
+            'status',
+        )
+
+
 class PostImageSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(read_only=True, required=False, allow_empty_file=True)
 
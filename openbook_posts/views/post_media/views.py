@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import transaction
 from rest_framework import status
 from rest_framework.parsers import FileUploadParser
@@ -8,7 +9,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from openbook_moderation.permissions import IsNotSuspended
 from openbook_posts.views.post_media.serializers import AddPostMediaSerializer, GetPostMediaSerializer, \
-    PostMediaSerializer
+    PostMediaSerializer, PostMediaUploadSerializer
 
 
 class PostMedia(APIView):
@@ -29,7 +30,15 @@ class PostMedia(APIView):
         order = data.get('order')
 
         with transaction.atomic():
-            user.add_media_to_post_with_uuid(post_uuid=post_uuid, file=file, order=order)
+            post = user.add_media_to_post_with_uuid(post_uuid=post_uuid, file=file, order=order)
+
+        if settings.POST_MEDIA_ASYNC_PROCESSING_ENABLED:
+            post_media_uploads_serializer = PostMediaUploadSerializer(post.get_pending_media(), many=True)
+
+            return Response({
+                'message': _('Media is being processed'),
+                'pending_media': post_media_uploads_serializer.data
+            }, status=status.HTTP_202_ACCEPTED)
 
         return Response({
             'message': _('Media added successfully to post')
@@ -61,7 +61,8 @@ class PostReactionEmojiGroupSerializer(serializers.ModelSerializer):
     emojis = serializers.SerializerMethodField()
 
     def get_emojis(self, obj):
-        emojis = obj.emojis.all().order_by('order')
+        # Prefetched ordered by order, see EmojiGroup.get_emoji_groups
+        emojis = obj.emojis.all()
 
         request = self.context['request']
         return PostReactionEmojiSerializer(emojis, many=True, context={'request': request}).data
@@ -110,7 +110,7 @@ class PostReactionEmojiGroups(APIView):
 
     def get(self, request):
         EmojiGroup = get_emoji_group_model()
-        emoji_groups = EmojiGroup.objects.filter(is_reaction_group=True).all().order_by('order')
+        emoji_groups = EmojiGroup.get_emoji_groups(is_reaction_group=True)
         serializer = PostReactionEmojiGroupSerializer(emoji_groups, many=True, context={'request': request})
 
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -7,7 +7,8 @@ from openbook_circles.validators import circle_id_exists
 from openbook_common.models import Emoji, Badge
 from openbook_common.serializers import CommonHashtagSerializer, CommonPublicUserSerializer
 from openbook_common.serializers_fields.post import ReactionField, CommentsCountField, PostReactionsEmojiCountField, \
-    CirclesField, PostCreatorField, PostIsMutedField, IsEncircledField
+    CirclesField, PostCreatorField, PostIsMutedField, IsEncircledField, PostsBatchLoaderListSerializer, \
+    RelatedPostsBatchLoaderListSerializer
 from openbook_common.serializers_fields.request import RestrictedImageFileSizeField, RestrictedFileSizeField
 from openbook_common.models import Language
 from openbook_communities.models import Community, CommunityMembership
@@ -210,6 +211,7 @@ class AuthenticatedUserPostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
+        list_serializer_class = PostsBatchLoaderListSerializer
         fields = (
             'id',
             'uuid',
@@ -240,6 +242,7 @@ class AuthenticatedUserTopPostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TopPost
+        list_serializer_class = RelatedPostsBatchLoaderListSerializer
         fields = (
             'id',
             'post',
@@ -252,6 +255,7 @@ class AuthenticatedUserTrendingPostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TrendingPost
+        list_serializer_class = RelatedPostsBatchLoaderListSerializer
         fields = (
             'id',
             'post',
@@ -0,0 +1,47 @@
+import re
+
+SEARCH_ENGINE_ICONTAINS = 'icontains'
+SEARCH_ENGINE_NGRAM = 'ngram'
+
+SEARCH_TOKEN_LENGTH = 3
+SEARCH_PREFIX_TOKEN_MARK = '^'
+
+words_starts_regexp = re.compile(r'(?:^|(?<=[\W_]))\w', flags=re.UNICODE)
+
+
+def make_search_tokens_for_values(values):
+    """
+    The trigrams of the given values, plus the one and two characters prefixes of their words marked with
+    SEARCH_PREFIX_TOKEN_MARK so queries shorter than a trigram can still match the start of a word
+    """
+    tokens = set()
+
+    for value in values:
+        if not value:
+            continue
+
+        value = value.lower()
+
+        for i in range(0, len(value) - SEARCH_TOKEN_LENGTH + 1):
+            tokens.add(value[i:i + SEARCH_TOKEN_LENGTH])
+
+        for word_start in words_starts_regexp.finditer(value):
+            start = word_start.start()
+            for prefix_length in range(1, SEARCH_TOKEN_LENGTH):
+                prefix = value[start:start + prefix_length]
+                if len(prefix) == prefix_length:
+                    tokens.add(SEARCH_PREFIX_TOKEN_MARK + prefix)
+
+    return tokens
+
+
+def make_search_tokens_for_query(query):
+    """
+    The tokens every value containing the query has, as made by make_search_tokens_for_values
+    """
+    query = query.lower()
+
+    if len(query) < SEARCH_TOKEN_LENGTH:
+        return {SEARCH_PREFIX_TOKEN_MARK + query} if query else set()
+
+    return set(query[i:i + SEARCH_TOKEN_LENGTH] for i in range(0, len(query) - SEARCH_TOKEN_LENGTH + 1))
@@ -0,0 +1,120 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from faker import Faker
+
+from openbook_common.utils.helpers import get_random_pastel_color
+from openbook_common.utils.model_loaders import get_user_model, get_community_model, get_hashtag_model, \
+    get_search_token_model
+from openbook_search.helpers import SEARCH_ENGINE_ICONTAINS, SEARCH_ENGINE_NGRAM
+
+fake = Faker()
+
+
+class SeededDatasetRollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares the latency of the users, communities and hashtags searches with each search engine on a ' \
+           'seeded dataset which is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5000,
+                            help='The amount of users, communities and hashtags to seed')
+        parser.add_argument('--queries', type=int, default=50, help='The amount of queries to run per search')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._benchmark(size=options['size'], queries_count=options['queries'])
+                raise SeededDatasetRollback()
+        except SeededDatasetRollback:
+            pass
+
+    def _benchmark(self, size, queries_count):
+        SearchToken = get_search_token_model()
+
+        self.stdout.write('Seeding %d users, communities and hashtags' % size)
+        users_ids, communities_ids, hashtags_ids, names = self._seed(size=size)
+
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_USER, objects_ids=users_ids)
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, objects_ids=communities_ids)
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG, objects_ids=hashtags_ids)
+
+        User = get_user_model()
+        user = User.objects.get(pk=users_ids[0])
+
+        queries = [self._make_query(name=fake.random_element(names)) for i in range(0, queries_count)]
+
+        searches = (
+            ('users', lambda query: user.search_users_with_query(query=query)),
+            ('communities', lambda query: user.search_communities_with_query(query=query,
+                                                                             excluded_from_profile_posts=True)),
+            ('hashtags', lambda query: user.search_hashtags_with_query(query=query)),
+        )
+
+        for search_name, search in searches:
+            for search_engine in (SEARCH_ENGINE_ICONTAINS, SEARCH_ENGINE_NGRAM):
+                with override_settings(SEARCH_ENGINE=search_engine):
+                    durations = []
+
+                    for query in queries:
+                        start = time.perf_counter()
+                        list(search(query)[:20])
+                        durations.append((time.perf_counter() - start) * 1000)
+
+                durations.sort()
+                p95_duration = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+                self.stdout.write('%s search with %s engine: median %.2fms, p95 %.2fms' % (
+                    search_name, search_engine, statistics.median(durations), p95_duration))
+
+    def _seed(self, size):
+        User = get_user_model()
+        UserProfile = User._meta.get_field('profile').related_model
+        Community = get_community_model()
+        Hashtag = get_hashtag_model()
+
+        created = timezone.now()
+        prefix = fake.pystr(min_chars=4, max_chars=4).lower()
+        names = []
+
+        users = []
+        for i in range(0, size):
+            name = fake.name()
+            names.append(name)
+            users.append(User(username='%s_%d_%s' % (prefix, i, fake.user_name())[:30],
+                              email='%s_%d_%s' % (prefix, i, fake.email()), password='!'))
+        User.objects.bulk_create(users)
+        users_ids = list(User.objects.filter(username__startswith='%s_' % prefix).values_list('pk', flat=True))
+
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id, name=name) for user_id, name in zip(users_ids, names)])
+
+        communities = []
+        for i in range(0, size):
+            title = fake.catch_phrase()
+            names.append(title)
+            communities.append(Community(creator_id=users_ids[i], name='%s%d%s' % (prefix, i, fake.word())[:32],
+                                         title=title[:32], color=get_random_pastel_color(), created=created))
+        Community.objects.bulk_create(communities)
+        communities_ids = list(Community.objects.filter(name__startswith=prefix).values_list('pk', flat=True))
+
+        hashtags = []
+        for i in range(0, size):
+            word = fake.word()
+            names.append(word)
+            hashtags.append(Hashtag(name='%s%s%d' % (word, prefix, i), color=get_random_pastel_color(),
+                                    created=created))
+        Hashtag.objects.bulk_create(hashtags)
+        hashtags_ids = list(Hashtag.objects.filter(name__contains=prefix).values_list('pk', flat=True))
+
+        return users_ids, communities_ids, hashtags_ids, names
+
+    def _make_query(self, name):
+        word = fake.random_element(name.split()).lower()
+        return word[:fake.random_int(min=2, max=max(2, len(word)))]
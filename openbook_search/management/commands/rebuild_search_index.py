@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_common.utils.model_loaders import get_search_token_model
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index of the users, communities and hashtags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='The amount of objects to index at once')
+
+    def handle(self, *args, **options):
+        SearchToken = get_search_token_model()
+
+        batch_size = options['batch_size']
+
+        for object_type, object_type_name in SearchToken.OBJECT_TYPES:
+            changed_tokens_count = SearchToken.rebuild_index_for_object_type(object_type=object_type,
+                                                                             batch_size=batch_size)
+            logger.info('Rebuilt search index of %s objects, %d tokens changed' % (object_type_name,
+                                                                                   changed_tokens_count))
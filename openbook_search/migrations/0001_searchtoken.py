@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('U', 'User'), ('C', 'Community'), ('H', 'Hashtag')], max_length=1)),
+                ('object_id', models.PositiveIntegerField()),
+                ('token', models.CharField(max_length=3)),
+            ],
+            options={
+                'unique_together': {('object_type', 'token', 'object_id')},
+                'index_together': {('object_type', 'object_id')},
+            },
+        ),
+    ]
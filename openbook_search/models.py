@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Count
+from django.db.models.functions import Length
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from openbook_auth.models import User, UserProfile
+from openbook_communities.models import Community
+from openbook_hashtags.models import Hashtag
+from openbook_search.helpers import make_search_tokens_for_values, make_search_tokens_for_query, \
+    SEARCH_TOKEN_LENGTH
+from openbook_search.queries import is_search_index_engine_enabled, make_search_rank_expression
+
+
+class SearchToken(models.Model):
+    """
+    The n-grams of the searchable fields of the users, communities and hashtags, see make_search_tokens_for_values
+    """
+    OBJECT_TYPE_USER = 'U'
+    OBJECT_TYPE_COMMUNITY = 'C'
+    OBJECT_TYPE_HASHTAG = 'H'
+    OBJECT_TYPES = (
+        (OBJECT_TYPE_USER, 'User'),
+        (OBJECT_TYPE_COMMUNITY, 'Community'),
+        (OBJECT_TYPE_HASHTAG, 'Hashtag'),
+    )
+
+    object_type = models.CharField(max_length=1, choices=OBJECT_TYPES)
+    object_id = models.PositiveIntegerField()
+    token = models.CharField(max_length=SEARCH_TOKEN_LENGTH)
+
+    class Meta:
+        unique_together = (('object_type', 'token', 'object_id'),)
+        index_together = [
+            ('object_type', 'object_id'),
+        ]
+
+    @classmethod
+    def is_search_index_enabled(cls):
+        return settings.SEARCH_INDEX_ENABLED or is_search_index_engine_enabled()
+
+    @classmethod
+    def get_matching_objects_ids(cls, object_type, query):
+        """
+        The ids of the objects which searchable fields might contain the query, at most
+        SEARCH_INDEX_MAX_CANDIDATES of them, the best matching ones first
+        """
+        tokens = make_search_tokens_for_query(query=query)
+
+        if not tokens:
+            return []
+
+        matching_objects_ids = cls.objects.filter(object_type=object_type, token__in=tokens).values(
+            'object_id').annotate(matched_tokens_count=Count('id')).filter(
+            matched_tokens_count=len(tokens)).order_by().values('object_id')
+
+        # Rank the candidates before capping them so the exact and prefix matches are never left out
+        object_model = cls._get_object_model(object_type=object_type)
+        searchable_fields = cls._get_searchable_fields(object_type=object_type)
+
+        return list(object_model.objects.filter(pk__in=matching_objects_ids).annotate(
+            search_rank=make_search_rank_expression(query=query, fields=searchable_fields)).order_by(
+            '-search_rank', Length(searchable_fields[0]), 'pk').values_list('pk', flat=True)[
+                    :settings.SEARCH_INDEX_MAX_CANDIDATES])
+
+    @classmethod
+    def index_objects_with_ids(cls, object_type, objects_ids):
+        """
+        Brings the tokens of the given objects up to date with their searchable fields, removing the tokens of
+        the objects which no longer exist. Returns the amount of created and deleted tokens.
+        """
+        objects_ids = list(objects_ids)
+
+        if not objects_ids:
+            return 0
+
+        wanted_tokens = set()
+
+        for object_id, *values in cls._get_searchable_values_queryset(object_type=object_type).filter(
+                pk__in=objects_ids):
+            wanted_tokens.update((object_id, token) for token in make_search_tokens_for_values(values=values))
+
+        stale_tokens_ids = []
+        existing_tokens = set()
+
+        for token_id, object_id, token in cls.objects.filter(object_type=object_type,
+                                                             object_id__in=objects_ids).values_list('id',
+                                                                                                    'object_id',
+                                                                                                    'token'):
+            if (object_id, token) in wanted_tokens:
+                existing_tokens.add((object_id, token))
+            else:
+                stale_tokens_ids.append(token_id)
+
+        if stale_tokens_ids:
+            cls.objects.filter(id__in=stale_tokens_ids).delete()
+
+        new_tokens = wanted_tokens - existing_tokens
+
+        if new_tokens:
+            # The collation of the database might consider different tokens the same
+            cls.objects.bulk_create([cls(object_type=object_type, object_id=object_id, token=token) for
+                                     object_id, token in new_tokens], ignore_conflicts=True)
+
+        return len(stale_tokens_ids) + len(new_tokens)
+
+    @classmethod
+    def remove_object_with_id(cls, object_type, object_id):
+        cls.objects.filter(object_type=object_type, object_id=object_id).delete()
+
+    @classmethod
+    def should_index_on_save(cls, searchable_fields, raw=False, update_fields=None):
+        if raw or not cls.is_search_index_enabled():
+            return False
+
+        return update_fields is None or not set(update_fields).isdisjoint(searchable_fields)
+
+    @classmethod
+    def rebuild_index_for_object_type(cls, object_type, batch_size):
+        """
+        Indexes every object of the given type and removes the tokens of the deleted ones.
+        Returns the amount of created and deleted tokens.
+        """
+        object_model = cls._get_object_model(object_type=object_type)
+
+        total_changed_tokens = 0
+        last_id = 0
+
+        while True:
+            objects_ids = list(
+                object_model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size])
+
+            if not objects_ids:
+                break
+
+            total_changed_tokens += cls.index_objects_with_ids(object_type=object_type, objects_ids=objects_ids)
+            last_id = objects_ids[-1]
+
+        deleted_tokens_count, _ = cls.objects.filter(object_type=object_type).exclude(
+            object_id__in=object_model.objects.values('pk')).delete()
+
+        return total_changed_tokens + deleted_tokens_count
+
+    @classmethod
+    def _get_searchable_values_queryset(cls, object_type):
+        object_model = cls._get_object_model(object_type=object_type)
+        return object_model.objects.values_list('id', *cls._get_searchable_fields(object_type=object_type))
+
+    @classmethod
+    def _get_searchable_fields(cls, object_type):
+        if object_type == cls.OBJECT_TYPE_USER:
+            return ('username', 'profile__name')
+        elif object_type == cls.OBJECT_TYPE_COMMUNITY:
+            return ('name', 'title')
+
+        return ('name',)
+
+    @classmethod
+    def _get_object_model(cls, object_type):
+        if object_type == cls.OBJECT_TYPE_USER:
+            return User
+        elif object_type == cls.OBJECT_TYPE_COMMUNITY:
+            return Community
+        elif object_type == cls.OBJECT_TYPE_HASHTAG:
+            return Hashtag
+
+        raise ValueError('Unknown search object type %s' % object_type)
+
+
+@receiver(post_save, sender=User, dispatch_uid='search_index_user_on_save')
+def user_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if SearchToken.should_index_on_save(searchable_fields=('username',), raw=raw, update_fields=update_fields):
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_USER, objects_ids=[instance.pk])
+
+
+@receiver(post_save, sender=UserProfile, dispatch_uid='search_index_user_profile_on_save')
+def user_profile_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if SearchToken.should_index_on_save(searchable_fields=('name',), raw=raw, update_fields=update_fields):
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_USER, objects_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=Community, dispatch_uid='search_index_community_on_save')
+def community_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if SearchToken.should_index_on_save(searchable_fields=('name', 'title'), raw=raw, update_fields=update_fields):
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, objects_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Hashtag, dispatch_uid='search_index_hashtag_on_save')
+def hashtag_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if SearchToken.should_index_on_save(searchable_fields=('name',), raw=raw, update_fields=update_fields):
+        SearchToken.index_objects_with_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG, objects_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=User, dispatch_uid='search_index_user_on_delete')
+def user_post_delete(sender, instance, **kwargs):
+    if SearchToken.is_search_index_enabled():
+        SearchToken.remove_object_with_id(object_type=SearchToken.OBJECT_TYPE_USER, object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Community, dispatch_uid='search_index_community_on_delete')
+def community_post_delete(sender, instance, **kwargs):
+    if SearchToken.is_search_index_enabled():
+        SearchToken.remove_object_with_id(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, object_id=instance.pk)
+
+
+@receiver(post_delete, sender=Hashtag, dispatch_uid='search_index_hashtag_on_delete')
+def hashtag_post_delete(sender, instance, **kwargs):
+    if SearchToken.is_search_index_enabled():
+        SearchToken.remove_object_with_id(object_type=SearchToken.OBJECT_TYPE_HASHTAG, object_id=instance.pk)
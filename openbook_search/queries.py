@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db.models import Q, Case, When, Value, IntegerField
+
+from openbook_common.utils.model_loaders import get_search_token_model
+from openbook_search.helpers import SEARCH_ENGINE_NGRAM
+
+
+def is_search_index_engine_enabled():
+    return settings.SEARCH_ENGINE == SEARCH_ENGINE_NGRAM
+
+
+def make_users_search_index_query(query):
+    SearchToken = get_search_token_model()
+    return make_search_index_query(object_type=SearchToken.OBJECT_TYPE_USER, query=query)
+
+
+def make_communities_search_index_query(query):
+    SearchToken = get_search_token_model()
+    return make_search_index_query(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, query=query)
+
+
+def make_hashtags_search_index_query(query):
+    SearchToken = get_search_token_model()
+    return make_search_index_query(object_type=SearchToken.OBJECT_TYPE_HASHTAG, query=query)
+
+
+def make_search_index_query(object_type, query):
+    SearchToken = get_search_token_model()
+    return Q(id__in=SearchToken.get_matching_objects_ids(object_type=object_type, query=query))
+
+
+def make_search_rank_expression(query, fields):
+    """
+    3 when one of the fields is the query, 2 when one of them starts with it and 1 otherwise
+    """
+    exact_query = Q()
+    prefix_query = Q()
+
+    for field in fields:
+        exact_query.add(Q(**{'%s__iexact' % field: query}), Q.OR)
+        prefix_query.add(Q(**{'%s__istartswith' % field: query}), Q.OR)
+
+    return Case(
+        When(exact_query, then=Value(3)),
+        When(prefix_query, then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
@@ -0,0 +1,229 @@
+from django.test import override_settings
+from django.urls import reverse
+from faker import Faker
+from rest_framework import status
+
+from openbook_common.tests.helpers import make_user, make_community, make_hashtag, make_authentication_headers_for_user
+from openbook_common.tests.models import OpenbookAPITestCase
+from openbook_search.helpers import make_search_tokens_for_values, make_search_tokens_for_query
+from openbook_search.models import SearchToken
+
+fake = Faker()
+
+
+class SearchTokensTests(OpenbookAPITestCase):
+    """
+    make_search_tokens_for_values and make_search_tokens_for_query
+    """
+
+    def test_query_tokens_are_contained_in_matching_value_tokens(self):
+        """
+        should make the tokens of a query a subset of the tokens of the values containing it
+        """
+        value_tokens = make_search_tokens_for_values(values=['Okuna Social', 'okuna_network'])
+
+        for query in ('kun', 'Social', 'a_net', 'na so', 'o', 'ne'):
+            self.assertTrue(make_search_tokens_for_query(query=query).issubset(value_tokens), query)
+
+    def test_short_query_only_matches_words_starts(self):
+        """
+        should only match queries shorter than a token at the start of a word
+        """
+        value_tokens = make_search_tokens_for_values(values=['Okuna Social'])
+
+        self.assertFalse(make_search_tokens_for_query(query='ku').issubset(value_tokens))
+        self.assertTrue(make_search_tokens_for_query(query='so').issubset(value_tokens))
+
+
+@override_settings(SEARCH_ENGINE='ngram')
+class NgramSearchTests(OpenbookAPITestCase):
+    """
+    Search of the users, communities and hashtags with the ngram search engine
+    """
+
+    def test_searches_users_by_username_and_name(self):
+        """
+        should find the users containing the query in their username or name
+        """
+        user = make_user()
+        username_user = make_user(username='plantlover')
+        name_user = make_user(name='Ada Plantagenet')
+        make_user(username='gardener', name='Grace Hopper')
+
+        users = user.search_users_with_query(query='plant')
+
+        self.assertEqual(set(users), {username_user, name_user})
+
+    def test_searching_users_excludes_blocked_users(self):
+        """
+        should not find the users blocking or blocked by the searching user
+        """
+        user = make_user()
+        blocked_user = make_user(username='plantlover')
+        blocking_user = make_user(username='plantfan')
+
+        user.block_user_with_id(user_id=blocked_user.pk)
+        blocking_user.block_user_with_id(user_id=user.pk)
+
+        self.assertFalse(user.search_users_with_query(query='plant').exists())
+
+    def test_ranks_users_by_match_then_followers(self):
+        """
+        should put the exact matches first, then the prefix matches, then the most followed users
+        """
+        user = make_user()
+        contained_user = make_user(username='myplant')
+        followed_contained_user = make_user(username='bigplants')
+        prefix_user = make_user(username='plants')
+        exact_user = make_user(username='plant')
+
+        make_user().follow_user(user=followed_contained_user)
+
+        users = list(user.search_users_with_query(query='plant'))
+
+        self.assertEqual(users, [exact_user, prefix_user, followed_contained_user, contained_user])
+
+    def test_matches_short_queries_at_words_starts(self):
+        """
+        should find the users with a word of their name starting with a short query
+        """
+        user = make_user()
+        name_user = make_user(name='Ada Lovelace')
+
+        self.assertEqual(list(user.search_users_with_query(query='lo')), [name_user])
+
+    def test_reindexes_updated_users(self):
+        """
+        should find the users by their new username only
+        """
+        user = make_user()
+        updated_user = make_user(username='plantlover')
+
+        updated_user.username = 'treelover'
+        updated_user.save()
+
+        self.assertFalse(user.search_users_with_query(query='plant').exists())
+        self.assertEqual(list(user.search_users_with_query(query='tree')), [updated_user])
+
+    def test_searches_communities_by_name_and_title(self):
+        """
+        should find the communities containing the query in their name or title, the most popular first
+        """
+        user = make_user()
+        community = make_community(name='plants', title='Green things')
+        popular_community = make_community(name='gardening', title='Indoor plants')
+        other_community = make_community(name='bigplants', title='Trees')
+        make_community(name='cooking', title='Recipes')
+
+        make_user().join_community_with_name(community_name=popular_community.name)
+
+        communities = list(user.search_communities_with_query(query='plant', excluded_from_profile_posts=True))
+
+        self.assertEqual(communities, [community, popular_community, other_community])
+
+    def test_searches_hashtags_created_by_posts(self):
+        """
+        should find the hashtags created when posting
+        """
+        user = make_user()
+        user.create_public_post(text='#houseplants are great')
+
+        hashtags = user.search_hashtags_with_query(query='plant')
+
+        self.assertEqual([hashtag.name for hashtag in hashtags], ['houseplants'])
+
+    @override_settings(SEARCH_INDEX_MAX_CANDIDATES=2)
+    def test_keeps_best_matches_when_capping_candidates(self):
+        """
+        should keep the exact and prefix matches when there are more candidates than SEARCH_INDEX_MAX_CANDIDATES
+        """
+        user = make_user()
+
+        for name in ('houseplants', 'bigplants', 'myplants'):
+            make_hashtag(name=name)
+
+        prefix_hashtag = make_hashtag(name='plants')
+        exact_hashtag = make_hashtag(name='plant')
+
+        self.assertEqual(
+            SearchToken.get_matching_objects_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG, query='plant'),
+            [exact_hashtag.pk, prefix_hashtag.pk])
+        self.assertEqual(list(user.search_hashtags_with_query(query='plant')), [exact_hashtag, prefix_hashtag])
+
+    def test_removes_deleted_objects_from_index(self):
+        """
+        should remove the tokens of the deleted hashtags
+        """
+        hashtag = make_hashtag(name='houseplants')
+        hashtag_id = hashtag.pk
+
+        hashtag.delete()
+
+        self.assertFalse(SearchToken.objects.filter(object_type=SearchToken.OBJECT_TYPE_HASHTAG,
+                                                    object_id=hashtag_id).exists())
+
+    def test_search_users_api_returns_same_users_as_icontains_engine(self):
+        """
+        should return the same users through the API with both search engines
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user=user)
+
+        for i in range(0, 5):
+            make_user(name='%s %s' % (fake.first_name(), fake.last_name()))
+
+        url = reverse('search-users')
+
+        for query in ('a', 'an', 'son', 'er'):
+            response = self.client.get(url, {'query': query}, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            with override_settings(SEARCH_ENGINE='icontains'):
+                icontains_response = self.client.get(url, {'query': query}, **headers)
+
+            ngram_usernames = set(user['username'] for user in response.json())
+            icontains_usernames = set(user['username'] for user in icontains_response.json())
+
+            self.assertTrue(ngram_usernames.issubset(icontains_usernames))
+
+
+class SearchIndexMaintenanceTests(OpenbookAPITestCase):
+    """
+    Maintenance of the search index
+    """
+
+    def test_does_not_index_when_disabled(self):
+        """
+        should not index the objects while the index is disabled
+        """
+        with override_settings(SEARCH_ENGINE='icontains', SEARCH_INDEX_ENABLED=False):
+            make_hashtag(name='houseplants')
+
+        self.assertFalse(SearchToken.objects.exists())
+
+    @override_settings(SEARCH_INDEX_ENABLED=True)
+    def test_indexes_when_enabled(self):
+        """
+        should maintain the index when enabled, even if the icontains engine is used
+        """
+        hashtag = make_hashtag(name='houseplants')
+
+        self.assertEqual(
+            SearchToken.get_matching_objects_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG, query='plant'),
+            [hashtag.pk])
+
+    def test_rebuild_index(self):
+        """
+        should index the existing objects and remove the tokens of the deleted ones
+        """
+        with override_settings(SEARCH_INDEX_ENABLED=False):
+            hashtag = make_hashtag(name='houseplants')
+
+        SearchToken.objects.create(object_type=SearchToken.OBJECT_TYPE_HASHTAG, object_id=hashtag.pk + 1,
+                                   token='pla')
+
+        SearchToken.rebuild_index_for_object_type(object_type=SearchToken.OBJECT_TYPE_HASHTAG, batch_size=10)
+
+        self.assertEqual(
+            SearchToken.get_matching_objects_ids(object_type=SearchToken.OBJECT_TYPE_HASHTAG, query='plant'),
+            [hashtag.pk])
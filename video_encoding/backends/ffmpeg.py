@@ -76,9 +76,10 @@ class FFmpegBackend(BaseEncodingBackend):
         if process.returncode != 0:
             raise exceptions.FFmpegError("`{}` exited with code {:d}".format(
                 ' '.join(process.args), process.returncode))
-        self.stdout = stdout.decode(console_encoding)
-        self.stderr = stderr.decode(console_encoding)
-        return self.stdout, self.stderr
+        # Return the decoded output rather than the attributes, another thread could be using this backend
+        self.stdout = stdout = stdout.decode(console_encoding)
+        self.stderr = stderr = stderr.decode(console_encoding)
+        return stdout, stderr
 
     # TODO reduce complexity
     def encode(self, source_path, target_path, params):  # NOQA: C901
@@ -168,22 +169,25 @@ class FFmpegBackend(BaseEncodingBackend):
             'height': int(media_info['video'][0]['height']),
         }
 
-    def get_thumbnail(self, video_path, at_time=0.5):
+    def get_thumbnail(self, video_path, at_time=0.5, video_duration=None):
         """
-        Extracts an image of a video and returns its path.
+        Extracts an image of a video and returns its path. The video is
+        probed for its duration unless given.
 
         If the requested thumbnail is not within the duration of the video
         an `InvalidTimeError` is thrown.
         """
         filename = os.path.basename(video_path)
         filename, __ = os.path.splitext(filename)
-        _, image_path = tempfile.mkstemp(suffix='_{}.jpg'.format(filename))
 
-        video_duration = self.get_media_info(video_path)['duration']
+        if video_duration is None:
+            video_duration = self.get_media_info(video_path)['duration']
         if at_time > video_duration:
             raise exceptions.InvalidTimeError()
         thumbnail_time = at_time
 
+        _, image_path = tempfile.mkstemp(suffix='_{}.jpg'.format(filename))
+
         cmds = [self.ffmpeg_path, '-i', video_path, '-vframes', '1']
         cmds.extend(['-ss', str(thumbnail_time), '-y', image_path])
 
@@ -1,10 +1,18 @@
+import os
+
 from appconf import AppConf
 from django.conf import settings  # NOQA
 
 
 class VideoEncodingAppConf(AppConf):
     THREADS = 1
+    # The maximum amount of encodings, thus of encoder processes, running at once
+    MAX_WORKERS = os.cpu_count() or 1
+    # The minimum amount of seconds between two writes of the progress of a format
     PROGRESS_UPDATE = 30
+    # Where the local files videos were stored from are kept for their
+    # encoding, see `keep_fieldfile_local_copy`. Disabled if None.
+    LOCAL_COPIES_DIR = None
     BACKEND = 'video_encoding.backends.ffmpeg.FFmpegBackend'
     BACKEND_PARAMS = {}
     FORMATS = {
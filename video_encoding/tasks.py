@@ -1,11 +1,14 @@
 import os
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
 
-from video_encoding.utils import get_fieldfile_local_path
+from video_encoding.utils import get_fieldfile_local_path, \
+    delete_fieldfile_local_copy
 from .backends import get_backend
 from .config import settings
 from .exceptions import VideoEncodingError
@@ -22,6 +25,7 @@ def convert_all_videos(app_label, model_name, object_pk):
     instance = Model.objects.get(pk=object_pk)
 
     # search for `VideoFields`
+    fieldfiles = []
     fields = instance._meta.fields
     for field in fields:
         if isinstance(field, VideoField):
@@ -29,29 +33,183 @@ def convert_all_videos(app_label, model_name, object_pk):
                 # ignore empty fields
                 continue
 
-            # trigger conversion
-            fieldfile = getattr(instance, field.name)
-            convert_video(fieldfile)
+            fieldfiles.append(getattr(instance, field.name))
+
+    # trigger conversion
+    convert_videos(fieldfiles)
 
 
 def convert_video(fieldfile, force=False):
     """
     Converts a given video file into all defined formats.
     """
-    instance = fieldfile.instance
-    field = fieldfile.field
+    convert_videos([fieldfile], force=force)
 
-    local_path, temp_file = get_fieldfile_local_path(fieldfile=fieldfile)
-
-    filename = os.path.basename(local_path)
-    source_path = local_path
 
+def convert_videos(fieldfiles, force=False):
+    """
+    Converts the given video files into all defined formats, running up to
+    `VIDEO_ENCODING_MAX_WORKERS` encodings at once.
+    """
     encoding_backend = get_backend()
+    encodings = []
+    temp_files = []
+
+    try:
+        for fieldfile in fieldfiles:
+            formats_options = _get_formats_options_to_encode(
+                fieldfile=fieldfile, encoding_backend=encoding_backend,
+                force=force)
+
+            if not formats_options:
+                continue
+
+            local_path, temp_file = get_fieldfile_local_path(
+                fieldfile=fieldfile)
+            if temp_file:
+                temp_files.append(temp_file)
+
+            filename = os.path.basename(local_path)
+
+            for video_format, options in formats_options:
+                # TODO do not upscale videos
+
+                _, target_path = tempfile.mkstemp(
+                    suffix='_{name}.{extension}'.format(**options))
+
+                encoding = Encoding(source_path=local_path,
+                                    target_path=target_path,
+                                    params=options['params'])
+                encoding.video_format = video_format
+                encoding.filename = '{filename}_{name}.{extension}'.format(
+                    filename=filename, **options)
+                encodings.append(encoding)
+
+        run_encodings(encodings, encoding_backend=encoding_backend,
+                      on_progress=_save_encoding_progress,
+                      on_finished=_save_encoding)
+    finally:
+        # remove temporary files
+        for encoding in encodings:
+            if os.path.exists(encoding.target_path):
+                os.remove(encoding.target_path)
+
+        for temp_file in temp_files:
+            temp_file.close()
+            os.unlink(temp_file.name)
+
+        # the local copies are only kept for the encoding
+        for fieldfile in fieldfiles:
+            delete_fieldfile_local_copy(fieldfile=fieldfile)
+
+
+class Encoding(object):
+    """
+    The encoding of a source video into a target file with the params of a
+    format, see `run_encodings`.
+    """
+
+    def __init__(self, source_path, target_path, params):
+        self.source_path = source_path
+        self.target_path = target_path
+        self.params = params
+        # from 0 to 1, as reported by the encoder
+        self.progress = 0
+        self.error = None
+
+
+def run_encodings(encodings, encoding_backend=None, max_workers=None,
+                  on_progress=None, on_finished=None):
+    """
+    Runs the encodings, up to `max_workers` at once. Each one runs in its own
+    encoder process, driven by a thread which only records its progress.
+
+    The callbacks are called with the encoding from the calling thread, so
+    they can use the database. `on_progress` is called at most every
+    `VIDEO_ENCODING_PROGRESS_UPDATE` seconds per encoding and `on_finished`
+    once it is done, with its `error` set if it failed.
+    """
+    if not encodings:
+        return
+
+    if encoding_backend is None:
+        encoding_backend = get_backend()
+
+    if max_workers is None:
+        max_workers = settings.VIDEO_ENCODING_MAX_WORKERS
+
+    progress_update = settings.VIDEO_ENCODING_PROGRESS_UPDATE
+    max_workers = max(1, min(max_workers, len(encodings)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running_encodings = {
+            executor.submit(_encode, encoding_backend, encoding): encoding
+            for encoding in encodings}
+        progress_updated = dict.fromkeys(encodings, time.monotonic())
+        saved_progresses = dict.fromkeys(encodings, 0)
+
+        try:
+            while running_encodings:
+                finished_futures, _ = wait(running_encodings,
+                                           timeout=max(progress_update, 1),
+                                           return_when=FIRST_COMPLETED)
+
+                for future in finished_futures:
+                    encoding = running_encodings.pop(future)
+
+                    try:
+                        future.result()
+                    except VideoEncodingError as e:
+                        encoding.error = e
+
+                    if on_finished:
+                        on_finished(encoding)
+
+                if on_progress:
+                    _report_progresses(
+                        encodings=running_encodings.values(),
+                        on_progress=on_progress,
+                        progress_updated=progress_updated,
+                        saved_progresses=saved_progresses,
+                        progress_update=progress_update)
+        except BaseException:
+            # do not start the queued encodings
+            for future in running_encodings:
+                future.cancel()
+            raise
+
+
+def _report_progresses(encodings, on_progress, progress_updated,
+                       saved_progresses, progress_update):
+    now = time.monotonic()
+
+    for encoding in encodings:
+        if encoding.progress == saved_progresses[encoding] or \
+                now - progress_updated[encoding] < progress_update:
+            continue
+
+        saved_progresses[encoding] = encoding.progress
+        progress_updated[encoding] = now
+        on_progress(encoding)
+
+
+def _encode(encoding_backend, encoding):
+    for progress in encoding_backend.encode(
+            encoding.source_path, encoding.target_path, encoding.params):
+        encoding.progress = progress
+
+
+def _get_formats_options_to_encode(fieldfile, encoding_backend, force):
+    instance = fieldfile.instance
+    field = fieldfile.field
+    content_type = ContentType.objects.get_for_model(instance)
+
+    formats_options = []
 
     for options in settings.VIDEO_ENCODING_FORMATS[encoding_backend.name]:
         video_format, created = Format.objects.get_or_create(
             object_id=instance.pk,
-            content_type=ContentType.objects.get_for_model(instance),
+            content_type=content_type,
             field_name=field.name, format=options['name'])
 
         # do not reencode if not requested
@@ -61,37 +219,25 @@ def convert_video(fieldfile, force=False):
             # set progress to 0
             video_format.reset_progress()
 
-        # TODO do not upscale videos
+        formats_options.append((video_format, options))
 
-        _, target_path = tempfile.mkstemp(
-            suffix='_{name}.{extension}'.format(**options))
+    return formats_options
 
-        try:
-            encoding = encoding_backend.encode(
-                source_path, target_path, options['params'])
-            while encoding:
-                try:
-                    progress = next(encoding)
-                except StopIteration:
-                    break
-                video_format.update_progress(progress)
-        except VideoEncodingError:
-            # TODO handle with more care
-            video_format.delete()
-            os.remove(target_path)
-            continue
 
-        # save encoded file
-        video_format.file.save(
-            '{filename}_{name}.{extension}'.format(filename=filename,
-                                                   **options),
-            File(open(target_path, mode='rb')))
+def _save_encoding_progress(encoding):
+    # the encoder reports fractions, 100 is kept for the saved files
+    encoding.video_format.update_progress(
+        min(int(encoding.progress * 100), 99))
 
-        video_format.update_progress(100)  # now we are ready
 
-        # remove temporary file
-        os.remove(target_path)
+def _save_encoding(encoding):
+    if encoding.error:
+        # TODO handle with more care
+        encoding.video_format.delete()
+        return
 
-        if temp_file:
-            os.unlink(temp_file.name)
-            temp_file.close()
+    # save encoded file
+    with open(encoding.target_path, mode='rb') as target_file:
+        encoding.video_format.file.save(encoding.filename, File(target_file))
+
+    encoding.video_format.update_progress(100)  # now we are ready
@@ -1,5 +1,10 @@
+import hashlib
+import os
+import shutil
 import tempfile
 
+from .config import settings
+
 
 def get_fieldfile_local_path(fieldfile):
     storage = fieldfile.storage
@@ -9,12 +14,72 @@ def get_fieldfile_local_path(fieldfile):
         # Try to access with path
         storage_local_path = storage.path(fieldfile.path)
     except (NotImplementedError, AttributeError):
+        local_copy_path = get_fieldfile_local_copy_path(fieldfile=fieldfile)
+
+        if local_copy_path and os.path.exists(local_copy_path):
+            # The file was stored from this machine, see keep_fieldfile_local_copy
+            return local_copy_path, None
+
         # Storage doesnt support absolute paths, download file to a temp local dir
-        storage_file = storage.open(fieldfile.name, 'r')
-        local_temp_file = tempfile.NamedTemporaryFile(delete=False)
-        local_temp_file.write(storage_file.read())
+        local_temp_file = tempfile.NamedTemporaryFile(
+            delete=False, suffix=os.path.splitext(fieldfile.name)[1])
+
+        with storage.open(fieldfile.name, 'rb') as storage_file:
+            shutil.copyfileobj(storage_file, local_temp_file)
+
         local_temp_file.seek(0)
 
         storage_local_path = local_temp_file.name
 
     return storage_local_path, local_temp_file
+
+
+def get_fieldfile_local_copy_path(fieldfile):
+    """
+    Returns where the local copy of the video stored in the fieldfile is kept
+    when `VIDEO_ENCODING_LOCAL_COPIES_DIR` is set.
+    """
+    if not settings.VIDEO_ENCODING_LOCAL_COPIES_DIR:
+        return None
+
+    name_hash = hashlib.sha1(fieldfile.name.encode('utf-8')).hexdigest()
+
+    return os.path.join(settings.VIDEO_ENCODING_LOCAL_COPIES_DIR,
+                        name_hash + os.path.splitext(fieldfile.name)[1])
+
+
+def keep_fieldfile_local_copy(fieldfile, local_path, move=False):
+    """
+    Keeps the local file the fieldfile was just stored from, so the video is
+    not downloaded again from storages without absolute paths to encode it
+    on this machine. Returns whether it was kept, `move` moves the local file
+    instead of copying it.
+    """
+    local_copy_path = get_fieldfile_local_copy_path(fieldfile=fieldfile)
+
+    if not local_copy_path:
+        return False
+
+    try:
+        fieldfile.storage.path(fieldfile.name)
+    except (NotImplementedError, AttributeError):
+        pass
+    else:
+        # The storage file is already local
+        return False
+
+    os.makedirs(settings.VIDEO_ENCODING_LOCAL_COPIES_DIR, exist_ok=True)
+
+    if move:
+        shutil.move(local_path, local_copy_path)
+    else:
+        shutil.copyfile(local_path, local_copy_path)
+
+    return True
+
+
+def delete_fieldfile_local_copy(fieldfile):
+    local_copy_path = get_fieldfile_local_copy_path(fieldfile=fieldfile)
+
+    if local_copy_path and os.path.exists(local_copy_path):
+        os.remove(local_copy_path)